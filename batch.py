@@ -0,0 +1,128 @@
+import json # For reading and writing the JSONL batch files
+import os # For building the batch file paths
+import time # For polling the batches
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
+from utils import create_directory, get_model_name, verbose_output # Import Functions from ./utils.py
+
+# Batch Constants:
+BATCH_DIRECTORY = f"{OUTPUT_DIRECTORY}Batches/" # The directory of the JSONL batch request and result files
+BATCH_POLL_INTERVAL_SECONDS = 30 # The number of seconds between each batch status poll
+BATCH_TIMEOUT_SECONDS = 25 * 60 * 60 # The maximum number of seconds to wait for the batches (a bit more than the 24h completion window)
+
+def supports_batch(model):
+   """
+   Verify if a model supports the offline batch submission mode.
+
+   :param model: The AI model object.
+   :return: True if the model implements the batch methods.
+   """
+
+   return all(hasattr(model, method) for method in ("build_batch_request", "submit_batch", "get_batch_status", "download_batch_results")) # Return True if every batch method is implemented
+
+def write_batch_file(model, model_name, task_messages):
+   """
+   Serialize the unique tasks into a provider-format JSONL batch file.
+
+   :param model: The AI model object.
+   :param model_name: The model name, used in the file name.
+   :param task_messages: List of unique task messages.
+   :return: Tuple of the batch file path and the dictionary mapping each custom id to its task message.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Writing the {BackgroundColors.CYAN}{model_name}{BackgroundColors.GREEN} batch file...{Style.RESET_ALL}") # Output the writing message
+
+   create_directory(BATCH_DIRECTORY, BATCH_DIRECTORY.replace(OUTPUT_DIRECTORY, "")) # Create the batch directory
+   batch_file_path = os.path.join(BATCH_DIRECTORY, f"{model_name}_batch_requests.jsonl") # The batch file path
+   custom_ids = {} # Maps each custom id to its task message
+
+   with open(batch_file_path, mode="w", encoding="utf-8") as batch_file: # Open the batch file
+      for index, task_message in enumerate(task_messages): # Loop through each unique task
+         custom_id = f"task-{index}" # The custom id of the task
+         custom_ids[custom_id] = task_message # Map the custom id to the task
+         batch_file.write(json.dumps(model.build_batch_request(custom_id, task_message)) + "\n") # Write the request line
+
+   return batch_file_path, custom_ids # Return the batch file path and the custom ids
+
+def parse_batch_results(results_text, custom_ids):
+   """
+   Parse the JSONL results of a batch. The OpenAI and Mistral result lines share the same layout.
+
+   :param results_text: The JSONL results text.
+   :param custom_ids: Dictionary mapping each custom id to its task message.
+   :return: Dictionary mapping each task message to its response.
+   """
+
+   responses = {} # Maps each task message to its response
+
+   for line in results_text.splitlines(): # Loop through each result line
+      if not line.strip(): # If the line is empty
+         continue # Skip it
+
+      result = json.loads(line) # Parse the result line
+      response = result.get("response") or {} # Get the response of the request
+      if result.get("custom_id") not in custom_ids or response.get("status_code") != 200: # If the request is unknown or failed
+         continue # Skip it, the task will be sent synchronously
+
+      choices = (response.get("body") or {}).get("choices") or [] # Get the completion choices
+      if choices: # If there is a completion
+         responses[custom_ids[result["custom_id"]]] = choices[0]["message"]["content"] # Map the task message to the response
+
+   return responses # Return the responses
+
+def run_batches(models_object_list, task_messages):
+   """
+   Serialize the tasks of every batch-capable model into JSONL, submit the batches, poll them until they finish and collect their results.
+
+   :param models_object_list: The list of AI model objects.
+   :param task_messages: Iterable of task messages.
+   :return: Dictionary mapping each batch-capable model object to a dictionary of task message to response.
+   """
+
+   batch_models = [model for model in models_object_list if supports_batch(model)] # The models that support batches
+   if not batch_models: # If no model supports batches
+      print(f"{BackgroundColors.YELLOW}None of the selected models supports the batch mode, running every task synchronously.{Style.RESET_ALL}") # Output the warning message
+      return {} # There are no batch results
+
+   unique_task_messages = list(dict.fromkeys(task_messages)) # The unique tasks, in the input order
+   pending_batches = {} # Maps each model to its batch id and custom ids
+   batch_results = {} # Maps each model to its responses
+
+   for model in batch_models: # Loop through each batch-capable model
+      model_name = get_model_name(model) # Get the model's name
+      batch_file_path, custom_ids = write_batch_file(model, model_name, unique_task_messages) # Write the batch file
+      try: # Try to submit the batch
+         pending_batches[model] = (model.submit_batch(batch_file_path), custom_ids) # Submit the batch
+         print(f"{BackgroundColors.GREEN}Submitted the {BackgroundColors.CYAN}{model_name}{BackgroundColors.GREEN} batch with {BackgroundColors.CYAN}{len(custom_ids)}{BackgroundColors.GREEN} tasks.{Style.RESET_ALL}") # Output the submitted message
+      except Exception as e: # If the batch could not be submitted
+         print(f"{BackgroundColors.RED}Error submitting the {BackgroundColors.CYAN}{model_name}{BackgroundColors.RED} batch, its tasks will be sent synchronously: {str(e)}{Style.RESET_ALL}") # Output the error message
+
+   deadline = time.monotonic() + BATCH_TIMEOUT_SECONDS # The time limit of the batches
+
+   while pending_batches and time.monotonic() < deadline: # Poll until every batch finishes or the time limit is reached
+      for model, (batch_id, custom_ids) in list(pending_batches.items()): # Loop through each pending batch
+         model_name = get_model_name(model) # Get the model's name
+         try: # Try to get the batch status
+            status, output_file_id = model.get_batch_status(batch_id) # Get the batch status
+         except Exception as e: # If the status could not be retrieved
+            print(f"{BackgroundColors.YELLOW}Error polling the {BackgroundColors.CYAN}{model_name}{BackgroundColors.YELLOW} batch: {str(e)}{Style.RESET_ALL}") # Output the warning message
+            continue # Poll it again later
+
+         if status == "running": # If the batch is still running
+            continue # Poll it again later
+
+         del pending_batches[model] # The batch finished
+         results_text = model.download_batch_results(output_file_id) if output_file_id else "" # Download the results
+         with open(os.path.join(BATCH_DIRECTORY, f"{model_name}_batch_results.jsonl"), mode="w", encoding="utf-8") as results_file: # Open the results file
+            results_file.write(results_text) # Keep the raw results next to the requests
+         batch_results[model] = parse_batch_results(results_text, custom_ids) # Parse the results
+         print(f"{BackgroundColors.GREEN}The {BackgroundColors.CYAN}{model_name}{BackgroundColors.GREEN} batch {status} with {BackgroundColors.CYAN}{len(batch_results[model])}/{len(custom_ids)}{BackgroundColors.GREEN} responses.{Style.RESET_ALL}") # Output the finished message
+
+      if pending_batches: # If some batches are still running
+         time.sleep(BATCH_POLL_INTERVAL_SECONDS) # Wait before polling again
+
+   for model in pending_batches: # Loop through each batch that did not finish in time
+      print(f"{BackgroundColors.RED}The {BackgroundColors.CYAN}{get_model_name(model)}{BackgroundColors.RED} batch did not finish in time, its tasks will be sent synchronously.{Style.RESET_ALL}") # Output the error message
+
+   return batch_results # Return the batch results
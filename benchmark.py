@@ -0,0 +1,341 @@
+import argparse # For parsing the command line arguments
+import contextlib # For silencing the output of the load scenarios
+import csv # For writing the synthetic input files
+import functools # For merging the latency histograms of the providers
+import importlib.util # For verifying if the Gemini SDK is installed
+import json # For reading the results of the load scenarios
+import os # For running the startup benchmark from the project directory
+import random # For generating the synthetic texts
+import shlex # For building the fake GitHub CLI command
+import statistics # For the median of the startup times
+import subprocess # For importing each module in a fresh interpreter
+import sys # For the path of the current interpreter
+import tempfile # For the directories of the load scenarios
+import time # For measuring the elapsed time
+import main as collector # Import the collector from ./main.py (aliased, as this module has its own main function)
+import numpy as np # For numerical operations
+from colorama import Style # For coloring the terminal
+from metrics import RUN_METRICS, DurationHistogram # Import the run metrics from ./metrics.py
+from mock_server import start_mock_server # Import the local stand-in server from ./mock_server.py
+from providers import PROVIDER_MODULES, get_provider_class # Import the provider registry from ./providers.py
+from sklearn.feature_extraction.text import TfidfVectorizer # For the per-pair reference implementation
+from sklearn.metrics.pairwise import cosine_similarity # For the per-pair reference implementation
+from similarity import SimilarityEngine # Import the batched similarity engine from ./similarity.py
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Benchmark Constants:
+SIMILARITY_ROWS = 10000 # The number of synthetic tasks of the similarity benchmark
+SIMILARITY_MODELS = 5 # The number of synthetic models of the similarity benchmark
+VOCABULARY_SIZE = 3000 # The number of distinct words of the synthetic texts
+WORDS_PER_TEXT = (20, 120) # The minimum and maximum number of words of the synthetic texts
+RANDOM_SEED = 42 # The seed of the random generator, so every run uses the same texts
+STARTUP_REPETITIONS = 5 # The number of fresh interpreters used to measure the import time of each module
+STARTUP_MODULES = {"main.py": "main", "Similarity (sklearn)": "sklearn.feature_extraction.text"} # The modules measured by the startup benchmark, besides the providers
+LOAD_SCENARIOS = (100, 1000, 10000) # The number of tasks of each load scenario
+LOAD_MODELS = {"ChatGPT": "ChatGPTModel", "Copilot": "CopilotModel", "Llama": "LlamaModel", "Mistral": "MistralModel"} # The models of the load scenarios (Gemini is added when its SDK is installed)
+LOAD_LATENCY_SECONDS = 0.05 # The median latency of the mock providers and of the fake GitHub CLI
+LOAD_LATENCY_SPREAD = 0.5 # The sigma of the lognormal latency of the mock providers
+LOAD_TOKEN_INTERVAL_SECONDS = 0.0 # The number of seconds between the streamed tokens of the mock providers
+LOAD_ERROR_RATE = 0.01 # The fraction of the calls that fail with a 500 error (or a non-zero exit code for the fake GitHub CLI)
+LOAD_RATE_LIMIT_RATE = 0.01 # The fraction of the calls that fail with a 429 error
+LOAD_RETRY_AFTER_SECONDS = 0.05 # The Retry-After delay of the 429 errors
+LOAD_REQUESTS_PER_MINUTE = 1000000 # The provider budgets are raised, so the scenarios measure the collector instead of the rate limits
+
+def generate_text(random_generator, vocabulary):
+   """
+   Generate a synthetic text made of random vocabulary words.
+
+   :param random_generator: The random generator.
+   :param vocabulary: The list of words.
+   :return: The synthetic text.
+   """
+
+   return " ".join(random_generator.choices(vocabulary, k=random_generator.randint(*WORDS_PER_TEXT))) # Return the random words
+
+def generate_similarity_dataset(num_rows, num_models):
+   """
+   Generate the synthetic outputs and expected outputs of the similarity benchmark.
+
+   :param num_rows: The number of tasks.
+   :param num_models: The number of models per task.
+   :return: Tuple of the list of per-task output lists and the list of expected outputs.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Generating the synthetic similarity dataset...{Style.RESET_ALL}") # Output the generating message
+
+   random_generator = random.Random(RANDOM_SEED) # Create the random generator
+   vocabulary = [f"word{index}" for index in range(VOCABULARY_SIZE)] # Create the vocabulary
+   expected_outputs = [generate_text(random_generator, vocabulary) for _ in range(num_rows)] # Generate the expected outputs
+   outputs = [[generate_text(random_generator, vocabulary) for _ in range(num_models)] for _ in range(num_rows)] # Generate the models' outputs
+
+   return outputs, expected_outputs # Return the dataset
+
+def per_pair_similarity(output, expected_output):
+   """
+   Reference implementation that fits a TfidfVectorizer on each (output, expected output) pair, as the collector originally did.
+
+   :param output: The output text.
+   :param expected_output: The expected output text.
+   :return: The similarity percentage.
+   """
+
+   vectors = TfidfVectorizer().fit_transform([output, expected_output]).toarray() # Fit the vectorizer and convert the vectors to a dense array
+   similarity = cosine_similarity([vectors[0]], [vectors[1]])[0][0] # Compute the cosine similarity between the vectors
+
+   return round(similarity * 100, 2) # Return similarity as a percentage rounded to 2 decimal places
+
+def benchmark_similarity(num_rows=SIMILARITY_ROWS, num_models=SIMILARITY_MODELS):
+   """
+   Compare the per-pair TF-IDF fits against the batched similarity engine, scoring one task at a time and the whole run at once.
+
+   :param num_rows: The number of tasks.
+   :param num_models: The number of models per task.
+   :return: Dictionary with the elapsed seconds of each method and the maximum difference between their scores.
+   """
+
+   print(f"{BackgroundColors.GREEN}Benchmarking the similarity of {BackgroundColors.CYAN}{num_rows}{BackgroundColors.GREEN} tasks x {BackgroundColors.CYAN}{num_models}{BackgroundColors.GREEN} models...{Style.RESET_ALL}") # Output the benchmark message
+
+   outputs, expected_outputs = generate_similarity_dataset(num_rows, num_models) # Generate the dataset
+   engine = SimilarityEngine("pair") # Create the batched similarity engine
+
+   start_time = time.perf_counter() # Start the per-pair timer
+   per_pair_scores = [per_pair_similarity(output, expected_output) for row_outputs, expected_output in zip(outputs, expected_outputs) for output in row_outputs] # Score each pair with its own vectorizer
+   per_pair_seconds = time.perf_counter() - start_time # Stop the per-pair timer
+
+   start_time = time.perf_counter() # Start the per-task timer
+   per_task_scores = [score for row_outputs, expected_output in zip(outputs, expected_outputs) for score in engine.compute_similarities(row_outputs, [expected_output] * num_models)] # Score each task in one batch, as main.py does
+   per_task_seconds = time.perf_counter() - start_time # Stop the per-task timer
+
+   start_time = time.perf_counter() # Start the whole run timer
+   whole_run_scores = engine.compute_similarities([output for row_outputs in outputs for output in row_outputs], [expected_output for expected_output in expected_outputs for _ in range(num_models)]) # Score the whole run in one batch
+   whole_run_seconds = time.perf_counter() - start_time # Stop the whole run timer
+
+   max_difference = float(max(np.max(np.abs(np.array(per_pair_scores) - np.array(per_task_scores))), np.max(np.abs(np.array(per_pair_scores) - np.array(whole_run_scores))))) # The largest score difference against the reference implementation
+
+   results = {"per_pair_seconds": per_pair_seconds, "per_task_seconds": per_task_seconds, "whole_run_seconds": whole_run_seconds, "max_difference": max_difference} # The benchmark results
+
+   print(f"{BackgroundColors.GREEN} - Per-pair vectorizer fits: {BackgroundColors.CYAN}{per_pair_seconds:.2f}s{Style.RESET_ALL}") # Output the per-pair time
+   print(f"{BackgroundColors.GREEN} - Batched engine, one batch per task: {BackgroundColors.CYAN}{per_task_seconds:.2f}s{BackgroundColors.GREEN} ({per_pair_seconds / per_task_seconds:.1f}x faster){Style.RESET_ALL}") # Output the per-task time
+   print(f"{BackgroundColors.GREEN} - Batched engine, one batch per run: {BackgroundColors.CYAN}{whole_run_seconds:.2f}s{BackgroundColors.GREEN} ({per_pair_seconds / whole_run_seconds:.1f}x faster){Style.RESET_ALL}") # Output the whole run time
+   print(f"{BackgroundColors.GREEN} - Maximum score difference: {BackgroundColors.CYAN}{max_difference:.2f}{Style.RESET_ALL}\n") # Output the maximum difference
+
+   return results # Return the benchmark results
+
+def measure_import_time(module_name):
+   """
+   Measure the time to import a module in a fresh interpreter, so the modules already imported by this process do not hide its cost.
+
+   :param module_name: The name of the module to import.
+   :return: The import time in seconds, or None if the module could not be imported.
+   """
+
+   code = f"import time; start_time = time.perf_counter(); import {module_name}; print(time.perf_counter() - start_time)" # Import the module and print the elapsed time
+   result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True) # Run a fresh interpreter in the project directory
+
+   return float(result.stdout.strip()) if result.returncode == 0 else None # Return the import time, or None if the import failed
+
+def benchmark_startup(repetitions=STARTUP_REPETITIONS):
+   """
+   Measure the import cost of main.py, of each provider module (with its SDK) and of the similarity dependencies.
+
+   :param repetitions: The number of fresh interpreters used for each module.
+   :return: Dictionary mapping each measured name to its median import time in seconds, or None if it could not be imported.
+   """
+
+   print(f"{BackgroundColors.GREEN}Benchmarking the import time of each module over {BackgroundColors.CYAN}{repetitions}{BackgroundColors.GREEN} fresh interpreters...{Style.RESET_ALL}") # Output the benchmark message
+
+   modules = {**STARTUP_MODULES, **PROVIDER_MODULES} # The modules to measure
+   results = {} # Maps each measured name to its median import time
+
+   for name, module_name in modules.items(): # Loop through each module
+      import_times = [measure_import_time(module_name) for _ in range(repetitions)] # Measure the import time in fresh interpreters
+      results[name] = statistics.median(import_times) if None not in import_times else None # The median import time
+
+      if results[name] is None: # If the module could not be imported
+         print(f"{BackgroundColors.GREEN} - {name}: {BackgroundColors.YELLOW}could not be imported (is its SDK installed?){Style.RESET_ALL}") # Output the import error
+      else: # If the module was imported
+         print(f"{BackgroundColors.GREEN} - {name}: {BackgroundColors.CYAN}{results[name] * 1000:.0f}ms{Style.RESET_ALL}") # Output the import time
+
+   print() # Output an empty line
+
+   return results # Return the benchmark results
+
+def get_load_models():
+   """
+   Get the models of the load scenarios.
+
+   :return: Dictionary mapping each model name to its class name.
+   """
+
+   load_models = dict(LOAD_MODELS) # The models that only need the installed SDKs
+   if importlib.util.find_spec("google") and importlib.util.find_spec("google.generativeai"): # If the Gemini SDK is installed
+      load_models["Gemini"] = "GeminiModel" # Add Gemini
+
+   return load_models # Return the load models
+
+def write_load_input(input_file, num_tasks):
+   """
+   Write a synthetic input CSV file for a load scenario.
+
+   :param input_file: The path to the input CSV file.
+   :param num_tasks: The number of tasks.
+   :return: None
+   """
+
+   random_generator = random.Random(RANDOM_SEED) # Create the random generator
+   vocabulary = [f"word{index}" for index in range(VOCABULARY_SIZE)] # Create the vocabulary
+
+   with open(input_file, mode="w", newline="", encoding="utf-8") as file: # Open the input file
+      writer = csv.writer(file) # Create the CSV writer
+      writer.writerow(["Task", "Expected Output (Optional)"]) # Write the header
+      for index in range(num_tasks): # Loop through each task
+         writer.writerow([f"Task {index}: {generate_text(random_generator, vocabulary)}", generate_text(random_generator, vocabulary)]) # Write the task and its expected output
+
+def get_peak_rss_megabytes():
+   """
+   Get the peak resident set size of the current process.
+
+   :return: The peak RSS in megabytes, or None if it is not available on this operating system.
+   """
+
+   try: # Try to import the Unix resource module
+      import resource # Only available on Unix
+   except ImportError: # If the operating system is not Unix
+      return None # The peak RSS is not available
+
+   peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # The peak RSS, in kilobytes on Linux and in bytes on macOS
+
+   return round(peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) # Return the peak RSS in megabytes
+
+def run_load_scenario(num_tasks):
+   """
+   Run the collector on the input file of the current directory, printing the scenario results as JSON.
+   It is run in a fresh interpreter by benchmark_load, whose current directory holds the scenario input and .env files.
+
+   :param num_tasks: The number of tasks of the scenario.
+   :return: Dictionary of the scenario results.
+   """
+
+   collector.EXECUTE_MODELS.clear() # Forget the configured models
+   collector.EXECUTE_MODELS.update(get_load_models()) # Use the load models
+   collector.CACHE_RESPONSES = False # Every task calls the mock providers
+
+   for model_class_name in collector.EXECUTE_MODELS.values(): # Loop through each model class
+      model_class = get_provider_class(model_class_name) # Import the model class
+      if getattr(model_class, "REQUESTS_PER_MINUTE", None): # If the model has a rate limiter
+         model_class.REQUESTS_PER_MINUTE, model_class.TOKENS_PER_MINUTE = LOAD_REQUESTS_PER_MINUTE, None # Raise its budgets
+
+   collector.create_directories() # Create the input and output directories
+
+   start_time = time.perf_counter() # Start the run timer
+   with open(os.devnull, mode="w") as devnull, contextlib.redirect_stdout(devnull): # Silence the progress output
+      collector.run_tasks(collector.read_csv_file()) # Run the collector
+   elapsed_seconds = time.perf_counter() - start_time # Stop the run timer
+   collector.close_provider_resources() # Close the pooled HTTP connections
+
+   snapshot = RUN_METRICS.snapshot() # Summarize the metrics of the run
+   latency = functools.reduce(DurationHistogram.merge, (provider_metrics["latency"] for provider_metrics in RUN_METRICS.providers.values()), DurationHistogram()) # The latency histogram of every call
+
+   results = { # The scenario results
+      "tasks": num_tasks, # The number of tasks
+      "seconds": round(elapsed_seconds, 3), # The elapsed time
+      "tasks_per_second": round(num_tasks / elapsed_seconds, 2), # The throughput
+      "peak_rss_mb": get_peak_rss_megabytes(), # The peak memory use
+      "latency": latency.summarize(), # The latency of the calls
+      "calls": sum(provider_metrics["calls"] for provider_metrics in snapshot["providers"].values()), # The number of calls
+      "errors": sum(provider_metrics["errors"] for provider_metrics in snapshot["providers"].values()), # The number of failed calls
+   }
+
+   print(json.dumps(results)) # Output the results for benchmark_load
+
+   return results # Return the results
+
+def benchmark_load(scenarios=LOAD_SCENARIOS):
+   """
+   Measure the throughput, peak memory and tail latency of the collector against the local mock providers and the fake GitHub CLI,
+   running each scenario in a fresh interpreter.
+
+   :param scenarios: The number of tasks of each scenario.
+   :return: Dictionary mapping each number of tasks to its scenario results.
+   """
+
+   load_models = get_load_models() # The models of the scenarios
+   print(f"{BackgroundColors.GREEN}Benchmarking the collector with {BackgroundColors.CYAN}{', '.join(load_models)}{BackgroundColors.GREEN} against the mock providers...{Style.RESET_ALL}") # Output the benchmark message
+
+   server = start_mock_server(port=0, latency_seconds=LOAD_LATENCY_SECONDS, latency_spread=LOAD_LATENCY_SPREAD, token_interval_seconds=LOAD_TOKEN_INTERVAL_SECONDS, error_rate=LOAD_ERROR_RATE, rate_limit_rate=LOAD_RATE_LIMIT_RATE, retry_after_seconds=LOAD_RETRY_AFTER_SECONDS) # Start the mock providers
+   host, port = server.server_address[:2] # Get the mock server address
+   project_directory = os.path.dirname(os.path.abspath(__file__)) # The directory of the collector modules
+   environment = { # The environment of the scenarios
+      **os.environ, # Keep the current environment
+      "PYTHONPATH": os.pathsep.join(filter(None, [project_directory, os.environ.get("PYTHONPATH")])), # Import the collector modules
+      "COPILOT_GH_COMMAND": f"{shlex.quote(sys.executable)} {shlex.quote(os.path.join(project_directory, 'fake_gh.py'))}", # Use the fake GitHub CLI
+      "FAKE_GH_DELAY_SECONDS": str(LOAD_LATENCY_SECONDS), # The latency of the fake GitHub CLI
+      "FAKE_GH_ERROR_RATE": str(LOAD_ERROR_RATE), # The error rate of the fake GitHub CLI
+   }
+   results = {} # Maps each number of tasks to its results
+
+   for num_tasks in scenarios: # Loop through each scenario
+      with tempfile.TemporaryDirectory() as scenario_directory: # Create the scenario directory
+         os.makedirs(os.path.join(scenario_directory, "Inputs")) # Create the input directory
+         write_load_input(os.path.join(scenario_directory, "Inputs", "input.csv"), num_tasks) # Write the input file
+         with open(os.path.join(scenario_directory, ".env"), mode="w", encoding="utf-8") as env_file: # Write the .env file of the mock providers
+            env_file.write(f"CHATGPT_API_KEY=mock\nGEMINI_API_KEY=mock\nLLAMA_API_KEY=mock\nMISTRAL_API_KEY=mock\nCHATGPT_BASE_URL=http://{host}:{port}/v1\nLLAMA_BASE_URL=http://{host}:{port}\nMISTRAL_SERVER_URL=http://{host}:{port}\nGEMINI_API_ENDPOINT=http://{host}:{port}\n") # The fake keys and the mock server URLs
+
+         scenario = subprocess.run([sys.executable, "-c", f"import benchmark; benchmark.run_load_scenario({int(num_tasks)})"], cwd=scenario_directory, env=environment, capture_output=True, text=True) # Run the scenario in a fresh interpreter
+
+      if scenario.returncode != 0 or not scenario.stdout.strip(): # If the scenario failed
+         print(f"{BackgroundColors.RED}The {BackgroundColors.CYAN}{num_tasks}{BackgroundColors.RED} tasks scenario failed:\n{scenario.stderr[-2000:]}{Style.RESET_ALL}") # Output the error
+         continue # Run the next scenario
+
+      results[num_tasks] = json.loads(scenario.stdout.strip().splitlines()[-1]) # Parse the results
+      result = results[num_tasks] # The scenario results
+      print(f"{BackgroundColors.GREEN} - {BackgroundColors.CYAN}{num_tasks}{BackgroundColors.GREEN} tasks: {BackgroundColors.CYAN}{result['tasks_per_second']:.1f} tasks/s{BackgroundColors.GREEN} ({result['seconds']:.1f}s), peak RSS {BackgroundColors.CYAN}{result['peak_rss_mb']} MB{BackgroundColors.GREEN}, call latency p50/p95/p99 {BackgroundColors.CYAN}{result['latency']['p50'] * 1000:.0f}/{result['latency']['p95'] * 1000:.0f}/{result['latency']['p99'] * 1000:.0f}ms{BackgroundColors.GREEN}, {BackgroundColors.CYAN}{result['errors']}/{result['calls']}{BackgroundColors.GREEN} failed calls{Style.RESET_ALL}") # Output the scenario results
+
+   server.shutdown() # Stop the mock providers
+   print() # Output an empty line
+
+   return results # Return the benchmark results
+
+def parse_arguments():
+   """
+   Parse the command line arguments.
+
+   :return: The parsed arguments.
+   """
+
+   parser = argparse.ArgumentParser(description="AIs API Response Collector benchmarks") # Create the argument parser
+   parser.add_argument("benchmark", nargs="?", default="similarity", choices=["similarity", "startup", "load"], help="The benchmark to run") # The benchmark to run
+   parser.add_argument("--rows", type=int, default=SIMILARITY_ROWS, help="The number of synthetic tasks of the similarity benchmark") # The number of rows
+   parser.add_argument("--tasks", type=int, nargs="+", default=list(LOAD_SCENARIOS), help="The number of tasks of each load scenario") # The load scenarios
+
+   return parser.parse_args() # Return the parsed arguments
+
+def main():
+   """
+   Main function.
+
+   :return: None
+   """
+
+   args = parse_arguments() # Parse the command line arguments
+
+   print(f"{BackgroundColors.CLEAR_TERMINAL}{BackgroundColors.BOLD}{BackgroundColors.GREEN}Welcome to the {BackgroundColors.CYAN}AIs API Response Collector Benchmarks{BackgroundColors.GREEN}!{Style.RESET_ALL}\n") # Output the welcome message
+
+   if args.benchmark == "similarity": # If the similarity benchmark was selected
+      benchmark_similarity(args.rows) # Run the similarity benchmark
+   elif args.benchmark == "startup": # If the startup benchmark was selected
+      benchmark_startup() # Run the startup benchmark
+   elif args.benchmark == "load": # If the load benchmark was selected
+      benchmark_load(args.tasks) # Run the load scenarios
+
+   print(f"{BackgroundColors.BOLD}{BackgroundColors.GREEN}Program finished.{Style.RESET_ALL}") # Output the end of the program message
+
+if __name__ == "__main__":
+   """
+   This is the standard boilerplate that calls the main() function.
+
+   :return: None
+   """
+
+   main() # Call the main function
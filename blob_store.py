@@ -0,0 +1,159 @@
+import csv # For reading the output CSV files
+import hashlib # For the content addresses of the responses
+import mmap # For reading the responses without loading the segment file into memory
+import os # For verifying if the segment file exists
+import re # For parsing the blob references
+import struct # For the record headers of the segment file
+import threading # For making the store thread safe
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Blob Store Constants:
+BLOB_STORE_FILE = f"{OUTPUT_DIRECTORY}responses.blobs" # The path to the append-only segment file of the responses
+BLOB_RECORD_MAGIC = b"BLB1" # The marker at the start of each record of the segment file
+BLOB_RECORD_HEADER = struct.Struct("<4s32sQ") # The record header: the marker, the SHA-256 digest and the length of the response in bytes
+BLOB_REFERENCE_PATTERN = re.compile(r"blob:([0-9a-f]{64}):(\d+):(\d+)") # The format of the blob references written to the output cells
+
+class BlobStore:
+   """
+   A content-addressed, append-only store of the model responses.
+   Each unique response is written once to the segment file, after a header with its SHA-256 digest and length,
+   and is referenced from the output cells by "blob:<digest>:<offset>:<length>". The responses are read through a memory map of the segment file.
+
+   """
+
+   def __init__(self, file_path=BLOB_STORE_FILE, read_only=False): # Constructor
+      self.file_path = file_path # The path to the segment file
+      self.read_only = read_only # If the store is only used to read the responses
+      self.lock = threading.Lock() # Lock for the segment file and its memory map
+      self.file = open(file_path, mode="rb" if read_only else "a+b") # Open the segment file, creating it if it will be written
+      self.memory_map = None # The memory map of the segment file, created on the first read
+      self.index = {} # Maps the digest of each stored response to its offset and length, so a response is only written once
+      self.load_index() # Read the digests of the stored responses
+
+   def load_index(self):
+      """
+      Read the record headers of the segment file into the index. A record left incomplete by an interrupted run is removed from the end of the file.
+
+      :return: None
+      """
+
+      file_size = os.fstat(self.file.fileno()).st_size # The size of the segment file
+      position = 0 # The offset of the next record header
+
+      with (mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if file_size else memoryview(b"")) as segment: # Map the segment file, if it is not empty
+         while position + BLOB_RECORD_HEADER.size <= file_size: # Loop through each record header
+            magic, digest, length = BLOB_RECORD_HEADER.unpack_from(segment, position) # Read the header
+            data_offset = position + BLOB_RECORD_HEADER.size # The offset of the response
+            if magic != BLOB_RECORD_MAGIC or data_offset + length > file_size: # If the record is incomplete or corrupted
+               break # Stop at the last complete record
+            self.index.setdefault(digest.hex(), (data_offset, length)) # Index the response
+            position = data_offset + length # Go to the next record
+
+      if position < file_size and not self.read_only: # If the end of the file is an incomplete record
+         print(f"{BackgroundColors.YELLOW}Removing the incomplete last {BackgroundColors.CYAN}{file_size - position}{BackgroundColors.YELLOW} bytes of {BackgroundColors.CYAN}{self.file_path}{Style.RESET_ALL}") # Output the warning message
+         self.file.truncate(position) # Remove it, so the next record is appended after the last complete one
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Opened the blob store {BackgroundColors.CYAN}{self.file_path}{BackgroundColors.GREEN} with {BackgroundColors.CYAN}{len(self.index)}{BackgroundColors.GREEN} responses.{Style.RESET_ALL}") # Output the opened message
+
+   def put(self, text):
+      """
+      Store a response, unless an identical response is already stored.
+
+      :param text: The response text.
+      :return: The blob reference of the response.
+      """
+
+      data = text.encode("utf-8") # Encode the response
+      digest = hashlib.sha256(data).digest() # The content address of the response
+      key = digest.hex() # The index key of the response
+
+      with self.lock: # Lock the segment file
+         if key not in self.index: # If the response is not stored yet
+            self.file.seek(0, os.SEEK_END) # Go to the end of the segment file
+            data_offset = self.file.tell() + BLOB_RECORD_HEADER.size # The offset of the response
+            self.file.write(BLOB_RECORD_HEADER.pack(BLOB_RECORD_MAGIC, digest, len(data)) + data) # Append the record
+            self.file.flush() # Make the record visible to the memory maps and the other readers
+            self.index[key] = (data_offset, len(data)) # Index the response
+
+         offset, length = self.index[key] # The location of the response
+
+      return f"blob:{key}:{offset}:{length}" # Return the blob reference
+
+   def read(self, reference):
+      """
+      Read a response from the memory map of the segment file.
+
+      :param reference: The blob reference of the response.
+      :return: The response text.
+      """
+
+      _, offset, length = parse_blob_reference(reference) # The location of the response
+
+      with self.lock: # Lock the memory map
+         if self.memory_map is None or offset + length > len(self.memory_map): # If the response was appended after the file was mapped
+            if self.memory_map is not None: # If the file was already mapped
+               self.memory_map.close() # Release the old map
+            self.memory_map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) # Map the whole segment file
+
+         if offset + length > len(self.memory_map): # If the reference points past the end of the segment file
+            raise ValueError(f"The blob reference {reference} is not in {self.file_path}") # Report the invalid reference
+
+         return self.memory_map[offset:offset + length].decode("utf-8") # Return the response
+
+   def resolve(self, value):
+      """
+      Get the text of an output cell, reading it from the store if the cell holds a blob reference.
+
+      :param value: The output cell value.
+      :return: The response text, or the value itself if it is not a blob reference.
+      """
+
+      return self.read(value) if parse_blob_reference(value) else value # Return the text of the cell
+
+   def close(self):
+      """
+      Close the memory map and the segment file.
+
+      :return: None
+      """
+
+      with self.lock: # Lock the segment file
+         if self.memory_map is not None: # If the file was mapped
+            self.memory_map.close() # Release the map
+            self.memory_map = None # Forget the closed map
+         self.file.close() # Close the segment file
+
+def parse_blob_reference(value):
+   """
+   Parse a blob reference.
+
+   :param value: The value of an output cell.
+   :return: Tuple of the digest, offset and length of the response, or None if the value is not a blob reference.
+   """
+
+   match = BLOB_REFERENCE_PATTERN.fullmatch(value) if isinstance(value, str) else None # Match the reference format
+
+   return (match.group(1), int(match.group(2)), int(match.group(3))) if match else None # Return the location of the response
+
+def read_output_rows(csv_file, blob_file=BLOB_STORE_FILE):
+   """
+   Read the rows of an output CSV file with the blob references of their cells replaced by the responses, one row at a time.
+   The segment file is memory mapped, so only the responses of the current row are loaded into memory.
+
+   :param csv_file: The path to the output CSV file.
+   :param blob_file: The path to the segment file of the responses.
+   :return: Generator of dictionaries mapping each column to its value.
+   """
+
+   blob_store = BlobStore(blob_file, read_only=True) if os.path.exists(blob_file) else None # Open the store, if the output has one
+
+   try: # Close the store even if the reader stops early
+      with open(csv_file, mode="r", newline="", encoding="utf-8") as file: # Open the output CSV file
+         for row in csv.DictReader(file): # Loop through each row
+            yield {column: blob_store.resolve(value) for column, value in row.items()} if blob_store else row # Yield the row with its responses
+   finally: # When the rows were read
+      if blob_store is not None: # If the store was opened
+         blob_store.close() # Close it
@@ -2,8 +2,11 @@
 
 import atexit # For playing a sound when the program finishes
 import os # For running a command in the terminal
+import time # For measuring the time to first token
 from colorama import Style # For coloring the terminal
-from openai import OpenAI # Import OpenAI client
+from openai import AsyncOpenAI, OpenAI # Import OpenAI clients
+from streaming import aconsume_stream, consume_stream # Import the stream consumers from ./streaming.py
+from transport import get_async_http_client, get_http_client # Import the shared HTTP transport from ./transport.py
 from utils import BackgroundColors # Import Classes from ./utils.py
 from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
 from utils import create_directory, play_sound, verbose_output, verify_env_file, write_output_to_file # Import Functions from ./utils.py
@@ -17,12 +20,30 @@ class ChatGPTModel:
 	# Constants:
 	ENV_PATH = "./.env" # The path to the .env file
 	ENV_VARIABLE = "CHATGPT_API_KEY" # The environment variable to load
+	BASE_URL_ENV_VARIABLE = "CHATGPT_BASE_URL" # The optional environment variable with the API base URL, such as the local mock server
 	OUTPUT_FILE = f"{OUTPUT_DIRECTORY}ChatGPT_output.txt" # The path to the output file
+	REQUESTS_PER_MINUTE = 500 # The requests per minute budget of gpt-4o-mini (adjust it to your account tier)
+	TOKENS_PER_MINUTE = 200000 # The tokens per minute budget of gpt-4o-mini (None disables the tokens budget)
+	REQUEST_TIMEOUT_SECONDS = 120 # The deadline of each request, after which it counts as a failure of the provider's circuit breaker (None waits forever)
+	HTTP2 = True # If HTTP/2 is used, as the OpenAI API supports it
+	HEDGE = True # If a duplicate request may be sent when a call is slower than the recent calls (see HEDGE_REQUESTS in main.py)
+	PACKING = True # If many short tasks may be combined into one JSON-structured request (see PACK_TASKS in main.py)
 
 	def __init__(self): # Constructor
 		self.api_key = verify_env_file(self.ENV_PATH, self.ENV_VARIABLE) # Call verify_env_file to load the API key
 		self.model = "gpt-4o-mini" # The AI model
-		self.client = OpenAI(api_key=self.api_key) # Initialize the OpenAI client with the API key
+		self.base_url = os.getenv(self.BASE_URL_ENV_VARIABLE) or None # The API base URL (None uses the OpenAI API)
+		self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0, http_client=get_http_client(self.HTTP2)) # Initialize the OpenAI client with the API key (retries are handled by the rate limiter)
+		self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0, http_client=get_async_http_client(self.HTTP2)) # Initialize the asynchronous OpenAI client with the API key (retries are handled by the rate limiter)
+
+	def get_parameters(self):
+		"""
+		Get the parameters that change the model's response, used to build the response cache keys.
+
+		:return: Dictionary of the model parameters.
+		"""
+
+		return {"model": self.model} # Return the model parameters
 
 	def run(self, task_message):
 		"""
@@ -44,7 +65,152 @@ class ChatGPTModel:
 			],
 		)
 
-		return response.choices[0].message # Return the response
+		return response.choices[0].message.content # Return the response
+
+	async def arun(self, task_message):
+		"""
+		Asynchronous version of the run method, used by the asyncio execution engine.
+
+		:param task_message: The message to send to the AI model.
+		:return output: The output text.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Running the ChatGPT AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		response = await self.async_client.chat.completions.create( # Create a completion
+			model=self.model, # The model to use
+			messages=[ # The messages to send
+				{
+					"role": "user", # The role of the user
+					"content": task_message, # The content of the message
+				}
+			],
+		)
+
+		return response.choices[0].message.content # Return the response
+
+	def get_chunk_text(self, chunk):
+		"""
+		Get the text of a streamed response chunk.
+
+		:param chunk: The response chunk.
+		:return: The text of the chunk.
+		"""
+
+		return chunk.choices[0].delta.content if chunk.choices else None # Return the text of the chunk, if any
+
+	def get_chunk_usage(self, chunk):
+		"""
+		Get the token usage reported in a streamed response chunk.
+
+		:param chunk: The response chunk.
+		:return: Tuple of the input and output tokens, or None if the chunk has no usage.
+		"""
+
+		return (chunk.usage.prompt_tokens, chunk.usage.completion_tokens) if getattr(chunk, "usage", None) else None # Return the token usage, if any
+
+	def run_stream(self, task_message):
+		"""
+		Streaming version of the run method, which consumes the tokens as they arrive and records the time to first token, the latency and the output tokens per second.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the ChatGPT AI Model...{Style.RESET_ALL}") # Output the running message
+
+		start_time = time.perf_counter() # The time the request is sent
+		stream = self.client.chat.completions.create( # Create a streamed completion
+			model=self.model, # The model to use
+			messages=[{"role": "user", "content": task_message}], # The messages to send
+			stream=True, # Stream the tokens as they are generated
+			stream_options={"include_usage": True}, # Send the token usage in the last chunk
+		)
+
+		return consume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
+
+	async def arun_stream(self, task_message):
+		"""
+		Asynchronous version of the run_stream method, used by the asyncio execution engine.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the ChatGPT AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		start_time = time.perf_counter() # The time the request is sent
+		stream = await self.async_client.chat.completions.create( # Create a streamed completion
+			model=self.model, # The model to use
+			messages=[{"role": "user", "content": task_message}], # The messages to send
+			stream=True, # Stream the tokens as they are generated
+			stream_options={"include_usage": True}, # Send the token usage in the last chunk
+		)
+
+		return await aconsume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
+
+	def build_batch_request(self, custom_id, task_message):
+		"""
+		Build the Batch API request line of a task.
+
+		:param custom_id: The identifier used to match the result to the task.
+		:param task_message: The message to send to the AI model.
+		:return: Dictionary of the JSONL request line.
+		"""
+
+		return { # The Batch API request line
+			"custom_id": custom_id, # The identifier of the request
+			"method": "POST", # The HTTP method
+			"url": "/v1/chat/completions", # The endpoint
+			"body": { # The completion request
+				"model": self.model, # The model to use
+				"messages": [{"role": "user", "content": task_message}], # The messages to send
+			},
+		}
+
+	def submit_batch(self, batch_file_path):
+		"""
+		Upload the JSONL batch file and create the batch.
+
+		:param batch_file_path: The path to the JSONL batch file.
+		:return: The batch identifier.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Submitting the ChatGPT batch...{Style.RESET_ALL}") # Output the submitting message
+
+		with open(batch_file_path, "rb") as batch_file: # Open the batch file
+			uploaded_file = self.client.files.create(file=batch_file, purpose="batch") # Upload the batch file
+
+		batch = self.client.batches.create(input_file_id=uploaded_file.id, endpoint="/v1/chat/completions", completion_window="24h") # Create the batch
+
+		return batch.id # Return the batch identifier
+
+	def get_batch_status(self, batch_id):
+		"""
+		Get the status of a batch.
+
+		:param batch_id: The batch identifier.
+		:return: Tuple of the status ("running", "completed" or "failed") and the output file identifier.
+		"""
+
+		batch = self.client.batches.retrieve(batch_id) # Retrieve the batch
+
+		if batch.status == "completed": # If the batch finished
+			return "completed", batch.output_file_id # Return the output file
+		if batch.status in ("failed", "expired", "cancelling", "cancelled"): # If the batch did not finish
+			return "failed", batch.output_file_id # Return the partial output file, if any
+
+		return "running", None # The batch is still running
+
+	def download_batch_results(self, file_id):
+		"""
+		Download the JSONL results of a batch.
+
+		:param file_id: The output file identifier.
+		:return: The JSONL results text.
+		"""
+
+		return self.client.files.content(file_id).text # Return the results text
 
 def main():
 	"""
@@ -0,0 +1,273 @@
+import asyncio # For the deadlines of the asynchronous calls
+import concurrent.futures # For the results of the synchronous calls with a deadline
+import threading # For making the breakers thread safe
+import time # For the cool-down of the open breakers and the deadlines
+from colorama import Style # For coloring the terminal
+from metrics import RUN_METRICS # Import the run metrics from ./metrics.py
+from utils import BackgroundColors # Import Classes from ./utils.py
+
+# Circuit Breaker Constants:
+PROVIDER_TIMEOUT_SECONDS = 180.0 # The deadline of each request of the model classes that do not set REQUEST_TIMEOUT_SECONDS (None waits forever)
+BREAKER_FAILURE_THRESHOLD = 5 # The number of consecutive failed or timed out calls that open the breaker of a provider
+BREAKER_COOLDOWN_SECONDS = 60.0 # The number of seconds an open breaker skips the calls of its provider before a probe call is let through
+DEADLINE_MAX_THREADS = 16 # The maximum number of threads running the synchronous requests of each provider with a deadline
+
+CIRCUIT_BREAKERS = {} # The circuit breakers of each model class, created on demand
+CIRCUIT_BREAKERS_LOCK = threading.Lock() # Lock for creating the circuit breakers and the deadline thread slots
+DEADLINE_SLOTS = {} # The semaphore bounding the deadline threads of each provider, created on demand
+
+class CircuitOpenError(Exception):
+   """
+   Raised when a call is skipped because the circuit breaker of its provider is open.
+
+   """
+
+class ProviderTimeoutError(TimeoutError):
+   """
+   Raised when a request does not finish within the deadline of its provider.
+
+   """
+
+class CircuitBreaker:
+   """
+   Stops calling a provider after BREAKER_FAILURE_THRESHOLD consecutive failed or timed out calls, so a dead provider does not stall the run.
+   While the breaker is open the calls are skipped. After BREAKER_COOLDOWN_SECONDS a single probe call is let through (half-open):
+   if it succeeds the breaker closes, otherwise it opens again for another cool-down.
+
+   """
+
+   def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown_seconds=BREAKER_COOLDOWN_SECONDS): # Constructor
+      self.name = name # The model name of the provider
+      self.failure_threshold = failure_threshold # The number of consecutive failures that open the breaker
+      self.cooldown_seconds = cooldown_seconds # The number of seconds the breaker stays open
+      self.state = "closed" # The breaker state: "closed", "open" or "half_open"
+      self.consecutive_failures = 0 # The number of consecutive failed calls
+      self.opened_at = None # The time the breaker last opened
+      self.probe_in_flight = False # If the probe call of the half-open breaker is running
+      self.lock = threading.Lock() # Lock for updating the breaker
+
+   def set_state(self, state):
+      """
+      Change the breaker state and record the change in the run metrics. Must be called with the lock held.
+
+      :param state: The new state.
+      :return: None
+      """
+
+      RUN_METRICS.record_breaker_transition(self.name, self.state, state) # Record the state change
+      color = BackgroundColors.GREEN if state == "closed" else BackgroundColors.YELLOW # The color of the state message
+      print(f"{color}The circuit breaker of {BackgroundColors.CYAN}{self.name}{color} changed from {BackgroundColors.CYAN}{self.state}{color} to {BackgroundColors.CYAN}{state}{color}.{Style.RESET_ALL}") # Output the state change
+      self.state = state # Change the state
+
+   def is_cooling_down(self):
+      """
+      Verify if the open breaker is still within its cool-down. Must be called with the lock held.
+
+      :return: True if the breaker is open and its cool-down did not elapse.
+      """
+
+      return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown_seconds # Return True if the calls are still skipped
+
+   def allows_calls(self):
+      """
+      Verify if a call would be let through, without starting it.
+
+      :return: True if the breaker is closed, its cool-down elapsed or its probe call is not running.
+      """
+
+      with self.lock: # Lock the breaker
+         return not self.is_cooling_down() and not (self.state == "half_open" and self.probe_in_flight) # Return True if a call would be let through
+
+   def before_call(self):
+      """
+      Let a call through or skip it.
+
+      :return: True if the call is the probe call of the half-open breaker.
+      """
+
+      with self.lock: # Lock the breaker
+         if self.is_cooling_down(): # If the breaker is open
+            raise CircuitOpenError(f"The circuit breaker of {self.name} is open") # Skip the call
+
+         if self.state == "open": # If the cool-down elapsed
+            self.set_state("half_open") # Let a probe call through
+
+         if self.state == "half_open": # If the breaker is waiting for its probe call
+            if self.probe_in_flight: # If another call is already probing the provider
+               raise CircuitOpenError(f"The circuit breaker of {self.name} is probing the provider") # Skip the call
+            self.probe_in_flight = True # This call is the probe
+            return True # The call is the probe
+
+         return False # The breaker is closed
+
+   def after_call(self, succeeded, probe):
+      """
+      Update the breaker with the outcome of a call.
+
+      :param succeeded: True if the call succeeded, False if it failed or timed out, or None if it was cancelled.
+      :param probe: If the call was the probe call of the half-open breaker.
+      :return: None
+      """
+
+      with self.lock: # Lock the breaker
+         if probe: # If the call was the probe
+            self.probe_in_flight = False # The next call can probe the provider
+
+         if succeeded is None: # If the call was cancelled
+            return # It says nothing about the provider
+
+         if succeeded: # If the call succeeded
+            self.consecutive_failures = 0 # Reset the failures
+            if probe: # If the provider recovered
+               self.set_state("closed") # Close the breaker
+            return # Nothing else to update
+
+         self.consecutive_failures += 1 # Count the failure
+         if probe or (self.state == "closed" and self.consecutive_failures >= self.failure_threshold): # If the probe failed or there are too many consecutive failures
+            self.opened_at = time.monotonic() # Start the cool-down
+            self.set_state("open") # Open the breaker
+
+   def run(self, function, *args):
+      """
+      Run a synchronous call through the breaker.
+
+      :param function: The function to call, such as the rate limited model.run.
+      :param args: The arguments of the function.
+      :return: The result of the call.
+      """
+
+      probe = self.before_call() # Let the call through or skip it
+      succeeded = None # The outcome of the call
+
+      try: # Try to run the call
+         result = function(*args) # Run the call
+         succeeded = True # The call succeeded
+      except Exception: # If the call failed or timed out
+         succeeded = False # The call failed
+         raise # Propagate the error
+      finally: # Even if the call was interrupted
+         self.after_call(succeeded, probe) # Update the breaker
+
+      return result # Return the result
+
+   async def arun(self, coroutine_function, *args):
+      """
+      Asynchronous version of the run method.
+
+      :param coroutine_function: The coroutine function to call, such as the rate limited model.arun.
+      :param args: The arguments of the coroutine function.
+      :return: The result of the call.
+      """
+
+      probe = self.before_call() # Let the call through or skip it
+      succeeded = None # The outcome of the call
+
+      try: # Try to run the call
+         result = await coroutine_function(*args) # Run the call
+         succeeded = True # The call succeeded
+      except Exception: # If the call failed or timed out
+         succeeded = False # The call failed
+         raise # Propagate the error
+      finally: # Even if the call was cancelled
+         self.after_call(succeeded, probe) # Update the breaker
+
+      return result # Return the result
+
+def run_with_deadline(provider, function, timeout, *args):
+   """
+   Run a synchronous request, giving up on it when it does not finish within the deadline.
+   A blocked request cannot be interrupted, so it runs in a daemon thread whose response is discarded, and which ends with the HTTP read timeout of
+   the provider's client (or never, if the provider hangs without one). Each provider has its own DEADLINE_MAX_THREADS threads: the requests of a
+   hung provider wait for a free thread of that provider and time out, while the requests of the other providers keep running, and the hung
+   threads do not keep the interpreter from exiting.
+
+   :param provider: The model name of the provider.
+   :param function: The function to call, such as model.run.
+   :param timeout: The deadline in seconds.
+   :param args: The arguments of the function.
+   :return: The result of the request.
+   """
+
+   deadline = time.monotonic() + timeout # The time the request is given up on
+   slots = get_deadline_slots(provider) # The threads of the provider
+
+   if not slots.acquire(timeout=timeout): # If every thread of the provider stayed busy until the deadline
+      raise ProviderTimeoutError(f"No thread of {provider} was free within {timeout:g} seconds, as its previous requests are still running") # Give up on the request
+
+   future = concurrent.futures.Future() # The result of the request
+
+   def run_request(): # Run the request in its thread
+      try: # Try to run the request
+         future.set_result(function(*args)) # Store its result
+      except Exception as e: # If the request failed
+         future.set_exception(e) # Store its error
+      finally: # Once the request ended
+         slots.release() # Free the thread of the provider
+
+   threading.Thread(target=run_request, name=f"deadline-{provider}", daemon=True).start() # Start the request
+   done, _ = concurrent.futures.wait([future], timeout=max(deadline - time.monotonic(), 0)) # Wait for it up to the deadline
+
+   if not done: # If the request is still running
+      raise ProviderTimeoutError(f"The request did not finish within {timeout:g} seconds") # Give up on it
+
+   return future.result() # Return the result or raise the error of the request
+
+async def arun_with_deadline(coroutine_function, timeout, *args):
+   """
+   Asynchronous version of the run_with_deadline function, which cancels the request that exceeds the deadline.
+
+   :param coroutine_function: The coroutine function to call, such as model.arun.
+   :param timeout: The deadline in seconds.
+   :param args: The arguments of the coroutine function.
+   :return: The result of the request.
+   """
+
+   task = asyncio.ensure_future(coroutine_function(*args)) # Start the request
+   done, _ = await asyncio.wait([task], timeout=timeout) # Wait for it up to the deadline
+
+   if not done: # If the request is still running
+      task.cancel() # Cancel it
+      raise ProviderTimeoutError(f"The request did not finish within {timeout:g} seconds") # Give up on it
+
+   return task.result() # Return the result or raise the error of the request
+
+def get_deadline_slots(provider):
+   """
+   Get the semaphore bounding the threads of the synchronous requests of a provider, creating it on the first call.
+
+   :param provider: The model name of the provider.
+   :return: The bounded semaphore.
+   """
+
+   with CIRCUIT_BREAKERS_LOCK: # Lock the semaphore creation
+      if provider not in DEADLINE_SLOTS: # If the provider has no semaphore yet
+         DEADLINE_SLOTS[provider] = threading.BoundedSemaphore(DEADLINE_MAX_THREADS) # Create it
+
+      return DEADLINE_SLOTS[provider] # Return the semaphore
+
+def get_request_timeout(model):
+   """
+   Get the deadline of each request of a model, from its REQUEST_TIMEOUT_SECONDS constant or else PROVIDER_TIMEOUT_SECONDS.
+
+   :param model: The AI model object.
+   :return: The deadline in seconds, or None if the requests have no deadline.
+   """
+
+   return getattr(type(model), "REQUEST_TIMEOUT_SECONDS", PROVIDER_TIMEOUT_SECONDS) # Return the deadline
+
+def get_circuit_breaker(model, name):
+   """
+   Get the circuit breaker of a model. All of the instances of the same model class share the same breaker.
+
+   :param model: The AI model object.
+   :param name: The model name used in the run metrics.
+   :return: The circuit breaker.
+   """
+
+   model_class = type(model) # Get the model class
+
+   with CIRCUIT_BREAKERS_LOCK: # Lock the breakers dictionary
+      if model_class not in CIRCUIT_BREAKERS: # If the breaker does not exist yet
+         CIRCUIT_BREAKERS[model_class] = CircuitBreaker(name) # Create it
+
+      return CIRCUIT_BREAKERS[model_class] # Return the breaker
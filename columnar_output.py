@@ -0,0 +1,313 @@
+import contextlib # For closing the rows read from the output CSV file
+import importlib.util # For verifying if pyarrow is installed
+import itertools # For selecting the completed rows of the output CSV file
+import os # For verifying if the columnar output file exists
+from blob_store import BLOB_STORE_FILE # Import Constants from ./blob_store.py
+from blob_store import read_output_rows # Import the output reader from ./blob_store.py
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import OUTPUT_DIRECTORY, STATISTICS_COLUMNS # Import Constants from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Columnar Output Constants:
+COLUMNAR_OUTPUT_FILES = {"parquet": f"{OUTPUT_DIRECTORY}output.parquet", "arrow": f"{OUTPUT_DIRECTORY}output.arrow"} # The path to the columnar output file of each format
+COLUMNAR_ROW_GROUP_SIZE = 1000 # The number of rows buffered before they are written as a row group (a record batch in the Arrow format)
+PREVIOUS_FILE_SUFFIX = ".previous" # The suffix of the columnar output file of a resumed run while its rows are copied to the new file
+PARQUET_COMPRESSION = "zstd" # The compression codec of the Parquet file
+STRING_COLUMNS = ("Task", "Expected Output", "Most Similar Model") # The text columns of the output, besides the models' outputs
+MISSING_VALUES = ("", "N/A", None) # The cell values stored as nulls in the typed columns
+
+def get_columnar_extra_columns(model_names):
+   """
+   Get the columns that are only written to the columnar output: the raw response and the token usage of each model.
+
+   :param model_names: The names of the models.
+   :return: Dictionary mapping each extra column name to its type name ("string" or "int64").
+   """
+
+   extra_columns = {} # Maps each extra column to its type name
+
+   for model_name in model_names: # Loop through each model
+      extra_columns[f"{model_name} Raw"] = "string" # The response before format_output flattened it
+      extra_columns[f"{model_name} Input Tokens"] = "int64" # The input tokens reported by the provider
+      extra_columns[f"{model_name} Output Tokens"] = "int64" # The output tokens of the streamed response
+
+   return extra_columns # Return the extra columns
+
+def get_columnar_columns(model_names, raw_results, task_metrics):
+   """
+   Get the values of the columns that are only written to the columnar output for a task.
+
+   :param model_names: The names of the models.
+   :param raw_results: Dictionary mapping each model name to its raw response, or None if the model failed.
+   :param task_metrics: Dictionary mapping each model name to its stream metrics, or None.
+   :return: Dictionary mapping each extra column name to its value.
+   """
+
+   columns = {} # Maps each extra column to its value
+
+   for model_name in model_names: # Loop through each model
+      metrics = task_metrics.get(model_name) or {} # The responses that were not streamed have no metrics
+      columns[f"{model_name} Raw"] = raw_results.get(model_name) # The raw response
+      columns[f"{model_name} Input Tokens"] = metrics.get("input_tokens") # The input tokens
+      columns[f"{model_name} Output Tokens"] = metrics.get("output_tokens") # The output tokens
+
+   return columns # Return the extra columns
+
+def build_columnar_schema(header, model_names):
+   """
+   Build the Arrow schema of the columnar output: the text columns are strings, the scores and metrics are float64
+   and the token counts are int64, so the empty and "N/A" cells of the CSV file become nulls.
+
+   :param header: The header of the output CSV file.
+   :param model_names: The names of the models.
+   :return: The pyarrow schema.
+   """
+
+   import pyarrow as pa # Imported on demand, as the columnar output is optional
+
+   fields = [pa.field(column, pa.string() if column in STRING_COLUMNS or column in model_names else pa.float64()) for column in header] # The columns of the CSV file
+   fields += [pa.field(column, getattr(pa, type_name)()) for column, type_name in get_columnar_extra_columns(model_names).items()] # The columns only written to the columnar output
+
+   return pa.schema(fields) # Return the schema
+
+def convert_value(value, field_type):
+   """
+   Convert a cell value to the Python value of its typed column.
+
+   :param value: The cell value.
+   :param field_type: The pyarrow type of the column.
+   :return: The converted value, or None for a missing value.
+   """
+
+   import pyarrow as pa # Imported on demand, as the columnar output is optional
+
+   if value in MISSING_VALUES: # If the cell is empty
+      return None # Store a null
+   if pa.types.is_string(field_type): # If the column is a text column
+      return str(value) # Store the text
+   if pa.types.is_integer(field_type): # If the column is a count
+      return int(float(value)) # Store the integer
+
+   return float(value) # Store the number
+
+def read_complete_batches(file_path, output_format):
+   """
+   Read the complete record batches of a columnar output file one at a time, stopping at a partially written last record batch of an Arrow stream.
+
+   :param file_path: The path to the columnar output file.
+   :param output_format: The format of the file ("parquet" or "arrow").
+   :return: Generator of pyarrow record batches.
+   """
+
+   import pyarrow as pa # Imported on demand, as the columnar output is optional
+
+   if output_format == "parquet": # If the file is a Parquet file
+      import pyarrow.parquet as pq # Imported on demand, as the columnar output is optional
+      with pq.ParquetFile(file_path, memory_map=False) as parquet_file: # A Parquet file is only readable once its footer was written
+         yield from parquet_file.iter_batches(batch_size=COLUMNAR_ROW_GROUP_SIZE) # Yield its rows in batches of a row group
+      return # Every row was read
+
+   with pa.OSFile(file_path, mode="rb") as source: # Open the Arrow stream
+      reader = pa.ipc.open_stream(source) # Read the stream schema
+      try: # Try to read the record batches
+         for batch in reader: # Loop through each record batch
+            yield batch # Yield the complete batch
+      except (pa.ArrowInvalid, OSError): # If the last record batch was cut by a crash
+         pass # Stop at the batches read so far
+
+class ColumnarOutputWriter:
+   """
+   Writes the rows of the run to a typed columnar file, buffering COLUMNAR_ROW_GROUP_SIZE rows before writing them as a row group of a
+   Parquet file or as a record batch of an Arrow IPC stream.
+
+   """
+
+   def __init__(self, output_format, header, model_names, file_path=None, row_group_size=COLUMNAR_ROW_GROUP_SIZE, restored_batches=None): # Constructor
+      import pyarrow as pa # Imported on demand, as the columnar output is optional
+
+      self.pa = pa # The pyarrow module
+      self.output_format = output_format # The format of the file ("parquet" or "arrow")
+      self.file_path = file_path or COLUMNAR_OUTPUT_FILES[output_format] # The path to the columnar output file
+      self.row_group_size = row_group_size # The number of rows of each row group
+      self.schema = build_columnar_schema(header, model_names) # The typed schema of the rows
+      self.model_names = model_names # The names of the models, whose similarity columns give the statistics of each row
+      self.rows = [] # The buffered rows
+
+      if output_format == "parquet": # If the rows are written to a Parquet file
+         import pyarrow.parquet as pq # Imported on demand, as the columnar output is optional
+         self.writer = pq.ParquetWriter(self.file_path, self.schema, compression=PARQUET_COMPRESSION) # Open the Parquet file
+      else: # If the rows are written to an Arrow IPC stream, which stays readable up to its last complete record batch
+         self.sink = pa.OSFile(self.file_path, mode="wb") # Open the Arrow file
+         self.writer = pa.ipc.new_stream(self.sink, self.schema) # Start the Arrow stream
+
+      for batch in restored_batches or (): # Loop through each record batch of the rows of a resumed run
+         self.writer.write_table(pa.Table.from_batches([batch]).select(self.schema.names).cast(self.schema)) # Write it before the new rows
+
+   def append(self, row):
+      """
+      Buffer a row, writing the buffered rows as a row group once there are row_group_size of them.
+
+      :param row: Dictionary mapping each column name to its value, as written to the output CSV file plus the extra columns.
+      :return: None
+      """
+
+      self.rows.append({field.name: convert_value(row.get(field.name), field.type) for field in self.schema}) # Buffer the typed row
+
+      if len(self.rows) >= self.row_group_size: # If the row group is full
+         self.flush() # Write it
+
+   def flush(self):
+      """
+      Write the buffered rows as a row group.
+
+      :return: None
+      """
+
+      if not self.rows: # If there are no buffered rows
+         return # Nothing to write
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Writing a row group of {BackgroundColors.CYAN}{len(self.rows)}{BackgroundColors.GREEN} rows to {BackgroundColors.CYAN}{self.file_path}{Style.RESET_ALL}") # Output the writing message
+
+      self.fill_statistics() # Compute the similarity statistics of the row group
+      self.writer.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema)) # Write the row group
+      self.rows.clear() # Clear the buffered rows
+
+   def fill_statistics(self):
+      """
+      Fill the similarity statistics of the buffered rows, which the output CSV file only receives once the run finishes,
+      computing them at once over the score matrix of the row group.
+
+      :return: None
+      """
+
+      if not set(STATISTICS_COLUMNS) <= set(self.schema.names): # If the output has no statistics columns
+         return # Nothing to fill
+
+      import numpy as np # Imported on demand, as numpy is slow to import
+      from leaderboard import compute_row_statistics # Imported on demand, as it imports numpy
+
+      score_matrix = np.array([[row[f"{model_name} Similarity"] or 0 for model_name in self.model_names] for row in self.rows], dtype=float).reshape(len(self.rows), len(self.model_names)) # The score matrix of the row group, a missing score counting as 0
+
+      for row, row_statistics in zip(self.rows, compute_row_statistics(score_matrix).tolist()): # Loop through each row and its statistics
+         row.update(zip(STATISTICS_COLUMNS, row_statistics)) # Fill them
+
+   def close(self):
+      """
+      Write the remaining rows and close the file.
+
+      :return: None
+      """
+
+      self.flush() # Write the remaining rows
+      self.writer.close() # Write the Parquet footer or the end of the Arrow stream
+
+      if self.output_format == "arrow": # If the rows were written to an Arrow stream
+         self.sink.close() # Close the Arrow file
+
+def restore_columnar_rows(output_format, file_path, csv_file, completed_rows, header, model_names, blob_file=BLOB_STORE_FILE):
+   """
+   Restore the rows already written by a resumed run, one record batch at a time, so they are never loaded into memory at once.
+   They are read from the complete record batches of the previous columnar output file and, past its last readable row (such as after a crash,
+   which leaves a Parquet file without its footer), rebuilt from the output CSV file without their extra columns and with the blob references
+   of the model outputs replaced by the outputs.
+
+   :param output_format: The format of the file ("parquet" or "arrow").
+   :param file_path: The path to the previous columnar output file.
+   :param csv_file: The path to the output CSV file.
+   :param completed_rows: The number of rows already written to the output CSV file.
+   :param header: The header of the output CSV file.
+   :param model_names: The names of the models.
+   :param blob_file: The path to the blob store of the output CSV file.
+   :return: Generator of the pyarrow record batches of the restored rows.
+   """
+
+   import pyarrow as pa # Imported on demand, as the columnar output is optional
+
+   schema = build_columnar_schema(header, model_names) # The typed schema of the rows
+   restored_rows = 0 # The number of rows restored from the previous columnar output file
+
+   if os.path.exists(file_path): # If the previous run wrote a columnar output file
+      try: # Try to read its complete rows
+         for batch in read_complete_batches(file_path, output_format): # Loop through each complete record batch
+            if restored_rows >= completed_rows or batch.schema.names != schema.names: # If every completed row was restored or the columns changed
+               break # Stop reading the file
+            batch = batch.slice(0, completed_rows - restored_rows) # Keep the completed rows
+            restored_rows += batch.num_rows # Count them
+            yield batch # Restore them
+      except (pa.ArrowInvalid, OSError): # If the file is not readable
+         pass # Rebuild the remaining rows from the CSV file
+
+   if restored_rows >= completed_rows: # If every completed row was restored
+      return # Nothing to rebuild
+
+   print(f"{BackgroundColors.YELLOW}Rebuilding the rows {BackgroundColors.CYAN}{restored_rows + 1}{BackgroundColors.YELLOW} to {BackgroundColors.CYAN}{completed_rows}{BackgroundColors.YELLOW} of the columnar output from {BackgroundColors.CYAN}{csv_file}{BackgroundColors.YELLOW}, without their raw responses and token counts.{Style.RESET_ALL}") # Output the warning message
+
+   rows = [] # The buffered rows rebuilt from the CSV file
+   with contextlib.closing(read_output_rows(csv_file, blob_file)) as output_rows: # Read the rows with their blob references replaced by the outputs
+      for row in itertools.islice(output_rows, restored_rows, completed_rows): # Loop through each completed row that was not restored
+         rows.append({field.name: convert_value(row.get(field.name), field.type) for field in schema}) # Rebuild the typed row
+         if len(rows) >= COLUMNAR_ROW_GROUP_SIZE: # If a row group was rebuilt
+            yield pa.RecordBatch.from_pylist(rows, schema=schema) # Restore it
+            rows = [] # Start the next row group
+
+   if rows: # If there are remaining rebuilt rows
+      yield pa.RecordBatch.from_pylist(rows, schema=schema) # Restore them
+
+def open_columnar_output(output_format, header, model_names, csv_file, completed_rows=0, file_path=None, blob_file=BLOB_STORE_FILE):
+   """
+   Open the columnar output writer, restoring the rows of a resumed run. The previous columnar output file is renamed with the PREVIOUS_FILE_SUFFIX
+   while its rows are copied to the new file, and is kept if the copy is interrupted, so the next resume reads it again.
+
+   :param output_format: The format of the file ("parquet" or "arrow"), or None to only write the CSV file.
+   :param header: The header of the output CSV file.
+   :param model_names: The names of the models.
+   :param csv_file: The path to the output CSV file.
+   :param completed_rows: The number of rows already written to the output CSV file.
+   :param file_path: The path to the columnar output file (defaults to the file of the format in the output directory).
+   :param blob_file: The path to the blob store of the output CSV file, used when rows are rebuilt from it.
+   :return: The columnar output writer, or None if it is disabled or pyarrow is not installed.
+   """
+
+   if output_format is None: # If the columnar output is disabled
+      return None # Only the CSV file is written
+
+   if importlib.util.find_spec("pyarrow") is None: # If pyarrow is not installed
+      print(f"{BackgroundColors.YELLOW}The {BackgroundColors.CYAN}{output_format}{BackgroundColors.YELLOW} output requires pyarrow, which is not installed, so only the CSV file is written.{Style.RESET_ALL}") # Output the warning message
+      return None # Only the CSV file is written
+
+   file_path = file_path or COLUMNAR_OUTPUT_FILES[output_format] # The path to the columnar output file
+   previous_file = f"{file_path}{PREVIOUS_FILE_SUFFIX}" # The path to the columnar output file of the resumed run
+
+   if not completed_rows: # If the run starts from scratch
+      return ColumnarOutputWriter(output_format, header, model_names, file_path) # Return the writer
+
+   if not os.path.exists(previous_file) and os.path.exists(file_path): # If the previous file was not left by an interrupted copy
+      os.replace(file_path, previous_file) # Keep the columnar output of the resumed run while the new file is written
+
+   restored_batches = restore_columnar_rows(output_format, previous_file, csv_file, completed_rows, header, model_names, blob_file) # The rows of the resumed run
+   columnar_writer = ColumnarOutputWriter(output_format, header, model_names, file_path, restored_batches=restored_batches) # Open the writer, copying the restored rows
+
+   if os.path.exists(previous_file): # If the resumed run wrote a columnar output file
+      os.remove(previous_file) # Its rows were copied to the new file
+
+   return columnar_writer # Return the writer
+
+def read_columnar_output(output_format="parquet", file_path=None):
+   """
+   Load a columnar output file for analysis, memory-mapping it so large result sets are not copied into memory.
+
+   :param output_format: The format of the file ("parquet" or "arrow").
+   :param file_path: The path to the columnar output file (defaults to the file of the format in the output directory).
+   :return: The pyarrow table, which can be converted with its to_pandas method.
+   """
+
+   import pyarrow as pa # Imported on demand, as the columnar output is optional
+
+   file_path = file_path or COLUMNAR_OUTPUT_FILES[output_format] # The path to the columnar output file
+
+   if output_format == "parquet": # If the file is a Parquet file
+      import pyarrow.parquet as pq # Imported on demand, as the columnar output is optional
+      return pq.read_table(file_path, memory_map=True) # Return the memory-mapped table
+
+   return pa.ipc.open_stream(pa.memory_map(file_path, mode="r")).read_all() # Return the zero-copy table of the memory-mapped Arrow stream
@@ -1,8 +1,12 @@
 # API Guide: https://docs.github.com/en/copilot/using-github-copilot/using-github-copilot-in-the-command-line
 
+import asyncio # For running the Copilot CLI as an asynchronous subprocess
 import atexit # For playing a sound when the program finishes
 import os # For running a command in the terminal
+import shlex # For splitting the GitHub CLI command
 import subprocess # For capturing the output of the terminal commands
+import threading # For limiting the parallel processes
+import time # For measuring the spawn and response times
 from colorama import Style # For coloring the terminal
 from utils import BackgroundColors # Import Classes from ./utils.py
 from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
@@ -16,9 +20,80 @@ class CopilotModel:
 
 	# Constants:
 	OUTPUT_FILE = f"{OUTPUT_DIRECTORY}Copilot_output.txt" # The path to the output file
+	GH_COMMAND_ENV_VARIABLE = "COPILOT_GH_COMMAND" # The optional environment variable with the GitHub CLI command, such as "python3 fake_gh.py"
+	MAX_PARALLEL_PROCESSES = 4 # The maximum number of "gh copilot" processes running at the same time
+	TIMEOUT_SECONDS = 60 # The maximum number of seconds of each "gh copilot" process before it is killed
+	MAX_ATTEMPTS = 2 # The number of times a "gh copilot" process is started before giving up on a task
+	REQUEST_TIMEOUT_SECONDS = None # No extra deadline, as the "gh copilot" processes are already killed after TIMEOUT_SECONDS
 
 	def __init__(self): # Constructor
-		pass # Do nothing
+		self.gh_command = shlex.split(os.getenv(self.GH_COMMAND_ENV_VARIABLE) or "gh") # The GitHub CLI command
+		self.processes_semaphore = threading.BoundedSemaphore(self.MAX_PARALLEL_PROCESSES) # Limits the parallel processes of the synchronous calls
+		self.async_processes_semaphore = None # Limits the parallel processes of the asynchronous calls, created in the running event loop
+		self.statistics = {"calls": 0, "timeouts": 0, "failures": 0, "spawn_seconds": 0.0, "response_seconds": 0.0} # The process timing statistics
+		self.statistics_lock = threading.Lock() # Lock for updating the statistics
+
+	def record_process(self, spawn_seconds, response_seconds, timed_out=False, failed=False):
+		"""
+		Record the timing of a "gh copilot" process.
+
+		:param spawn_seconds: The number of seconds spent starting the process.
+		:param response_seconds: The number of seconds spent waiting for the response.
+		:param timed_out: If the process was killed after TIMEOUT_SECONDS.
+		:param failed: If the process exited with an error.
+		:return: None
+		"""
+
+		with self.statistics_lock: # Lock the statistics
+			self.statistics["calls"] += 1 # Count the process
+			self.statistics["timeouts"] += int(timed_out) # Count the timeout
+			self.statistics["failures"] += int(failed) # Count the failure
+			self.statistics["spawn_seconds"] += spawn_seconds # Add the spawn time
+			self.statistics["response_seconds"] += response_seconds # Add the response time
+
+	def get_statistics(self):
+		"""
+		Get the process timing statistics, splitting the time spent spawning the processes from the time spent waiting for the responses.
+
+		:return: Dictionary of the process timing statistics.
+		"""
+
+		with self.statistics_lock: # Lock the statistics
+			return dict(self.statistics) # Return a copy of the statistics
+
+	def run_copilot_command(self, copilot_command, argument):
+		"""
+		Run a Copilot CLI command via GitHub CLI, limiting the parallel processes and killing and retrying the ones that exceed TIMEOUT_SECONDS.
+
+		:param copilot_command: The Copilot CLI command, either "explain" or "suggest".
+		:param argument: The command to be explained or the description of what you want.
+		:return output: The raw output from Copilot.
+		"""
+
+		with self.processes_semaphore: # Wait for a free process slot
+			for attempt in range(1, self.MAX_ATTEMPTS + 1): # Loop through each attempt
+				start_time = time.perf_counter() # Start the spawn timer
+				process = subprocess.Popen( # Run the Copilot CLI command
+					[*self.gh_command, "copilot", copilot_command, argument], # The Copilot CLI command
+					stdout=subprocess.PIPE, # Capture the output
+					stderr=subprocess.PIPE, # Capture the error
+					text=True # Set the text mode to True
+				) # Run the Copilot CLI command and capture output
+				spawn_time = time.perf_counter() # The process was started
+
+				try: # Try to get the output before the timeout
+					output, error = process.communicate(timeout=self.TIMEOUT_SECONDS) # Get the output and error
+				except subprocess.TimeoutExpired: # If the process hung
+					process.kill() # Kill the process
+					process.communicate() # Reap the killed process
+					self.record_process(spawn_time - start_time, time.perf_counter() - spawn_time, timed_out=True) # Record the timeout
+					print(f"{BackgroundColors.YELLOW}The Copilot process timed out after {BackgroundColors.CYAN}{self.TIMEOUT_SECONDS}{BackgroundColors.YELLOW} seconds ({attempt}/{self.MAX_ATTEMPTS}).{Style.RESET_ALL}") # Output the timeout message
+					continue # Retry the command
+
+				self.record_process(spawn_time - start_time, time.perf_counter() - spawn_time, failed=process.returncode != 0) # Record the process timing
+				return process.returncode, output, error # Return the result of the process
+
+		raise TimeoutError(f"{BackgroundColors.RED}The Copilot {copilot_command} command timed out {self.MAX_ATTEMPTS} times.{Style.RESET_ALL}") # Every attempt timed out
 
 	def explain_command(self, command):
 		"""
@@ -29,15 +104,9 @@ class CopilotModel:
 		"""
 
 		verbose_output(true_string=f"{BackgroundColors.GREEN}Requesting explanation for: {BackgroundColors.CYAN}{command}{Style.RESET_ALL}") # Output the verbose message
-		process = subprocess.Popen( # Run the Copilot CLI command
-			["gh", "copilot", "explain", command], # The Copilot CLI command
-			stdout=subprocess.PIPE, # Capture the output
-			stderr=subprocess.PIPE, # Capture the error
-			text=True # Set the text mode to True
-		) # Run the Copilot CLI command and capture output
-		output, error = process.communicate() # Get the output and error
-
-		if process.returncode != 0: # If the return code is not 0
+		returncode, output, error = self.run_copilot_command("explain", command) # Run the Copilot CLI command and capture output
+
+		if returncode != 0: # If the return code is not 0
 			raise RuntimeError(f"{BackgroundColors.RED}Error explaining command: {BackgroundColors.YELLOW}{error}{Style.RESET_ALL}")
 
 		return self.parse_output(output) # Return the output
@@ -51,19 +120,67 @@ class CopilotModel:
 		"""
 
 		verbose_output(true_string=f"{BackgroundColors.GREEN}Requesting command suggestion for: {BackgroundColors.CYAN}{description}{Style.RESET_ALL}") # Output the verbose message
-		process = subprocess.Popen( # Run the Copilot CLI command
-			["gh", "copilot", "suggest", description], # The Copilot CLI command
-			stdout=subprocess.PIPE, # Capture the output
-			stderr=subprocess.PIPE, # Capture the error
-			text=True # Set the text mode to True
-		) # Run the Copilot CLI command and capture output
-		output, error = process.communicate() # Get the output and error
-
-		if process.returncode != 0: # If the return code is not 0
+		returncode, output, error = self.run_copilot_command("suggest", description) # Run the Copilot CLI command and capture output
+
+		if returncode != 0: # If the return code is not 0
 			raise RuntimeError(f"{BackgroundColors.RED}Error suggesting command: {BackgroundColors.YELLOW}{error}{Style.RESET_ALL}")
 
 		return self.parse_output(output) # Return the output
-	
+
+	def get_async_processes_semaphore(self):
+		"""
+		Get the semaphore that limits the parallel processes of the asynchronous calls, creating it in the running event loop.
+
+		:return: The asyncio semaphore.
+		"""
+
+		loop = asyncio.get_running_loop() # Get the running event loop
+
+		if self.async_processes_semaphore is None or self.async_processes_semaphore[0] is not loop: # If the semaphore belongs to another event loop
+			self.async_processes_semaphore = (loop, asyncio.Semaphore(self.MAX_PARALLEL_PROCESSES)) # Create it in the running event loop
+
+		return self.async_processes_semaphore[1] # Return the semaphore
+
+	async def arun_copilot_command(self, copilot_command, argument):
+		"""
+		Asynchronously run a Copilot CLI command via GitHub CLI without blocking the event loop,
+		limiting the parallel processes and killing and retrying the ones that exceed TIMEOUT_SECONDS.
+
+		:param copilot_command: The Copilot CLI command, either "explain" or "suggest".
+		:param argument: The command to be explained or the description of what you want.
+		:return output: The parsed output from Copilot.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Requesting asynchronous {BackgroundColors.CYAN}{copilot_command}{BackgroundColors.GREEN} for: {BackgroundColors.CYAN}{argument}{Style.RESET_ALL}") # Output the verbose message
+
+		async with self.get_async_processes_semaphore(): # Wait for a free process slot
+			for attempt in range(1, self.MAX_ATTEMPTS + 1): # Loop through each attempt
+				start_time = time.perf_counter() # Start the spawn timer
+				process = await asyncio.create_subprocess_exec( # Run the Copilot CLI command
+					*self.gh_command, "copilot", copilot_command, argument, # The Copilot CLI command
+					stdout=asyncio.subprocess.PIPE, # Capture the output
+					stderr=asyncio.subprocess.PIPE, # Capture the error
+				) # Run the Copilot CLI command and capture output
+				spawn_time = time.perf_counter() # The process was started
+
+				try: # Try to get the output before the timeout
+					output, error = await asyncio.wait_for(process.communicate(), timeout=self.TIMEOUT_SECONDS) # Get the output and error
+				except asyncio.TimeoutError: # If the process hung
+					process.kill() # Kill the process
+					await process.wait() # Reap the killed process
+					self.record_process(spawn_time - start_time, time.perf_counter() - spawn_time, timed_out=True) # Record the timeout
+					print(f"{BackgroundColors.YELLOW}The Copilot process timed out after {BackgroundColors.CYAN}{self.TIMEOUT_SECONDS}{BackgroundColors.YELLOW} seconds ({attempt}/{self.MAX_ATTEMPTS}).{Style.RESET_ALL}") # Output the timeout message
+					continue # Retry the command
+
+				self.record_process(spawn_time - start_time, time.perf_counter() - spawn_time, failed=process.returncode != 0) # Record the process timing
+
+				if process.returncode != 0: # If the return code is not 0
+					raise RuntimeError(f"{BackgroundColors.RED}Error running the {copilot_command} command: {BackgroundColors.YELLOW}{error.decode()}{Style.RESET_ALL}")
+
+				return self.parse_output(output.decode()) # Return the output
+
+		raise TimeoutError(f"{BackgroundColors.RED}The Copilot {copilot_command} command timed out {self.MAX_ATTEMPTS} times.{Style.RESET_ALL}") # Every attempt timed out
+
 	def parse_output(self, output):
 		"""
 		Parse the output to extract only the relevant response.
@@ -89,6 +206,15 @@ class CopilotModel:
 
 		return parsed_output # Return the parsed output
 
+	def get_parameters(self):
+		"""
+		Get the parameters that change the model's response, used to build the response cache keys.
+
+		:return: Dictionary of the model parameters.
+		"""
+
+		return {"cli": "gh copilot"} # Return the model parameters
+
 	def run(self, task_message, task_type="explain"):
 		"""
 		Main function to run the Copilot CLI to explain or suggest a command.
@@ -105,6 +231,20 @@ class CopilotModel:
 		else: # If the task type is invalid
 			raise ValueError(f"Invalid task_type: {task_type}. Use 'explain' or 'suggest'.") # Raise a ValueError
 
+	async def arun(self, task_message, task_type="explain"):
+		"""
+		Asynchronous version of the run method, used by the asyncio execution engine.
+
+		:param task_message: The command to be explained or description of what you want.
+		:param task_type: Type of task, either "explain" or "suggest".
+		:return output: The output from Copilot.
+		"""
+
+		if task_type not in ("explain", "suggest"): # If the task type is invalid
+			raise ValueError(f"Invalid task_type: {task_type}. Use 'explain' or 'suggest'.") # Raise a ValueError
+
+		return await self.arun_copilot_command(task_type, task_message) # Return the output of the Copilot CLI command
+
 def main():
 	"""
 	Main entry point to run the CopilotModel.
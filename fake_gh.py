@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import os # For reading the fake behavior environment variables
+import random # For the injected failures
+import sys # For reading the command line arguments and exiting
+import time # For simulating the Copilot response time
+
+# Fake GitHub CLI Constants:
+FAKE_GH_DELAY_SECONDS = float(os.getenv("FAKE_GH_DELAY_SECONDS", "0.1")) # The number of seconds before the fake response is printed
+FAKE_GH_HANG_MARKER = os.getenv("FAKE_GH_HANG_MARKER", "[hang]") # The fake process never answers when the argument contains this marker
+FAKE_GH_FAIL_MARKER = os.getenv("FAKE_GH_FAIL_MARKER", "[fail]") # The fake process exits with an error when the argument contains this marker
+FAKE_GH_ERROR_RATE = float(os.getenv("FAKE_GH_ERROR_RATE", "0")) # The fraction of the calls that exit with an error
+
+def main():
+   """
+   Imitate "gh copilot explain|suggest <argument>", so the Copilot process pool can be exercised without the GitHub CLI.
+   Set COPILOT_GH_COMMAND="python3 fake_gh.py" to use it.
+
+   :return: None
+   """
+
+   if len(sys.argv) < 4 or sys.argv[1] != "copilot" or sys.argv[2] not in ("explain", "suggest"): # If the command is not a Copilot command
+      print("usage: fake_gh.py copilot explain|suggest <argument>", file=sys.stderr) # Output the usage message
+      sys.exit(2) # Exit with an usage error
+
+   copilot_command, argument = sys.argv[2], sys.argv[3] # The Copilot command and its argument
+
+   if FAKE_GH_HANG_MARKER in argument: # If the process should hang
+      time.sleep(sys.maxsize // 10**12) # Sleep until the process is killed
+   if FAKE_GH_FAIL_MARKER in argument or random.random() < FAKE_GH_ERROR_RATE: # If the process should fail
+      print(f"fake gh: could not {copilot_command} the command", file=sys.stderr) # Output the error message
+      sys.exit(1) # Exit with an error
+
+   time.sleep(FAKE_GH_DELAY_SECONDS) # Simulate the response time
+
+   print("Welcome to GitHub Copilot in the CLI!\n") # Output the welcome message, which is ignored by the parser
+   print("Explanation:\n") # Output the explanation header
+   print(f"  Fake {copilot_command} of: {argument}") # Output the fake answer
+
+if __name__ == "__main__":
+   """
+   This is the standard boilerplate that calls the main() function.
+
+   :return: None
+   """
+
+   main() # Call the main function
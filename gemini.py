@@ -1,13 +1,20 @@
 # API Guide: https://ai.google.dev/gemini-api/docs/quickstart?lang=python
 
+import asyncio # For running the REST transport calls in a separate thread
 import atexit # For playing a sound when the program finishes
 import google.generativeai as genai # Import the Google AI Python SDK
 import os # For running a command in the terminal
+import threading # For configuring the SDK only once per process
+import time # For measuring the time to first token
 from colorama import Style # For coloring the terminal
+from streaming import aconsume_stream, consume_stream # Import the stream consumers from ./streaming.py
 from utils import BackgroundColors # Import Classes from ./utils.py
 from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
 from utils import create_directory, play_sound, verbose_output, verify_env_file, write_output_to_file # Import Functions from ./utils.py
 
+CONFIGURED_API_KEY = None # The (API key, API endpoint) tuple the SDK is configured with, so genai.configure runs once per process
+CONFIGURE_LOCK = threading.Lock() # Lock for configuring the SDK
+
 class GeminiModel:
 	"""
 	A class to interact with the Google Gemini AI model.
@@ -17,35 +24,50 @@ class GeminiModel:
 	# Constants:
 	ENV_PATH = "./.env" # The path to the .env file
 	ENV_VARIABLE = "GEMINI_API_KEY" # The environment variable to load
+	API_ENDPOINT_ENV_VARIABLE = "GEMINI_API_ENDPOINT" # The optional environment variable with the API endpoint, such as the local mock server (uses the REST transport)
 	OUTPUT_FILE = f"{OUTPUT_DIRECTORY}Gemini_output.txt" # The path to the output file
+	GENERATION_CONFIG = { # Generation configuration
+		"temperature": 0.1, # Temperature
+		"top_p": 0.95, # Top p
+		"top_k": 64, # Top k
+		"max_output_tokens": 8192, # Maximum output tokens
+	} # Generation configuration
+	USE_CHAT_SESSION = False # If set to True, each task opens a chat session seeded with CHAT_SESSION_GREETING instead of a single-shot request
+	CHAT_SESSION_GREETING = "Hi, Gemini." # The first user turn of the chat sessions
+	REQUESTS_PER_MINUTE = 15 # The requests per minute budget of the Gemini free tier (adjust it to your account tier)
+	TOKENS_PER_MINUTE = 1000000 # The tokens per minute budget of the Gemini free tier (None disables the tokens budget)
+	REQUEST_TIMEOUT_SECONDS = 120 # The deadline of each request, after which it counts as a failure of the provider's circuit breaker (None waits forever)
+	PACKING = True # If many short tasks may be combined into one JSON-structured request (see PACK_TASKS in main.py)
 
 	def __init__(self): # Constructor
 		self.api_key = verify_env_file(self.ENV_PATH, self.ENV_VARIABLE) # Verify the .env file and load the API key
 		self.model_name = "gemini-1.5-flash" # The model name
-		self.model = None # The AI model
+		self.api_endpoint = os.getenv(self.API_ENDPOINT_ENV_VARIABLE) or None # The API endpoint (None uses the Gemini API)
+		self.model = None # The AI model, configured on the first task
 	
 	def configure_model(self, api_key):
 		"""
-		Configures the Gemini AI model.
+		Configures the Gemini AI model. The SDK is only configured again if the API key changed.
 
 		:param api_key: The API key for configuration.
 		:return: The configured model.
 		"""
 
-		verbose_output(true_string=f"{BackgroundColors.GREEN}Configuring the Gemini Model...{Style.RESET_ALL}") # Output the configuration message
+		global CONFIGURED_API_KEY # The API key the SDK is configured with
 
-		genai.configure(api_key=api_key) # Configure the API key
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Configuring the Gemini Model...{Style.RESET_ALL}") # Output the configuration message
 
-		generation_config = { # Generation configuration
-			"temperature": 0.1, # Temperature
-			"top_p": 0.95, # Top p
-			"top_k": 64, # Top k
-			"max_output_tokens": 8192, # Maximum output tokens
-		} # Generation configuration
+		with CONFIGURE_LOCK: # Lock the SDK configuration
+			if CONFIGURED_API_KEY != (api_key, self.api_endpoint): # If the SDK is not configured with this API key and endpoint yet
+				if self.api_endpoint: # If a custom endpoint is used
+					genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": self.api_endpoint}) # Configure the API key and the endpoint
+				else: # If the Gemini API is used
+					genai.configure(api_key=api_key) # Configure the API key
+				CONFIGURED_API_KEY = (api_key, self.api_endpoint) # Remember the configured API key and endpoint
 
 		model = genai.GenerativeModel( # Create the model
 			model_name=self.model_name, # Model name
-			generation_config=generation_config, # Generation
+			generation_config=self.GENERATION_CONFIG, # Generation
 		)
 
 		return model # Return the model
@@ -83,22 +105,159 @@ class GeminiModel:
 
 		verbose_output(true_string=f"{BackgroundColors.GREEN}Sending the message...{Style.RESET_ALL}") # Output the sending message
 
-		output = chat_session.send_message(user_message) # Send the message
+		output = chat_session.send_message(user_message, request_options=self.get_request_options()) # Send the message, with the HTTP read timeout
 		return output.text # Return the output text
 
+	async def asend_message(self, chat_session, user_message):
+		"""
+		Asynchronously sends a message to the chat session and gets the output.
+
+		:param chat_session: The current chat session.
+		:param user_message: The message to send.
+		:return: The output from the model.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Sending the message asynchronously...{Style.RESET_ALL}") # Output the sending message
+
+		output = await chat_session.send_message_async(user_message, request_options=self.get_request_options()) # Send the message, with the HTTP read timeout
+		return output.text # Return the output text
+
+	def get_request_options(self):
+		"""
+		Get the request options of the SDK calls, whose timeout ends a hung request, so it does not keep a thread of the provider's deadline pool forever.
+
+		:return: Dictionary of the request options, or None if the requests have no timeout.
+		"""
+
+		return {"timeout": self.REQUEST_TIMEOUT_SECONDS} if self.REQUEST_TIMEOUT_SECONDS is not None else None # Return the request options
+
+	def get_model(self):
+		"""
+		Get the configured model, configuring it only on the first call.
+
+		:return: The configured model.
+		"""
+
+		if self.model is None: # If the model was not configured yet
+			self.model = self.configure_model(self.api_key) # Configure the model
+
+		return self.model # Return the configured model
+
+	def get_parameters(self):
+		"""
+		Get the parameters that change the model's response, used to build the response cache keys.
+
+		:return: Dictionary of the model parameters.
+		"""
+
+		return {"model": self.model_name, "generation_config": self.GENERATION_CONFIG, "chat_session": self.USE_CHAT_SESSION} # Return the model parameters
+
 	def run(self, task_message):
 		"""
 		Main function to run the AI model to do what is described in the task message.
+		By default, a single-shot request is sent. If USE_CHAT_SESSION is True, a chat session is opened instead.
+
+		:param task_message: The message to send to the AI model.
+		:return output: The output text.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Running the Gemini AI Model...{Style.RESET_ALL}") # Output the running message
+
+		model = self.get_model() # Get the configured model
+
+		if self.USE_CHAT_SESSION: # If the chat session path is enabled
+			chat_session = self.start_chat_session(model, self.CHAT_SESSION_GREETING) # Start the chat session
+			return self.send_message(chat_session, task_message) # Send the message and return the output
+
+		return model.generate_content(task_message, request_options=self.get_request_options()).text # Send a single-shot request, with the HTTP read timeout, and return the output
+
+	async def arun(self, task_message):
+		"""
+		Asynchronous version of the run method, used by the asyncio execution engine.
 
 		:param task_message: The message to send to the AI model.
 		:return output: The output text.
 		"""
 
-		self.model = self.configure_model(self.api_key) # Configure the model
-		chat_session = self.start_chat_session(self.model, f"Hi, Gemini.") # Start the chat session
-		output = self.send_message(chat_session, task_message) # Send the message
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Running the Gemini AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		if self.api_endpoint: # If a custom endpoint is used, the REST transport has no asynchronous client
+			return await asyncio.to_thread(self.run, task_message) # Run the task in a separate thread
+
+		model = self.get_model() # Get the configured model
+
+		if self.USE_CHAT_SESSION: # If the chat session path is enabled
+			chat_session = self.start_chat_session(model, self.CHAT_SESSION_GREETING) # Start the chat session
+			return await self.asend_message(chat_session, task_message) # Send the message and return the output
+
+		output = await model.generate_content_async(task_message, request_options=self.get_request_options()) # Send a single-shot request, with the HTTP read timeout
+
+		return output.text # Return the output
+
+	def get_chunk_text(self, chunk):
+		"""
+		Get the text of a streamed response chunk.
+
+		:param chunk: The response chunk.
+		:return: The text of the chunk.
+		"""
+
+		return chunk.text if chunk.parts else None # Return the text of the chunk, if any (chunk.text raises an error when the chunk has no parts)
+
+	def get_chunk_usage(self, chunk):
+		"""
+		Get the token usage reported in a streamed response chunk.
+
+		:param chunk: The response chunk.
+		:return: Tuple of the input and output tokens, or None if the chunk has no usage.
+		"""
+
+		usage_metadata = getattr(chunk, "usage_metadata", None) # The usage of the chunk
+
+		return (usage_metadata.prompt_token_count, usage_metadata.candidates_token_count) if usage_metadata else None # Return the token usage, if any
+
+	def run_stream(self, task_message):
+		"""
+		Streaming version of the run method, which consumes the tokens as they arrive and records the time to first token, the latency and the output tokens per second.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the Gemini AI Model...{Style.RESET_ALL}") # Output the running message
+
+		model = self.get_model() # Get the configured model
+
+		start_time = time.perf_counter() # The time the request is sent
+		if self.USE_CHAT_SESSION: # If the chat session path is enabled
+			stream = self.start_chat_session(model, self.CHAT_SESSION_GREETING).send_message(task_message, stream=True, request_options=self.get_request_options()) # Stream the message of a new chat session
+		else: # If a single-shot request is sent
+			stream = model.generate_content(task_message, stream=True, request_options=self.get_request_options()) # Stream a single-shot request
+
+		return consume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
+
+	async def arun_stream(self, task_message):
+		"""
+		Asynchronous version of the run_stream method, used by the asyncio execution engine.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the Gemini AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		if self.api_endpoint: # If a custom endpoint is used, the REST transport has no asynchronous client
+			return await asyncio.to_thread(self.run_stream, task_message) # Stream the task in a separate thread
+
+		model = self.get_model() # Get the configured model
+
+		start_time = time.perf_counter() # The time the request is sent
+		if self.USE_CHAT_SESSION: # If the chat session path is enabled
+			stream = await self.start_chat_session(model, self.CHAT_SESSION_GREETING).send_message_async(task_message, stream=True, request_options=self.get_request_options()) # Stream the message of a new chat session
+		else: # If a single-shot request is sent
+			stream = await model.generate_content_async(task_message, stream=True, request_options=self.get_request_options()) # Stream a single-shot request
 
-		return output # Return the output
+		return await aconsume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
 
 def main():
 	"""
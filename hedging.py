@@ -0,0 +1,235 @@
+import asyncio # For running the hedged coroutines
+import collections # For the window of recent latencies
+import concurrent.futures # For running the hedged synchronous calls
+import threading # For making the hedgers thread safe
+import time # For measuring the latency of the calls
+from colorama import Style # For coloring the terminal
+from metrics import RUN_METRICS, compute_quantile # Import the run metrics from ./metrics.py
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Hedging Constants:
+HEDGE_QUANTILE = 0.95 # A duplicate request is sent when a call takes longer than this quantile of the recent calls
+HEDGE_WINDOW_SIZE = 200 # The number of recent call latencies the quantile is learned from
+HEDGE_MIN_SAMPLES = 20 # The number of calls to observe before the first duplicate request is sent
+HEDGE_BUDGET_FRACTION = 0.05 # The maximum fraction of the calls that are hedged, which bounds the extra spend
+HEDGE_MAX_THREADS = 64 # The maximum number of threads running the hedged synchronous calls
+
+HEDGERS = {} # The hedgers of each model class, created on demand
+HEDGERS_LOCK = threading.Lock() # Lock for creating the hedgers
+HEDGE_EXECUTOR = None # The thread pool of the hedged synchronous calls, created on demand
+
+class Hedger:
+   """
+   Hedges the slow calls of a provider: when a call has not finished within the HEDGE_QUANTILE latency of the recent calls,
+   a duplicate request is sent, the first successful response is used and the other request is cancelled.
+   At most HEDGE_BUDGET_FRACTION of the calls are hedged.
+
+   """
+
+   def __init__(self, name, quantile=HEDGE_QUANTILE, window_size=HEDGE_WINDOW_SIZE, min_samples=HEDGE_MIN_SAMPLES, budget_fraction=HEDGE_BUDGET_FRACTION): # Constructor
+      self.name = name # The model name of the provider
+      self.quantile = quantile # The latency quantile that triggers a duplicate request
+      self.min_samples = min_samples # The number of calls observed before hedging
+      self.budget_fraction = budget_fraction # The maximum fraction of hedged calls
+      self.latencies = collections.deque(maxlen=window_size) # The latencies of the recent calls
+      self.calls = 0 # The number of calls
+      self.hedges = 0 # The number of hedged calls
+      self.lock = threading.Lock() # Lock for updating the hedger
+
+   def start_call(self):
+      """
+      Count a call and get how long to wait for it before sending a duplicate request.
+
+      :return: The hedge delay in seconds, or None if there are not enough recent calls to learn it from.
+      """
+
+      with self.lock: # Lock the hedger
+         self.calls += 1 # Count the call
+         if len(self.latencies) < self.min_samples: # If the latency distribution is not known yet
+            return None # Do not hedge
+
+         return compute_quantile(sorted(self.latencies), self.quantile) # Return the latency quantile of the recent calls
+
+   def record_latency(self, seconds):
+      """
+      Record the latency of a successful call.
+
+      :param seconds: The latency in seconds.
+      :return: None
+      """
+
+      with self.lock: # Lock the hedger
+         self.latencies.append(seconds) # Add the latency to the window
+
+   def acquire_hedge(self):
+      """
+      Take a hedge from the budget.
+
+      :return: True if a duplicate request can be sent, or False if the budget is spent.
+      """
+
+      with self.lock: # Lock the hedger
+         if self.hedges + 1 > self.budget_fraction * self.calls: # If another hedge would exceed the budget
+            return False # Do not hedge
+
+         self.hedges += 1 # Count the hedge
+
+         return True # Hedge the call
+
+   def finish_call(self, start_time, attempts, winner):
+      """
+      Record the latency of a successful call and, if it was hedged, which request won.
+
+      :param start_time: The time the call started.
+      :param attempts: The list of the requests of the call.
+      :param winner: The request whose response was used.
+      :return: None
+      """
+
+      self.record_latency(time.perf_counter() - start_time) # Learn from the call latency
+
+      if len(attempts) > 1: # If the call was hedged
+         RUN_METRICS.record_hedge(self.name, won=winner is not attempts[0]) # Count the hedge and whether the duplicate request won
+         verbose_output(true_string=f"{BackgroundColors.GREEN}The {BackgroundColors.CYAN}{self.name}{BackgroundColors.GREEN} call was hedged and the {BackgroundColors.CYAN}{'duplicate' if winner is not attempts[0] else 'original'}{BackgroundColors.GREEN} request won.{Style.RESET_ALL}") # Output the verbose message
+
+   def run(self, function, *args):
+      """
+      Run a synchronous call, sending a duplicate request in another thread if it is slower than the recent calls.
+      The request that loses cannot be interrupted, so its thread finishes in the background and its response is discarded.
+      The hedged requests of every provider share the HEDGE_MAX_THREADS threads of HEDGE_EXECUTOR, so a hung provider whose calls have no
+      deadline (see run_with_deadline in circuit_breaker.py) can hold all of them and delay the hedged calls of the other providers.
+
+      :param function: The function to call, such as the rate limited model.run.
+      :param args: The arguments of the function.
+      :return: The result of the first successful request.
+      """
+
+      start_time = time.perf_counter() # Start the call timer
+      hedge_delay = self.start_call() # Get the hedge delay
+
+      if hedge_delay is None: # If the call cannot be hedged yet
+         result = function(*args) # Run the call in the current thread
+         self.record_latency(time.perf_counter() - start_time) # Learn from the call latency
+         return result # Return the result
+
+      executor = get_hedge_executor() # Get the thread pool of the hedged calls
+      attempts = [executor.submit(function, *args)] # Send the request
+      done, _ = concurrent.futures.wait(attempts, timeout=hedge_delay) # Wait for it up to the hedge delay
+
+      if not done and self.acquire_hedge(): # If the request is slow and the budget allows a hedge
+         attempts.append(executor.submit(function, *args)) # Send a duplicate request
+
+      try: # Wait for the first successful request
+         winner = wait_first_successful(attempts) # Get the request that succeeded first
+      finally: # Even if every request failed
+         for attempt in attempts: # Loop through each request
+            attempt.cancel() # Cancel the requests that did not start
+
+      self.finish_call(start_time, attempts, winner) # Record the call
+
+      return winner.result() # Return the result
+
+   async def arun(self, coroutine_function, *args):
+      """
+      Asynchronous version of the run method, which cancels the request that loses.
+
+      :param coroutine_function: The coroutine function to call, such as the rate limited model.arun.
+      :param args: The arguments of the coroutine function.
+      :return: The result of the first successful request.
+      """
+
+      start_time = time.perf_counter() # Start the call timer
+      hedge_delay = self.start_call() # Get the hedge delay
+      attempts = [asyncio.ensure_future(coroutine_function(*args))] # Send the request
+
+      try: # Wait for the first successful request
+         if hedge_delay is not None: # If the call can be hedged
+            done, _ = await asyncio.wait(attempts, timeout=hedge_delay) # Wait for the request up to the hedge delay
+            if not done and self.acquire_hedge(): # If the request is slow and the budget allows a hedge
+               attempts.append(asyncio.ensure_future(coroutine_function(*args))) # Send a duplicate request
+
+         winner = await await_first_successful(attempts) # Get the request that succeeded first
+      finally: # Even if every request failed or the call was cancelled
+         for attempt in attempts: # Loop through each request
+            attempt.cancel() # Cancel the request that lost
+
+      self.finish_call(start_time, attempts, winner) # Record the call
+
+      return winner.result() # Return the result
+
+def wait_first_successful(attempts):
+   """
+   Wait for the first of the synchronous requests that succeeds.
+
+   :param attempts: The list of the request futures.
+   :return: The future of the first successful request.
+   """
+
+   pending = set(attempts) # The requests that did not finish
+   first_error = None # The error of the first failed request
+
+   while pending: # Loop until every request finished
+      done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED) # Wait for a request to finish
+      for attempt in done: # Loop through each finished request
+         if attempt.exception() is None: # If the request succeeded
+            return attempt # Use its result
+         first_error = first_error or attempt.exception() # Keep the first error
+
+   raise first_error # Every request failed
+
+async def await_first_successful(attempts):
+   """
+   Wait for the first of the asynchronous requests that succeeds.
+
+   :param attempts: The list of the request tasks.
+   :return: The task of the first successful request.
+   """
+
+   pending = set(attempts) # The requests that did not finish
+   first_error = None # The error of the first failed request
+
+   while pending: # Loop until every request finished
+      done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED) # Wait for a request to finish
+      for attempt in done: # Loop through each finished request
+         if attempt.exception() is None: # If the request succeeded
+            return attempt # Use its result
+         first_error = first_error or attempt.exception() # Keep the first error
+
+   raise first_error # Every request failed
+
+def get_hedge_executor():
+   """
+   Get the thread pool of the hedged synchronous calls, creating it on the first call.
+
+   :return: The thread pool executor.
+   """
+
+   global HEDGE_EXECUTOR # The thread pool is shared by every hedger
+
+   with HEDGERS_LOCK: # Lock the thread pool creation
+      if HEDGE_EXECUTOR is None: # If the thread pool was not created yet
+         HEDGE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=HEDGE_MAX_THREADS, thread_name_prefix="hedge") # Create it
+
+   return HEDGE_EXECUTOR # Return the thread pool
+
+def get_hedger(model, name):
+   """
+   Get the hedger of a model, if its class allows duplicate requests (HEDGE = True).
+   All of the instances of the same model class share the same hedger.
+
+   :param model: The AI model object.
+   :param name: The model name used in the run metrics.
+   :return: The hedger or None if the model is not hedged.
+   """
+
+   model_class = type(model) # Get the model class
+
+   if not getattr(model_class, "HEDGE", False): # If the model does not allow duplicate requests
+      return None # There is no hedger
+
+   with HEDGERS_LOCK: # Lock the hedgers dictionary
+      if model_class not in HEDGERS: # If the hedger does not exist yet
+         HEDGERS[model_class] = Hedger(name) # Create it
+
+      return HEDGERS[model_class] # Return the hedger
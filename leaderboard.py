@@ -0,0 +1,153 @@
+import csv # For reading the output CSV files
+import json # For writing the leaderboard file
+import warnings # For silencing the warnings of the models without scores
+import numpy as np # For the vectorized statistics
+from metrics import write_file_atomically # Import the atomic writer from ./metrics.py
+from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
+
+# Leaderboard Constants:
+LEADERBOARD_FILE = f"{OUTPUT_DIRECTORY}leaderboard.json" # The path to the per-model summary of the output CSV file
+LEADERBOARD_QUANTILES = (0.1, 0.5, 0.9) # The quantiles of the similarity and latency of each model
+MISSING_SCORES = ("", "N/A") # The similarity and latency cells without a value
+
+def compute_row_statistics(score_matrix):
+   """
+   Compute the similarity statistics of every row of a score matrix with array operations.
+
+   :param score_matrix: The (rows x models) NumPy array of the similarity scores.
+   :return: The (rows x 5) NumPy array of the minimum, maximum, average, median and standard deviation of each row, rounded to 2 decimal places.
+   """
+
+   if score_matrix.shape[1] == 0: # If there are no models
+      return np.zeros((score_matrix.shape[0], 5)) # Every statistic is 0
+
+   statistics = np.column_stack([score_matrix.min(axis=1), score_matrix.max(axis=1), score_matrix.mean(axis=1), np.median(score_matrix, axis=1), score_matrix.std(axis=1)]) # Compute the statistics of every row at once
+
+   return np.round(statistics, 2) # Return the statistics rounded as the output stores them
+
+def parse_score(value):
+   """
+   Parse a similarity or latency cell of the output CSV file.
+
+   :param value: The cell value.
+   :return: The value as a float, or NaN if the cell has no value.
+   """
+
+   return float(value) if value not in MISSING_SCORES else np.nan # Return the parsed value
+
+def read_score_matrix(csv_file):
+   """
+   Read the similarity and latency columns of an output CSV file into (tasks x models) matrices, without loading the models' outputs.
+
+   :param csv_file: The path to the output CSV file.
+   :return: Tuple of the model names, the score matrix and the latency matrix, with NaN in the cells without a value.
+   """
+
+   with open(csv_file, mode="r", newline="", encoding="utf-8") as file: # Open the output CSV file
+      reader = csv.reader(file) # The reader of the output
+      header = next(reader, []) # The header of the output
+      model_names = [column for column in header if f"{column} Similarity" in header] # The model columns have a similarity column
+      score_columns = [header.index(f"{model_name} Similarity") for model_name in model_names] # The positions of the similarity columns
+      latency_columns = [header.index(f"{model_name} Latency (s)") if f"{model_name} Latency (s)" in header else None for model_name in model_names] # The positions of the latency columns, if the stream metrics were collected
+      scores, latencies = [], [] # The similarity and latency cells of each row
+
+      for row in reader: # Loop through each row
+         scores.append([parse_score(row[column]) for column in score_columns]) # Parse its similarity scores
+         latencies.append([parse_score(row[column]) if column is not None else np.nan for column in latency_columns]) # Parse its latencies
+
+   shape = (len(scores), len(model_names)) # The shape of the matrices, even when the output has no rows
+
+   return model_names, np.array(scores, dtype=float).reshape(shape), np.array(latencies, dtype=float).reshape(shape) # Return the model names and the matrices
+
+def summarize_column(values):
+   """
+   Summarize the values of a model with the NaN cells left out.
+
+   :param values: The (rows x models) NumPy array of the values.
+   :return: Tuple of the count, the mean and the LEADERBOARD_QUANTILES of each column, with NaN for the columns without values.
+   """
+
+   with warnings.catch_warnings(): # The columns without values only produce NaN
+      warnings.simplefilter("ignore", RuntimeWarning) # Silence the empty slice warnings
+      means = np.nanmean(values, axis=0) if values.shape[0] else np.full(values.shape[1], np.nan) # The mean of each column
+      quantiles = np.nanquantile(values, LEADERBOARD_QUANTILES, axis=0) if values.shape[0] else np.full((len(LEADERBOARD_QUANTILES), values.shape[1]), np.nan) # The quantiles of each column
+
+   return np.count_nonzero(~np.isnan(values), axis=0), means, quantiles # Return the summaries
+
+def to_json_number(value, digits=2):
+   """
+   Convert a NumPy value to a rounded JSON number.
+
+   :param value: The value.
+   :param digits: The number of decimal places.
+   :return: The rounded float, or None if the value is NaN.
+   """
+
+   return None if np.isnan(value) else round(float(value), digits) # Return the JSON number
+
+def build_leaderboard(model_names, score_matrix, latency_matrix, provider_metrics=None):
+   """
+   Build the run-level summary of each model from the score and latency matrices of the output:
+   the mean, median, p10 and p90 similarity, the number of tasks it was the most similar model of, its latency and, when it was called by this run, its token usage.
+
+   :param model_names: The model names of the matrix columns.
+   :param score_matrix: The (tasks x models) NumPy array of the similarity scores, with NaN for the cells without a score.
+   :param latency_matrix: The (tasks x models) NumPy array of the stream latencies, with NaN for the cells without a latency.
+   :param provider_metrics: Dictionary mapping each model name to its summary in the RUN_METRICS snapshot, or None.
+   :return: Dictionary of the leaderboard.
+   """
+
+   scored_rows = ~np.isnan(score_matrix).all(axis=1) # The rows with at least one score
+   winners = np.argmax(np.where(np.isnan(score_matrix), -np.inf, score_matrix)[scored_rows], axis=1) if model_names else np.array([], dtype=int) # The most similar model of each scored row, the first one on ties
+   wins = np.bincount(winners, minlength=len(model_names)) # The number of wins of each model
+   scored_tasks, mean_scores, score_quantiles = summarize_column(score_matrix) # The similarity summary of each model
+   latency_counts, mean_latencies, latency_quantiles = summarize_column(latency_matrix) # The latency summary of each model
+   provider_metrics = provider_metrics or {} # The metrics of the models called by this run
+   models = {} # The summary of each model
+
+   for column, model_name in enumerate(model_names): # Loop through each model
+      usage = provider_metrics.get(model_name) # The calls of the model in this run
+      models[model_name] = { # The model summary
+         "scored_tasks": int(scored_tasks[column]), # The number of tasks with a similarity score
+         "mean_similarity": to_json_number(mean_scores[column]), # The average similarity
+         "median_similarity": to_json_number(score_quantiles[1][column]), # The median similarity
+         "p10_similarity": to_json_number(score_quantiles[0][column]), # The similarity of the worst 10% of the tasks
+         "p90_similarity": to_json_number(score_quantiles[2][column]), # The similarity of the best 10% of the tasks
+         "wins": int(wins[column]), # The number of tasks it was the most similar model of
+         "win_rate": round(int(wins[column]) / int(scored_rows.sum()), 4) if scored_rows.any() else 0.0, # The fraction of the scored tasks it won
+         "latency": { # The summary of the stream latencies of the output
+            "count": int(latency_counts[column]), # The number of streamed responses
+            "mean_seconds": to_json_number(mean_latencies[column], 3), # The average latency
+            "p50_seconds": to_json_number(latency_quantiles[1][column], 3), # The median latency
+            "p90_seconds": to_json_number(latency_quantiles[2][column], 3), # The 90th percentile latency
+         },
+         "usage": { # The calls and token usage of this run, which drive its cost
+            "calls": usage["calls"], # The number of calls
+            "errors": usage["errors"], # The number of failed calls
+            "input_tokens": usage["input_tokens"], # The input tokens reported by the provider
+            "output_tokens": usage["output_tokens"], # The output tokens
+            "tokens_per_call": round((usage["input_tokens"] + usage["output_tokens"]) / usage["calls"], 1) if usage["calls"] else 0.0, # The average tokens of each call
+         } if usage else None, # None if the model was not called by this run, such as when merging or rescoring
+      }
+
+   return { # The leaderboard
+      "tasks": int(score_matrix.shape[0]), # The number of rows of the output
+      "scored_tasks": int(scored_rows.sum()), # The number of rows with at least one score
+      "ranking": sorted(model_names, key=lambda model_name: (models[model_name]["mean_similarity"] is None, -(models[model_name]["mean_similarity"] or 0))), # The models by descending average similarity, the ones without scores last
+      "models": models, # The summary of each model
+   }
+
+def write_leaderboard(csv_file, leaderboard_file=LEADERBOARD_FILE, provider_metrics=None):
+   """
+   Build the leaderboard of an output CSV file and write it as a JSON file.
+
+   :param csv_file: The path to the output CSV file.
+   :param leaderboard_file: The path to the leaderboard file.
+   :param provider_metrics: Dictionary mapping each model name to its summary in the RUN_METRICS snapshot, or None.
+   :return: Dictionary of the leaderboard.
+   """
+
+   leaderboard = build_leaderboard(*read_score_matrix(csv_file), provider_metrics) # Build the leaderboard from the output columns
+   write_file_atomically(leaderboard_file, json.dumps(leaderboard, indent=3)) # Write the leaderboard file
+
+   return leaderboard # Return the leaderboard
@@ -2,8 +2,11 @@
 
 import atexit # For playing a sound when the program finishes
 import os # For running a command in the terminal
+import time # For measuring the time to first token
 from colorama import Style # For coloring the terminal
-from openai import OpenAI # Import OpenAI client
+from openai import AsyncOpenAI, OpenAI # Import OpenAI clients
+from streaming import aconsume_stream, consume_stream # Import the stream consumers from ./streaming.py
+from transport import get_async_http_client, get_http_client # Import the shared HTTP transport from ./transport.py
 from utils import BackgroundColors # Import Classes from ./utils.py
 from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
 from utils import create_directory, play_sound, verbose_output, verify_env_file, write_output_to_file # Import Functions from ./utils.py
@@ -17,12 +20,31 @@ class LlamaModel:
 	# Constants:
 	ENV_PATH = "./.env" # The path to the .env file
 	ENV_VARIABLE = "LLAMA_API_KEY" # The environment variable to load
+	BASE_URL_ENV_VARIABLE = "LLAMA_BASE_URL" # The optional environment variable with the API base URL, such as the local mock server
+	DEFAULT_BASE_URL = "https://api.llama-api.com" # The base URL of the Llama API
 	OUTPUT_FILE = f"{OUTPUT_DIRECTORY}Llama_output.txt" # The path to the output file
+	REQUESTS_PER_MINUTE = 60 # The requests per minute budget of the Llama API (adjust it to your account tier)
+	TOKENS_PER_MINUTE = None # The tokens per minute budget of the Llama API (None disables the tokens budget)
+	REQUEST_TIMEOUT_SECONDS = 180 # The deadline of each request, after which it counts as a failure of the provider's circuit breaker (None waits forever)
+	HTTP2 = False # If HTTP/2 is used (the Llama API is only used over HTTP/1.1)
+	HEDGE = True # If a duplicate request may be sent when a call is slower than the recent calls (see HEDGE_REQUESTS in main.py)
+	PACKING = True # If many short tasks may be combined into one JSON-structured request (see PACK_TASKS in main.py)
 
 	def __init__(self): # Constructor
 		self.api_key = verify_env_file(self.ENV_PATH, self.ENV_VARIABLE) # Call verify_env_file to load the API key
 		self.model_name = "llama3.1-70b" # The model name
-		self.client = OpenAI(api_key=self.api_key, base_url="https://api.llama-api.com") # Initialize the Llama client
+		self.base_url = os.getenv(self.BASE_URL_ENV_VARIABLE) or self.DEFAULT_BASE_URL # The API base URL
+		self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0, http_client=get_http_client(self.HTTP2)) # Initialize the Llama client (retries are handled by the rate limiter)
+		self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0, http_client=get_async_http_client(self.HTTP2)) # Initialize the asynchronous Llama client (retries are handled by the rate limiter)
+
+	def get_parameters(self):
+		"""
+		Get the parameters that change the model's response, used to build the response cache keys.
+
+		:return: Dictionary of the model parameters.
+		"""
+
+		return {"model": self.model_name} # Return the model parameters
 
 	def run(self, task_message):
 		"""
@@ -43,6 +65,83 @@ class LlamaModel:
 
 		return response.choices[0].message.content # Return the response
 
+	async def arun(self, task_message):
+		"""
+		Asynchronous version of the run method, used by the asyncio execution engine.
+
+		:param task_message: The message to send to the AI model.
+		:return output: The output text.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Running the Llama AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		response = await self.async_client.chat.completions.create(
+			model=self.model_name, # The model to use
+			messages=[ # The messages to send
+				{"role": "user", "content": task_message} # User message
+			],
+		)
+
+		return response.choices[0].message.content # Return the response
+
+	def get_chunk_text(self, chunk):
+		"""
+		Get the text of a streamed response chunk.
+
+		:param chunk: The response chunk.
+		:return: The text of the chunk.
+		"""
+
+		return chunk.choices[0].delta.content if chunk.choices else None # Return the text of the chunk, if any
+
+	def get_chunk_usage(self, chunk):
+		"""
+		Get the token usage reported in a streamed response chunk.
+
+		:param chunk: The response chunk.
+		:return: Tuple of the input and output tokens, or None if the chunk has no usage.
+		"""
+
+		return (chunk.usage.prompt_tokens, chunk.usage.completion_tokens) if getattr(chunk, "usage", None) else None # Return the token usage, if any
+
+	def run_stream(self, task_message):
+		"""
+		Streaming version of the run method, which consumes the tokens as they arrive and records the time to first token, the latency and the output tokens per second.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the Llama AI Model...{Style.RESET_ALL}") # Output the running message
+
+		start_time = time.perf_counter() # The time the request is sent
+		stream = self.client.chat.completions.create( # Create a streamed completion
+			model=self.model_name, # The model to use
+			messages=[{"role": "user", "content": task_message}], # The messages to send
+			stream=True, # Stream the tokens as they are generated
+		)
+
+		return consume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
+
+	async def arun_stream(self, task_message):
+		"""
+		Asynchronous version of the run_stream method, used by the asyncio execution engine.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the Llama AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		start_time = time.perf_counter() # The time the request is sent
+		stream = await self.async_client.chat.completions.create( # Create a streamed completion
+			model=self.model_name, # The model to use
+			messages=[{"role": "user", "content": task_message}], # The messages to send
+			stream=True, # Stream the tokens as they are generated
+		)
+
+		return await aconsume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
+
 def main():
 	"""
 	Main entry point to run the LlamaModel.
@@ -1,23 +1,64 @@
+import argparse # For parsing the command line arguments
+import asyncio # For running the tasks with the asyncio execution engine
 import atexit # For playing a sound when the program finishes
+import collections # For the queue of in-flight tasks
+import concurrent.futures # For running the task on each model concurrently
+import contextlib # For closing the columnar output writer
 import csv # For reading and writing CSV files
+import functools # For binding the model calls to their rate limiter
+import hashlib # For hashing the normalized task descriptions
+import itertools # For pairing the rows of the rescored output with the input rows
 import os # For running a command in the terminal
-import numpy as np # For numerical operations
-import pandas as pd # For reading CSV files
+import socket # For the identifier of the queue workers
 import sys # For exiting the program
-from chatgpt import ChatGPTModel # Import the ChatGPTModel class from ./chatgpt.py
+import time # For measuring the latency of the model calls
+import unicodedata # For normalizing the task descriptions
+from batch import run_batches # Import the offline batch submission mode from ./batch.py
+from blob_store import BLOB_STORE_FILE # Import Constants from ./blob_store.py
+from blob_store import BlobStore, parse_blob_reference # Import the content-addressed response store from ./blob_store.py
+from circuit_breaker import CircuitOpenError, ProviderTimeoutError # Import the circuit breaker errors from ./circuit_breaker.py
+from circuit_breaker import arun_with_deadline, get_circuit_breaker, get_request_timeout, run_with_deadline # Import the provider deadlines and circuit breakers from ./circuit_breaker.py
 from colorama import Style # For coloring the terminal
-from copilot import CopilotModel # Import the CopilotModel class from ./copilot.py
-from gemini import GeminiModel # Import the GeminiModel class from ./gemini.py
-from llama import LlamaModel # Import the LlamaModel class from ./llama.py
-from mistral import MistralModel # Import the MistralModel class from ./mistral.py
-from sklearn.feature_extraction.text import TfidfVectorizer # For calculating Cosine Similarity
-from sklearn.metrics.pairwise import cosine_similarity # To compute similarity
+from columnar_output import COLUMNAR_OUTPUT_FILES # Import Constants from ./columnar_output.py
+from columnar_output import get_columnar_columns, open_columnar_output # Import the columnar output writer from ./columnar_output.py
+from metrics import METRICS_EXPORT_INTERVAL_SECONDS, METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE # Import Constants from ./metrics.py
+from hedging import get_hedger # Import the hedged requests from ./hedging.py
+from metrics import RUN_METRICS, timed_stage, write_file_atomically # Import the run metrics from ./metrics.py
+from packing import build_pack_prompt, group_tasks, parse_pack_response, supports_packing # Import the prompt packing from ./packing.py
+from providers import aclose_provider_resources, close_provider_resources, get_provider_class # Import the lazy provider registry from ./providers.py
+from rate_limiter import get_rate_limiter # Import the rate limiter of each model from ./rate_limiter.py
+from response_cache import ResponseCache, get_cache_key # Import the persistent response cache from ./response_cache.py
+from similarity import SIMILARITY_IDF_MODE, REFERENCE_CORPUS_FILE # Import Constants from ./similarity.py
+from similarity import SimilarityEngine, read_reference_corpus # Import the batched similarity engine from ./similarity.py
 from utils import BackgroundColors # Import Classes from ./utils.py
-from utils import START_PATH, OUTPUT_DIRECTORY # Import Constants from ./utils.py
-from utils import create_directory, play_sound, verbose_output # Import Functions from ./utils.py
+from utils import START_PATH, OUTPUT_DIRECTORY, STATISTICS_COLUMNS # Import Constants from ./utils.py
+from utils import create_directory, get_model_name, play_sound, verbose_output # Import Functions from ./utils.py
+from work_queue import QUEUE_FILE, QUEUE_HEARTBEATS_PER_LEASE, QUEUE_POLL_SECONDS # Import Constants from ./work_queue.py
+from work_queue import WorkQueue # Import the SQLite job queue from ./work_queue.py
 
 # Execution Constants:
 EXECUTE_MODELS = {"ChatGPT": "ChatGPTModel", "Copilot": "CopilotModel", "Gemini": "GeminiModel", "Llama": "LlamaModel", "Mistral": "MistralModel"} # The AI/LLM models to execute
+CONCURRENT_MODELS = True # If set to True, each task is sent to all of the models at the same time instead of one after another
+ASYNC_EXECUTION = True # If set to True, the tasks are run by the asyncio execution engine, keeping many tasks in flight at the same time
+MAX_CONCURRENT_TASKS = 8 # The maximum number of tasks in flight at the same time when ASYNC_EXECUTION is True
+MAX_QUEUED_TASKS = MAX_CONCURRENT_TASKS * 4 # The maximum number of dispatched tasks, finished or not, waiting to be written in the input order when ASYNC_EXECUTION is True
+MAX_CONCURRENT_REQUESTS_PER_PROVIDER = 4 # The maximum number of simultaneous requests to each provider when ASYNC_EXECUTION is True
+STREAM_RESPONSES = False # If set to True (or with the --stream flag), the models that support it stream their responses, and the time to first token, latency and output tokens per second of each call are written next to the similarity columns
+CACHE_RESPONSES = True # If set to True, the responses are stored in a persistent cache and reused when the provider, model parameters and prompt have not changed
+STORE_RESPONSES_AS_BLOBS = False # If set to True, each model output is written once to the append-only BLOB_STORE_FILE and its output cell only keeps the blob reference (hash, offset and length)
+COLUMNAR_OUTPUT_FORMAT = None # If set to "parquet" or "arrow", the rows are also written to a typed columnar file with the raw responses and token counts (requires pyarrow)
+SHARD_STRATEGY = "index" # How the --shard mode partitions the tasks: "index" assigns the row k to the shard k % N + 1 and "hash" assigns each task by the hash of its normalized description, so identical tasks share a shard
+CIRCUIT_BREAKERS = True # If set to True, the calls to a provider are skipped for a cool-down after too many consecutive failures or timeouts, and its cells are marked with SKIPPED_OUTPUT (see circuit_breaker.py)
+PACK_TASKS = False # If set to True, the short tasks are combined into JSON-structured requests of up to PACK_MAX_TASKS tasks to the models with PACKING = True, and the tasks without a valid answer fall back to single-task calls (see packing.py)
+HEDGE_REQUESTS = False # If set to True, a duplicate request is sent when a call to a model with HEDGE = True is slower than the HEDGE_QUANTILE of its recent calls, and the first response is used (see hedging.py)
+DEDUPLICATE_TASKS = True # If set to True, the tasks whose normalized descriptions are identical are sent once to each model and the responses are reused by every matching row
+WRITE_LEADERBOARD = True # If set to True, the per-model summary of the output (mean, median, p10 and p90 similarity, wins, latency and token usage) is written to LEADERBOARD_FILE once the output is complete
+DEDUPLICATION_WINDOW = 1000 # The number of written unique tasks whose results are kept for their later duplicates when CACHE_RESPONSES is False (with the cache, only the tasks in flight are kept and a later duplicate is answered by the response cache)
+MERGE_BATCH_ROWS = 1000 # The number of rows whose aggregate columns are recomputed in one batch by the --merge mode
+RESCORE_BATCH_ROWS = 10000 # The number of rows whose similarities are computed in one batch by the --rescore mode
+
+# Output Cell Constants:
+SKIPPED_OUTPUT = "[Skipped: the circuit breaker of the provider was open]" # The output cell of the calls skipped by an open circuit breaker
 
 # Input/Output Directory Constants:
 INPUT_DIRECTORY = f"{START_PATH}/Inputs/" # The path to the input directory
@@ -26,6 +67,11 @@ INPUT_DIRECTORY = f"{START_PATH}/Inputs/" # The path to the input directory
 INPUT_CSV_FILE = f"{INPUT_DIRECTORY}input.csv" # The path to the input CSV file
 OUTPUT_CSV_FILE = f"{OUTPUT_DIRECTORY}output.csv" # The path to the output CSV file
 
+RESPONSE_CACHE = None # The persistent response cache, opened on demand
+BLOB_STORE = None # The content-addressed store of the model outputs, open while the rows of a run with STORE_RESPONSES_AS_BLOBS are written
+SIMILARITY_ENGINE = None # The batched similarity engine, created on demand
+PRECOMPUTED_RESPONSES = {} # Maps the cache key of a request to its response, filled by the batch mode
+
 def create_directories():
    """
    Creates the input and output directories.
@@ -36,22 +82,138 @@ def create_directories():
    create_directory(INPUT_DIRECTORY, INPUT_DIRECTORY.replace(START_PATH, "")) # Create the input directory
    create_directory(OUTPUT_DIRECTORY, OUTPUT_DIRECTORY.replace(START_PATH, "")) # Create the output directory
 
+def read_tasks(input_file):
+   """
+   Lazily read the tasks from the input CSV file, one row at a time.
+
+   :param input_file: The path to the input CSV file.
+   :return: Generator of (task_description, expected_output) tuples.
+   """
+
+   with open(input_file, mode="r", newline="", encoding="utf-8") as file: # Open the input CSV file
+      for task in csv.DictReader(file, restval=""): # Loop through each row of the CSV file
+         yield get_tasks_attributes(task) # Yield the task description and expected output
+
 def read_csv_file():
    """
-   Reads tasks from the input CSV file using pandas and returns the DataFrame.
+   Reads tasks from the input CSV file as a stream, so the first request goes out right after startup and the memory use stays bounded.
 
-   :return: None
+   :return: Generator of (task_description, expected_output) tuples.
    """
 
-   verbose_output(true_string=f"{BackgroundColors.GREEN}Reading tasks from CSV file using pandas...{Style.RESET_ALL}") # Output the reading message
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Reading tasks from CSV file...{Style.RESET_ALL}") # Output the reading message
 
    if os.path.exists(INPUT_CSV_FILE): # If the input CSV file exists
-      df = pd.read_csv(INPUT_CSV_FILE) # Reading the CSV into a DataFrame
-      return df # Return the DataFrame
+      return read_tasks(INPUT_CSV_FILE) # Return the tasks generator
    else: # If the input CSV file does not exist
       print(f"{BackgroundColors.RED}CSV file {BackgroundColors.CYAN}{INPUT_CSV_FILE}{BackgroundColors.RED} not found. Make sure the file exists.{Style.RESET_ALL}")
       sys.exit(1) # Exit the program
 
+def parse_shard(value):
+   """
+   Parse the value of the --shard argument.
+
+   :param value: The shard, such as "2/4" for the second of four shards.
+   :return: Tuple of the shard number (starting at 1) and the number of shards.
+   """
+
+   try: # Try to parse the shard number and count
+      shard_index, shard_count = (int(part) for part in value.split("/")) # Split the shard number from the number of shards
+   except ValueError: # If the value is not in the "i/N" format
+      raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected the 'i/N' format, such as '1/4'") # Report the invalid value
+
+   if shard_count < 1 or not 1 <= shard_index <= shard_count: # If the shard does not exist
+      raise argparse.ArgumentTypeError(f"invalid shard '{value}', the shard number must be between 1 and the number of shards") # Report the invalid value
+
+   return shard_index, shard_count # Return the shard number and count
+
+def parse_shard_count(value):
+   """
+   Parse the value of the --merge argument.
+
+   :param value: The number of shards, such as "4".
+   :return: The number of shards.
+   """
+
+   try: # Try to parse the number of shards
+      shard_count = int(value) # Convert it to an integer
+   except ValueError: # If the value is not an integer
+      raise argparse.ArgumentTypeError(f"invalid number of shards '{value}', expected a positive integer, such as '4'") # Report the invalid value
+
+   if shard_count < 1: # If there are no shards to merge
+      raise argparse.ArgumentTypeError(f"invalid number of shards '{value}', the number of shards must be at least 1") # Report the invalid value
+
+   return shard_count # Return the number of shards
+
+def get_task_shard(row_index, task_description, shard_count, shard_strategy=SHARD_STRATEGY):
+   """
+   Get the shard of a task. The assignment is deterministic, so every machine and the merge step agree on it.
+
+   :param row_index: The index of the task in the input CSV file.
+   :param task_description: The task description.
+   :param shard_count: The number of shards.
+   :param shard_strategy: "index" to assign the tasks by row index or "hash" to assign them by the hash of their normalized description.
+   :return: The shard number of the task, starting at 1.
+   """
+
+   if shard_strategy == "hash": # If the tasks are assigned by their description
+      return int(get_task_key(task_description), 16) % shard_count + 1 # Return the shard of the description hash
+
+   return row_index % shard_count + 1 # Return the shard of the row index
+
+def select_shard_tasks(tasks, shard, shard_strategy=SHARD_STRATEGY):
+   """
+   Select the tasks of a shard.
+
+   :param tasks: Iterable of (task_description, expected_output) tuples, in the input order.
+   :param shard: Tuple of the shard number and the number of shards.
+   :param shard_strategy: "index" or "hash", as in get_task_shard.
+   :return: Generator of the (task_description, expected_output) tuples of the shard.
+   """
+
+   shard_index, shard_count = shard # Unpack the shard
+
+   for row_index, (task_description, expected_output) in enumerate(tasks): # Loop through each task
+      if get_task_shard(row_index, task_description, shard_count, shard_strategy) == shard_index: # If the task belongs to the shard
+         yield task_description, expected_output # Yield it
+
+def get_shard_file(file_path, shard):
+   """
+   Get the path of the per-shard version of an output file.
+
+   :param file_path: The path to the output file, such as OUTPUT_CSV_FILE.
+   :param shard: Tuple of the shard number and the number of shards, or None.
+   :return: The path with the shard in its name, such as "output.shard-2-of-4.csv", or file_path if shard is None.
+   """
+
+   return add_file_suffix(file_path, get_shard_suffix(shard)) # Return the shard file path
+
+def get_shard_suffix(shard):
+   """
+   Get the file name suffix of a shard.
+
+   :param shard: Tuple of the shard number and the number of shards, or None.
+   :return: The suffix, such as "shard-2-of-4", or None if shard is None.
+   """
+
+   return f"shard-{shard[0]}-of-{shard[1]}" if shard else None # Return the shard suffix
+
+def add_file_suffix(file_path, suffix):
+   """
+   Add a suffix before the extension of a file path.
+
+   :param file_path: The path to the file, such as METRICS_JSON_FILE.
+   :param suffix: The suffix, such as "shard-2-of-4", or None.
+   :return: The path with the suffix, such as "metrics.shard-2-of-4.json", or file_path if suffix is None.
+   """
+
+   if not suffix: # If there is no suffix
+      return file_path # Use the file itself
+
+   root, extension = os.path.splitext(file_path) # Split the extension from the file path
+
+   return f"{root}.{suffix}{extension}" # Return the file path with the suffix
+
 def get_models_object_list(models_object_names=EXECUTE_MODELS.values()):
    """
    Get the list of objects of the AI models.
@@ -66,10 +228,10 @@ def get_models_object_list(models_object_names=EXECUTE_MODELS.values()):
    
    for model_object_name in models_object_names: # Loop through each model object name
       try: # Try to get the model object
-         model_class = globals()[model_object_name] # Get the model class from the globals
+         model_class = get_provider_class(model_object_name) # Import the model class from the provider registry
          model_objects.append(model_class()) # Append the model object to the list
       except KeyError: # If the model object is not found
-         print(f"{BackgroundColors.RED}Error: Model class '{model_object_name}' not found in globals.{Style.RESET_ALL}")
+         print(f"{BackgroundColors.RED}Error: Model class '{model_object_name}' not found in the provider registry.{Style.RESET_ALL}")
       except Exception as e: # If an error occurs
          print(f"{BackgroundColors.RED}Error instantiating model '{model_object_name}': {str(e)}{Style.RESET_ALL}")
 
@@ -100,14 +262,18 @@ def initialize_dict(models_list):
       model_name = model.__module__.split(".")[-1].capitalize() # Extract model name
       output_dict[model_name] = [] # Initialize an empty list for the model output
       output_dict[f"{model_name} Similarity"] = [] # Initialize an empty list for similarity scores
+      if STREAM_RESPONSES: # If the stream metrics are collected
+         output_dict[f"{model_name} TTFT (s)"] = [] # Initialize an empty list for the time to first token
+         output_dict[f"{model_name} Latency (s)"] = [] # Initialize an empty list for the total latency
+         output_dict[f"{model_name} Tokens/s"] = [] # Initialize an empty list for the output tokens per second
 
    return output_dict # Return the initialized dictionary
 
 def get_task_description(task):
    """
-   Get the task description from the task DataFrame.
+   Get the task description from the task row.
 
-   :param task: The task from the DataFrame.
+   :param task: The task row from the input CSV file.
    :return: The task description.
    """
 
@@ -119,19 +285,19 @@ def get_expected_output(task):
    """
    Get the expected output from the task, if available.
 
-   :param task: The task from the DataFrame.
+   :param task: The task row from the input CSV file.
    :return: The expected output or an empty string if not present.
    """
 
    verbose_output(true_string=f"{BackgroundColors.GREEN}Getting the expected output from the task...{Style.RESET_ALL}") # Output the getting message
 
-   return task.get("Expected Output (Optional)", "") # Get the expected output from the task
+   return task.get("Expected Output (Optional)") or "" # Get the expected output from the task
 
 def get_tasks_attributes(task):
    """
-   Get the task description and expected output from the task DataFrame.
+   Get the task description and expected output from the task row.
 
-   :param task: The task row from the DataFrame.
+   :param task: The task row from the input CSV file.
    :return: Tuple of task_description and expected_output.
    """
 
@@ -157,6 +323,7 @@ def update_output_dict(output_dict, task_description, expected_output):
    output_dict["Task"].append(task_description) # Add the task description to the dictionary
    output_dict["Expected Output"].append(expected_output) # Add the expected output to the dictionary
 
+@timed_stage("format_output")
 def format_output(output):
    """
    Format the output by:
@@ -172,93 +339,463 @@ def format_output(output):
    
    return " // ".join(lines) # Join the lines with " // "
 
-def run_task_on_each_model(models_object_list, task_description, output_dict):
+@contextlib.contextmanager
+def use_blob_store(blob_file):
+   """
+   Write the model outputs of the rows stored in the block to a blob store, keeping only their references in the output cells.
+
+   :param blob_file: The path to the segment file of the blob store.
+   :return: Generator that yields the blob store.
    """
-   Run the task on each AI model and store the results in the output dictionary.
+
+   global BLOB_STORE # The blob store is used by update_model_outputs
+
+   BLOB_STORE = BlobStore(blob_file) # Open the blob store
+   try: # Run the block
+      yield BLOB_STORE # Use the blob store
+   finally: # Even if the block failed
+      BLOB_STORE.close() # Close the blob store
+      BLOB_STORE = None # Write the next outputs inline
+
+def get_response_cache():
+   """
+   Get the persistent response cache, opening it on the first call.
+
+   :return: The response cache or None if CACHE_RESPONSES is False.
+   """
+
+   global RESPONSE_CACHE # The response cache is shared by every model call
+
+   if CACHE_RESPONSES and RESPONSE_CACHE is None: # If the cache is enabled but not opened yet
+      RESPONSE_CACHE = ResponseCache() # Open the response cache
+
+   return RESPONSE_CACHE # Return the response cache
+
+def close_response_cache():
+   """
+   Close the persistent response cache, if it was opened.
+
+   :return: None
+   """
+
+   global RESPONSE_CACHE # The response cache is shared by every model call
+
+   if RESPONSE_CACHE is not None: # If the cache was opened
+      RESPONSE_CACHE.close() # Close the response cache
+      RESPONSE_CACHE = None # Forget the closed cache
+
+def get_stored_response(model, task_description):
+   """
+   Get the response of a request from the batch results or from the persistent response cache.
+
+   :param model: The AI model object.
+   :param task_description: The description of the task to run.
+   :return: Tuple of the cache key of the request and the stored response, or None if there is no stored response.
+   """
+
+   cache_key = get_cache_key(model, task_description) # Build the cache key of the request
+
+   if cache_key in PRECOMPUTED_RESPONSES: # If the batch mode collected the response
+      return cache_key, PRECOMPUTED_RESPONSES[cache_key] # Return the batch response
+
+   response_cache = get_response_cache() # Get the response cache
+
+   return cache_key, response_cache.get(cache_key) if response_cache else None # Return the cached response, if any
+
+def store_response(cache_key, result):
+   """
+   Store a response in the persistent response cache, if it is enabled.
+
+   :param cache_key: The cache key of the request.
+   :param result: The raw output of the model.
+   :return: None
+   """
+
+   response_cache = get_response_cache() # Get the response cache
+
+   if response_cache and result is not None: # If the cache is enabled and the model returned a response
+      response_cache.set(cache_key, str(result)) # Store the response in the cache
+
+def call_model(model, task_description):
+   """
+   Call the model's "run" method (or its "run_stream" method if STREAM_RESPONSES is True) within the rate limits of its provider,
+   reusing the batch or cached response when available.
+
+   :param model: The AI model object.
+   :param task_description: The description of the task to run.
+   :return: Tuple of the raw output of the model and its stream metrics, or None if the response was not streamed.
+   """
+
+   model_name = get_model_name(model) # Get the model's name
+   cache_key, stored_result = get_stored_response(model, task_description) # Get the stored response, if any
+   if stored_result is not None: # If the response is stored
+      RUN_METRICS.record_cache_hit(model_name) # Count the reused response
+      return stored_result, None # Return it without calling the provider
+
+   stream = STREAM_RESPONSES and hasattr(model, "run_stream") # If the response is streamed
+   function = model.run_stream if stream else model.run # The model function to call
+   request_timeout = get_request_timeout(model) # Get the deadline of each request of the model's provider
+   function = function if request_timeout is None else functools.partial(run_with_deadline, model_name, function, request_timeout) # Give up on the requests that exceed the deadline, in the threads of the model's provider
+   rate_limiter = get_rate_limiter(model) # Get the rate limiter of the model's provider
+   function = function if rate_limiter is None else functools.partial(rate_limiter.run, function) # Run the calls within the provider budgets if there are any
+   hedger = get_hedger(model, model_name) if HEDGE_REQUESTS else None # Get the hedger of the model, if the slow calls are hedged
+   function = function if hedger is None else functools.partial(hedger.run, function) # Hedge the call if it is slow
+   circuit_breaker = get_circuit_breaker(model, model_name) if CIRCUIT_BREAKERS else None # Get the circuit breaker of the model's provider
+   function = function if circuit_breaker is None else functools.partial(circuit_breaker.run, function) # Skip the call while the breaker is open
+   start_time = time.perf_counter() # Start the call timer
+   try: # Try to run the task
+      result = function(task_description) # Run the task
+   except CircuitOpenError: # If the call was skipped
+      RUN_METRICS.record_skipped_call(model_name) # Count the skipped call
+      raise # Propagate the error
+   except Exception as e: # If the call failed
+      RUN_METRICS.record_call(model_name, time.perf_counter() - start_time, error=True, timeout=isinstance(e, ProviderTimeoutError)) # Count the failed call
+      raise # Propagate the error
+   result, metrics = result if stream else (result, None) # Split the output from the stream metrics
+   RUN_METRICS.record_call(model_name, time.perf_counter() - start_time, stream_metrics=metrics) # Record the call
+   store_response(cache_key, result) # Store the response in the cache
+
+   return result, metrics # Return the output of the model and its stream metrics
+
+async def acall_model(model, task_description):
+   """
+   Asynchronously call the model's "arun" method (or its "arun_stream" method if STREAM_RESPONSES is True, or its "run" method in a separate thread)
+   within the rate limits of its provider, reusing the batch or cached response when available.
+
+   :param model: The AI model object.
+   :param task_description: The description of the task to run.
+   :return: Tuple of the raw output of the model and its stream metrics, or None if the response was not streamed.
+   """
+
+   if not hasattr(model, "arun"): # If the model only has the synchronous run method
+      return await asyncio.to_thread(call_model, model, task_description) # Run the task in a separate thread
+
+   model_name = get_model_name(model) # Get the model's name
+   cache_key, stored_result = get_stored_response(model, task_description) # Get the stored response, if any
+   if stored_result is not None: # If the response is stored
+      RUN_METRICS.record_cache_hit(model_name) # Count the reused response
+      return stored_result, None # Return it without calling the provider
+
+   stream = STREAM_RESPONSES and hasattr(model, "arun_stream") # If the response is streamed
+   coroutine_function = model.arun_stream if stream else model.arun # The model coroutine function to call
+   request_timeout = get_request_timeout(model) # Get the deadline of each request of the model's provider
+   coroutine_function = coroutine_function if request_timeout is None else functools.partial(arun_with_deadline, coroutine_function, request_timeout) # Cancel the requests that exceed the deadline
+   rate_limiter = get_rate_limiter(model) # Get the rate limiter of the model's provider
+   coroutine_function = coroutine_function if rate_limiter is None else functools.partial(rate_limiter.arun, coroutine_function) # Run the calls within the provider budgets if there are any
+   hedger = get_hedger(model, model_name) if HEDGE_REQUESTS else None # Get the hedger of the model, if the slow calls are hedged
+   coroutine_function = coroutine_function if hedger is None else functools.partial(hedger.arun, coroutine_function) # Hedge the call if it is slow
+   circuit_breaker = get_circuit_breaker(model, model_name) if CIRCUIT_BREAKERS else None # Get the circuit breaker of the model's provider
+   coroutine_function = coroutine_function if circuit_breaker is None else functools.partial(circuit_breaker.arun, coroutine_function) # Skip the call while the breaker is open
+   start_time = time.perf_counter() # Start the call timer
+   try: # Try to run the task
+      result = await coroutine_function(task_description) # Run the task
+   except CircuitOpenError: # If the call was skipped
+      RUN_METRICS.record_skipped_call(model_name) # Count the skipped call
+      raise # Propagate the error
+   except Exception as e: # If the call failed
+      RUN_METRICS.record_call(model_name, time.perf_counter() - start_time, error=True, timeout=isinstance(e, ProviderTimeoutError)) # Count the failed call
+      raise # Propagate the error
+   result, metrics = result if stream else (result, None) # Split the output from the stream metrics
+   RUN_METRICS.record_call(model_name, time.perf_counter() - start_time, stream_metrics=metrics) # Record the call
+   store_response(cache_key, result) # Store the response in the cache
+
+   return result, metrics # Return the output of the model and its stream metrics
+
+def collect_batch_responses(models_object_list, completed_rows=0, shard=None, shard_strategy=SHARD_STRATEGY):
+   """
+   Run the offline batch submission mode for the batch-capable models and keep their responses for the regular pipeline.
 
    :param models_object_list: The list of AI model objects.
+   :param completed_rows: The number of tasks already written to the output file, which are not submitted.
+   :param shard: Tuple of the shard number and the number of shards, or None to submit every task.
+   :param shard_strategy: "index" or "hash", as in get_task_shard.
+   :return: None
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Collecting the batch responses...{Style.RESET_ALL}") # Output the collecting message
+
+   tasks = read_tasks(INPUT_CSV_FILE) if shard is None else select_shard_tasks(read_tasks(INPUT_CSV_FILE), shard, shard_strategy) # The tasks of the run
+   task_messages = (task_description for index, (task_description, _) in enumerate(tasks) if index >= completed_rows) # The tasks that were not written yet
+   batch_results = run_batches(models_object_list, task_messages) # Submit, poll and collect the batches
+
+   for model, responses in batch_results.items(): # Loop through each model's batch responses
+      for task_description, response in responses.items(): # Loop through each response
+         cache_key = get_cache_key(model, task_description) # Build the cache key of the request
+         PRECOMPUTED_RESPONSES[cache_key] = response # Keep the response for the regular pipeline
+         store_response(cache_key, response) # Store the response in the cache
+
+def run_pack(model, task_messages):
+   """
+   Send a packed request to a model and keep the answer of each task for the regular pipeline.
+   The tasks without a valid answer, such as all of them if the request fails or its response cannot be parsed, are left to single-task calls.
+
+   :param model: The AI model object.
+   :param task_messages: List of the task messages of the pack.
+   :return: None
+   """
+
+   model_name = get_model_name(model) # Get the model's name
+
+   try: # Try to run the packed request
+      result, _ = call_model(model, build_pack_prompt(task_messages)) # Run the packed request
+      answers = parse_pack_response(result, task_messages) # Split the response into the answer of each task
+   except Exception as e: # If the packed request failed
+      verbose_output(true_string=f"{BackgroundColors.YELLOW}The {BackgroundColors.CYAN}{model_name}{BackgroundColors.YELLOW} packed request failed, running its tasks one at a time: {str(e)}{Style.RESET_ALL}") # Output the fallback message
+      answers = {} # Every task falls back to a single-task call
+
+   for task_message, answer in answers.items(): # Loop through each answered task
+      cache_key = get_cache_key(model, task_message) # Build the cache key of the single-task request
+      PRECOMPUTED_RESPONSES[cache_key] = answer # Keep the answer for the regular pipeline
+      store_response(cache_key, answer) # Store the answer in the cache
+
+   RUN_METRICS.record_pack(model_name, len(answers), len(task_messages) - len(answers)) # Record the packed request
+
+def collect_packed_responses(models_object_list, completed_rows=0, shard=None, shard_strategy=SHARD_STRATEGY):
+   """
+   Run the prompt packing mode for the models that support it and keep their answers for the regular pipeline.
+   The tasks without a stored response are grouped into packs, whose requests are sent with up to MAX_CONCURRENT_REQUESTS_PER_PROVIDER in flight per provider.
+
+   :param models_object_list: The list of AI model objects.
+   :param completed_rows: The number of tasks already written to the output file, which are not packed.
+   :param shard: Tuple of the shard number and the number of shards, or None to pack every task.
+   :param shard_strategy: "index" or "hash", as in get_task_shard.
+   :return: None
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Collecting the packed responses...{Style.RESET_ALL}") # Output the collecting message
+
+   pack_models = [model for model in models_object_list if supports_packing(model)] # The models that support packing
+   if not pack_models: # If no model supports packing
+      print(f"{BackgroundColors.YELLOW}None of the selected models supports the packing mode, running every task on its own.{Style.RESET_ALL}") # Output the warning message
+      return # There are no packed responses
+
+   tasks = read_tasks(INPUT_CSV_FILE) if shard is None else select_shard_tasks(read_tasks(INPUT_CSV_FILE), shard, shard_strategy) # The tasks of the run
+   task_messages = list(dict.fromkeys(task_description for index, (task_description, _) in enumerate(tasks) if index >= completed_rows)) # The unique tasks that were not written yet
+
+   with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS_PER_PROVIDER * len(pack_models)) as executor: # Create the threads of the packed requests
+      futures = [executor.submit(run_pack, model, pack) for model in pack_models for pack in group_tasks(task_message for task_message in task_messages if get_stored_response(model, task_message)[1] is None)] # Send the packs of the tasks without a stored response
+      for future in futures: # Loop through each packed request
+         future.result() # Wait for it
+
+def get_task_key(task_description):
+   """
+   Get the deduplication key of a task: the hash of its description after the Unicode normalization, the removal of the
+   leading and trailing whitespace and the collapse of the inner whitespace.
+
+   :param task_description: The task description.
+   :return: The SHA-256 hex digest of the normalized task description.
+   """
+
+   normalized_description = " ".join(unicodedata.normalize("NFKC", task_description).split()) # Normalize the task description
+
+   return hashlib.sha256(normalized_description.encode("utf-8")).hexdigest() # Return the hash of the normalized description
+
+def get_dispatched_task(dispatched_tasks, task_key):
+   """
+   Get the future or results of a dispatched task identical to a task, marking it as recently used.
+
+   :param dispatched_tasks: Ordered dictionary mapping the deduplication key of each kept task to its future or results.
+   :param task_key: The deduplication key of the task, or None if the tasks are not deduplicated.
+   :return: The future or results of the identical task, or None if there is none.
+   """
+
+   if task_key is None or task_key not in dispatched_tasks: # If no identical task is kept
+      return None # The task must be sent to the models
+
+   dispatched_tasks.move_to_end(task_key) # Mark it as recently used
+
+   return dispatched_tasks[task_key] # Return its future or results
+
+def release_dispatched_task(dispatched_tasks, task_key, dispatched_task):
+   """
+   Release a task once its row is written, so the deduplication map does not grow with the input: with the response cache, the task is
+   forgotten and a later duplicate is answered by the cache; without it, only the DEDUPLICATION_WINDOW most recently used tasks are kept.
+
+   :param dispatched_tasks: Ordered dictionary mapping the deduplication key of each kept task to its future or results.
+   :param task_key: The deduplication key of the written task, or None if the tasks are not deduplicated.
+   :param dispatched_task: The future or results of the written task.
+   :return: None
+   """
+
+   if task_key is None or dispatched_tasks.get(task_key) is not dispatched_task: # If the task is not kept, or was replaced by a newer identical task
+      return # Nothing to release
+
+   if CACHE_RESPONSES: # If a later duplicate is answered by the response cache
+      del dispatched_tasks[task_key] # Forget the task
+      return # Nothing else to release
+
+   while len(dispatched_tasks) > DEDUPLICATION_WINDOW: # If too many tasks are kept
+      dispatched_tasks.popitem(last=False) # Forget the least recently used one
+
+def record_deduplicated_task(models_object_list):
+   """
+   Record a task whose responses are reused from an identical task of the run, saving one call to each model.
+
+   :param models_object_list: The list of AI model objects.
+   :return: None
+   """
+
+   for model in models_object_list: # Loop through each AI model
+      RUN_METRICS.record_deduplicated_call(get_model_name(model)) # Count the saved call
+
+def run_model_task(model, task_description):
+   """
+   Run the task on a single AI model, catching any error so it does not affect the other models.
+
+   :param model: The AI model object.
    :param task_description: The description of the task to run.
-   :param output_dict: The output dictionary to store results.
-   :return: A dictionary of task results from all models.
+   :return: Tuple of the formatted output of the model (or an empty string if the model failed), its stream metrics (or None) and its raw output (or None if the model failed).
+   """
+
+   model_name = get_model_name(model) # Get the model's name
+
+   try: # Try to run the task on the model
+      result, metrics = call_model(model, task_description) # Run the task on the model
+   except CircuitOpenError: # If the provider's circuit breaker is open
+      return SKIPPED_OUTPUT, None, None # Mark the cell as skipped without waiting for the provider
+   except Exception as e: # If an error occurs
+      print(f"{BackgroundColors.RED}Error running the task on the {BackgroundColors.CYAN}{model_name}{BackgroundColors.RED} model: {str(e)}{Style.RESET_ALL}") # Output the error message
+      return "", None, None # Return an empty output so the other models' results are kept
+
+   return format_output(result), metrics, str(result) # Return the formatted output, the stream metrics and the raw output
+
+def run_task_on_each_model(models_object_list, task_description):
+   """
+   Run the task on each AI model.
+   If CONCURRENT_MODELS is True, the task is sent to all of the models at the same time.
+
+   :param models_object_list: The list of AI model objects.
+   :param task_description: The description of the task to run.
+   :return: Tuple of the dictionaries of task results, stream metrics and raw outputs from all models.
    """
 
    verbose_output(true_string=f"{BackgroundColors.GREEN}Running the task on each AI model...{Style.RESET_ALL}") # Output the running message
 
-   task_results = {} # Initialize the task results dictionary
-   for model in models_object_list: # Loop through each model object
-      model_name = model.__module__.split(".")[-1].capitalize() # Get the model's name
-      result = model.run(task_description) # Run the task using the model's "run" method
-      formatted_output = format_output(result) # Format the output
-      task_results[model_name] = formatted_output # Add the result to the task results dictionary
-      output_dict[model_name].append(format_output(formatted_output)) # Add the result to the output dictionary
+   if CONCURRENT_MODELS and len(models_object_list) > 1: # If the models should run concurrently
+      with concurrent.futures.ThreadPoolExecutor(max_workers=len(models_object_list)) as executor: # Create a thread for each model
+         futures = [executor.submit(run_model_task, model, task_description) for model in models_object_list] # Send the task to every model at the same time
+         model_results = [future.result() for future in futures] # Collect the outputs in the same order as the models
+   else: # If the models should run one after another
+      model_results = [run_model_task(model, task_description) for model in models_object_list] # Run the task on each model sequentially
 
-   return task_results # Return the task results dictionary
+   task_results = {get_model_name(model): formatted_output for model, (formatted_output, _, _) in zip(models_object_list, model_results)} # Map each model name to its output
+   task_metrics = {get_model_name(model): metrics for model, (_, metrics, _) in zip(models_object_list, model_results)} # Map each model name to its stream metrics
+   raw_results = {get_model_name(model): raw_output for model, (_, _, raw_output) in zip(models_object_list, model_results)} # Map each model name to its raw output
 
-def compute_similarity(output, expected_output):
+   return task_results, task_metrics, raw_results # Return the task results, the stream metrics and the raw outputs
+
+async def arun_model_task(model, task_description, provider_semaphore):
    """
-   Compute the similarity between the output and the expected output using Cosine Similarity.
+   Asynchronously run the task on a single AI model, catching any error so it does not affect the other models.
 
-   :param output: The output text.
-   :param expected_output: The expected output text.
-   :return: The similarity percentage.
+   :param model: The AI model object.
+   :param task_description: The description of the task to run.
+   :param provider_semaphore: The semaphore that limits the simultaneous requests to the model's provider.
+   :return: Tuple of the formatted output of the model (or an empty string if the model failed), its stream metrics (or None) and its raw output (or None if the model failed).
    """
 
-   verbose_output(true_string=f"{BackgroundColors.GREEN}Computing the similarity between the output and the expected output...{Style.RESET_ALL}") # Output the computation message
+   model_name = get_model_name(model) # Get the model's name
 
-   if pd.isna(expected_output) or not expected_output.strip(): # If the expected output is empty
-      return None # Return None
-   
-   vectorizer = TfidfVectorizer().fit_transform([output, expected_output]) # Fit the vectorizer and transform the output and expected output
-   vectors = vectorizer.toarray() # Convert the vectorizer to an array
-   similarity = cosine_similarity([vectors[0]], [vectors[1]])[0][0] # Compute the cosine similarity between the vectors
+   async with provider_semaphore: # Respect the per-provider concurrency limit
+      try: # Try to run the task on the model
+         result, metrics = await acall_model(model, task_description) # Run the task on the model
+      except CircuitOpenError: # If the provider's circuit breaker is open
+         return SKIPPED_OUTPUT, None, None # Mark the cell as skipped without waiting for the provider
+      except Exception as e: # If an error occurs
+         print(f"{BackgroundColors.RED}Error running the task on the {BackgroundColors.CYAN}{model_name}{BackgroundColors.RED} model: {str(e)}{Style.RESET_ALL}") # Output the error message
+         return "", None, None # Return an empty output so the other models' results are kept
 
-   return round(similarity * 100, 2) # Return similarity as a percentage rounded to 2 decimal places
+   return format_output(result), metrics, str(result) # Return the formatted output, the stream metrics and the raw output
 
-def compute_similarity_statistics(similarity_scores):
+async def arun_task_on_each_model(models_object_list, task_description, provider_semaphores):
    """
-   Compute min, max, average, median, and standard deviation of similarity scores.
+   Asynchronously run the task on every AI model at the same time.
 
-   :param similarity_scores: List of tuples with model names and their similarity scores.
-   :return: Tuple of min_similarity, max_similarity, average_similarity, median_similarity, and standard_deviation_similarity.
+   :param models_object_list: The list of AI model objects.
+   :param task_description: The description of the task to run.
+   :param provider_semaphores: Dictionary mapping each model name to its provider semaphore.
+   :return: Tuple of the dictionaries of task results, stream metrics and raw outputs from all models.
    """
 
-   verbose_output(true_string=f"{BackgroundColors.GREEN}Computing similarity statistics...{Style.RESET_ALL}") # Output the computation message
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Running the task on each AI model asynchronously...{Style.RESET_ALL}") # Output the running message
 
-   valid_scores = [score for model_name, score in similarity_scores if isinstance(score, (int, float))] # Extract valid numeric scores, ensuring they are floats
+   model_results = await asyncio.gather(*[arun_model_task(model, task_description, provider_semaphores[get_model_name(model)]) for model in models_object_list]) # Send the task to every model at the same time
 
-   if not valid_scores: # Handle case with no valid scores
-      return (0, 0, 0, 0, 0) # Or another appropriate value for empty case
+   task_results = {get_model_name(model): formatted_output for model, (formatted_output, _, _) in zip(models_object_list, model_results)} # Map each model name to its output
+   task_metrics = {get_model_name(model): metrics for model, (_, metrics, _) in zip(models_object_list, model_results)} # Map each model name to its stream metrics
+   raw_results = {get_model_name(model): raw_output for model, (_, _, raw_output) in zip(models_object_list, model_results)} # Map each model name to its raw output
 
-   min_similarity = round(min(valid_scores), 2) # Compute the minimum similarity
-   max_similarity = round(max(valid_scores), 2) # Compute the maximum similarity
-   average_similarity = round(np.mean(valid_scores), 2) # Compute the average similarity
-   median_similarity = round(np.median(valid_scores), 2) # Compute the median similarity
-   standard_deviation_similarity = round(np.std(valid_scores), 2) # Compute the standard deviation
+   return task_results, task_metrics, raw_results # Return the task results, the stream metrics and the raw outputs
 
-   statistics_tuple = (min_similarity, max_similarity, average_similarity, median_similarity, standard_deviation_similarity) # Store the statistics in a tuple
+def update_model_outputs(output_dict, task_results):
+   """
+   Update the output dictionary with the output of each model.
+
+   :param output_dict: The output dictionary to update.
+   :param task_results: Dictionary mapping each model name to its formatted output.
+   :return: None
+   """
 
-   return statistics_tuple # Return the statistics
+   for model_name, formatted_output in task_results.items(): # Loop through each model output
+      if BLOB_STORE is not None and formatted_output and formatted_output != SKIPPED_OUTPUT: # If the outputs are written to the blob store
+         formatted_output = BLOB_STORE.put(formatted_output) # Store the output once and keep its reference
+      output_dict[model_name].append(formatted_output) # Add the result to the output dictionary
 
-def update_similarity_statistics(output_dict, statistics_tuple):
+def update_stream_metrics(output_dict, task_metrics):
    """
-   Update the output dictionary with similarity statistics.
+   Update the output dictionary with the stream metrics of each model. The cells of the responses that were not streamed are left empty.
 
    :param output_dict: The output dictionary to update.
-   :param statistics_tuple: Tuple of min_similarity, max_similarity, average_similarity, median_similarity, and standard_deviation_similarity.
+   :param task_metrics: Dictionary mapping each model name to its stream metrics, or None.
    :return: None
    """
 
-   verbose_output(true_string=f"{BackgroundColors.GREEN}Updating the output dictionary with similarity statistics...{Style.RESET_ALL}") # Output the updating message
+   if not STREAM_RESPONSES: # If the stream metrics are not collected
+      return # There are no stream metrics columns
+
+   for model_name, metrics in task_metrics.items(): # Loop through each model's stream metrics
+      metrics = metrics or {} # The responses that were not streamed have no metrics
+      output_dict[f"{model_name} TTFT (s)"].append(metrics.get("ttft", "")) # Add the time to first token
+      output_dict[f"{model_name} Latency (s)"].append(metrics.get("latency", "")) # Add the total latency
+      output_dict[f"{model_name} Tokens/s"].append(metrics.get("tokens_per_second", "")) # Add the output tokens per second
+
+def get_similarity_engine():
+   """
+   Get the batched similarity engine, creating it on the first call.
+   In "corpus" mode, the IDF is fitted once on the REFERENCE_CORPUS_FILE or, if it is not set, on the expected outputs of the input CSV file.
+
+   :return: The similarity engine.
+   """
+
+   global SIMILARITY_ENGINE # The similarity engine is shared by every task
+
+   if SIMILARITY_ENGINE is None: # If the engine was not created yet
+      if SIMILARITY_IDF_MODE == "corpus": # If a single IDF is used for the whole run
+         reference_corpus = read_reference_corpus(REFERENCE_CORPUS_FILE) if REFERENCE_CORPUS_FILE else (expected_output for _, expected_output in read_tasks(INPUT_CSV_FILE)) # The reference corpus
+         SIMILARITY_ENGINE = SimilarityEngine(SIMILARITY_IDF_MODE, reference_corpus) # Create the engine fitted on the reference corpus
+      else: # If each pair has its own IDF
+         SIMILARITY_ENGINE = SimilarityEngine(SIMILARITY_IDF_MODE) # Create the engine
 
-   output_dict["Minimum Similarity"].append(statistics_tuple[0]) # Update the minimum similarity
-   output_dict["Maximum Similarity"].append(statistics_tuple[1]) # Update the maximum similarity
-   output_dict["Average Similarity"].append(statistics_tuple[2]) # Update the average similarity
-   output_dict["Median Similarity"].append(statistics_tuple[3]) # Update the median similarity
-   output_dict["Standard Deviation Similarity"].append(statistics_tuple[4]) # Update the standard deviation similarity
+   return SIMILARITY_ENGINE # Return the similarity engine
 
+def compute_similarity(output, expected_output):
+   """
+   Compute the similarity between the output and the expected output using Cosine Similarity.
+
+   :param output: The output text.
+   :param expected_output: The expected output text.
+   :return: The similarity percentage.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Computing the similarity between the output and the expected output...{Style.RESET_ALL}") # Output the computation message
+
+   return get_similarity_engine().compute_similarities([output], [expected_output])[0] # Return similarity as a percentage rounded to 2 decimal places, or None if the expected output is empty
+
+@timed_stage("compute_similarity_for_models")
 def compute_similarity_for_models(models_object_list, task_results, expected_output, output_dict):
    """
    Compute similarity scores for each model and update the output dictionary.
+   The similarity statistics of the row are left empty, as write_similarity_statistics computes them at once over the score matrix of the finished output.
 
    :param models_object_list: List of model objects.
    :param task_results: The results from running the task on the models.
@@ -270,15 +807,17 @@ def compute_similarity_for_models(models_object_list, task_results, expected_out
    verbose_output(true_string=f"{BackgroundColors.GREEN}Computing similarity scores for each model...{Style.RESET_ALL}") # Output the computation message
 
    similarity_scores = [] # To store similarity scores for each model
+   model_names = [get_model_name(model) for model in models_object_list] # Get the models' names
+   model_outputs = [task_results[model_name] if task_results[model_name] != SKIPPED_OUTPUT else None for model_name in model_names] # The outputs of the models, without the skipped cells' marker
+   model_similarities = get_similarity_engine().compute_similarities(model_outputs, [expected_output] * len(model_names)) # Compute every model's similarity in one batch
+   model_similarities = [similarity_score if model_output is not None else None for model_output, similarity_score in zip(model_outputs, model_similarities)] # The skipped cells have no similarity
 
-   for model in models_object_list: # Loop through each model object
-      model_name = model.__module__.split(".")[-1].capitalize() # Get model's name
-      similarity_score = compute_similarity(task_results[model_name], expected_output) # Compute similarity score
+   for model_name, similarity_score in zip(model_names, model_similarities): # Loop through each model's similarity score
       similarity_scores.append((model_name, similarity_score if similarity_score is not None else 0)) # Append the model name and similarity score to the list
       output_dict[f"{model_name} Similarity"].append(similarity_score if similarity_score is not None else "N/A") # Append the similarity score for each model
    
-   statistics_tuple = compute_similarity_statistics(similarity_scores) # Compute similarity statistics
-   update_similarity_statistics(output_dict, statistics_tuple) # Update similarity statistics
+   for column in STATISTICS_COLUMNS: # Loop through each similarity statistic
+      output_dict[column].append("") # Leave it to write_similarity_statistics
 
    return similarity_scores # Return the list of similarity scores
 
@@ -295,66 +834,901 @@ def update_most_similar_model(similarity_scores, output_dict):
    most_similar_model, overall_similarity_score = max(similarity_scores, key=lambda x: (x[1] is not None, x[1])) # Get the most similar model and score
    output_dict["Most Similar Model"].append(f"{most_similar_model} ({overall_similarity_score}%)") # Update most similar model
 
-def run_tasks(df):
+def print_task(index, task_description, expected_output):
    """
-   Run the tasks in the DataFrame.
+   Output the task number, description and expected output.
 
-   :param df: The DataFrame containing the tasks and the expected output.
-   :return: The output dictionary.
+   :param index: The index of the task in the input.
+   :param task_description: The task description.
+   :param expected_output: The expected output.
+   :return: None
+   """
+
+   print(f"{BackgroundColors.GREEN}Task {BackgroundColors.CYAN}{index + 1:02}{BackgroundColors.GREEN}:\n - {BackgroundColors.GREEN}Task Message: {BackgroundColors.CYAN}{task_description}{BackgroundColors.GREEN}\n - Expected Output: {BackgroundColors.CYAN}{expected_output}{Style.RESET_ALL}\n") # Output the task description and expected output
+
+def store_task_results(models_object_list, task_description, expected_output, task_results, task_metrics, raw_results, output_dict, deduplicated=False):
+   """
+   Store a finished task in the output dictionary: its attributes, the models' outputs and stream metrics, the similarity scores and the most similar model.
+   The similarity scores are always computed against the task's own expected output, even when its responses are reused from an identical task.
+
+   :param models_object_list: The list of AI model objects.
+   :param task_description: The task description.
+   :param expected_output: The expected output.
+   :param task_results: Dictionary mapping each model name to its formatted output.
+   :param task_metrics: Dictionary mapping each model name to its stream metrics, or None.
+   :param raw_results: Dictionary mapping each model name to its raw output, or None.
+   :param output_dict: The output dictionary to store results.
+   :param deduplicated: If the responses were reused from an identical task, so the stream metrics cells are left empty.
+   :return: Dictionary of the raw outputs and token counts of the task, which are only written to the columnar output.
+   """
+
+   if deduplicated: # If the responses were reused from an identical task
+      task_metrics = dict.fromkeys(task_metrics) # No call was made for this task
+
+   update_output_dict(output_dict, task_description, expected_output) # Update the output dictionary with the task description and expected output
+   update_model_outputs(output_dict, task_results) # Add the models' outputs to the output dictionary
+   update_stream_metrics(output_dict, task_metrics) # Add the models' stream metrics to the output dictionary
+   similarity_scores = compute_similarity_for_models(models_object_list, task_results, expected_output, output_dict) # Compute similarity scores
+   update_most_similar_model(similarity_scores, output_dict) # Update most similar model in the output dictionary
+
+   return get_columnar_columns(list(task_results), raw_results, task_metrics) # Return the columns only written to the columnar output
+
+async def arun_closing_providers(coroutine):
+   """
+   Run a coroutine of the asyncio execution engine and then close the asynchronous HTTP clients of the providers in the same event loop, even if it fails.
+
+   :param coroutine: The coroutine to run, such as arun_tasks(...).
+   :return: The result of the coroutine.
+   """
+
+   try: # Run the coroutine
+      return await coroutine # Return its result
+   finally: # Even if it failed or was cancelled
+      await aclose_provider_resources() # Close the asynchronous connections before the event loop finishes
+
+async def arun_tasks(tasks, models_object_list, output_dict, output_file, writer, completed_rows=0, columnar_writer=None):
+   """
+   Run the tasks with the asyncio execution engine.
+   Up to MAX_CONCURRENT_TASKS tasks are kept in flight, each provider receives at most MAX_CONCURRENT_REQUESTS_PER_PROVIDER
+   simultaneous requests, and each finished task is written to the output CSV file in the input order. When a slow task holds
+   MAX_QUEUED_TASKS dispatched tasks behind it, including the deduplicated ones, no other task is dispatched until it is written, so the memory use does not grow with the input.
+
+   :param tasks: Iterable of (task_description, expected_output) tuples.
+   :param models_object_list: The list of AI model objects.
+   :param output_dict: The output dictionary that holds the row being written.
+   :param output_file: The opened output CSV file.
+   :param writer: The CSV writer of the output file.
+   :param completed_rows: The number of tasks already written to the output file, which are skipped.
+   :param columnar_writer: The columnar output writer, or None if the rows are only written to the output CSV file.
+   :return: None
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Running the tasks for each Artificial Intelligence model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+   provider_semaphores = {get_model_name(model): asyncio.Semaphore(MAX_CONCURRENT_REQUESTS_PER_PROVIDER) for model in models_object_list} # One semaphore per provider
+   tasks_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TASKS) # Limits the number of tasks in flight
+   in_flight = collections.deque() # The dispatched tasks, in the input order
+   dispatched_tasks = collections.OrderedDict() # Maps the deduplication key of each kept task to its future, when DEDUPLICATE_TASKS is True
+
+   for index, (task_description, expected_output) in enumerate(tasks): # Loop through each task
+      if index < completed_rows: # If the task was already written to the output file
+         continue # Skip it
+
+      task_key = get_task_key(task_description) if DEDUPLICATE_TASKS else None # The deduplication key of the task
+      future = get_dispatched_task(dispatched_tasks, task_key) # The future of an identical task that is still kept
+      deduplicated = future is not None # If an identical task was already dispatched
+
+      if deduplicated: # If the responses of the identical task can be reused
+         record_deduplicated_task(models_object_list) # Count the saved calls, sharing its future instead of calling the models again
+      else: # If the task must be sent to the models
+         await tasks_semaphore.acquire() # Wait until there is room for another task in flight
+         future = asyncio.create_task(arun_task_on_each_model(models_object_list, task_description, provider_semaphores)) # Dispatch the task to every model
+         future.add_done_callback(lambda _: tasks_semaphore.release()) # Free the slot once the task finishes
+         if task_key is not None: # If the tasks are deduplicated
+            dispatched_tasks[task_key] = future # Keep the future for the identical tasks
+
+      print_task(index, task_description, expected_output) # Output the task description and expected output
+      in_flight.append((task_description, expected_output, future, deduplicated, task_key)) # Keep the task in the input order
+
+      while in_flight and (in_flight[0][2].done() or len(in_flight) >= MAX_QUEUED_TASKS): # Write every finished task at the head of the queue, waiting for the head task when the queue is full
+         task_description, expected_output, future, deduplicated, task_key = in_flight.popleft() # Get the oldest task
+         columnar_columns = store_task_results(models_object_list, task_description, expected_output, *await future, output_dict, deduplicated) # Store its results and stream metrics once it finishes
+         write_output_row(output_dict, output_file, writer, columnar_writer, columnar_columns) # Write them to the output files
+         release_dispatched_task(dispatched_tasks, task_key, future) # Release the task once its row is written
+
+   while in_flight: # Write the remaining tasks in the input order
+      task_description, expected_output, future, deduplicated, task_key = in_flight.popleft() # Get the oldest task
+      columnar_columns = store_task_results(models_object_list, task_description, expected_output, *await future, output_dict, deduplicated) # Store its results and stream metrics once it finishes
+      write_output_row(output_dict, output_file, writer, columnar_writer, columnar_columns) # Write them to the output files
+      release_dispatched_task(dispatched_tasks, task_key, future) # Release the task once its row is written
+
+def run_tasks(tasks, resume=False, batch=False, columnar_format=COLUMNAR_OUTPUT_FORMAT, shard=None, shard_strategy=SHARD_STRATEGY, pack=PACK_TASKS, blobs=STORE_RESPONSES_AS_BLOBS):
+   """
+   Run the tasks, appending and flushing each finished task to the output CSV file as soon as it is done.
+   If ASYNC_EXECUTION is True, the tasks are run by the asyncio execution engine.
+
+   :param tasks: Iterable of (task_description, expected_output) tuples, such as the generator returned by read_csv_file.
+   :param resume: If True, the tasks already written to the output CSV file are skipped.
+   :param batch: If True, the batch-capable models receive every task through their provider's batch endpoint before the regular pipeline runs.
+   :param columnar_format: If set to "parquet" or "arrow", the rows are also written to a typed columnar file.
+   :param shard: Tuple of the shard number and the number of shards, to only run the tasks of that shard and write them to the shard output files, or None to run every task.
+   :param shard_strategy: "index" or "hash", as in get_task_shard.
+   :param pack: If True, the short tasks are sent in packed requests to the models that support it before the regular pipeline runs.
+   :param blobs: If True, the model outputs are written to the blob store of the run or of its shard and the output cells keep their references.
+   :return: The output dictionary, which is empty once every row was written.
    """
 
    verbose_output(true_string=f"{BackgroundColors.GREEN}Running the tasks for each Artificial Intelligence model...{Style.RESET_ALL}") # Output the running message
 
    models_object_list = get_models_object_list() # Get the list of AI model objects
    output_dict = initialize_dict(models_object_list) # Initialize the output dictionary
+   output_csv_file = get_shard_file(OUTPUT_CSV_FILE, shard) # The output CSV file of the run or of its shard
+   output_file, writer, completed_rows = open_output_csv(list(output_dict.keys()), resume, output_csv_file) # Open the output CSV file
+   columnar_file = get_shard_file(COLUMNAR_OUTPUT_FILES[columnar_format], shard) if columnar_format else None # The columnar output file of the run or of its shard
+   columnar_writer = open_columnar_output(columnar_format, list(output_dict.keys()), [get_model_name(model) for model in models_object_list], output_csv_file, completed_rows, columnar_file, get_shard_file(BLOB_STORE_FILE, shard)) # Open the columnar output file, if enabled
+
+   if shard is not None: # If only the tasks of a shard are run
+      tasks = select_shard_tasks(tasks, shard, shard_strategy) # Select them
+      print(f"{BackgroundColors.GREEN}Running the shard {BackgroundColors.CYAN}{shard[0]}/{shard[1]}{BackgroundColors.GREEN} (by {shard_strategy}) into {BackgroundColors.CYAN}{output_csv_file}{Style.RESET_ALL}\n") # Output the shard message
+
+   if batch: # If the offline batch submission mode is enabled
+      collect_batch_responses(models_object_list, completed_rows, shard, shard_strategy) # Collect the batch responses before running the tasks
+
+   if pack: # If the prompt packing mode is enabled
+      collect_packed_responses(models_object_list, completed_rows, shard, shard_strategy) # Collect the packed responses before running the tasks
+
+   tasks = RUN_METRICS.time_iterable("read_csv_file", tasks) # Time the reading of each input row
+   RUN_METRICS.start_periodic_export(METRICS_EXPORT_INTERVAL_SECONDS) # Export the metrics during the run, if enabled
+
+   with output_file, contextlib.closing(columnar_writer) if columnar_writer else contextlib.nullcontext(), use_blob_store(get_shard_file(BLOB_STORE_FILE, shard)) if blobs else contextlib.nullcontext(): # Close the output files even if the run crashes
+      if ASYNC_EXECUTION: # If the asyncio execution engine should be used
+         asyncio.run(arun_closing_providers(arun_tasks(tasks, models_object_list, output_dict, output_file, writer, completed_rows, columnar_writer))) # Run the tasks asynchronously
+      else: # If the tasks should be run one at a time
+         dispatched_tasks = collections.OrderedDict() # Maps the deduplication key of each kept task to its results, when DEDUPLICATE_TASKS is True
+
+         for index, (task_description, expected_output) in enumerate(tasks): # Loop through each task
+            if index < completed_rows: # If the task was already written to the output file
+               continue # Skip it
+
+            print_task(index, task_description, expected_output) # Output the task description and expected output
+
+            task_key = get_task_key(task_description) if DEDUPLICATE_TASKS else None # The deduplication key of the task
+            results = get_dispatched_task(dispatched_tasks, task_key) # The results of an identical task that are still kept
+            deduplicated = results is not None # If an identical task was already run
+
+            if deduplicated: # If the responses of the identical task can be reused
+               record_deduplicated_task(models_object_list) # Count the saved calls, reusing them instead of calling the models again
+            else: # If the task must be sent to the models
+               results = run_task_on_each_model(models_object_list, task_description) # Run the task on each AI model
+               if task_key is not None: # If the tasks are deduplicated
+                  dispatched_tasks[task_key] = results # Keep the results for the identical tasks
+
+            columnar_columns = store_task_results(models_object_list, task_description, expected_output, *results, output_dict, deduplicated) # Store its results and stream metrics
+            write_output_row(output_dict, output_file, writer, columnar_writer, columnar_columns) # Write the task to the output files
+            release_dispatched_task(dispatched_tasks, task_key, results) # Release the task once its row is written
+
+   RUN_METRICS.stop_periodic_export() # Stop the periodic metrics export
+   print_process_statistics(models_object_list) # Output the timing of the subprocess-based models
+   print_deduplication_statistics() # Output the calls saved by the deduplication
+   print_hedge_statistics() # Output the hedged calls
+   print_packing_statistics() # Output the packing ratio
+   write_similarity_statistics(output_csv_file) # Write the similarity statistics of the finished output
+   report_leaderboard(output_csv_file, shard) # Write the leaderboard of the output
+
+   return output_dict # Return the output dictionary
+
+def print_deduplication_statistics():
+   """
+   Output the number of model calls saved by the deduplication of identical tasks.
+
+   :return: None
+   """
+
+   if not DEDUPLICATE_TASKS: # If the tasks are not deduplicated
+      return # Nothing to output
 
-   for index, task in df.iterrows(): # Loop through each row in the DataFrame
-      task_description, expected_output = get_tasks_attributes(task) # Get the task description and expected output
-      update_output_dict(output_dict, task_description, expected_output) # Update the output dictionary with the task description and expected output
-      print(f"{BackgroundColors.GREEN}Task {BackgroundColors.CYAN}{index + 1:02}{BackgroundColors.GREEN}:\n - {BackgroundColors.GREEN}Task Message: {BackgroundColors.CYAN}{task_description}{BackgroundColors.GREEN}\n - Expected Output: {BackgroundColors.CYAN}{expected_output}{Style.RESET_ALL}\n") # Output the task description and expected output
+   deduplicated_calls = [provider_metrics["deduplicated_calls"] for provider_metrics in RUN_METRICS.snapshot()["providers"].values()] # The saved calls of each provider
+   duplicate_tasks = max(deduplicated_calls, default=0) # Each duplicate task saves one call to each model
 
-      task_results = run_task_on_each_model(models_object_list, task_description, output_dict) # Run the task on each AI model
+   print(f"{BackgroundColors.GREEN}Deduplication saved {BackgroundColors.CYAN}{sum(deduplicated_calls)}{BackgroundColors.GREEN} model calls ({BackgroundColors.CYAN}{duplicate_tasks}{BackgroundColors.GREEN} duplicate tasks).{Style.RESET_ALL}") # Output the saved calls
 
-      similarity_scores = compute_similarity_for_models(models_object_list, task_results, expected_output, output_dict) # Compute similarity scores
-      update_most_similar_model(similarity_scores, output_dict) # Update most similar model in the output dictionary
+def print_packing_statistics():
+   """
+   Output the packing ratio of each model: how many tasks each packed request answered on average, and how many packed tasks fell back to single-task calls.
+
+   :return: None
+   """
 
-   return output_dict # Return the output list
+   for model_name, provider_metrics in RUN_METRICS.snapshot()["providers"].items(): # Loop through each model's metrics
+      if provider_metrics["packed_requests"]: # If the model received packed requests
+         print(f"{BackgroundColors.GREEN}{model_name} packing: {BackgroundColors.CYAN}{provider_metrics['packed_tasks']}{BackgroundColors.GREEN} tasks answered by {BackgroundColors.CYAN}{provider_metrics['packed_requests']}{BackgroundColors.GREEN} packed requests (packing ratio {BackgroundColors.CYAN}{provider_metrics['packing_ratio']:.2f}{BackgroundColors.GREEN}), {BackgroundColors.CYAN}{provider_metrics['pack_fallbacks']}{BackgroundColors.GREEN} tasks fell back to single-task calls.{Style.RESET_ALL}") # Output the packing statistics
 
-def convert_dict_to_df(output_dict):
+def print_hedge_statistics():
    """
-   Convert the output dictionary to a DataFrame.
+   Output the number of hedged calls of each model and how many of them were won by the duplicate request.
 
-   :param output_dict: The output dictionary.
-   :return: The output DataFrame.
+   :return: None
    """
 
-   verbose_output(true_string=f"{BackgroundColors.GREEN}Converting the output dictionary to a DataFrame...{Style.RESET_ALL}") # Output the conversion message
+   if not HEDGE_REQUESTS: # If the slow calls are not hedged
+      return # Nothing to output
+
+   for model_name, provider_metrics in RUN_METRICS.snapshot()["providers"].items(): # Loop through each model's metrics
+      if provider_metrics["hedged_calls"]: # If some of its calls were hedged
+         print(f"{BackgroundColors.GREEN}{model_name} hedged calls: {BackgroundColors.CYAN}{provider_metrics['hedged_calls']}/{provider_metrics['calls']}{BackgroundColors.GREEN} ({BackgroundColors.CYAN}{provider_metrics['hedge_rate']:.1%}{BackgroundColors.GREEN}), {BackgroundColors.CYAN}{provider_metrics['hedge_wins']}{BackgroundColors.GREEN} won by the duplicate request.{Style.RESET_ALL}") # Output the hedge statistics
 
-   return pd.DataFrame(output_dict) # Return the DataFrame
+def report_leaderboard(output_csv_file, shard=None):
+   """
+   Write the leaderboard of a complete output CSV file and output the ranking of the models.
 
-def write_output_to_csv(output_dict):
+   :param output_csv_file: The path to the output CSV file.
+   :param shard: Tuple of the shard number and the number of shards, to write the leaderboard of that shard, or None.
+   :return: Dictionary of the leaderboard, or None if WRITE_LEADERBOARD is False.
    """
-   Write the output to a new CSV file with the first column as the input tasks and the other columns as the AI model outputs.
 
-   :param output_dict: The output dictionary containing model outputs.
+   if not WRITE_LEADERBOARD: # If the leaderboard is disabled
+      return None # Nothing to write
+
+   from leaderboard import LEADERBOARD_FILE, write_leaderboard # Imported on demand, as it imports numpy
+
+   leaderboard_file = get_shard_file(LEADERBOARD_FILE, shard) # The leaderboard file of the output or of its shard
+
+   leaderboard = write_leaderboard(output_csv_file, leaderboard_file, RUN_METRICS.snapshot()["providers"]) # Write the leaderboard, with the token usage of the models called by this run
+   print(f"{BackgroundColors.GREEN}Leaderboard of the {BackgroundColors.CYAN}{leaderboard['scored_tasks']}/{leaderboard['tasks']}{BackgroundColors.GREEN} scored tasks, written to {BackgroundColors.CYAN}{leaderboard_file}{BackgroundColors.GREEN}:{Style.RESET_ALL}") # Output the leaderboard header
+
+   for rank, model_name in enumerate(leaderboard["ranking"], start=1): # Loop through each model, from the most similar
+      summary = leaderboard["models"][model_name] # The summary of the model
+      similarities = ", ".join(f"{name} {summary[f'{name}_similarity']}%" if summary[f"{name}_similarity"] is not None else f"{name} N/A" for name in ("mean", "median", "p10", "p90")) # The similarity summary
+      latency = f", p50 latency {BackgroundColors.CYAN}{summary['latency']['p50_seconds']}s{BackgroundColors.GREEN}" if summary["latency"]["count"] else "" # The latency summary, if the responses were streamed
+      usage = f", {BackgroundColors.CYAN}{summary['usage']['input_tokens'] + summary['usage']['output_tokens']}{BackgroundColors.GREEN} tokens" if summary["usage"] else "" # The token usage, if the model was called by this run
+      print(f"{BackgroundColors.GREEN} {rank}. {BackgroundColors.CYAN}{model_name}{BackgroundColors.GREEN}: {BackgroundColors.CYAN}{similarities}{BackgroundColors.GREEN}, {BackgroundColors.CYAN}{summary['wins']}{BackgroundColors.GREEN} wins ({BackgroundColors.CYAN}{summary['win_rate']:.1%}{BackgroundColors.GREEN}){latency}{usage}{Style.RESET_ALL}") # Output the model summary
+
+   return leaderboard # Return the leaderboard
+
+def print_process_statistics(models_object_list):
+   """
+   Output the process timing statistics of the subprocess-based models, such as Copilot, splitting the spawn time from the response time.
+
+   :param models_object_list: The list of AI model objects.
    :return: None
    """
-   
-   verbose_output(true_string=f"{BackgroundColors.GREEN}Writing the output to the output CSV file...{Style.RESET_ALL}") # Output the writing message
-
-   try: # Try to write the output to the CSV file
-      with open(OUTPUT_CSV_FILE, mode="w", newline="", encoding="utf-8") as file: # Open the output CSV file
-         writer = csv.writer(file) # Create a CSV writer
-         writer.writerow(output_dict.keys()) # Write the header row
-
-         num_rows = len(output_dict["Task"]) # Get the number of rows based on the length of the "Task" list
-         for i in range(num_rows): # Loop through each row
-            row = [output_dict[key][i] for key in output_dict] # Get the values for each key in the dictionary
-            writer.writerow(row) # Write the row to the CSV file
-      
-      verbose_output(true_string=f"{BackgroundColors.GREEN}Output written to {BackgroundColors.CYAN}{OUTPUT_CSV_FILE}{Style.RESET_ALL}") # Output the success message
-   except Exception as e: # If an error occurs
-      print(f"{BackgroundColors.RED}Error writing output to CSV: {str(e)}{Style.RESET_ALL}") # Output the error message
+
+   for model in models_object_list: # Loop through each AI model
+      if not hasattr(model, "get_statistics"): # If the model does not run subprocesses
+         continue # Skip it
+
+      statistics = model.get_statistics() # Get the process timing statistics
+      if not statistics["calls"]: # If no process was started
+         continue # Skip it
+
+      print(f"{BackgroundColors.GREEN}{get_model_name(model)} processes: {BackgroundColors.CYAN}{statistics['calls']}{BackgroundColors.GREEN} started, {BackgroundColors.CYAN}{statistics['timeouts']}{BackgroundColors.GREEN} timed out, {BackgroundColors.CYAN}{statistics['failures']}{BackgroundColors.GREEN} failed, average spawn {BackgroundColors.CYAN}{statistics['spawn_seconds'] / statistics['calls'] * 1000:.1f}ms{BackgroundColors.GREEN}, average response {BackgroundColors.CYAN}{statistics['response_seconds'] / statistics['calls']:.2f}s{Style.RESET_ALL}") # Output the statistics
+
+def read_lines_with_offsets(file, line_offsets):
+   """
+   Read the complete lines of a binary file, keeping track of the byte offset after the last line read.
+   A last line without a line break was cut by an interrupted write, so it is not read.
+
+   :param file: The file opened in binary mode.
+   :param line_offsets: Single item list updated with the byte offset after the last line read.
+   :return: Generator of the decoded lines.
+   """
+
+   for line in file: # Loop through each line of the file
+      if not line.endswith(b"\n"): # If the line was cut before its line break
+         return # Stop before the partially written line
+      line_offsets[0] += len(line) # Update the byte offset
+      yield line.decode("utf-8") # Yield the decoded line
+
+def count_completed_rows(header, output_csv_file=OUTPUT_CSV_FILE):
+   """
+   Count the complete rows of an existing output CSV file and truncate a partially written last row, so the run can be resumed.
+
+   :param header: The header the output file must have.
+   :param output_csv_file: The path to the output CSV file.
+   :return: The number of complete rows in the output file.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Counting the completed rows of the output CSV file...{Style.RESET_ALL}") # Output the counting message
+
+   completed_rows = -1 # The number of complete rows, not counting the header
+   valid_offset = 0 # The byte offset after the last complete row
+
+   with open(output_csv_file, mode="rb") as file: # Open the output CSV file in binary mode to get the byte offsets
+      line_offsets = [0] # The byte offset after the last line consumed by the CSV reader
+      reader = csv.reader(read_lines_with_offsets(file, line_offsets)) # Parse the lines, recording the offset of the last consumed line
+
+      try: # Try to parse the rows
+         for row in reader: # Loop through each row
+            if completed_rows == -1 and row != header: # If the header does not match the current models
+               print(f"{BackgroundColors.RED}The header of {BackgroundColors.CYAN}{output_csv_file}{BackgroundColors.RED} does not match the current models, so the run cannot be resumed.{Style.RESET_ALL}")
+               sys.exit(1) # Exit the program
+            if len(row) != len(header): # If the row was partially written
+               break # Stop counting
+            completed_rows += 1 # Count the complete row
+            valid_offset = line_offsets[0] # The file is valid up to this row
+      except csv.Error: # If the last row was cut in the middle of a quoted field
+         pass # Keep the rows counted so far
+
+   with open(output_csv_file, mode="r+b") as file: # Open the output CSV file to drop a partially written last row
+      file.truncate(valid_offset) # Keep only the complete rows
+
+   return max(completed_rows, 0) # Return the number of complete rows
+
+def open_output_csv(header, resume=False, output_csv_file=OUTPUT_CSV_FILE):
+   """
+   Open the output CSV file for incremental writing.
+   If resume is True and the file exists, the new rows are appended after the rows already written.
+
+   :param header: The header row of the output file.
+   :param resume: If True, the existing output file is kept and its complete rows are counted.
+   :param output_csv_file: The path to the output CSV file.
+   :return: Tuple of the opened file, the CSV writer and the number of rows already written.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Opening the output CSV file...{Style.RESET_ALL}") # Output the opening message
+
+   completed_rows = count_completed_rows(header, output_csv_file) if resume and os.path.exists(output_csv_file) else 0 # Count the rows already written when resuming
+   resuming = resume and os.path.exists(output_csv_file) and os.path.getsize(output_csv_file) > 0 # If the rows are appended to an existing file
+
+   output_file = open(output_csv_file, mode="a" if resuming else "w", newline="", encoding="utf-8") # Open the output CSV file
+   writer = csv.writer(output_file) # Create a CSV writer
+
+   if not resuming: # If the file is new
+      writer.writerow(header) # Write the header row
+      output_file.flush() # Flush the header to the file
+   else: # If the run is resumed
+      print(f"{BackgroundColors.GREEN}Resuming the run, skipping the {BackgroundColors.CYAN}{completed_rows}{BackgroundColors.GREEN} tasks already in {BackgroundColors.CYAN}{output_csv_file}{Style.RESET_ALL}\n") # Output the resume message
+
+   return output_file, writer, completed_rows # Return the file, the writer and the number of rows already written
+
+@timed_stage("write_output_row")
+def write_output_row(output_dict, output_file, writer, columnar_writer=None, columnar_columns=None):
+   """
+   Append the row held in the output dictionary to the output CSV file, flush it and clear the dictionary, so the memory use does not grow with the number of tasks.
+   If the columnar output is enabled, the row is also buffered by the columnar output writer, with the model outputs instead of their blob references.
+
+   :param output_dict: The output dictionary holding one finished row.
+   :param output_file: The opened output CSV file.
+   :param writer: The CSV writer of the output file.
+   :param columnar_writer: The columnar output writer, or None.
+   :param columnar_columns: Dictionary of the columns only written to the columnar output, such as the raw outputs.
+   :return: None
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Writing the row to the output CSV file...{Style.RESET_ALL}") # Output the writing message
+
+   writer.writerow([values[-1] for values in output_dict.values()]) # Write the row to the CSV file
+   output_file.flush() # Flush the row so it survives a crash
+
+   if columnar_writer is not None: # If the columnar output is enabled
+      columnar_writer.append({**{column: BLOB_STORE.resolve(values[-1]) if BLOB_STORE is not None else values[-1] for column, values in output_dict.items()}, **(columnar_columns or {})}) # Buffer the typed row
+
+   for values in output_dict.values(): # Loop through each column
+      values.clear() # Clear the stored values
+
+def open_work_queue(queue_file):
+   """
+   Open the job queue, exiting if the tasks were not enqueued yet.
+
+   :param queue_file: The path to the SQLite queue file.
+   :return: Tuple of the job queue and its list of (model_name, class_name) providers.
+   """
+
+   if not os.path.exists(queue_file): # If the queue was not created
+      print(f"{BackgroundColors.RED}The job queue {BackgroundColors.CYAN}{queue_file}{BackgroundColors.RED} was not found. Run {BackgroundColors.CYAN}python main.py --queue enqueue{BackgroundColors.RED} first.{Style.RESET_ALL}")
+      sys.exit(1) # Exit the program
+
+   queue = WorkQueue(queue_file) # Open the queue
+
+   return queue, queue.get_providers() # Return the queue and its providers
+
+def print_queue_status(queue):
+   """
+   Output the number of jobs of each status of the job queue.
+
+   :param queue: The job queue.
+   :return: None
+   """
+
+   status_counts = queue.get_status_counts() # Count the jobs of each status
+
+   print(f"{BackgroundColors.GREEN}Jobs: {', '.join(f'{BackgroundColors.CYAN}{status_counts.get(status, 0)}{BackgroundColors.GREEN} {status}' for status in ('pending', 'leased', 'done', 'failed'))}.{Style.RESET_ALL}") # Output the status counts
+
+def enqueue_tasks(queue_file=QUEUE_FILE):
+   """
+   Load the tasks of the input CSV file into the job queue, with one job per unique task and model of EXECUTE_MODELS.
+
+   :param queue_file: The path to the SQLite queue file.
+   :return: None
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Enqueuing the tasks...{Style.RESET_ALL}") # Output the enqueuing message
+
+   queue = WorkQueue(queue_file) # Open or create the queue
+
+   if queue.get_task_count(): # If the queue already holds a run
+      print(f"{BackgroundColors.RED}The job queue {BackgroundColors.CYAN}{queue_file}{BackgroundColors.RED} already holds {BackgroundColors.CYAN}{queue.get_task_count()}{BackgroundColors.RED} tasks. Delete it to enqueue a new input.{Style.RESET_ALL}")
+      queue.close() # Close the queue
+      sys.exit(1) # Exit the program
+
+   providers = [(get_model_name(get_provider_class(class_name)), class_name) for class_name in EXECUTE_MODELS.values()] # The model name and class name of each model
+   rows, jobs = queue.enqueue(read_csv_file(), providers, get_task_key if DEDUPLICATE_TASKS else None) # Enqueue the tasks
+
+   print(f"{BackgroundColors.GREEN}Enqueued {BackgroundColors.CYAN}{rows}{BackgroundColors.GREEN} tasks as {BackgroundColors.CYAN}{jobs}{BackgroundColors.GREEN} jobs ({BackgroundColors.CYAN}{rows * len(providers) - jobs}{BackgroundColors.GREEN} saved by the deduplication) in {BackgroundColors.CYAN}{queue_file}{Style.RESET_ALL}") # Output the enqueued message
+   queue.close() # Close the queue
+
+async def arun_queue_job(model, prompt, provider_semaphore):
+   """
+   Asynchronously run a leased job on its model.
+
+   :param model: The AI model object.
+   :param prompt: The task description of the job.
+   :param provider_semaphore: The semaphore that limits the simultaneous requests to the model's provider.
+   :return: Tuple of the formatted output, the stream metrics (or None) and the raw output.
+   """
+
+   async with provider_semaphore: # Respect the per-provider concurrency limit
+      result, metrics = await acall_model(model, prompt) # Run the task on the model
+
+   return format_output(result), metrics, str(result) # Return the formatted output, the stream metrics and the raw output
+
+async def arun_queue_worker(queue, models_object_list, worker_id):
+   """
+   Lease and run the jobs of the models until the queue has no unfinished jobs of them.
+   Each provider has up to MAX_CONCURRENT_REQUESTS_PER_PROVIDER jobs in flight, and a failed job is released so it is retried.
+   No job of a provider is leased while its circuit breaker is open, and the jobs skipped by the breaker are released without consuming an attempt.
+   The leases of the running jobs are renewed QUEUE_HEARTBEATS_PER_LEASE times per lease, so a job slower than the lease is not run again by another worker.
+
+   :param queue: The job queue.
+   :param models_object_list: The list of AI model objects.
+   :param worker_id: The identifier of the worker.
+   :return: Dictionary with the number of completed, failed, lost and skipped jobs, a lost job being one whose lease expired and was taken by another worker.
+   """
+
+   models = {get_model_name(model): model for model in models_object_list} # Map each model name to its model
+   circuit_breakers = {model_name: get_circuit_breaker(model, model_name) for model_name, model in models.items()} if CIRCUIT_BREAKERS else {} # The circuit breaker of each provider
+   provider_semaphores = {model_name: asyncio.Semaphore(MAX_CONCURRENT_REQUESTS_PER_PROVIDER) for model_name in models} # One semaphore per provider
+   in_flight = {} # Maps each running job to its (job_key, provider)
+   statistics = {"completed": 0, "failed": 0, "lost": 0, "skipped": 0} # The job counters of the worker
+   heartbeat_seconds = queue.lease_seconds / QUEUE_HEARTBEATS_PER_LEASE # The number of seconds between the lease renewals
+   next_heartbeat = time.monotonic() + heartbeat_seconds # When the leases of the running jobs are renewed next
+
+   while True: # Loop until every job is finished
+      for model_name, model in models.items(): # Loop through each provider
+         if model_name in circuit_breakers and not circuit_breakers[model_name].allows_calls(): # If the provider's circuit breaker is open
+            continue # Leave its jobs to the cool-down
+         free_slots = MAX_CONCURRENT_REQUESTS_PER_PROVIDER - sum(provider == model_name for _, provider in in_flight.values()) # The free slots of the provider
+         for job_key, prompt in queue.lease(worker_id, model_name, free_slots): # Lease the next jobs of the provider
+            in_flight[asyncio.create_task(arun_queue_job(model, prompt, provider_semaphores[model_name]))] = (job_key, model_name) # Run the job
+
+      if not in_flight: # If no job could be leased
+         if not queue.count_unfinished(list(models)): # If every job is finished
+            break # Stop the worker
+         await asyncio.sleep(QUEUE_POLL_SECONDS) # Wait for the leases of the other workers to finish or expire
+         continue # Try to lease again
+
+      finished, _ = await asyncio.wait(in_flight, timeout=max(next_heartbeat - time.monotonic(), 0), return_when=asyncio.FIRST_COMPLETED) # Wait for a job to finish, or for the next lease renewal
+
+      if time.monotonic() >= next_heartbeat: # If the leases of the running jobs should be renewed
+         queue.renew(worker_id, [job for future, job in in_flight.items() if future not in finished]) # Extend them while the jobs run
+         next_heartbeat = time.monotonic() + heartbeat_seconds # Schedule the next renewal
+
+      for future in finished: # Loop through each finished job
+         job_key, model_name = in_flight.pop(future) # Get the job
+         try: # Try to get the job result
+            formatted_output, metrics, raw_output = future.result() # The job result
+         except CircuitOpenError: # If the provider's circuit breaker opened after the job was leased
+            queue.release(worker_id, job_key, model_name) # Give the job back for after the cool-down
+            statistics["skipped"] += 1 # Count the skipped job
+            continue # Get the next finished job
+         except Exception as e: # If the call failed
+            print(f"{BackgroundColors.RED}Error running a job on the {BackgroundColors.CYAN}{model_name}{BackgroundColors.RED} model: {str(e)}{Style.RESET_ALL}") # Output the error message
+            queue.fail(worker_id, job_key, model_name, str(e)) # Release the job so it is retried
+            statistics["failed"] += 1 # Count the failed job
+            continue # Get the next finished job
+
+         completed = queue.complete(worker_id, job_key, model_name, formatted_output, raw_output, metrics) # Store the job result
+         statistics["completed" if completed else "lost"] += 1 # Count the job
+
+   return statistics # Return the job counters
+
+def get_worker_id():
+   """
+   Get the identifier of the queue worker of this process.
+
+   :return: The identifier, made of the host name and the process id.
+   """
+
+   return f"{socket.gethostname()}-{os.getpid()}" # Return the worker identifier
+
+def run_queue_worker(queue_file=QUEUE_FILE):
+   """
+   Run a queue worker, which leases and runs the jobs of the models it can create until every job is finished.
+   Any number of workers can run at the same time, on the same or on other machines sharing the queue file.
+
+   :param queue_file: The path to the SQLite queue file.
+   :return: The identifier of the worker.
+   """
+
+   queue, providers = open_work_queue(queue_file) # Open the queue
+   models_object_list = get_models_object_list([class_name for _, class_name in providers]) # Create the models of the queue
+   worker_id = get_worker_id() # The identifier of the worker
+
+   print(f"{BackgroundColors.GREEN}Worker {BackgroundColors.CYAN}{worker_id}{BackgroundColors.GREEN} leasing the {BackgroundColors.CYAN}{', '.join(get_model_name(model) for model in models_object_list)}{BackgroundColors.GREEN} jobs of {BackgroundColors.CYAN}{queue_file}{Style.RESET_ALL}") # Output the worker message
+
+   statistics = asyncio.run(arun_closing_providers(arun_queue_worker(queue, models_object_list, worker_id))) # Run the jobs
+
+   print(f"{BackgroundColors.GREEN}Worker {BackgroundColors.CYAN}{worker_id}{BackgroundColors.GREEN} finished: {BackgroundColors.CYAN}{statistics['completed']}{BackgroundColors.GREEN} jobs completed, {BackgroundColors.CYAN}{statistics['failed']}{BackgroundColors.GREEN} failed attempts, {BackgroundColors.CYAN}{statistics['lost']}{BackgroundColors.GREEN} expired leases, {BackgroundColors.CYAN}{statistics['skipped']}{BackgroundColors.GREEN} jobs skipped by an open circuit breaker.{Style.RESET_ALL}") # Output the worker statistics
+   print_queue_status(queue) # Output the status of the queue
+   print_process_statistics(models_object_list) # Output the timing of the subprocess-based models
+   queue.close() # Close the queue
+
+   return worker_id # Return the worker identifier
+
+def materialize_queue(queue_file=QUEUE_FILE, columnar_format=COLUMNAR_OUTPUT_FORMAT, blobs=STORE_RESPONSES_AS_BLOBS):
+   """
+   Write the output CSV file from the completed jobs of the queue, in the input order, computing the similarity scores of each row.
+   The rows are written up to the first row with unfinished jobs, and the outputs of the failed jobs are left empty.
+
+   :param queue_file: The path to the SQLite queue file.
+   :param columnar_format: If set to "parquet" or "arrow", the rows are also written to a typed columnar file.
+   :param blobs: If True, the model outputs are written to the blob store and the output cells keep their references.
+   :return: The number of written rows.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Materializing the output from the job queue...{Style.RESET_ALL}") # Output the materializing message
+
+   queue, providers = open_work_queue(queue_file) # Open the queue
+   model_classes = [get_provider_class(class_name) for _, class_name in providers] # The model classes, which name the columns without creating the models
+   output_dict = initialize_dict(model_classes) # Initialize the output dictionary
+   output_file, writer, _ = open_output_csv(list(output_dict.keys())) # Open the output CSV file
+   columnar_writer = open_columnar_output(columnar_format, list(output_dict.keys()), [model_name for model_name, _ in providers], OUTPUT_CSV_FILE) # Open the columnar output file, if enabled
+   written_rows = 0 # The number of written rows
+   written_job_keys = set() # The job keys of the written rows, so the rows of identical tasks leave their stream metrics empty
+
+   with output_file, contextlib.closing(columnar_writer) if columnar_writer else contextlib.nullcontext(), use_blob_store(BLOB_STORE_FILE) if blobs else contextlib.nullcontext(): # Close the output files even if the materialization crashes
+      for _, task_description, expected_output, job_key, jobs in queue.read_rows(): # Loop through each input row
+         if any(job["status"] not in ("done", "failed") for job in jobs.values()): # If the row has unfinished jobs
+            break # Stop at the first unfinished row
+
+         task_results = {model_name: jobs[model_name]["output"] or "" for model_name, _ in providers} # Map each model name to its output
+         task_metrics = {model_name: jobs[model_name]["metrics"] for model_name, _ in providers} # Map each model name to its stream metrics
+         raw_results = {model_name: jobs[model_name]["raw_output"] for model_name, _ in providers} # Map each model name to its raw output
+
+         columnar_columns = store_task_results(model_classes, task_description, expected_output, task_results, task_metrics, raw_results, output_dict, job_key in written_job_keys) # Store its results and stream metrics
+         write_output_row(output_dict, output_file, writer, columnar_writer, columnar_columns) # Write them to the output files
+         written_job_keys.add(job_key) # Keep the job key of the row
+         written_rows += 1 # Count the written row
+
+   task_count = queue.get_task_count() # The number of input rows
+   print(f"{BackgroundColors.GREEN if written_rows == task_count else BackgroundColors.YELLOW}Materialized {BackgroundColors.CYAN}{written_rows}/{task_count}{BackgroundColors.GREEN if written_rows == task_count else BackgroundColors.YELLOW} rows into {BackgroundColors.CYAN}{OUTPUT_CSV_FILE}{Style.RESET_ALL}") # Output the materialized message
+   print_queue_status(queue) # Output the status of the queue
+   queue.close() # Close the queue
+   write_similarity_statistics(OUTPUT_CSV_FILE) # Write the similarity statistics of the materialized output
+   report_leaderboard(OUTPUT_CSV_FILE) # Write the leaderboard of the output
+
+   return written_rows # Return the number of written rows
+
+def recompute_aggregate_rows(header, rows, statistics=None):
+   """
+   Recompute the similarity statistics and the most similar model of output rows from their per-model similarity scores,
+   building the (rows x models) score matrix of the rows so the statistics of every row are computed at once.
+
+   :param header: The header of the output CSV file.
+   :param rows: List of the rows of the output CSV file, which are updated in place.
+   :param statistics: The (rows x 5) NumPy array of the statistics of the rows, already computed by compute_row_statistics over a larger score matrix, or None to compute them.
+   :return: The rows with their aggregate columns recomputed.
+   """
+
+   import numpy as np # Imported on demand, as numpy is slow to import
+   from leaderboard import compute_row_statistics # Imported on demand, as it imports numpy
+
+   positions = {column: position for position, column in enumerate(header)} # The position of each column
+   model_names = [column for column in header if f"{column} Similarity" in positions] # The model columns have a similarity column
+   similarity_columns = [positions[f"{model_name} Similarity"] for model_name in model_names] # The positions of the similarity columns
+   scores = [[float(row[column]) if row[column] not in ("", "N/A") else 0 for column in similarity_columns] for row in rows] # Parse the similarity scores as compute_similarity_for_models stores them
+   score_matrix = np.array(scores, dtype=float).reshape(len(rows), len(model_names)) # The score matrix of the rows
+   statistics = (compute_row_statistics(score_matrix) if statistics is None else statistics).tolist() # The similarity statistics of each row
+   winners = np.argmax(score_matrix, axis=1).tolist() # The most similar model of each row, the first one on ties as in update_most_similar_model
+   statistics_columns = [positions[column] for column in STATISTICS_COLUMNS] # The positions of the statistics columns, in the order of the statistics
+
+   for row, row_scores, row_statistics, winner in zip(rows, scores, statistics, winners): # Loop through each row
+      row_statistics[:2] = [round(min(row_scores), 2), round(max(row_scores), 2)] # Keep the type of the minimum and maximum scores, so a missing score stays the integer 0
+      for column, value in zip(statistics_columns, row_statistics): # Loop through each statistic
+         row[column] = value # Replace it
+      row[positions["Most Similar Model"]] = f"{model_names[winner]} ({row_scores[winner]}%)" # Replace the most similar model
+
+   return rows # Return the rows
+
+@timed_stage("write_similarity_statistics")
+def write_similarity_statistics(output_csv_file=OUTPUT_CSV_FILE):
+   """
+   Write the similarity statistics of every row of a finished output CSV file, whose rows were written with empty statistics.
+   The statistics are computed at once over the (tasks x models) score matrix of the output, then the rows are rewritten
+   through a temporary file in batches of RESCORE_BATCH_ROWS rows, so only the score matrix and one batch are kept in memory.
+
+   :param output_csv_file: The path to the output CSV file.
+   :return: None
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Writing the similarity statistics of {BackgroundColors.CYAN}{output_csv_file}{BackgroundColors.GREEN}...{Style.RESET_ALL}") # Output the writing message
+
+   import numpy as np # Imported on demand, as numpy is slow to import
+   from leaderboard import compute_row_statistics, read_score_matrix # Imported on demand, as it imports numpy
+
+   _, score_matrix, _ = read_score_matrix(output_csv_file) # Read the similarity columns of every row
+   statistics = compute_row_statistics(np.nan_to_num(score_matrix)) # Compute the statistics of every row at once, a missing score counting as 0 as in the Most Similar Model column
+   temporary_file = f"{output_csv_file}.tmp" # The output with its statistics, which replaces the output once it is complete
+
+   with open(output_csv_file, mode="r", newline="", encoding="utf-8") as input_file, open(temporary_file, mode="w", newline="", encoding="utf-8") as output_file: # Open the output and the temporary file
+      reader, writer = csv.reader(input_file), csv.writer(output_file) # The reader of the output and the writer of the temporary file
+      header = next(reader) # The header of the output
+      writer.writerow(header) # Write the header row
+
+      for start in range(0, len(statistics), RESCORE_BATCH_ROWS): # Loop through each batch of rows
+         rows = list(itertools.islice(reader, RESCORE_BATCH_ROWS)) # Read the rows of the batch
+         writer.writerows(recompute_aggregate_rows(header, rows, statistics[start:start + len(rows)])) # Write them with their statistics
+
+   os.replace(temporary_file, output_csv_file) # Replace the output with the one with the statistics
+
+def copy_row_blobs(row, source_store, target_store, source_file):
+   """
+   Copy the outputs referenced by the cells of a shard output row to the merged blob store, whose references replace the shard ones.
+
+   :param row: The row of the shard output CSV file.
+   :param source_store: The blob store of the shard, or None if the shard did not write one.
+   :param target_store: The blob store of the merged output, or None if no shard wrote one.
+   :param source_file: The path to the segment file of the shard's blob store.
+   :return: The row with the references of the merged blob store.
+   """
+
+   if source_store is None: # If the shard did not write a blob store
+      if any(parse_blob_reference(value) for value in row): # If its row still references one
+         print(f"{BackgroundColors.RED}The blob store {BackgroundColors.CYAN}{source_file}{BackgroundColors.RED} was not found. Copy it to {BackgroundColors.CYAN}{OUTPUT_DIRECTORY}{BackgroundColors.RED} with the shard output.{Style.RESET_ALL}")
+         sys.exit(1) # Exit the program
+      return row # The outputs are inline
+
+   return [target_store.put(source_store.read(value)) if parse_blob_reference(value) else value for value in row] # Return the row with the merged references
+
+def merge_shard_outputs(shard_count, shard_strategy=SHARD_STRATEGY):
+   """
+   Merge the output CSV files of the shards into the output CSV file, in the original row order of the input CSV file.
+   The shard of each input row is computed again, so the next row of that shard's output is the row's result, and the aggregate columns are recomputed.
+   The rows are written to a temporary file, which only replaces the output CSV file once every input row was merged.
+
+   :param shard_count: The number of shards.
+   :param shard_strategy: The strategy the shards were run with, "index" or "hash".
+   :return: The number of merged rows.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Merging the outputs of the {BackgroundColors.CYAN}{shard_count}{BackgroundColors.GREEN} shards...{Style.RESET_ALL}") # Output the merging message
+
+   shard_files = [get_shard_file(OUTPUT_CSV_FILE, (shard_index, shard_count)) for shard_index in range(1, shard_count + 1)] # The output file of each shard
+   missing_files = [shard_file for shard_file in shard_files if not os.path.exists(shard_file)] # The shards that were not run
+
+   if missing_files: # If a shard output is missing
+      print(f"{BackgroundColors.RED}The shard outputs {BackgroundColors.CYAN}{', '.join(missing_files)}{BackgroundColors.RED} were not found. Make sure every shard was run and its output copied to {BackgroundColors.CYAN}{OUTPUT_DIRECTORY}{Style.RESET_ALL}")
+      sys.exit(1) # Exit the program
+
+   merged_rows = 0 # The number of merged rows
+   temporary_file = f"{OUTPUT_CSV_FILE}.tmp" # The merged output, which replaces the output once it is complete
+   shard_blob_files = [get_shard_file(BLOB_STORE_FILE, (shard_index, shard_count)) for shard_index in range(1, shard_count + 1)] # The blob store of each shard
+
+   with contextlib.ExitStack() as stack: # Close every file when the merge finishes
+      readers = [csv.reader(stack.enter_context(open(shard_file, mode="r", newline="", encoding="utf-8"))) for shard_file in shard_files] # The reader of each shard output
+      shard_blob_stores = [stack.enter_context(contextlib.closing(BlobStore(blob_file, read_only=True))) if os.path.exists(blob_file) else None for blob_file in shard_blob_files] # The blob store of each shard that wrote one
+      merged_blob_store = stack.enter_context(contextlib.closing(BlobStore(BLOB_STORE_FILE))) if any(shard_blob_stores) else None # The blob store of the merged output
+      headers = [next(reader, None) for reader in readers] # The header of each shard output
+
+      if any(header != headers[0] for header in headers) or headers[0] is None: # If the shards were run with different models
+         print(f"{BackgroundColors.RED}The shard outputs have different headers, so they were not run with the same models and cannot be merged.{Style.RESET_ALL}")
+         sys.exit(1) # Exit the program
+
+      header = headers[0] # The header of the merged output
+      task_column = header.index("Task") # The position of the task column
+      output_file = stack.enter_context(open(temporary_file, mode="w", newline="", encoding="utf-8")) # Open the merged output file
+      writer = csv.writer(output_file) # Create the CSV writer
+      writer.writerow(header) # Write the header row
+      pending_rows = [] # The rows of the current batch
+
+      for row_index, (task_description, _) in enumerate(read_tasks(INPUT_CSV_FILE)): # Loop through each input row
+         shard_index = get_task_shard(row_index, task_description, shard_count, shard_strategy) # The shard that ran the task
+         row = next(readers[shard_index - 1], None) # The next row of that shard
+
+         if row is None or row[task_column] != task_description: # If the shard did not finish or was run on another input or strategy
+            print(f"{BackgroundColors.RED}The row {BackgroundColors.CYAN}{row_index + 1}{BackgroundColors.RED} of {BackgroundColors.CYAN}{INPUT_CSV_FILE}{BackgroundColors.RED} is not the next row of {BackgroundColors.CYAN}{shard_files[shard_index - 1]}{BackgroundColors.RED}. Resume that shard with --resume, or verify the input file and the --shard-by strategy.{Style.RESET_ALL}")
+            sys.exit(1) # Exit the program before the output is replaced
+
+         pending_rows.append(copy_row_blobs(row, shard_blob_stores[shard_index - 1], merged_blob_store, shard_blob_files[shard_index - 1])) # Copy the outputs of the row to the merged blob store and add it to the batch
+         merged_rows += 1 # Count the merged row
+
+         if len(pending_rows) >= MERGE_BATCH_ROWS: # If the batch is full
+            writer.writerows(recompute_aggregate_rows(header, pending_rows)) # Write the rows with their aggregate columns recomputed at once
+            pending_rows = [] # Start a new batch
+
+      writer.writerows(recompute_aggregate_rows(header, pending_rows)) # Write the last batch
+
+      extra_shards = [shard_file for shard_file, reader in zip(shard_files, readers) if next(reader, None) is not None] # The shards with rows that are not in the input
+      if extra_shards: # If a shard has more rows than the input
+         print(f"{BackgroundColors.YELLOW}The shard outputs {BackgroundColors.CYAN}{', '.join(extra_shards)}{BackgroundColors.YELLOW} have rows that are not in {BackgroundColors.CYAN}{INPUT_CSV_FILE}{BackgroundColors.YELLOW}, which were not merged.{Style.RESET_ALL}") # Output the warning message
+
+   os.replace(temporary_file, OUTPUT_CSV_FILE) # Replace the output with the merged one
+   print(f"{BackgroundColors.GREEN}Merged the {BackgroundColors.CYAN}{merged_rows}{BackgroundColors.GREEN} rows of the {BackgroundColors.CYAN}{shard_count}{BackgroundColors.GREEN} shards into {BackgroundColors.CYAN}{OUTPUT_CSV_FILE}{Style.RESET_ALL}") # Output the merged message
+   report_leaderboard(OUTPUT_CSV_FILE) # Write the leaderboard of the merged output
+
+   return merged_rows # Return the number of merged rows
+
+def get_rescore_state_file(output_csv_file):
+   """
+   Get the path of the file with the scoring hash of each row of an output CSV file, written by the --rescore mode.
+
+   :param output_csv_file: The path to the output CSV file.
+   :return: The path to the rescore state file, such as "output.rescore_hashes.txt".
+   """
+
+   return f"{os.path.splitext(output_csv_file)[0]}.rescore_hashes.txt" # Return the rescore state file path
+
+def read_rescore_state(state_file):
+   """
+   Read the scoring hash of each row from the last rescore of an output CSV file.
+
+   :param state_file: The path to the rescore state file.
+   :return: List of the row hashes, in the row order, or an empty list if the output was never rescored.
+   """
+
+   if not os.path.exists(state_file): # If the output was never rescored
+      return [] # Every row is rescored
+
+   with open(state_file, mode="r", encoding="utf-8") as file: # Open the rescore state file
+      return file.read().split() # Return the row hashes
+
+def get_scoring_fingerprint():
+   """
+   Get the fingerprint of the similarity method, so changing it rescores every row.
+   In "corpus" mode, it includes the hash of the reference corpus the IDF is fitted on.
+
+   :return: The fingerprint string.
+   """
+
+   if SIMILARITY_IDF_MODE != "corpus": # If each pair has its own IDF
+      return SIMILARITY_IDF_MODE # The scores only depend on the mode
+
+   reference_corpus = read_reference_corpus(REFERENCE_CORPUS_FILE) if REFERENCE_CORPUS_FILE else [expected_output for _, expected_output in read_tasks(INPUT_CSV_FILE)] # The reference corpus
+
+   return f"corpus:{hashlib.sha256(chr(0).join(reference_corpus).encode('utf-8')).hexdigest()}" # Return the mode with the hash of its corpus
+
+def get_row_score_hash(fingerprint, expected_output, model_outputs):
+   """
+   Get the scoring hash of a row: the hash of everything its similarity scores depend on.
+
+   :param fingerprint: The fingerprint of the similarity method.
+   :param expected_output: The expected output of the row.
+   :param model_outputs: List of the output cells of the row, which may be blob references (which include the hash of the output).
+   :return: The SHA-256 hex digest.
+   """
+
+   return hashlib.sha256(chr(0).join([fingerprint, expected_output, *model_outputs]).encode("utf-8")).hexdigest() # Return the hash of the scoring inputs
+
+def rescore_rows(header, model_names, rows, blob_store):
+   """
+   Recompute the similarity scores of the changed rows in one batch, and their similarity statistics and most similar model.
+
+   :param header: The header of the output CSV file.
+   :param model_names: The model names of the output columns.
+   :param rows: List of (row, expected_output) tuples, where expected_output is None for the unchanged rows, which are returned as they are.
+   :param blob_store: The blob store of the output, or None if the outputs are inline.
+   :return: List of the rows, with the changed ones rescored.
+   """
+
+   positions = {column: position for position, column in enumerate(header)} # The position of each column
+   changed_rows = [(row, expected_output) for row, expected_output in rows if expected_output is not None] # The rows to rescore
+   model_outputs = [None if row[positions[model_name]] == SKIPPED_OUTPUT else blob_store.resolve(row[positions[model_name]]) if blob_store else row[positions[model_name]] for row, _ in changed_rows for model_name in model_names] # The output of each model of each row, without the skipped cells' marker
+   expected_outputs = [expected_output for _, expected_output in changed_rows for _ in model_names] # The expected output of each pair
+   similarities = get_similarity_engine().compute_similarities(model_outputs, expected_outputs) # Compute every similarity in one batch
+   similarities = iter([similarity_score if model_output is not None else None for model_output, similarity_score in zip(model_outputs, similarities)]) # The skipped cells have no similarity
+
+   for row, expected_output in changed_rows: # Loop through each changed row
+      row[positions["Expected Output"]] = expected_output # Update its expected output
+      for model_name in model_names: # Loop through each model
+         similarity_score = next(similarities) # The similarity of the model's output
+         row[positions[f"{model_name} Similarity"]] = similarity_score if similarity_score is not None else "N/A" # Store it as compute_similarity_for_models does
+
+   recompute_aggregate_rows(header, [row for row, _ in changed_rows]) # Recompute the similarity statistics and the most similar model of the changed rows at once
+
+   return [row for row, _ in rows] # Return the rows
+
+def rescore_output(shard=None, shard_strategy=SHARD_STRATEGY):
+   """
+   Recompute the similarity scores, similarity statistics and most similar model of an existing output CSV file from its stored outputs and the
+   expected outputs of the input CSV file, without calling any model. Only the rows whose expected output, outputs or similarity method changed
+   since the last rescore are scored again, in batches of RESCORE_BATCH_ROWS rows.
+
+   :param shard: Tuple of the shard number and the number of shards, to rescore the output of that shard, or None to rescore the output CSV file.
+   :param shard_strategy: The strategy the shard was run with, "index" or "hash".
+   :return: The number of rescored rows.
+   """
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Rescoring the output...{Style.RESET_ALL}") # Output the rescoring message
+
+   start_time = time.perf_counter() # Start the rescore timer
+   output_csv_file = get_shard_file(OUTPUT_CSV_FILE, shard) # The output CSV file of the run or of its shard
+   blob_file = get_shard_file(BLOB_STORE_FILE, shard) # The blob store of the output
+   state_file = get_rescore_state_file(output_csv_file) # The row hashes of the last rescore
+   temporary_file = f"{output_csv_file}.tmp" # The rescored output, which replaces the output once it is complete
+
+   if not os.path.exists(output_csv_file): # If there is no output to rescore
+      print(f"{BackgroundColors.RED}The output file {BackgroundColors.CYAN}{output_csv_file}{BackgroundColors.RED} was not found. Run the tasks before rescoring them.{Style.RESET_ALL}")
+      sys.exit(1) # Exit the program
+
+   previous_hashes = read_rescore_state(state_file) # The row hashes of the last rescore
+   fingerprint = get_scoring_fingerprint() # The fingerprint of the similarity method
+   tasks = read_tasks(INPUT_CSV_FILE) if shard is None else select_shard_tasks(read_tasks(INPUT_CSV_FILE), shard, shard_strategy) # The tasks of the output, with their updated expected outputs
+   row_hashes = [] # The scoring hash of each row
+   rescored_rows = 0 # The number of rescored rows
+
+   with contextlib.ExitStack() as stack: # Close every file when the rescore finishes
+      reader = csv.reader(stack.enter_context(open(output_csv_file, mode="r", newline="", encoding="utf-8"))) # The reader of the output
+      header = next(reader) # The header of the output
+      model_names = [column for column in header if f"{column} Similarity" in header] # The model columns have a similarity column
+      task_column = header.index("Task") # The position of the task column
+      model_columns = [header.index(model_name) for model_name in model_names] # The positions of the model output columns
+      blob_store = stack.enter_context(contextlib.closing(BlobStore(blob_file, read_only=True))) if os.path.exists(blob_file) else None # The blob store of the output, if it has one
+      writer = csv.writer(stack.enter_context(open(temporary_file, mode="w", newline="", encoding="utf-8"))) # The writer of the rescored output
+      writer.writerow(header) # Write the header row
+      pending_rows = [] # The rows of the current batch, with the expected output of the rows to rescore
+
+      for row_index, (row, task) in enumerate(itertools.zip_longest(reader, tasks)): # Loop through each output row and its input row
+         if row is None or task is None: # If the output and the input do not have the same number of rows
+            print(f"{BackgroundColors.RED}The output {BackgroundColors.CYAN}{output_csv_file}{BackgroundColors.RED} has {'fewer' if row is None else 'more'} rows than {BackgroundColors.CYAN}{INPUT_CSV_FILE}{BackgroundColors.RED} (the row {BackgroundColors.CYAN}{row_index + 1}{BackgroundColors.RED} is missing from the {'output' if row is None else 'input'}). Finish the run with --resume, or verify the input file, before rescoring it.{Style.RESET_ALL}")
+            sys.exit(1) # Exit the program before the output is replaced
+
+         task_description, expected_output = task # The input row of the output row
+         if row[task_column] != task_description: # If the output was not produced from this input
+            print(f"{BackgroundColors.RED}The row {BackgroundColors.CYAN}{row_index + 1}{BackgroundColors.RED} of {BackgroundColors.CYAN}{output_csv_file}{BackgroundColors.RED} is not the task of the same row of {BackgroundColors.CYAN}{INPUT_CSV_FILE}{BackgroundColors.RED}. Only the expected outputs of the input can change.{Style.RESET_ALL}")
+            sys.exit(1) # Exit the program
+
+         row_hash = get_row_score_hash(fingerprint, expected_output, [row[model_column] for model_column in model_columns]) # The scoring hash of the row
+         changed = row_index >= len(previous_hashes) or previous_hashes[row_index] != row_hash # If the row must be rescored
+         pending_rows.append((row, expected_output if changed else None)) # Add it to the batch
+         row_hashes.append(row_hash) # Keep its hash
+         rescored_rows += changed # Count the rescored row
+
+         if len(pending_rows) >= RESCORE_BATCH_ROWS: # If the batch is full
+            writer.writerows(rescore_rows(header, model_names, pending_rows, blob_store)) # Rescore and write it
+            pending_rows = [] # Start a new batch
+
+      writer.writerows(rescore_rows(header, model_names, pending_rows, blob_store)) # Rescore and write the last batch
+
+   os.replace(temporary_file, output_csv_file) # Replace the output with the rescored one
+   write_file_atomically(state_file, "\n".join(row_hashes) + "\n") # Keep the row hashes for the next rescore
+
+   print(f"{BackgroundColors.GREEN}Rescored {BackgroundColors.CYAN}{rescored_rows}/{len(row_hashes)}{BackgroundColors.GREEN} rows of {BackgroundColors.CYAN}{output_csv_file}{BackgroundColors.GREEN} in {BackgroundColors.CYAN}{time.perf_counter() - start_time:.2f}{BackgroundColors.GREEN} seconds, the other rows did not change.{Style.RESET_ALL}") # Output the rescored message
+   report_leaderboard(output_csv_file, shard) # Write the leaderboard of the rescored output
+
+   return rescored_rows # Return the number of rescored rows
+
+def parse_arguments():
+   """
+   Parse the command line arguments.
+
+   :return: The parsed arguments.
+   """
+
+   parser = argparse.ArgumentParser(description="AIs API Response Collector") # Create the argument parser
+   parser.add_argument("--resume", action="store_true", help="Skip the tasks already written to the output CSV file and append the remaining ones") # The resume flag
+   parser.add_argument("--batch", action="store_true", help="Send the tasks of ChatGPT and Mistral through their discounted batch endpoints") # The batch mode flag
+   parser.add_argument("--stream", action="store_true", default=STREAM_RESPONSES, help="Stream the responses of ChatGPT, Gemini, Llama and Mistral and write the time to first token, latency and output tokens per second of each call next to the similarity columns") # The streaming flag
+   parser.add_argument("--pack", action="store_true", default=PACK_TASKS, help="Combine the short tasks into JSON-structured requests to ChatGPT, Gemini, Llama and Mistral, falling back to single-task calls when a response cannot be split") # The prompt packing flag
+   parser.add_argument("--shard", type=parse_shard, help="Only run the tasks of the shard i of N (such as 2/4) and write them to the shard output files") # The shard to run
+   parser.add_argument("--shard-by", choices=["index", "hash"], default=SHARD_STRATEGY, help="Partition the tasks by row index or by the hash of their normalized description") # The shard strategy
+   parser.add_argument("--rescore", action="store_true", help="Recompute the similarity scores of the output CSV file (or of the --shard output) from its stored responses and the expected outputs of the input CSV file, without calling any model") # The rescore flag
+   parser.add_argument("--merge", type=parse_shard_count, metavar="N", help="Merge the output files of the N shards into the output CSV file, in the input order") # The number of shards to merge
+   parser.add_argument("--queue", choices=["enqueue", "work", "materialize"], help="Job queue mode: load the input tasks into the queue, run a worker that leases its jobs, or write the output CSV file from the completed jobs") # The job queue mode
+   parser.add_argument("--queue-file", default=QUEUE_FILE, help="The path to the SQLite job queue, which every worker must share") # The job queue file
+   parser.add_argument("--blobs", action="store_true", default=STORE_RESPONSES_AS_BLOBS, help="Write each model output once to the append-only Outputs/responses.blobs file and keep only its reference (hash, offset and length) in the output cells") # The blob store flag
+   parser.add_argument("--columnar", choices=["parquet", "arrow"], default=COLUMNAR_OUTPUT_FORMAT, help="Also write the rows to a typed Parquet file or Arrow IPC stream, with the raw responses and token counts (requires pyarrow)") # The columnar output format
+
+   return parser.parse_args() # Return the parsed arguments
 
 def main():
    """
@@ -363,13 +1737,38 @@ def main():
    :return: None
    """
 
+   global STREAM_RESPONSES # The streaming mode is read by every model call and names the stream metrics columns
+
+   args = parse_arguments() # Parse the command line arguments
+   STREAM_RESPONSES = args.stream # Stream the responses only when it was asked for
+
    print(f"{BackgroundColors.CLEAR_TERMINAL}{BackgroundColors.BOLD}{BackgroundColors.GREEN}Welcome to the {BackgroundColors.CYAN}AIs API Response Collector{BackgroundColors.GREEN}!{Style.RESET_ALL}\n") # Output the welcome message
 
    create_directories() # Create the input and output directories
 
-   tasks_df = read_csv_file() # Read the tasks from the input CSV file
-   output_dict = run_tasks(tasks_df) # Run the tasks
-   write_output_to_csv(output_dict) # Write the output to the output CSV file
+   if args.merge is not None: # If the shard outputs should be merged
+      merge_shard_outputs(args.merge, args.shard_by) # Merge them into the output CSV file
+   elif args.rescore: # If the similarity scores of the output should be recomputed
+      rescore_output(args.shard, args.shard_by) # Rescore the changed rows
+   elif args.queue == "enqueue": # If the tasks should be loaded into the job queue
+      enqueue_tasks(args.queue_file) # Enqueue them
+   elif args.queue == "materialize": # If the output should be written from the job queue
+      materialize_queue(args.queue_file, args.columnar, args.blobs) # Write the output files
+   else: # If the tasks should be run
+      metrics_suffix = f"worker-{get_worker_id()}" if args.queue == "work" else get_shard_suffix(args.shard) # The metrics files of a worker or shard are named after it
+      try: # Run the tasks, cleaning up even if the run fails or is interrupted
+         if args.queue == "work": # If the jobs of the queue should be run
+            run_queue_worker(args.queue_file) # Run the worker
+         else: # If the tasks of the input file should be run
+            tasks = read_csv_file() # Stream the tasks from the input CSV file
+            run_tasks(tasks, resume=args.resume, batch=args.batch, columnar_format=args.columnar, shard=args.shard, shard_strategy=args.shard_by, pack=args.pack, blobs=args.blobs) # Run the tasks, writing each finished task to the output files
+      finally: # Even if the run failed or was interrupted
+         RUN_METRICS.stop_periodic_export() # Stop the periodic metrics export
+         close_response_cache() # Close the response cache
+         close_provider_resources() # Close the pooled HTTP connections of the providers
+         metrics_json_file, metrics_prometheus_file = add_file_suffix(METRICS_JSON_FILE, metrics_suffix), add_file_suffix(METRICS_PROMETHEUS_FILE, metrics_suffix) # The metrics files of the run, shard or worker
+         RUN_METRICS.export(metrics_json_file, metrics_prometheus_file) # Write the metrics of the run
+         print(f"{BackgroundColors.GREEN}The metrics of the run were written to {BackgroundColors.CYAN}{metrics_json_file}{BackgroundColors.GREEN} and {BackgroundColors.CYAN}{metrics_prometheus_file}{Style.RESET_ALL}") # Output the metrics files
 
    print(f"{BackgroundColors.BOLD}{BackgroundColors.GREEN}Program finished.{Style.RESET_ALL}") # Output the end of the program message
    atexit.register(play_sound) # Register the function to play a sound when the program finishes
@@ -0,0 +1,451 @@
+import bisect # For finding the histogram bucket of each duration
+import functools # For wrapping the timed functions
+import itertools # For the cumulative bucket counts
+import json # For writing the JSON metrics file
+import math # For the nearest rank of the quantiles
+import os # For replacing the metrics files atomically
+import threading # For the thread-safe counters and the periodic export
+import time # For measuring the elapsed time
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Metrics Constants:
+METRICS_JSON_FILE = f"{OUTPUT_DIRECTORY}metrics.json" # The path to the JSON metrics file
+METRICS_PROMETHEUS_FILE = f"{OUTPUT_DIRECTORY}metrics.prom" # The path to the Prometheus text format metrics file
+METRICS_EXPORT_INTERVAL_SECONDS = None # The number of seconds between each export during the run (None only exports the metrics at the end of the run)
+METRICS_QUANTILES = (0.5, 0.95, 0.99) # The latency quantiles of the summaries
+METRICS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0) # The upper bounds in seconds of the duration histogram buckets, followed by +Inf
+METRICS_PREFIX = "collector" # The prefix of the Prometheus metric names
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2} # The Prometheus gauge value of each circuit breaker state
+
+class DurationHistogram:
+   """
+   Histogram of durations with the fixed METRICS_BUCKETS buckets, so its memory does not grow with the number of durations.
+   The quantiles are estimated by linear interpolation within the bucket of their rank.
+
+   """
+
+   def __init__(self): # Constructor
+      self.count = 0 # The number of durations
+      self.total = 0.0 # The sum of the durations
+      self.maximum = 0.0 # The longest duration
+      self.bucket_counts = [0] * (len(METRICS_BUCKETS) + 1) # The number of durations of each bucket, the last one being +Inf
+
+   def observe(self, seconds):
+      """
+      Add a duration to the histogram.
+
+      :param seconds: The duration in seconds.
+      :return: None
+      """
+
+      self.count += 1 # Count the duration
+      self.total += seconds # Add it to the sum
+      self.maximum = max(self.maximum, seconds) # Keep the longest duration
+      self.bucket_counts[bisect.bisect_left(METRICS_BUCKETS, seconds)] += 1 # Count it in the first bucket whose upper bound is not lower than it
+
+   def merge(self, other):
+      """
+      Add the durations of another histogram to this one.
+
+      :param other: The other histogram.
+      :return: This histogram.
+      """
+
+      self.count += other.count # Add the counts
+      self.total += other.total # Add the sums
+      self.maximum = max(self.maximum, other.maximum) # Keep the longest duration
+      self.bucket_counts = [count + other_count for count, other_count in zip(self.bucket_counts, other.bucket_counts)] # Add the bucket counts
+
+      return self # Return the merged histogram
+
+   def quantile(self, quantile):
+      """
+      Estimate a quantile of the durations.
+
+      :param quantile: The quantile between 0 and 1.
+      :return: The estimated quantile in seconds, or 0.0 if there are no durations.
+      """
+
+      rank = quantile * self.count # The rank of the quantile
+      cumulative_count = 0 # The number of durations of the previous buckets
+
+      for index, bucket_count in enumerate(self.bucket_counts): # Loop through each bucket
+         if bucket_count and cumulative_count + bucket_count >= rank: # If the rank falls in this bucket
+            lower_bound = METRICS_BUCKETS[index - 1] if index else 0.0 # The lower bound of the bucket
+            upper_bound = METRICS_BUCKETS[index] if index < len(METRICS_BUCKETS) else self.maximum # The upper bound of the bucket, or the longest duration for +Inf
+            return min(lower_bound + (upper_bound - lower_bound) * (rank - cumulative_count) / bucket_count, self.maximum) # Return the interpolated quantile
+         cumulative_count += bucket_count # Go to the next bucket
+
+      return 0.0 # There are no durations
+
+   def summarize(self):
+      """
+      Summarize the histogram.
+
+      :return: Dictionary with the count, total, maximum, quantiles (such as "p95") and cumulative bucket counts of the durations.
+      """
+
+      summary = {"count": self.count, "total_seconds": round(self.total, 6), "max_seconds": round(self.maximum, 6)} # The count, total and maximum
+
+      for quantile in METRICS_QUANTILES: # Loop through each quantile
+         summary[f"p{quantile * 100:g}"] = round(self.quantile(quantile), 6) # Add the quantile
+
+      summary["buckets"] = dict(zip([f"{bound:g}" for bound in METRICS_BUCKETS] + ["+Inf"], itertools.accumulate(self.bucket_counts))) # Add the cumulative count of each bucket, keyed by its upper bound
+
+      return summary # Return the summary
+
+class RunMetrics:
+   """
+   Thread-safe collector of the performance metrics of a run: the wall time of each pipeline stage and, for each provider,
+   the calls, errors, timeouts, skipped calls, circuit breaker state changes, cache hits, deduplicated calls, hedged calls, packed requests, latencies, times to first token and token usage.
+
+   """
+
+   def __init__(self): # Constructor
+      self.lock = threading.Lock() # Lock for updating the metrics
+      self.start_time = time.time() # The time the run started
+      self.stage_durations = {} # Maps each stage to the histogram of its durations
+      self.providers = {} # Maps each provider to its metrics
+      self.export_stop_event = None # Stops the periodic export thread
+
+   def get_provider(self, provider):
+      """
+      Get the metrics of a provider, creating them on the first call. Must be called with the lock held.
+
+      :param provider: The provider name.
+      :return: Dictionary of the provider metrics.
+      """
+
+      if provider not in self.providers: # If the provider has no metrics yet
+         self.providers[provider] = {"calls": 0, "errors": 0, "timeouts": 0, "skipped_calls": 0, "breaker_state": "closed", "breaker_transitions": [], "cache_hits": 0, "deduplicated_calls": 0, "hedged_calls": 0, "hedge_wins": 0, "packed_requests": 0, "packed_tasks": 0, "pack_fallbacks": 0, "latency": DurationHistogram(), "ttft": DurationHistogram(), "input_tokens": 0, "output_tokens": 0} # Create its metrics
+
+      return self.providers[provider] # Return the provider metrics
+
+   def record_stage(self, stage, seconds):
+      """
+      Record the duration of a pipeline stage.
+
+      :param stage: The stage name, such as "format_output".
+      :param seconds: The duration in seconds.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         self.stage_durations.setdefault(stage, DurationHistogram()).observe(seconds) # Add the duration
+
+   def record_call(self, provider, seconds, error=False, stream_metrics=None, timeout=False):
+      """
+      Record a call to a provider.
+
+      :param provider: The provider name.
+      :param seconds: The latency of the call in seconds, including the rate limiter waits and retries.
+      :param error: If the call failed.
+      :param stream_metrics: The stream metrics of the call, with its time to first token and token usage, or None.
+      :param timeout: If the call failed because it exceeded the deadline of its provider.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         provider_metrics = self.get_provider(provider) # Get the provider metrics
+         provider_metrics["calls"] += 1 # Count the call
+         provider_metrics["errors"] += int(error) # Count the error
+         provider_metrics["timeouts"] += int(timeout) # Count the timeout
+         provider_metrics["latency"].observe(seconds) # Add the latency
+
+         if stream_metrics: # If the call was streamed
+            provider_metrics["ttft"].observe(stream_metrics["ttft"]) # Add the time to first token
+            provider_metrics["input_tokens"] += stream_metrics.get("input_tokens") or 0 # Add the input tokens
+            provider_metrics["output_tokens"] += stream_metrics.get("output_tokens") or 0 # Add the output tokens
+
+   def record_cache_hit(self, provider):
+      """
+      Record a response reused from the batch results or the response cache, which did not call the provider.
+
+      :param provider: The provider name.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         self.get_provider(provider)["cache_hits"] += 1 # Count the cache hit
+
+   def record_deduplicated_call(self, provider):
+      """
+      Record a call that was not made because the response of an identical task of the run was reused.
+
+      :param provider: The provider name.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         self.get_provider(provider)["deduplicated_calls"] += 1 # Count the saved call
+
+   def record_skipped_call(self, provider):
+      """
+      Record a call that was skipped because the circuit breaker of its provider was open.
+
+      :param provider: The provider name.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         self.get_provider(provider)["skipped_calls"] += 1 # Count the skipped call
+
+   def record_breaker_transition(self, provider, from_state, to_state):
+      """
+      Record a state change of the circuit breaker of a provider.
+
+      :param provider: The provider name.
+      :param from_state: The previous state: "closed", "open" or "half_open".
+      :param to_state: The new state.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         provider_metrics = self.get_provider(provider) # Get the provider metrics
+         provider_metrics["breaker_state"] = to_state # Keep the current state
+         provider_metrics["breaker_transitions"].append({"timestamp": time.time(), "from": from_state, "to": to_state}) # Add the state change
+
+   def record_hedge(self, provider, won):
+      """
+      Record a call that was hedged with a duplicate request.
+
+      :param provider: The provider name.
+      :param won: If the duplicate request returned first.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         provider_metrics = self.get_provider(provider) # Get the provider metrics
+         provider_metrics["hedged_calls"] += 1 # Count the hedged call
+         provider_metrics["hedge_wins"] += int(won) # Count the duplicate request that won
+
+   def record_pack(self, provider, packed_tasks, fallback_tasks):
+      """
+      Record a packed request, which combined many tasks into one call.
+
+      :param provider: The provider name.
+      :param packed_tasks: The number of tasks answered by the packed request.
+      :param fallback_tasks: The number of tasks of the pack without a valid answer, which fall back to single-task calls.
+      :return: None
+      """
+
+      with self.lock: # Lock the metrics
+         provider_metrics = self.get_provider(provider) # Get the provider metrics
+         provider_metrics["packed_requests"] += 1 # Count the packed request
+         provider_metrics["packed_tasks"] += packed_tasks # Count the answered tasks
+         provider_metrics["pack_fallbacks"] += fallback_tasks # Count the tasks that fall back to single-task calls
+
+   def time_iterable(self, stage, iterable):
+      """
+      Time how long each item of an iterable takes to be produced, such as the rows streamed from the input CSV file.
+
+      :param stage: The stage name.
+      :param iterable: The iterable to time.
+      :return: Generator of the items of the iterable.
+      """
+
+      iterator = iter(iterable) # Get the iterator
+      while True: # Loop until the iterable is exhausted
+         start_time = time.perf_counter() # Start the timer
+         try: # Try to get the next item
+            item = next(iterator) # Get the next item
+         except StopIteration: # If the iterable is exhausted
+            return # Stop the generator
+         self.record_stage(stage, time.perf_counter() - start_time) # Record the duration
+         yield item # Yield the item
+
+   def snapshot(self):
+      """
+      Summarize the metrics collected so far.
+
+      :return: Dictionary of the metrics, with the count, total and quantiles of each stage and provider latency.
+      """
+
+      with self.lock: # Lock the metrics
+         return { # The metrics summary
+            "timestamp": time.time(), # The time of the snapshot
+            "run_seconds": round(time.time() - self.start_time, 3), # The elapsed time of the run
+            "stages": {stage: histogram.summarize() for stage, histogram in self.stage_durations.items()}, # The summary of each stage
+            "providers": { # The summary of each provider
+               provider: { # The provider summary
+                  "calls": provider_metrics["calls"], # The number of calls
+                  "errors": provider_metrics["errors"], # The number of failed calls
+                  "timeouts": provider_metrics["timeouts"], # The number of calls that exceeded the provider deadline
+                  "skipped_calls": provider_metrics["skipped_calls"], # The number of calls skipped while the circuit breaker was open
+                  "breaker_state": provider_metrics["breaker_state"], # The current state of the circuit breaker
+                  "breaker_opens": sum(transition["to"] == "open" for transition in provider_metrics["breaker_transitions"]), # The number of times the circuit breaker opened
+                  "breaker_transitions": list(provider_metrics["breaker_transitions"]), # The state changes of the circuit breaker
+                  "cache_hits": provider_metrics["cache_hits"], # The number of reused responses
+                  "deduplicated_calls": provider_metrics["deduplicated_calls"], # The number of calls saved by the deduplication
+                  "hedged_calls": provider_metrics["hedged_calls"], # The number of calls that sent a duplicate request
+                  "hedge_wins": provider_metrics["hedge_wins"], # The number of hedged calls whose duplicate request returned first
+                  "hedge_rate": round(provider_metrics["hedged_calls"] / provider_metrics["calls"], 4) if provider_metrics["calls"] else 0.0, # The fraction of the calls that were hedged
+                  "packed_requests": provider_metrics["packed_requests"], # The number of packed requests
+                  "packed_tasks": provider_metrics["packed_tasks"], # The number of tasks answered by the packed requests
+                  "pack_fallbacks": provider_metrics["pack_fallbacks"], # The number of packed tasks that fell back to single-task calls
+                  "packing_ratio": round(provider_metrics["packed_tasks"] / provider_metrics["packed_requests"], 4) if provider_metrics["packed_requests"] else 0.0, # The average number of tasks answered by each packed request
+                  "latency": provider_metrics["latency"].summarize(), # The latency summary
+                  "ttft": provider_metrics["ttft"].summarize(), # The time to first token summary
+                  "input_tokens": provider_metrics["input_tokens"], # The input tokens reported by the provider
+                  "output_tokens": provider_metrics["output_tokens"], # The output tokens
+               }
+               for provider, provider_metrics in self.providers.items()
+            },
+         }
+
+   def export(self, json_file=METRICS_JSON_FILE, prometheus_file=METRICS_PROMETHEUS_FILE):
+      """
+      Write the metrics to the JSON file and to the Prometheus text format file.
+
+      :param json_file: The path to the JSON metrics file.
+      :param prometheus_file: The path to the Prometheus text format metrics file.
+      :return: None
+      """
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Exporting the metrics to {BackgroundColors.CYAN}{json_file}{BackgroundColors.GREEN} and {BackgroundColors.CYAN}{prometheus_file}{Style.RESET_ALL}") # Output the exporting message
+
+      snapshot = self.snapshot() # Summarize the metrics
+      write_file_atomically(json_file, json.dumps(snapshot, indent=3)) # Write the JSON metrics file
+      write_file_atomically(prometheus_file, format_prometheus(snapshot)) # Write the Prometheus metrics file
+
+   def start_periodic_export(self, interval_seconds=METRICS_EXPORT_INTERVAL_SECONDS):
+      """
+      Export the metrics every interval_seconds in a background thread, so a long run can be monitored while it runs.
+
+      :param interval_seconds: The number of seconds between each export (None disables the periodic export).
+      :return: None
+      """
+
+      if not interval_seconds or self.export_stop_event is not None: # If the periodic export is disabled or already running
+         return # Nothing to start
+
+      self.export_stop_event = threading.Event() # Stops the export thread
+      stop_event = self.export_stop_event # The stop event of this thread
+
+      def export_loop(): # Export the metrics until the run finishes
+         while not stop_event.wait(interval_seconds): # Wait for the interval or the stop event
+            try: # Try to export the metrics
+               self.export() # Export the metrics
+            except OSError as e: # If the files could not be written
+               print(f"{BackgroundColors.YELLOW}Error exporting the metrics: {str(e)}{Style.RESET_ALL}") # Output the warning message
+
+      threading.Thread(target=export_loop, daemon=True).start() # Start the export thread
+
+   def stop_periodic_export(self):
+      """
+      Stop the periodic export thread, if it is running.
+
+      :return: None
+      """
+
+      if self.export_stop_event is not None: # If the periodic export is running
+         self.export_stop_event.set() # Stop the export thread
+         self.export_stop_event = None # Forget the stopped thread
+
+RUN_METRICS = RunMetrics() # The metrics of the current run
+
+def compute_quantile(sorted_values, quantile):
+   """
+   Compute a quantile of sorted values using the nearest-rank method.
+
+   :param sorted_values: The sorted list of values.
+   :param quantile: The quantile between 0 and 1.
+   :return: The quantile value.
+   """
+
+   index = max(0, math.ceil(quantile * len(sorted_values)) - 1) # The nearest rank, as a list index
+
+   return sorted_values[index] # Return the quantile value
+
+def format_prometheus_histogram(name, help_text, labels):
+   """
+   Format a duration histogram in the Prometheus text format.
+
+   :param name: The metric name.
+   :param help_text: The metric description.
+   :param labels: List of (label string, summary) tuples, such as ('stage="format_output"', {...}), where each summary was returned by DurationHistogram.summarize.
+   :return: List of lines.
+   """
+
+   lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"] # The metric header
+
+   for label, label_summary in labels: # Loop through each labeled histogram
+      for upper_bound, cumulative_count in label_summary["buckets"].items(): # Loop through each bucket
+         lines.append(f'{name}_bucket{{{label},le="{upper_bound}"}} {cumulative_count}') # Add the bucket
+      lines.append(f"{name}_sum{{{label}}} {label_summary['total_seconds']}") # Add the total
+      lines.append(f"{name}_count{{{label}}} {label_summary['count']}") # Add the count
+
+   return lines # Return the lines
+
+def format_prometheus(snapshot):
+   """
+   Format a metrics snapshot in the Prometheus text exposition format.
+
+   :param snapshot: The metrics snapshot returned by RunMetrics.snapshot.
+   :return: The Prometheus text.
+   """
+
+   providers = snapshot["providers"] # The provider metrics
+   lines = [f"# HELP {METRICS_PREFIX}_run_seconds Elapsed time of the run.", f"# TYPE {METRICS_PREFIX}_run_seconds gauge", f"{METRICS_PREFIX}_run_seconds {snapshot['run_seconds']}"] # The run time
+
+   lines += format_prometheus_histogram(f"{METRICS_PREFIX}_stage_seconds", "Wall time of each pipeline stage.", [(f'stage="{stage}"', summary) for stage, summary in snapshot["stages"].items()]) # The stage durations
+   lines += format_prometheus_histogram(f"{METRICS_PREFIX}_provider_latency_seconds", "Latency of each provider call, including the rate limiter waits and retries.", [(f'provider="{provider}"', provider_metrics["latency"]) for provider, provider_metrics in providers.items()]) # The provider latencies
+   lines += format_prometheus_histogram(f"{METRICS_PREFIX}_provider_ttft_seconds", "Time to first token of each streamed provider call.", [(f'provider="{provider}"', provider_metrics["ttft"]) for provider, provider_metrics in providers.items() if provider_metrics["ttft"]["count"]]) # The provider times to first token
+
+   for metric, help_text in (("calls", "Number of provider calls."), ("errors", "Number of failed provider calls."), ("timeouts", "Number of provider calls that exceeded the provider deadline."), ("skipped_calls", "Number of provider calls skipped while the circuit breaker was open."), ("breaker_opens", "Number of times the circuit breaker of the provider opened."), ("cache_hits", "Number of responses reused from the batch results or the response cache."), ("deduplicated_calls", "Number of calls saved by reusing the responses of identical tasks."), ("hedged_calls", "Number of calls that sent a duplicate request because they were slower than the recent calls."), ("hedge_wins", "Number of hedged calls whose duplicate request returned first."), ("packed_requests", "Number of requests that combined many tasks."), ("packed_tasks", "Number of tasks answered by the packed requests."), ("pack_fallbacks", "Number of packed tasks that fell back to single-task calls.")): # Loop through each provider counter
+      lines += [f"# HELP {METRICS_PREFIX}_provider_{metric}_total {help_text}", f"# TYPE {METRICS_PREFIX}_provider_{metric}_total counter"] # The counter header
+      lines += [f'{METRICS_PREFIX}_provider_{metric}_total{{provider="{provider}"}} {provider_metrics[metric]}' for provider, provider_metrics in providers.items()] # The counter of each provider
+
+   lines += [f"# HELP {METRICS_PREFIX}_provider_breaker_state State of the circuit breaker of the provider (0 closed, 1 half-open, 2 open).", f"# TYPE {METRICS_PREFIX}_provider_breaker_state gauge"] # The breaker state header
+   lines += [f'{METRICS_PREFIX}_provider_breaker_state{{provider="{provider}"}} {BREAKER_STATE_VALUES[provider_metrics["breaker_state"]]}' for provider, provider_metrics in providers.items()] # The breaker state of each provider
+
+   lines += [f"# HELP {METRICS_PREFIX}_provider_hedge_rate Fraction of the provider calls that were hedged.", f"# TYPE {METRICS_PREFIX}_provider_hedge_rate gauge"] # The hedge rate header
+   lines += [f'{METRICS_PREFIX}_provider_hedge_rate{{provider="{provider}"}} {provider_metrics["hedge_rate"]}' for provider, provider_metrics in providers.items()] # The hedge rate of each provider
+
+   lines += [f"# HELP {METRICS_PREFIX}_provider_packing_ratio Average number of tasks answered by each packed request.", f"# TYPE {METRICS_PREFIX}_provider_packing_ratio gauge"] # The packing ratio header
+   lines += [f'{METRICS_PREFIX}_provider_packing_ratio{{provider="{provider}"}} {provider_metrics["packing_ratio"]}' for provider, provider_metrics in providers.items()] # The packing ratio of each provider
+
+   lines += [f"# HELP {METRICS_PREFIX}_provider_tokens_total Number of tokens of the streamed provider calls.", f"# TYPE {METRICS_PREFIX}_provider_tokens_total counter"] # The tokens header
+   for provider, provider_metrics in providers.items(): # Loop through each provider
+      lines.append(f'{METRICS_PREFIX}_provider_tokens_total{{provider="{provider}",direction="input"}} {provider_metrics["input_tokens"]}') # The input tokens
+      lines.append(f'{METRICS_PREFIX}_provider_tokens_total{{provider="{provider}",direction="output"}} {provider_metrics["output_tokens"]}') # The output tokens
+
+   return "\n".join(lines) + "\n" # Return the Prometheus text
+
+def write_file_atomically(file_path, content):
+   """
+   Write a file through a temporary file, so a reader never sees a partially written metrics file.
+
+   :param file_path: The path to the file.
+   :param content: The content of the file.
+   :return: None
+   """
+
+   temporary_file_path = f"{file_path}.tmp" # The temporary file path
+   with open(temporary_file_path, mode="w", encoding="utf-8") as file: # Open the temporary file
+      file.write(content) # Write the content
+   os.replace(temporary_file_path, file_path) # Replace the file
+
+def timed_stage(stage):
+   """
+   Decorator that records the wall time of each call of a function as a pipeline stage of RUN_METRICS.
+
+   :param stage: The stage name.
+   :return: The decorator.
+   """
+
+   def decorator(function): # Wrap the function
+      @functools.wraps(function) # Keep the function name and docstring
+      def wrapper(*args, **kwargs): # Time the function call
+         start_time = time.perf_counter() # Start the timer
+         try: # Run the function
+            return function(*args, **kwargs) # Return its result
+         finally: # Even if it raised an error
+            RUN_METRICS.record_stage(stage, time.perf_counter() - start_time) # Record the duration
+
+      return wrapper # Return the wrapped function
+
+   return decorator # Return the decorator
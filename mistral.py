@@ -2,8 +2,11 @@
 
 import atexit # For playing a sound when the program finishes
 import os # For running a command in the terminal
+import time # For measuring the time to first token
 from colorama import Style # For coloring the terminal
 from mistralai import Mistral # Import the Mistral client
+from streaming import aconsume_stream, consume_stream # Import the stream consumers from ./streaming.py
+from transport import get_async_http_client, get_http_client # Import the shared HTTP transport from ./transport.py
 from utils import BackgroundColors # Import Classes from ./utils.py
 from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
 from utils import create_directory, play_sound, verbose_output, verify_env_file, write_output_to_file # Import Functions from ./utils.py
@@ -17,12 +20,29 @@ class MistralModel:
 	# Constants:
 	ENV_PATH = "./.env" # The path to the .env file
 	ENV_VARIABLE = "MISTRAL_API_KEY" # The environment variable to load
+	SERVER_URL_ENV_VARIABLE = "MISTRAL_SERVER_URL" # The optional environment variable with the API server URL, such as the local mock server
 	OUTPUT_FILE = f"{OUTPUT_DIRECTORY}Mistral_output.txt" # The path to the output file
+	REQUESTS_PER_MINUTE = 60 # The requests per minute budget of the Mistral free tier (adjust it to your account tier)
+	TOKENS_PER_MINUTE = 500000 # The tokens per minute budget of the Mistral free tier (None disables the tokens budget)
+	REQUEST_TIMEOUT_SECONDS = 120 # The deadline of each request, after which it counts as a failure of the provider's circuit breaker (None waits forever)
+	HTTP2 = True # If HTTP/2 is used, as the Mistral API supports it
+	HEDGE = True # If a duplicate request may be sent when a call is slower than the recent calls (see HEDGE_REQUESTS in main.py)
+	PACKING = True # If many short tasks may be combined into one JSON-structured request (see PACK_TASKS in main.py)
 
 	def __init__(self): # Constructor
 		self.api_key = verify_env_file(self.ENV_PATH, self.ENV_VARIABLE) # Call verify_env_file to load the API key
 		self.model_name = "mistral-large-latest" # The model name
-		self.client = Mistral(api_key=self.api_key) # Initialize the Mistral client
+		self.server_url = os.getenv(self.SERVER_URL_ENV_VARIABLE) or None # The API server URL (None uses the Mistral API)
+		self.client = Mistral(api_key=self.api_key, server_url=self.server_url, client=get_http_client(self.HTTP2), async_client=get_async_http_client(self.HTTP2)) # Initialize the Mistral client with the shared HTTP transport
+
+	def get_parameters(self):
+		"""
+		Get the parameters that change the model's response, used to build the response cache keys.
+
+		:return: Dictionary of the model parameters.
+		"""
+
+		return {"model": self.model_name} # Return the model parameters
 
 	def run(self, task_message):
 		"""
@@ -46,6 +66,151 @@ class MistralModel:
 
 		return response.choices[0].message.content # Return the response
 
+	async def arun(self, task_message):
+		"""
+		Asynchronous version of the run method, used by the asyncio execution engine.
+
+		:param task_message: The message to send to the AI model.
+		:return output: The output text.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Running the Mistral AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		response = await self.client.chat.complete_async( # Get the response from the AI model
+			model=self.model_name, # The model to use
+			messages=[ # The messages to send
+				{
+					"role": "user", # The role of the user
+					"content": task_message, # The content of the message
+				}
+			]
+		)
+
+		return response.choices[0].message.content # Return the response
+
+	def get_chunk_text(self, event):
+		"""
+		Get the text of a streamed response event.
+
+		:param event: The response event.
+		:return: The text of the event.
+		"""
+
+		if not event.data.choices: # If the event has no choices
+			return None # There is no text
+
+		content = event.data.choices[0].delta.content # The content of the event
+		if isinstance(content, list): # If the content is a list of chunks
+			return "".join(getattr(content_chunk, "text", "") for content_chunk in content) # Join the text chunks
+
+		return content # Return the text of the event
+
+	def get_chunk_usage(self, event):
+		"""
+		Get the token usage reported in a streamed response event.
+
+		:param event: The response event.
+		:return: Tuple of the input and output tokens, or None if the event has no usage.
+		"""
+
+		return (event.data.usage.prompt_tokens, event.data.usage.completion_tokens) if event.data.usage else None # Return the token usage, if any
+
+	def run_stream(self, task_message):
+		"""
+		Streaming version of the run method, which consumes the tokens as they arrive and records the time to first token, the latency and the output tokens per second.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the Mistral AI Model...{Style.RESET_ALL}") # Output the running message
+
+		start_time = time.perf_counter() # The time the request is sent
+		stream = self.client.chat.stream( # Create a streamed completion
+			model=self.model_name, # The model to use
+			messages=[{"role": "user", "content": task_message}], # The messages to send
+		)
+
+		return consume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
+
+	async def arun_stream(self, task_message):
+		"""
+		Asynchronous version of the run_stream method, used by the asyncio execution engine.
+
+		:param task_message: The message to send to the AI model.
+		:return: Tuple of the output text and the stream metrics.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Streaming the Mistral AI Model asynchronously...{Style.RESET_ALL}") # Output the running message
+
+		start_time = time.perf_counter() # The time the request is sent
+		stream = await self.client.chat.stream_async( # Create a streamed completion
+			model=self.model_name, # The model to use
+			messages=[{"role": "user", "content": task_message}], # The messages to send
+		)
+
+		return await aconsume_stream(stream, start_time, self.get_chunk_text, self.get_chunk_usage) # Consume the stream and return the output and metrics
+
+	def build_batch_request(self, custom_id, task_message):
+		"""
+		Build the Batch API request line of a task.
+
+		:param custom_id: The identifier used to match the result to the task.
+		:param task_message: The message to send to the AI model.
+		:return: Dictionary of the JSONL request line.
+		"""
+
+		return { # The Batch API request line
+			"custom_id": custom_id, # The identifier of the request
+			"body": { # The completion request
+				"messages": [{"role": "user", "content": task_message}], # The messages to send
+			},
+		}
+
+	def submit_batch(self, batch_file_path):
+		"""
+		Upload the JSONL batch file and create the batch job.
+
+		:param batch_file_path: The path to the JSONL batch file.
+		:return: The batch job identifier.
+		"""
+
+		verbose_output(true_string=f"{BackgroundColors.GREEN}Submitting the Mistral batch...{Style.RESET_ALL}") # Output the submitting message
+
+		with open(batch_file_path, "rb") as batch_file: # Open the batch file
+			uploaded_file = self.client.files.upload(file={"file_name": os.path.basename(batch_file_path), "content": batch_file}, purpose="batch") # Upload the batch file
+
+		batch_job = self.client.batch.jobs.create(input_files=[uploaded_file.id], model=self.model_name, endpoint="/v1/chat/completions") # Create the batch job
+
+		return batch_job.id # Return the batch job identifier
+
+	def get_batch_status(self, batch_id):
+		"""
+		Get the status of a batch job.
+
+		:param batch_id: The batch job identifier.
+		:return: Tuple of the status ("running", "completed" or "failed") and the output file identifier.
+		"""
+
+		batch_job = self.client.batch.jobs.get(job_id=batch_id) # Retrieve the batch job
+
+		if batch_job.status == "SUCCESS": # If the batch job finished
+			return "completed", batch_job.output_file # Return the output file
+		if batch_job.status in ("FAILED", "TIMEOUT_EXCEEDED", "CANCELLATION_REQUESTED", "CANCELLED"): # If the batch job did not finish
+			return "failed", batch_job.output_file # Return the partial output file, if any
+
+		return "running", None # The batch job is still running
+
+	def download_batch_results(self, file_id):
+		"""
+		Download the JSONL results of a batch job.
+
+		:param file_id: The output file identifier.
+		:return: The JSONL results text.
+		"""
+
+		return self.client.files.download(file_id=file_id).read().decode("utf-8") # Return the results text
+
 def main():
 	"""
 	Main entry point to run the MistralModel.
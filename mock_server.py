@@ -0,0 +1,522 @@
+import argparse # For parsing the command line arguments
+import json # For the request and response bodies
+import math # For the lognormal latency distribution
+import random # For the latency distributions and the injected errors
+import re # For matching the request paths
+import threading # For running the server in the background
+import time # For the timestamps of the files and batches
+import uuid # For the identifiers of the files and batches
+from colorama import Style # For coloring the terminal
+from email.parser import BytesParser # For parsing the multipart file uploads
+from email.policy import HTTP # For parsing the multipart file uploads
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # For the local HTTP server
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Mock Server Constants:
+MOCK_SERVER_HOST = "127.0.0.1" # The host of the mock server
+MOCK_SERVER_PORT = 8765 # The port of the mock server
+MOCK_BATCH_DELAY_SECONDS = 0.0 # The number of seconds a batch stays in progress before it completes
+MOCK_LATENCY_DISTRIBUTION = "lognormal" # The distribution of the latency before the first token: "constant", "uniform" or "lognormal"
+MOCK_LATENCY_SECONDS = 0.0 # The median latency before the first token (0 answers immediately)
+MOCK_LATENCY_SPREAD = 0.5 # The sigma of the lognormal distribution, or the relative half-width of the uniform distribution
+MOCK_TOKEN_INTERVAL_SECONDS = 0.0 # The number of seconds between the streamed tokens
+MOCK_ERROR_RATE = 0.0 # The fraction of the chat requests answered with a 500 error
+MOCK_RATE_LIMIT_RATE = 0.0 # The fraction of the chat requests answered with a 429 error
+MOCK_RETRY_AFTER_SECONDS = 1.0 # The delay sent in the Retry-After headers of the 429 errors
+MOCK_REQUEST_QUEUE_SIZE = 256 # The number of pending connections the server accepts, so load tests are not refused
+
+class MockProviderState:
+   """
+   The in-memory files and batches of the mock server, and the latency and errors of its chat endpoints.
+
+   """
+
+   def __init__(self, batch_delay_seconds=MOCK_BATCH_DELAY_SECONDS, latency_distribution=MOCK_LATENCY_DISTRIBUTION, latency_seconds=MOCK_LATENCY_SECONDS, latency_spread=MOCK_LATENCY_SPREAD, token_interval_seconds=MOCK_TOKEN_INTERVAL_SECONDS, error_rate=MOCK_ERROR_RATE, rate_limit_rate=MOCK_RATE_LIMIT_RATE, retry_after_seconds=MOCK_RETRY_AFTER_SECONDS): # Constructor
+      if latency_distribution not in ("constant", "uniform", "lognormal"): # If the latency distribution is invalid
+         raise ValueError(f"Invalid latency_distribution: {latency_distribution}. Use 'constant', 'uniform' or 'lognormal'.") # Raise a ValueError
+
+      self.batch_delay_seconds = batch_delay_seconds # The number of seconds a batch stays in progress
+      self.latency_distribution = latency_distribution # The distribution of the latency before the first token
+      self.latency_seconds = latency_seconds # The median latency before the first token
+      self.latency_spread = latency_spread # The spread of the latency distribution
+      self.token_interval_seconds = token_interval_seconds # The number of seconds between the streamed tokens
+      self.error_rate = error_rate # The fraction of the chat requests answered with a 500 error
+      self.rate_limit_rate = rate_limit_rate # The fraction of the chat requests answered with a 429 error
+      self.retry_after_seconds = retry_after_seconds # The delay sent in the Retry-After headers
+      self.files = {} # Maps each file id to its metadata and content
+      self.batches = {} # Maps each batch id to its metadata
+      self.lock = threading.Lock() # Lock for the files and batches
+
+   def add_file(self, filename, content, purpose):
+      """
+      Store an uploaded or generated file.
+
+      :param filename: The file name.
+      :param content: The file content in bytes.
+      :param purpose: The purpose of the file.
+      :return: The file metadata.
+      """
+
+      file_id = f"file-{uuid.uuid4().hex}" # The file id
+      metadata = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()), "filename": filename, "purpose": purpose, "status": "processed", "sample_type": "batch_request", "source": "upload", "num_lines": content.count(b"\n")} # The file metadata, with the fields of both the OpenAI and the Mistral APIs
+
+      with self.lock: # Lock the state
+         self.files[file_id] = (metadata, content) # Store the file
+
+      return metadata # Return the file metadata
+
+   def create_batch(self, batch):
+      """
+      Store a new batch.
+
+      :param batch: The batch metadata.
+      :return: The batch metadata.
+      """
+
+      with self.lock: # Lock the state
+         self.batches[batch["id"]] = batch # Store the batch
+
+      return batch # Return the batch metadata
+
+   def refresh_batch(self, batch_id):
+      """
+      Complete a batch once its delay has passed, generating its output file.
+
+      :param batch_id: The batch id.
+      :return: The batch metadata or None if the batch does not exist.
+      """
+
+      with self.lock: # Lock the state
+         batch = self.batches.get(batch_id) # Get the batch
+         if batch is None or batch["completed"] or time.time() - batch["created_at"] < self.batch_delay_seconds: # If the batch does not exist, already completed or is still in progress
+            return batch # Return it as is
+
+         input_content = self.files[batch["input_file_id"]][1] # Get the input file content
+
+      results = [build_batch_result(json.loads(line), batch["model"]) for line in input_content.decode("utf-8").splitlines() if line.strip()] # Answer every request
+      output_file = self.add_file(f"{batch_id}_output.jsonl", "".join(json.dumps(result) + "\n" for result in results).encode("utf-8"), "batch_result") # Store the results file
+
+      with self.lock: # Lock the state
+         batch.update(completed=True, output_file_id=output_file["id"], total_requests=len(results)) # Mark the batch as completed
+
+      return batch # Return the batch metadata
+
+   def sample_latency(self):
+      """
+      Sample the latency before the first token from the configured distribution.
+
+      :return: The latency in seconds.
+      """
+
+      if self.latency_seconds <= 0: # If the latency is disabled
+         return 0.0 # Answer immediately
+      if self.latency_distribution == "uniform": # If the latency is uniform
+         return random.uniform(self.latency_seconds * (1 - self.latency_spread), self.latency_seconds * (1 + self.latency_spread)) # Sample around the median
+      if self.latency_distribution == "lognormal": # If the latency has a long tail
+         return random.lognormvariate(math.log(self.latency_seconds), self.latency_spread) # Sample a lognormal latency with the configured median
+
+      return self.latency_seconds # Return the constant latency
+
+   def sample_error(self):
+      """
+      Decide if a chat request is answered with an injected error.
+
+      :return: The HTTP status code of the error (429 or 500), or None if the request succeeds.
+      """
+
+      draw = random.random() # Draw the outcome of the request
+
+      if draw < self.rate_limit_rate: # If the request is rate limited
+         return 429 # Return the rate limit status
+      if draw < self.rate_limit_rate + self.error_rate: # If the request fails
+         return 500 # Return the server error status
+
+      return None # The request succeeds
+
+def build_mock_answer(messages):
+   """
+   Build the deterministic answer of the mock server to a list of chat messages.
+
+   :param messages: The chat messages.
+   :return: The answer text.
+   """
+
+   last_message = messages[-1]["content"] if messages else "" # Get the last message
+   packed_tasks = get_packed_tasks(last_message) # Get the tasks of a packed request, if it is one
+
+   if packed_tasks is not None: # If the message is a packed request
+      return json.dumps({"answers": [{"id": task["id"], "answer": f"Mock response to: {task['task']}"} for task in packed_tasks]}) # Answer each task as a single-task request would
+
+   return f"Mock response to: {last_message}" # Return the answer
+
+def get_packed_tasks(message):
+   """
+   Get the tasks of a packed request, whose last line is a JSON object with a "tasks" list (see packing.py).
+
+   :param message: The message text.
+   :return: The list of the tasks, or None if the message is not a packed request.
+   """
+
+   try: # Try to parse the last line of the message
+      tasks = json.loads(str(message).rsplit("\n", 1)[-1]).get("tasks") # Parse the tasks
+   except (ValueError, AttributeError): # If the last line is not a JSON object
+      return None # It is not a packed request
+
+   return tasks if isinstance(tasks, list) else None # Return the tasks
+
+def build_chat_completion(model, messages):
+   """
+   Build an OpenAI-compatible chat completion body, which the Mistral API also uses.
+
+   :param model: The model name.
+   :param messages: The chat messages.
+   :return: Dictionary of the chat completion.
+   """
+
+   answer = build_mock_answer(messages) # Build the answer
+   prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages) # Approximate the prompt tokens
+   completion_tokens = len(answer.split()) # Approximate the completion tokens
+
+   return { # The chat completion
+      "id": f"chatcmpl-{uuid.uuid4().hex}", # The completion id
+      "object": "chat.completion", # The object type
+      "created": int(time.time()), # The creation time
+      "model": model or "mock-model", # The model name
+      "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}], # The completion choices
+      "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}, # The token usage
+   }
+
+def build_chat_completion_chunks(model, messages):
+   """
+   Build the streamed chunks of an OpenAI-compatible chat completion, one per word, followed by a chunk with the token usage.
+
+   :param model: The model name.
+   :param messages: The chat messages.
+   :return: List of chunk dictionaries.
+   """
+
+   completion = build_chat_completion(model, messages) # Build the full completion
+   words = completion["choices"][0]["message"]["content"].split(" ") # Split the answer into words
+   chunk = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"], "model": completion["model"]} # The attributes shared by every chunk
+
+   chunks = [{**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "content": word if index == 0 else f" {word}"}, "finish_reason": None}]} for index, word in enumerate(words)] # One chunk per word
+   chunks.append({**chunk, "choices": [], "usage": completion["usage"]}) # The token usage is sent in the last chunk
+
+   return chunks # Return the chunks
+
+def build_gemini_response(request, stream=False):
+   """
+   Build the Gemini generateContent response body, or its streamed chunks.
+
+   :param request: The parsed generateContent request.
+   :param stream: If True, a list of chunks (one per word, the last one with the token usage) is returned.
+   :return: Dictionary of the response, or list of chunk dictionaries.
+   """
+
+   contents = request.get("contents") or [] # The conversation contents
+   messages = [{"role": content.get("role", "user"), "content": "".join(part.get("text", "") for part in content.get("parts", []))} for content in contents] # Convert the contents to chat messages
+   answer = build_mock_answer(messages) # Build the answer
+   prompt_tokens = sum(len(message["content"].split()) for message in messages) # Approximate the prompt tokens
+   usage = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": len(answer.split()), "totalTokenCount": prompt_tokens + len(answer.split())} # The token usage
+
+   if not stream: # If the full response is requested
+      return {"candidates": [{"content": {"role": "model", "parts": [{"text": answer}]}, "finishReason": "STOP", "index": 0}], "usageMetadata": usage} # Return the response
+
+   words = answer.split(" ") # Split the answer into words
+   chunks = [{"candidates": [{"content": {"role": "model", "parts": [{"text": word if index == 0 else f" {word}"}]}, "index": 0}]} for index, word in enumerate(words)] # One chunk per word
+   chunks[-1]["candidates"][0]["finishReason"] = "STOP" # The last chunk finishes the answer
+   chunks[-1]["usageMetadata"] = usage # The token usage is sent in the last chunk
+
+   return chunks # Return the chunks
+
+def build_batch_result(request_line, model):
+   """
+   Build the result line of a batch request line.
+
+   :param request_line: The parsed request line.
+   :param model: The model of the batch (used when the request body has none).
+   :return: Dictionary of the result line.
+   """
+
+   body = request_line.get("body", {}) # Get the request body
+
+   return { # The result line, in the layout shared by the OpenAI and Mistral APIs
+      "id": f"batch_req_{uuid.uuid4().hex}", # The result id
+      "custom_id": request_line.get("custom_id"), # The custom id of the request
+      "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": build_chat_completion(body.get("model") or model, body.get("messages", []))}, # The response
+      "error": None, # There is no error
+   }
+
+def format_openai_batch(batch):
+   """
+   Format a batch as an OpenAI Batch object.
+
+   :param batch: The batch metadata.
+   :return: Dictionary of the OpenAI Batch object.
+   """
+
+   return { # The OpenAI Batch object
+      "id": batch["id"], "object": "batch", "endpoint": batch["endpoint"], "input_file_id": batch["input_file_id"], # The batch attributes
+      "completion_window": "24h", "created_at": int(batch["created_at"]), # The batch window and creation time
+      "status": "completed" if batch["completed"] else "in_progress", # The batch status
+      "output_file_id": batch.get("output_file_id"), "error_file_id": None, # The batch files
+      "request_counts": {"total": batch["total_requests"], "completed": batch["total_requests"] if batch["completed"] else 0, "failed": 0}, # The request counts
+   }
+
+def format_mistral_batch(batch):
+   """
+   Format a batch as a Mistral BatchJobOut object.
+
+   :param batch: The batch metadata.
+   :return: Dictionary of the Mistral BatchJobOut object.
+   """
+
+   completed_requests = batch["total_requests"] if batch["completed"] else 0 # The number of completed requests
+
+   return { # The Mistral BatchJobOut object
+      "id": batch["id"], "object": "batch", "input_files": [batch["input_file_id"]], "endpoint": batch["endpoint"], "model": batch["model"], "errors": [], # The batch attributes
+      "status": "SUCCESS" if batch["completed"] else "RUNNING", "created_at": int(batch["created_at"]), # The batch status and creation time
+      "total_requests": batch["total_requests"], "completed_requests": completed_requests, "succeeded_requests": completed_requests, "failed_requests": 0, # The request counts
+      "output_file": batch.get("output_file_id"), # The output file
+   }
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+   """
+   The HTTP handler that imitates the OpenAI-compatible, Mistral and Gemini chat endpoints and the OpenAI and Mistral file and batch endpoints.
+
+   """
+
+   protocol_version = "HTTP/1.1" # Keep the connections alive, as the providers do
+   state = None # The MockProviderState shared by every request, set by start_mock_server
+
+   def log_message(self, format, *args): # Silence the default request logging
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Mock server: {format % args}{Style.RESET_ALL}") # Output the request only in verbose mode
+
+   def send_json(self, body, status_code=200, headers=None):
+      """
+      Send a JSON response.
+
+      :param body: The response body.
+      :param status_code: The HTTP status code.
+      :param headers: Dictionary of extra headers, or None.
+      :return: None
+      """
+
+      content = json.dumps(body).encode("utf-8") # Serialize the body
+      self.send_response(status_code) # Send the status line
+      self.send_header("Content-Type", "application/json") # Send the content type
+      self.send_header("Content-Length", str(len(content))) # Send the content length
+      for header, value in (headers or {}).items(): # Loop through each extra header
+         self.send_header(header, value) # Send the header
+      self.end_headers() # End the headers
+      self.wfile.write(content) # Send the body
+
+   def send_stream(self, chunks, sse=True, done_event=True):
+      """
+      Send a streamed response with chunked transfer encoding, waiting the token interval between the chunks.
+
+      :param chunks: List of chunk dictionaries.
+      :param sse: If True, the chunks are sent as server-sent events, otherwise as a JSON array.
+      :param done_event: If True, the server-sent events end with a "[DONE]" event, as in the OpenAI-compatible APIs.
+      :return: None
+      """
+
+      self.send_response(200) # Send the status line
+      self.send_header("Content-Type", "text/event-stream" if sse else "application/json") # Send the content type
+      self.send_header("Transfer-Encoding", "chunked") # The length of the body is not known in advance
+      self.end_headers() # End the headers
+
+      for index, chunk in enumerate(chunks): # Loop through each chunk
+         if index and self.state.token_interval_seconds: # If the tokens are paced
+            time.sleep(self.state.token_interval_seconds) # Wait before the next token
+         self.write_chunk(f"data: {json.dumps(chunk)}\n\n" if sse else f"{'[' if index == 0 else ','}{json.dumps(chunk)}\n") # Send the chunk
+
+      if sse and done_event: # If the events end with a "[DONE]" event
+         self.write_chunk("data: [DONE]\n\n") # Send the end of the stream
+      elif not sse: # If the chunks are sent as a JSON array
+         self.write_chunk("]" if chunks else "[]") # Close the array
+      self.wfile.write(b"0\r\n\r\n") # Send the last chunk of the transfer encoding
+      self.wfile.flush() # Flush the response
+
+   def write_chunk(self, text):
+      """
+      Write a chunk of a chunked transfer encoding response.
+
+      :param text: The chunk text.
+      :return: None
+      """
+
+      data = text.encode("utf-8") # Encode the chunk
+      self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n") # Write the chunk with its length
+      self.wfile.flush() # Send it right away
+
+   def handle_chat_request(self, path, request):
+      """
+      Answer a chat request after the sampled latency, injecting the configured 429 and 500 errors.
+
+      :param path: The request path.
+      :param request: The parsed request body.
+      :return: None
+      """
+
+      error_status = self.state.sample_error() # Decide if an error is injected
+      if error_status == 429: # If the request is rate limited
+         retry_after = self.state.retry_after_seconds # The delay before retrying
+         self.send_json({"error": {"message": "Rate limit reached (injected by the mock server)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}}, 429, {"Retry-After": str(max(1, math.ceil(retry_after))), "retry-after-ms": str(int(retry_after * 1000))}) # Send the rate limit error
+         return # Stop handling the request
+      if error_status == 500: # If the request fails
+         self.send_json({"error": {"message": "Internal server error (injected by the mock server)", "type": "server_error"}}, 500) # Send the server error
+         return # Stop handling the request
+
+      time.sleep(self.state.sample_latency()) # Wait the latency before the first token
+      gemini_match = re.fullmatch(r"/v1(?:beta)?/models/([^/:]+):(generateContent|streamGenerateContent)", path) # Match the Gemini endpoints
+
+      if gemini_match and gemini_match.group(2) == "streamGenerateContent": # If a streamed Gemini response is requested
+         self.send_stream(build_gemini_response(request, stream=True), sse="alt=sse" in self.path, done_event=False) # Stream the response, as server-sent events if the client asks for them
+      elif gemini_match: # If a Gemini response is requested
+         self.send_json(build_gemini_response(request)) # Send the response
+      elif request.get("stream"): # If a streamed chat completion is requested
+         self.send_stream(build_chat_completion_chunks(request.get("model"), request.get("messages", []))) # Stream the chat completion
+      else: # If a chat completion is requested
+         self.send_json(build_chat_completion(request.get("model"), request.get("messages", []))) # Send the chat completion
+
+   def read_body(self):
+      """
+      Read the request body.
+
+      :return: The request body in bytes.
+      """
+
+      return self.rfile.read(int(self.headers.get("Content-Length", 0))) # Read the body
+
+   def read_upload(self):
+      """
+      Read a multipart file upload.
+
+      :return: Tuple of the file name, the file content and the purpose.
+      """
+
+      message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + self.read_body()) # Parse the multipart body
+      filename, content, purpose = "batch.jsonl", b"", "batch" # The default upload attributes
+
+      for part in message.iter_parts(): # Loop through each part
+         name = part.get_param("name", header="content-disposition") # Get the field name
+         if name == "file": # If the part is the file
+            filename, content = part.get_filename() or filename, part.get_payload(decode=True) # Get the file name and content
+         elif name == "purpose": # If the part is the purpose
+            purpose = part.get_payload(decode=True).decode("utf-8") # Get the purpose
+
+      return filename, content, purpose # Return the upload attributes
+
+   def do_POST(self): # Handle the POST requests
+      path = self.path.split("?")[0] # Ignore the query string
+
+      if path.endswith("/chat/completions") or re.fullmatch(r"/v1(?:beta)?/models/[^/:]+:(generateContent|streamGenerateContent)", path): # If a chat completion is requested
+         self.handle_chat_request(path, json.loads(self.read_body() or b"{}")) # Answer the chat request
+      elif path == "/v1/files": # If a file is uploaded
+         self.send_json(self.state.add_file(*self.read_upload())) # Store the file
+      elif path in ("/v1/batches", "/v1/batch/jobs"): # If a batch is created
+         request = json.loads(self.read_body() or b"{}") # Parse the request
+         input_file_id = request.get("input_file_id") or (request.get("input_files") or [None])[0] # The OpenAI or Mistral input file
+         if input_file_id not in self.state.files: # If the input file does not exist
+            self.send_json({"error": {"message": f"File {input_file_id} not found"}}, 404) # Send the error
+            return # Stop handling the request
+         batch = self.state.create_batch({"id": f"batch_{uuid.uuid4().hex}", "input_file_id": input_file_id, "endpoint": request.get("endpoint", "/v1/chat/completions"), "model": request.get("model"), "created_at": time.time(), "completed": False, "total_requests": 0}) # Create the batch
+         self.send_json(format_openai_batch(batch) if path == "/v1/batches" else format_mistral_batch(batch)) # Send the batch
+      else: # If the endpoint is not implemented
+         self.send_json({"error": {"message": f"Unknown endpoint {path}"}}, 404) # Send the error
+
+   def do_GET(self): # Handle the GET requests
+      path = self.path.split("?")[0] # Ignore the query string
+      file_match = re.fullmatch(r"/v1/files/([^/]+)/content", path) # Match the file content endpoint
+      batch_match = re.fullmatch(r"/v1/(batches|batch/jobs)/([^/]+)", path) # Match the batch endpoints
+
+      if file_match and file_match.group(1) in self.state.files: # If a file content is requested
+         content = self.state.files[file_match.group(1)][1] # Get the file content
+         self.send_response(200) # Send the status line
+         self.send_header("Content-Type", "application/octet-stream") # Send the content type
+         self.send_header("Content-Length", str(len(content))) # Send the content length
+         self.end_headers() # End the headers
+         self.wfile.write(content) # Send the content
+      elif batch_match and batch_match.group(2) in self.state.batches: # If a batch is requested
+         batch = self.state.refresh_batch(batch_match.group(2)) # Complete the batch if its delay has passed
+         self.send_json(format_openai_batch(batch) if batch_match.group(1) == "batches" else format_mistral_batch(batch)) # Send the batch
+      else: # If the endpoint or the resource does not exist
+         self.send_json({"error": {"message": f"Unknown resource {path}"}}, 404) # Send the error
+
+class MockHTTPServer(ThreadingHTTPServer):
+   """
+   The threaded HTTP server of the mock providers, with a larger queue of pending connections for the load tests.
+
+   """
+
+   daemon_threads = True # Do not wait for the open connections when the server stops
+   request_queue_size = MOCK_REQUEST_QUEUE_SIZE # The number of pending connections
+
+def start_mock_server(host=MOCK_SERVER_HOST, port=MOCK_SERVER_PORT, batch_delay_seconds=MOCK_BATCH_DELAY_SECONDS, **behavior):
+   """
+   Start the mock server in a background thread.
+
+   :param host: The host to listen on.
+   :param port: The port to listen on (0 picks a free port).
+   :param batch_delay_seconds: The number of seconds a batch stays in progress before it completes.
+   :param behavior: The latency and error arguments of MockProviderState, such as latency_seconds or rate_limit_rate.
+   :return: The running server, whose server_address holds the actual host and port.
+   """
+
+   handler = type("BoundMockProviderHandler", (MockProviderHandler,), {"state": MockProviderState(batch_delay_seconds, **behavior)}) # Bind a new state to the handler
+   server = MockHTTPServer((host, port), handler) # Create the server
+   threading.Thread(target=server.serve_forever, daemon=True).start() # Serve the requests in the background
+
+   return server # Return the server
+
+def parse_arguments():
+   """
+   Parse the command line arguments.
+
+   :return: The parsed arguments.
+   """
+
+   parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI-compatible, Mistral and Gemini APIs") # Create the argument parser
+   parser.add_argument("--host", default=MOCK_SERVER_HOST, help="The host to listen on") # The host
+   parser.add_argument("--port", type=int, default=MOCK_SERVER_PORT, help="The port to listen on") # The port
+   parser.add_argument("--batch-delay", type=float, default=MOCK_BATCH_DELAY_SECONDS, help="The number of seconds a batch stays in progress") # The batch delay
+   parser.add_argument("--latency-distribution", default=MOCK_LATENCY_DISTRIBUTION, choices=["constant", "uniform", "lognormal"], help="The distribution of the latency before the first token") # The latency distribution
+   parser.add_argument("--latency", type=float, default=MOCK_LATENCY_SECONDS, help="The median latency before the first token, in seconds") # The median latency
+   parser.add_argument("--latency-spread", type=float, default=MOCK_LATENCY_SPREAD, help="The sigma of the lognormal distribution, or the relative half-width of the uniform distribution") # The latency spread
+   parser.add_argument("--token-interval", type=float, default=MOCK_TOKEN_INTERVAL_SECONDS, help="The number of seconds between the streamed tokens") # The token interval
+   parser.add_argument("--error-rate", type=float, default=MOCK_ERROR_RATE, help="The fraction of the chat requests answered with a 500 error") # The error rate
+   parser.add_argument("--rate-limit-rate", type=float, default=MOCK_RATE_LIMIT_RATE, help="The fraction of the chat requests answered with a 429 error") # The 429 rate
+   parser.add_argument("--retry-after", type=float, default=MOCK_RETRY_AFTER_SECONDS, help="The delay sent in the Retry-After headers of the 429 errors, in seconds") # The Retry-After delay
+
+   return parser.parse_args() # Return the parsed arguments
+
+def main():
+   """
+   Main function.
+
+   :return: None
+   """
+
+   args = parse_arguments() # Parse the command line arguments
+   server = start_mock_server(args.host, args.port, args.batch_delay, latency_distribution=args.latency_distribution, latency_seconds=args.latency, latency_spread=args.latency_spread, token_interval_seconds=args.token_interval, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after_seconds=args.retry_after) # Start the mock server
+   host, port = server.server_address[:2] # Get the actual address
+
+   print(f"{BackgroundColors.GREEN}Mock server listening on {BackgroundColors.CYAN}http://{host}:{port}{Style.RESET_ALL}") # Output the address
+   print(f"{BackgroundColors.GREEN}Set {BackgroundColors.CYAN}CHATGPT_BASE_URL=http://{host}:{port}/v1{BackgroundColors.GREEN}, {BackgroundColors.CYAN}LLAMA_BASE_URL=http://{host}:{port}{BackgroundColors.GREEN}, {BackgroundColors.CYAN}MISTRAL_SERVER_URL=http://{host}:{port}{BackgroundColors.GREEN} and {BackgroundColors.CYAN}GEMINI_API_ENDPOINT=http://{host}:{port}{BackgroundColors.GREEN} in the .env file to use it.{Style.RESET_ALL}") # Output the configuration
+
+   try: # Keep the main thread alive
+      while True: # Until interrupted
+         time.sleep(1) # Wait
+   except KeyboardInterrupt: # If the user stops the server
+      server.shutdown() # Stop the server
+
+if __name__ == "__main__":
+   """
+   This is the standard boilerplate that calls the main() function.
+
+   :return: None
+   """
+
+   main() # Call the main function
@@ -0,0 +1,104 @@
+import json # For the structured packed prompts and responses
+import math # For estimating the tokens of the tasks
+from rate_limiter import CHARACTERS_PER_TOKEN # Import Constants from ./rate_limiter.py
+
+# Packing Constants:
+PACK_MAX_TASKS = 8 # The maximum number of tasks combined into one packed request (K)
+PACK_TOKEN_BUDGET = 4000 # The maximum estimated tokens of a packed request, counting its prompt and the expected answers
+PACK_MAX_TASK_TOKENS = 200 # The tasks longer than this estimate are never packed, as the per-request overhead is small next to them
+PACK_OUTPUT_TOKENS_PER_TASK = 400 # The tokens reserved for the answer of each packed task
+PACK_INSTRUCTIONS = ( # The instructions of the packed requests
+   "Answer each of the tasks of the JSON object below independently, as if it were the only question you were asked. "
+   "Reply with only a JSON object, without any text around it, in the format "
+   '{"answers": [{"id": <the task id>, "answer": "<the complete answer to the task>"}]}, with one answer per task.'
+)
+
+def supports_packing(model):
+   """
+   Verify if a model supports the prompt packing mode.
+
+   :param model: The AI model object.
+   :return: True if the model class sets PACKING = True.
+   """
+
+   return getattr(type(model), "PACKING", False) # Return True if the model can answer packed requests
+
+def estimate_task_tokens(task_message):
+   """
+   Estimate the number of prompt tokens of a task.
+
+   :param task_message: The task message.
+   :return: The estimated number of tokens.
+   """
+
+   return math.ceil(len(task_message) / CHARACTERS_PER_TOKEN) # Return the estimated tokens
+
+def group_tasks(task_messages, max_tasks=PACK_MAX_TASKS, token_budget=PACK_TOKEN_BUDGET):
+   """
+   Group the short tasks into packs of up to max_tasks tasks within the token budget, in the input order.
+   The long tasks, and a last pack left with a single task, are not yielded and run as single-task calls.
+
+   :param task_messages: Iterable of task messages.
+   :param max_tasks: The maximum number of tasks of a pack.
+   :param token_budget: The maximum estimated tokens of a pack, counting its prompt and the expected answers.
+   :return: Generator of lists of task messages.
+   """
+
+   pack = [] # The tasks of the current pack
+   pack_tokens = estimate_task_tokens(PACK_INSTRUCTIONS) # The estimated tokens of the current pack
+
+   for task_message in task_messages: # Loop through each task
+      task_tokens = estimate_task_tokens(task_message) # The estimated prompt tokens of the task
+      if task_tokens > PACK_MAX_TASK_TOKENS: # If the task is too long to be worth packing
+         continue # Leave it to a single-task call
+
+      task_tokens += PACK_OUTPUT_TOKENS_PER_TASK # Reserve the tokens of its answer
+      if pack and (len(pack) >= max_tasks or pack_tokens + task_tokens > token_budget): # If the task does not fit in the current pack
+         if len(pack) > 1: # If the pack combines several tasks
+            yield pack # Send it
+         pack, pack_tokens = [], estimate_task_tokens(PACK_INSTRUCTIONS) # Start a new pack
+
+      pack.append(task_message) # Add the task to the pack
+      pack_tokens += task_tokens # Count its tokens
+
+   if len(pack) > 1: # If the last pack combines several tasks
+      yield pack # Send it
+
+def build_pack_prompt(task_messages):
+   """
+   Build the prompt of a packed request: the instructions followed by the tasks as a JSON object, on its last line.
+
+   :param task_messages: List of the task messages of the pack.
+   :return: The packed prompt.
+   """
+
+   tasks = [{"id": task_id, "task": task_message} for task_id, task_message in enumerate(task_messages, start=1)] # Number the tasks from 1
+
+   return f"{PACK_INSTRUCTIONS}\n\n{json.dumps({'tasks': tasks}, ensure_ascii=False)}" # Return the packed prompt
+
+def parse_pack_response(response, task_messages):
+   """
+   Split the structured response of a packed request into the answer of each task.
+
+   :param response: The response text, which may be wrapped in a Markdown code block.
+   :param task_messages: List of the task messages of the pack.
+   :return: Dictionary mapping each answered task message to its answer. The tasks without a valid answer are left out, so they run as single-task calls.
+   """
+
+   text = str(response) # The response text
+   start, end = text.find("{"), text.rfind("}") # The bounds of the JSON object, ignoring any text or code block around it
+
+   try: # Try to parse the JSON object
+      answers = json.loads(text[start:end + 1])["answers"] if start != -1 else [] # Parse the answers
+   except (ValueError, KeyError, TypeError): # If the response is not the requested JSON object
+      return {} # Every task runs as a single-task call
+
+   parsed = {} # Maps each answered task message to its answer
+
+   for answer in answers if isinstance(answers, list) else []: # Loop through each answer
+      task_id = answer.get("id") if isinstance(answer, dict) else None # The id of the answered task
+      text = answer.get("answer") if isinstance(answer, dict) else None # The answer text
+      if isinstance(task_id, int) and 1 <= task_id <= len(task_messages) and isinstance(text, str) and text.strip(): # If the answer is valid
+         parsed[task_messages[task_id - 1]] = text # Map the task message to its answer
+
+   return parsed # Return the answers
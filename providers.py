@@ -0,0 +1,61 @@
+import importlib # For importing the provider modules on demand
+import sys # For verifying which provider modules were imported
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Provider Registry Constants:
+PROVIDER_MODULES = {"ChatGPTModel": "chatgpt", "CopilotModel": "copilot", "GeminiModel": "gemini", "LlamaModel": "llama", "MistralModel": "mistral"} # Maps each model class name to the module that defines it
+
+def register_provider(model_class_name, module_name):
+   """
+   Register a model class, so it can be selected in EXECUTE_MODELS without importing its module up front.
+
+   :param model_class_name: The name of the model class, such as "ChatGPTModel".
+   :param module_name: The name of the module that defines the class, such as "chatgpt".
+   :return: None
+   """
+
+   PROVIDER_MODULES[model_class_name] = module_name # Register the module of the class
+
+def get_provider_class(model_class_name):
+   """
+   Get a model class, importing its module (and the provider's SDK) only when the class is requested.
+
+   :param model_class_name: The name of the model class, such as "ChatGPTModel".
+   :return: The model class.
+   """
+
+   if model_class_name not in PROVIDER_MODULES: # If the class was not registered
+      raise KeyError(model_class_name) # Raise a KeyError
+
+   verbose_output(true_string=f"{BackgroundColors.GREEN}Importing the {BackgroundColors.CYAN}{PROVIDER_MODULES[model_class_name]}{BackgroundColors.GREEN} provider module...{Style.RESET_ALL}") # Output the importing message
+
+   module = importlib.import_module(PROVIDER_MODULES[model_class_name]) # Import the provider module
+   return getattr(module, model_class_name) # Return the model class
+
+def close_provider_resources():
+   """
+   Close the resources shared by the imported providers, such as the pooled HTTP clients.
+   The transport module (and httpx) is only imported by the providers that use it, so it is not imported here.
+
+   :return: None
+   """
+
+   transport = sys.modules.get("transport") # The shared HTTP transport, if a provider imported it
+
+   if transport is not None: # If a provider used the pooled HTTP clients
+      transport.close_http_clients() # Close the pooled HTTP connections
+
+async def aclose_provider_resources():
+   """
+   Close the asynchronous resources shared by the imported providers, such as the pooled asynchronous HTTP clients.
+   Must be awaited in the event loop that used them, before it finishes.
+
+   :return: None
+   """
+
+   transport = sys.modules.get("transport") # The shared HTTP transport, if a provider imported it
+
+   if transport is not None: # If a provider used the pooled HTTP clients
+      await transport.aclose_async_http_clients() # Close the pooled asynchronous HTTP connections
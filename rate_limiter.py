@@ -0,0 +1,316 @@
+import asyncio # For waiting without blocking the event loop
+import email.utils # For parsing HTTP-date Retry-After headers
+import math # For rounding up the token estimates
+import random # For the jitter of the exponential backoff
+import threading # For making the token buckets thread safe
+import time # For measuring the elapsed time and waiting
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Retry Constants:
+MAX_RETRIES = 5 # The maximum number of retries of a rate limited or failed request
+BASE_BACKOFF_SECONDS = 1.0 # The base delay of the exponential backoff
+MAX_BACKOFF_SECONDS = 60.0 # The maximum delay of the exponential backoff
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504} # The HTTP status codes that are worth retrying
+
+# Token Estimation Constants:
+CHARACTERS_PER_TOKEN = 4 # The average number of characters per token, used to estimate the input tokens of a prompt
+EXPECTED_OUTPUT_TOKENS = 512 # The number of output tokens reserved for each request
+
+# Adaptive Rate Constants:
+RATE_DECREASE_FACTOR = 0.5 # The factor applied to the request rate after a 429 response
+RATE_INCREASE_STEP = 0.05 # The step used to recover the request rate after each successful request
+MINIMUM_RATE_FACTOR = 0.1 # The minimum fraction of the configured rate
+
+RATE_LIMITERS = {} # The rate limiters of each model class, created on demand
+RATE_LIMITERS_LOCK = threading.Lock() # Lock for creating the rate limiters
+
+class TokenBucket:
+   """
+   A thread-safe token bucket that hands out reservations, so it can be used both by threads and by coroutines.
+
+   """
+
+   def __init__(self, capacity, refill_per_second): # Constructor
+      self.capacity = capacity # The maximum number of tokens in the bucket
+      self.refill_per_second = refill_per_second # The number of tokens added to the bucket per second
+      self.tokens = capacity # The current number of tokens, which can be negative when there are pending reservations
+      self.updated_at = time.monotonic() # The last time the bucket was refilled
+      self.blocked_until = 0.0 # The bucket does not hand out tokens before this time
+      self.lock = threading.Lock() # Lock for updating the bucket
+
+   def refill(self, now):
+      """
+      Add the tokens accumulated since the last refill. Must be called with the lock held.
+
+      :param now: The current monotonic time.
+      :return: None
+      """
+
+      self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second) # Refill the bucket, up to its capacity
+      self.updated_at = now # Update the last refill time
+
+   def reserve(self, amount):
+      """
+      Reserve tokens from the bucket.
+
+      :param amount: The number of tokens to reserve.
+      :return: The number of seconds to wait before the reserved tokens can be used.
+      """
+
+      with self.lock: # Lock the bucket
+         now = time.monotonic() # Get the current time
+         self.refill(now) # Refill the bucket
+         self.tokens -= min(amount, self.capacity) # Reserve the tokens, never more than the capacity of the bucket
+         wait_seconds = -self.tokens / self.refill_per_second if self.tokens < 0 else 0.0 # Wait until the deficit is refilled
+
+         return max(wait_seconds, self.blocked_until - now) # Also wait until the bucket is unblocked
+
+   def block(self, seconds):
+      """
+      Stop handing out tokens for the given number of seconds.
+
+      :param seconds: The number of seconds to block the bucket.
+      :return: None
+      """
+
+      with self.lock: # Lock the bucket
+         self.blocked_until = max(self.blocked_until, time.monotonic() + seconds) # Extend the blocked period
+
+class RateLimiter:
+   """
+   A per-provider rate limiter that enforces requests-per-minute and tokens-per-minute budgets, honors Retry-After headers
+   and applies jittered exponential backoff on 429 and 5xx responses.
+
+   """
+
+   def __init__(self, name, requests_per_minute=None, tokens_per_minute=None): # Constructor
+      self.name = name # The name of the provider
+      self.requests_per_minute = requests_per_minute # The configured requests per minute budget
+      self.tokens_per_minute = tokens_per_minute # The configured tokens per minute budget
+      self.requests_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute else None # The requests bucket
+      self.tokens_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute else None # The tokens bucket
+      self.rate_factor = 1.0 # The fraction of the configured rate currently in use, lowered after 429 responses
+      self.lock = threading.Lock() # Lock for updating the rate factor
+
+   def buckets(self):
+      """
+      Get the configured token buckets.
+
+      :return: The list of configured token buckets.
+      """
+
+      return [bucket for bucket in (self.requests_bucket, self.tokens_bucket) if bucket is not None] # Return the configured buckets
+
+   def reserve(self, task_message):
+      """
+      Reserve one request and the estimated tokens of the task message.
+
+      :param task_message: The message that will be sent to the AI model.
+      :return: The number of seconds to wait before sending the request.
+      """
+
+      wait_seconds = self.requests_bucket.reserve(1) if self.requests_bucket else 0.0 # Reserve one request
+      if self.tokens_bucket: # If there is a tokens budget
+         wait_seconds = max(wait_seconds, self.tokens_bucket.reserve(estimate_tokens(task_message))) # Reserve the estimated tokens
+
+      return wait_seconds # Return the time to wait
+
+   def set_rate_factor(self, rate_factor):
+      """
+      Update the fraction of the configured rate currently in use.
+
+      :param rate_factor: The new rate factor.
+      :return: None
+      """
+
+      with self.lock: # Lock the rate limiter
+         self.rate_factor = min(1.0, max(MINIMUM_RATE_FACTOR, rate_factor)) # Keep the rate factor between the minimum and 1
+         if self.requests_bucket: # If there is a requests budget
+            self.requests_bucket.refill_per_second = self.requests_per_minute / 60 * self.rate_factor # Update the requests refill rate
+         if self.tokens_bucket: # If there is a tokens budget
+            self.tokens_bucket.refill_per_second = self.tokens_per_minute / 60 * self.rate_factor # Update the tokens refill rate
+
+   def on_success(self):
+      """
+      Slowly recover the request rate after a successful request.
+
+      :return: None
+      """
+
+      if self.rate_factor < 1.0: # If the rate was lowered
+         self.set_rate_factor(self.rate_factor + RATE_INCREASE_STEP) # Increase the rate
+
+   def on_error(self, error, attempt):
+      """
+      Handle a failed request, lowering the rate and blocking the buckets if it was rate limited.
+
+      :param error: The exception raised by the request.
+      :param attempt: The number of the failed attempt, starting at 0.
+      :return: The number of seconds to wait before retrying, or None if the request should not be retried.
+      """
+
+      status_code = get_status_code(error) # Get the HTTP status code of the error
+      if status_code not in RETRYABLE_STATUS_CODES or attempt >= MAX_RETRIES: # If the error is not retryable or there are no retries left
+         return None # Do not retry
+
+      retry_after = get_retry_after(error) # Get the Retry-After delay sent by the provider
+      if retry_after is not None: # If the provider sent a Retry-After delay
+         delay = retry_after + random.uniform(0, 0.1 * max(retry_after, 1.0)) # Honor it, with a small jitter so the retries do not all happen at the same time
+      else: # If the provider did not send a Retry-After delay
+         delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)) # Jittered exponential backoff
+
+      if status_code == 429: # If the request was rate limited
+         self.set_rate_factor(self.rate_factor * RATE_DECREASE_FACTOR) # Lower the request rate
+         for bucket in self.buckets(): # Loop through each bucket
+            bucket.block(delay) # Pause every request to this provider, not only this one
+
+      print(f"{BackgroundColors.YELLOW}The {BackgroundColors.CYAN}{self.name}{BackgroundColors.YELLOW} request failed with status {BackgroundColors.CYAN}{status_code}{BackgroundColors.YELLOW}. Retrying in {BackgroundColors.CYAN}{delay:.2f}{BackgroundColors.YELLOW} seconds ({attempt + 1}/{MAX_RETRIES})...{Style.RESET_ALL}") # Output the retry message
+
+      return delay # Return the delay before retrying
+
+   def run(self, function, task_message, *args):
+      """
+      Run a synchronous model call within the provider budgets, retrying it when it is rate limited or fails with a 5xx error.
+
+      :param function: The model function to call, such as model.run.
+      :param task_message: The message to send to the AI model.
+      :param args: Extra arguments passed to the function.
+      :return: The result of the function.
+      """
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Running the {BackgroundColors.CYAN}{self.name}{BackgroundColors.GREEN} request within its rate limits...{Style.RESET_ALL}") # Output the verbose message
+
+      attempt = 0 # The current attempt
+      while True: # Loop until the request succeeds or cannot be retried
+         time.sleep(self.reserve(task_message)) # Wait for the request and token budgets
+         try: # Try to run the request
+            result = function(task_message, *args) # Run the request
+         except Exception as e: # If an error occurs
+            delay = self.on_error(e, attempt) # Get the delay before retrying
+            if delay is None: # If the request should not be retried
+               raise # Propagate the error
+            time.sleep(delay) # Wait before retrying
+            attempt += 1 # Go to the next attempt
+            continue # Retry the request
+
+         self.on_success() # Recover the request rate
+         return result # Return the result
+
+   async def arun(self, coroutine_function, task_message, *args):
+      """
+      Asynchronous version of the run method, for model "arun" methods.
+
+      :param coroutine_function: The model coroutine function to call, such as model.arun.
+      :param task_message: The message to send to the AI model.
+      :param args: Extra arguments passed to the coroutine function.
+      :return: The result of the coroutine function.
+      """
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Running the asynchronous {BackgroundColors.CYAN}{self.name}{BackgroundColors.GREEN} request within its rate limits...{Style.RESET_ALL}") # Output the verbose message
+
+      attempt = 0 # The current attempt
+      while True: # Loop until the request succeeds or cannot be retried
+         await asyncio.sleep(self.reserve(task_message)) # Wait for the request and token budgets
+         try: # Try to run the request
+            result = await coroutine_function(task_message, *args) # Run the request
+         except Exception as e: # If an error occurs
+            delay = self.on_error(e, attempt) # Get the delay before retrying
+            if delay is None: # If the request should not be retried
+               raise # Propagate the error
+            await asyncio.sleep(delay) # Wait before retrying
+            attempt += 1 # Go to the next attempt
+            continue # Retry the request
+
+         self.on_success() # Recover the request rate
+         return result # Return the result
+
+def estimate_tokens(task_message):
+   """
+   Estimate the number of tokens consumed by a request, including the reserved output tokens.
+
+   :param task_message: The message to send to the AI model.
+   :return: The estimated number of tokens.
+   """
+
+   return math.ceil(len(str(task_message)) / CHARACTERS_PER_TOKEN) + EXPECTED_OUTPUT_TOKENS # Return the estimated input and output tokens
+
+def get_status_code(error):
+   """
+   Get the HTTP status code of an error raised by one of the provider SDKs.
+
+   :param error: The exception raised by the request.
+   :return: The HTTP status code or None if it is not available.
+   """
+
+   for attribute in ("status_code", "code", "http_status"): # Loop through the attributes used by the OpenAI, Mistral and Google SDKs
+      value = getattr(error, attribute, None) # Get the attribute value
+      if isinstance(value, int): # If the attribute holds a status code
+         return int(value) # Return the status code
+
+   response = get_error_response(error) # Get the HTTP response of the error
+   status_code = getattr(response, "status_code", None) # Get the status code of the response
+
+   return status_code if isinstance(status_code, int) else None # Return the status code
+
+def get_error_response(error):
+   """
+   Get the HTTP response attached to an error raised by one of the provider SDKs.
+
+   :param error: The exception raised by the request.
+   :return: The HTTP response or None if it is not available.
+   """
+
+   return getattr(error, "response", None) or getattr(error, "raw_response", None) # Return the response of the OpenAI or Mistral error
+
+def get_retry_after(error):
+   """
+   Get the delay requested by the provider in the Retry-After (or retry-after-ms) header of an error.
+
+   :param error: The exception raised by the request.
+   :return: The delay in seconds or None if the header is not present.
+   """
+
+   headers = getattr(get_error_response(error), "headers", None) or {} # Get the headers of the response
+
+   retry_after_ms = headers.get("retry-after-ms") # Get the Retry-After header in milliseconds
+   if retry_after_ms: # If the header is present
+      try: # Try to parse the header
+         return float(retry_after_ms) / 1000 # Return the delay in seconds
+      except ValueError: # If the header is not a number
+         pass # Try the Retry-After header
+
+   retry_after = headers.get("retry-after") # Get the Retry-After header
+   if not retry_after: # If the header is not present
+      return None # There is no delay
+
+   try: # Try to parse the header as a number of seconds
+      return max(0.0, float(retry_after)) # Return the delay in seconds
+   except ValueError: # If the header is an HTTP date
+      try: # Try to parse the header as an HTTP date
+         return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time()) # Return the seconds until the date
+      except (TypeError, ValueError): # If the header is invalid
+         return None # Ignore the header
+
+def get_rate_limiter(model):
+   """
+   Get the rate limiter of a model, created from its REQUESTS_PER_MINUTE and TOKENS_PER_MINUTE constants.
+   All of the instances of the same model class share the same rate limiter.
+
+   :param model: The AI model object.
+   :return: The rate limiter or None if the model has no configured budgets.
+   """
+
+   model_class = type(model) # Get the model class
+   requests_per_minute = getattr(model_class, "REQUESTS_PER_MINUTE", None) # Get the requests per minute budget
+   tokens_per_minute = getattr(model_class, "TOKENS_PER_MINUTE", None) # Get the tokens per minute budget
+
+   if not requests_per_minute and not tokens_per_minute: # If the model has no budgets
+      return None # There is no rate limiter
+
+   with RATE_LIMITERS_LOCK: # Lock the rate limiters dictionary
+      if model_class not in RATE_LIMITERS: # If the rate limiter does not exist yet
+         RATE_LIMITERS[model_class] = RateLimiter(model_class.__name__, requests_per_minute, tokens_per_minute) # Create it
+
+      return RATE_LIMITERS[model_class] # Return the rate limiter
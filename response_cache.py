@@ -0,0 +1,112 @@
+import hashlib # For hashing the cache keys
+import json # For serializing the cache keys
+import sqlite3 # For the persistent cache store
+import threading # For making the cache thread safe
+import time # For the TTL and LRU timestamps
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Cache Constants:
+CACHE_FILE = f"{OUTPUT_DIRECTORY}responses_cache.sqlite3" # The path to the SQLite response cache
+CACHE_TTL_SECONDS = None # The time to live of the cached responses in seconds (None means they never expire)
+CACHE_MAX_ENTRIES = 100000 # The maximum number of cached responses, the least recently used ones are evicted (None means unbounded)
+EVICTION_INTERVAL = 100 # The number of insertions between each eviction check
+
+class ResponseCache:
+   """
+   A persistent SQLite response cache keyed by provider, model parameters and prompt, with an optional TTL and size-bounded LRU eviction.
+
+   """
+
+   def __init__(self, cache_file=CACHE_FILE, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES): # Constructor
+      self.cache_file = cache_file # The path to the SQLite cache file
+      self.ttl_seconds = ttl_seconds # The time to live of the cached responses
+      self.max_entries = max_entries # The maximum number of cached responses
+      self.insertions = 0 # The number of insertions since the last eviction check
+      self.lock = threading.Lock() # Lock for the SQLite connection
+      self.connection = sqlite3.connect(cache_file, check_same_thread=False, isolation_level=None) # Open the SQLite database in autocommit mode
+      self.connection.execute("PRAGMA journal_mode=WAL") # Allow other processes to read while a response is written
+      self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)") # Create the responses table
+      self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)") # Index used by the LRU eviction
+
+   def get(self, key):
+      """
+      Get a cached response.
+
+      :param key: The cache key.
+      :return: The cached response or None if it is not cached or has expired.
+      """
+
+      now = time.time() # Get the current time
+
+      with self.lock: # Lock the connection
+         row = self.connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone() # Get the cached response
+         if row is None: # If the response is not cached
+            return None # Cache miss
+
+         response, created_at = row # Unpack the row
+         if self.ttl_seconds is not None and now - created_at > self.ttl_seconds: # If the response has expired
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,)) # Delete the expired response
+            return None # Cache miss
+
+         self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)) # Mark the response as recently used
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Response cache hit for key {BackgroundColors.CYAN}{key}{Style.RESET_ALL}") # Output the verbose message
+
+      return response # Return the cached response
+
+   def set(self, key, response):
+      """
+      Store a response in the cache.
+
+      :param key: The cache key.
+      :param response: The response text.
+      :return: None
+      """
+
+      now = time.time() # Get the current time
+
+      with self.lock: # Lock the connection
+         self.connection.execute("INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)", (key, response, now, now)) # Store the response
+         self.insertions += 1 # Count the insertion
+
+         if self.max_entries is not None and self.insertions >= EVICTION_INTERVAL: # If it is time to check the cache size
+            self.insertions = 0 # Reset the insertions counter
+            self.connection.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)) # Evict the least recently used responses
+
+   def close(self):
+      """
+      Close the cache, evicting the responses over the size limit.
+
+      :return: None
+      """
+
+      with self.lock: # Lock the connection
+         if self.max_entries is not None: # If the cache is size bounded
+            self.connection.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)) # Evict the least recently used responses
+         self.connection.close() # Close the connection
+
+def get_model_parameters(model):
+   """
+   Get the parameters that change a model's response, such as the model name and the generation configuration.
+
+   :param model: The AI model object.
+   :return: Dictionary of the model parameters.
+   """
+
+   return model.get_parameters() if hasattr(model, "get_parameters") else {} # Return the model parameters
+
+def get_cache_key(model, task_message):
+   """
+   Build the cache key of a request from its provider, model parameters and prompt.
+
+   :param model: The AI model object.
+   :param task_message: The message to send to the AI model.
+   :return: The SHA-256 hex digest of the request.
+   """
+
+   request = {"provider": type(model).__name__, "parameters": get_model_parameters(model), "prompt": task_message} # The attributes that identify the request
+
+   return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest() # Return the hash of the request
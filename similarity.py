@@ -0,0 +1,164 @@
+import math # For the IDF weight of the per-pair mode
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Similarity Constants:
+SIMILARITY_IDF_MODE = "pair" # "pair" reproduces a TF-IDF fitted on each (output, expected output) pair, "corpus" fits a single IDF over a reference corpus
+REFERENCE_CORPUS_FILE = None # The text file (one document per line) used as the reference corpus in "corpus" mode (None means the expected outputs of the input CSV file)
+PAIR_SINGLE_DOCUMENT_IDF = math.log(3 / 2) + 1 # The smoothed IDF of a term that appears in only one of the two documents of a pair (the IDF of a shared term is 1)
+
+class SimilarityEngine:
+   """
+   A batched TF-IDF cosine similarity engine, which keeps the vectors sparse and scores many (output, expected output) pairs in one sparse matrix operation.
+
+   """
+
+   def __init__(self, idf_mode=SIMILARITY_IDF_MODE, reference_corpus=None): # Constructor
+      if idf_mode not in ("pair", "corpus"): # If the IDF mode is invalid
+         raise ValueError(f"Invalid idf_mode: {idf_mode}. Use 'pair' or 'corpus'.") # Raise a ValueError
+
+      self.idf_mode = idf_mode # The IDF mode
+      self.vectorizer = None # The TF-IDF vectorizer fitted on the reference corpus, used in "corpus" mode
+
+      if idf_mode == "corpus": # If a single IDF is used for the whole run
+         self.fit(reference_corpus or []) # Fit the vectorizer on the reference corpus
+
+   def fit(self, reference_corpus):
+      """
+      Fit the vocabulary and the IDF on the reference corpus, used in "corpus" mode.
+
+      :param reference_corpus: Iterable of reference documents.
+      :return: None
+      """
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Fitting the TF-IDF vectorizer on the reference corpus...{Style.RESET_ALL}") # Output the fitting message
+
+      from sklearn.feature_extraction.text import TfidfVectorizer # Imported on demand, as sklearn is slow to import
+
+      documents = [document for document in reference_corpus if is_valid_text(document)] # Ignore the empty documents
+      self.vectorizer = TfidfVectorizer().fit(documents) if documents else None # Fit the vectorizer, if there is anything to fit
+
+   def compute_similarities(self, outputs, expected_outputs):
+      """
+      Compute the cosine similarity of each (output, expected output) pair.
+
+      :param outputs: List of output texts.
+      :param expected_outputs: List of expected output texts, aligned with the outputs.
+      :return: List of similarity percentages rounded to 2 decimal places, with None where the expected output is empty.
+      """
+
+      verbose_output(true_string=f"{BackgroundColors.GREEN}Computing the similarity of {BackgroundColors.CYAN}{len(outputs)}{BackgroundColors.GREEN} pairs...{Style.RESET_ALL}") # Output the computation message
+
+      import numpy as np # Imported on demand, as numpy is slow to import
+
+      valid_indexes = [index for index, expected_output in enumerate(expected_outputs) if is_valid_text(expected_output)] # The pairs with an expected output
+      similarities = [None] * len(outputs) # The pairs without an expected output have no similarity
+
+      if not valid_indexes: # If no pair has an expected output
+         return similarities # Return the empty similarities
+
+      valid_outputs = [str(outputs[index]) if outputs[index] is not None else "" for index in valid_indexes] # The outputs of the valid pairs
+      valid_expected_outputs = [str(expected_outputs[index]) for index in valid_indexes] # The expected outputs of the valid pairs
+
+      if self.idf_mode == "pair": # If each pair has its own IDF
+         scores = compute_pair_idf_similarities(valid_outputs, valid_expected_outputs) # Reproduce a TF-IDF fitted on each pair
+      else: # If the IDF was fitted on the reference corpus
+         scores = self.compute_corpus_idf_similarities(valid_outputs, valid_expected_outputs) # Use the reference corpus IDF
+
+      for index, score in zip(valid_indexes, np.round(scores * 100, 2)): # Loop through each valid pair
+         similarities[index] = float(score) # Store the similarity percentage
+
+      return similarities # Return the similarities
+
+   def compute_corpus_idf_similarities(self, outputs, expected_outputs):
+      """
+      Compute the cosine similarities using the IDF fitted on the reference corpus.
+
+      :param outputs: List of output texts.
+      :param expected_outputs: List of expected output texts.
+      :return: Array of cosine similarities between 0 and 1.
+      """
+
+      import numpy as np # Imported on demand, as numpy is slow to import
+
+      if self.vectorizer is None: # If the reference corpus had no documents
+         return np.zeros(len(outputs)) # There is no shared vocabulary
+
+      output_vectors = self.vectorizer.transform(outputs) # The L2 normalized sparse output vectors
+      expected_vectors = self.vectorizer.transform(expected_outputs) # The L2 normalized sparse expected output vectors
+
+      return np.asarray(output_vectors.multiply(expected_vectors).sum(axis=1)).ravel() # The row-wise dot products are the cosine similarities
+
+def is_valid_text(text):
+   """
+   Verify if a text is a non-empty string.
+
+   :param text: The text to verify.
+   :return: True if the text is not None, NaN or whitespace only.
+   """
+
+   if text is None or (isinstance(text, float) and math.isnan(text)): # If the text is missing
+      return False # The text is not valid
+
+   return bool(str(text).strip()) # Return True if the text is not whitespace only
+
+def compute_pair_idf_similarities(outputs, expected_outputs):
+   """
+   Compute the cosine similarities a TfidfVectorizer fitted on each (output, expected output) pair would give, in a single sparse matrix operation.
+   With two documents, the smoothed IDF of a term is 1 if it appears in both of them and log(3 / 2) + 1 otherwise.
+
+   :param outputs: List of output texts.
+   :param expected_outputs: List of expected output texts.
+   :return: Array of cosine similarities between 0 and 1.
+   """
+
+   import numpy as np # Imported on demand, as numpy is slow to import
+   from sklearn.feature_extraction.text import CountVectorizer # Imported on demand, so the runs without expected outputs never load sklearn
+
+   vectorizer = CountVectorizer() # Uses the same tokenization as TfidfVectorizer
+   try: # Try to build the term counts
+      counts = vectorizer.fit_transform(outputs + expected_outputs).astype(np.float64) # The sparse term counts of every document
+   except ValueError: # If no document has any token
+      return np.zeros(len(outputs)) # Every similarity is 0
+
+   output_counts = counts[:len(outputs)] # The term counts of the outputs
+   expected_counts = counts[len(outputs):] # The term counts of the expected outputs
+
+   dot_products = np.asarray(output_counts.multiply(expected_counts).sum(axis=1)).ravel() # Only the shared terms contribute, and their IDF is 1
+   output_norms = weighted_squared_norms(output_counts, expected_counts) # The squared norms of the output TF-IDF vectors
+   expected_norms = weighted_squared_norms(expected_counts, output_counts) # The squared norms of the expected output TF-IDF vectors
+
+   denominators = np.sqrt(output_norms * expected_norms) # The product of the norms
+   similarities = np.zeros(len(outputs)) # An empty vector has a similarity of 0
+   np.divide(dot_products, denominators, out=similarities, where=denominators > 0) # Compute the cosine similarities
+
+   return similarities # Return the cosine similarities
+
+def weighted_squared_norms(counts, other_counts):
+   """
+   Compute the squared norms of the per-pair TF-IDF vectors of each row.
+
+   :param counts: The sparse term counts of the documents.
+   :param other_counts: The sparse term counts of the other document of each pair.
+   :return: Array of squared norms.
+   """
+
+   import numpy as np # Imported on demand, as numpy is slow to import
+
+   squared_counts = counts.multiply(counts) # The squared term counts
+   shared_squared = np.asarray(squared_counts.multiply(other_counts > 0).sum(axis=1)).ravel() # The squared counts of the terms shared with the other document
+   total_squared = np.asarray(squared_counts.sum(axis=1)).ravel() # The squared counts of every term
+
+   return shared_squared + (total_squared - shared_squared) * PAIR_SINGLE_DOCUMENT_IDF ** 2 # The terms only in this document are weighted by their IDF
+
+def read_reference_corpus(reference_corpus_file=REFERENCE_CORPUS_FILE):
+   """
+   Read the reference corpus file, one document per line.
+
+   :param reference_corpus_file: The path to the reference corpus file.
+   :return: List of reference documents.
+   """
+
+   with open(reference_corpus_file, mode="r", encoding="utf-8") as file: # Open the reference corpus file
+      return [line.strip() for line in file if line.strip()] # Return the non-empty lines
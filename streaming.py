@@ -0,0 +1,90 @@
+import time # For measuring the time to first token and the latency
+from rate_limiter import CHARACTERS_PER_TOKEN # Import Constants from ./rate_limiter.py
+
+def estimate_output_tokens(output):
+   """
+   Estimate the number of output tokens of a response, for the providers that do not report it in the stream.
+
+   :param output: The output text.
+   :return: The estimated number of output tokens.
+   """
+
+   return max(1, len(output) // CHARACTERS_PER_TOKEN) if output else 0 # Return the estimated number of tokens
+
+def build_stream_metrics(start_time, first_token_time, end_time, output_tokens, input_tokens=None):
+   """
+   Build the metrics of a streamed call.
+
+   :param start_time: The time the request was sent.
+   :param first_token_time: The time the first text chunk was received, or None if the response was empty.
+   :param end_time: The time the stream finished.
+   :param output_tokens: The number of output tokens.
+   :param input_tokens: The number of input tokens reported by the provider, or None.
+   :return: Dictionary with the time to first token ("ttft") and total latency ("latency") in seconds, the output tokens per second ("tokens_per_second") and the token usage ("input_tokens" and "output_tokens").
+   """
+
+   first_token_time = first_token_time if first_token_time is not None else end_time # An empty response has its first token at the end
+   latency = end_time - start_time # The total latency
+   generation_seconds = end_time - first_token_time # The time spent generating the tokens after the first one
+
+   return { # The stream metrics
+      "ttft": round(first_token_time - start_time, 3), # The time to first token
+      "latency": round(latency, 3), # The total latency
+      "tokens_per_second": round(output_tokens / (generation_seconds if generation_seconds > 0 else latency), 1) if latency > 0 else 0.0, # The output tokens per second, using the whole latency when everything arrived in a single chunk
+      "input_tokens": input_tokens, # The input tokens
+      "output_tokens": output_tokens, # The output tokens
+   }
+
+def consume_stream(chunks, start_time, get_chunk_text, get_chunk_usage):
+   """
+   Consume a stream of response chunks incrementally, recording the time to first token, the latency and the output tokens per second.
+
+   :param chunks: Iterable of response chunks.
+   :param start_time: The time the request was sent, from time.perf_counter.
+   :param get_chunk_text: Function that returns the text of a chunk.
+   :param get_chunk_usage: Function that returns the (input tokens, output tokens) tuple reported in a chunk, or None.
+   :return: Tuple of the output text and the stream metrics.
+   """
+
+   parts = [] # The text chunks
+   first_token_time = None # The time the first text chunk was received
+   usage = None # The (input tokens, output tokens) tuple reported by the provider
+
+   for chunk in chunks: # Loop through each chunk as soon as it arrives
+      text = get_chunk_text(chunk) # Get the text of the chunk
+      if text: # If the chunk has text
+         first_token_time = first_token_time or time.perf_counter() # Record the time to first token
+         parts.append(text) # Keep the text
+      usage = get_chunk_usage(chunk) or usage # Keep the usage, usually sent in the last chunk
+
+   output = "".join(parts) # Join the text chunks
+   input_tokens, output_tokens = usage or (None, None) # The reported token usage
+
+   return output, build_stream_metrics(start_time, first_token_time, time.perf_counter(), output_tokens or estimate_output_tokens(output), input_tokens) # Return the output and the metrics
+
+async def aconsume_stream(chunks, start_time, get_chunk_text, get_chunk_usage):
+   """
+   Asynchronous version of consume_stream, for asynchronous streams.
+
+   :param chunks: Asynchronous iterable of response chunks.
+   :param start_time: The time the request was sent, from time.perf_counter.
+   :param get_chunk_text: Function that returns the text of a chunk.
+   :param get_chunk_usage: Function that returns the (input tokens, output tokens) tuple reported in a chunk, or None.
+   :return: Tuple of the output text and the stream metrics.
+   """
+
+   parts = [] # The text chunks
+   first_token_time = None # The time the first text chunk was received
+   usage = None # The (input tokens, output tokens) tuple reported by the provider
+
+   async for chunk in chunks: # Loop through each chunk as soon as it arrives
+      text = get_chunk_text(chunk) # Get the text of the chunk
+      if text: # If the chunk has text
+         first_token_time = first_token_time or time.perf_counter() # Record the time to first token
+         parts.append(text) # Keep the text
+      usage = get_chunk_usage(chunk) or usage # Keep the usage, usually sent in the last chunk
+
+   output = "".join(parts) # Join the text chunks
+   input_tokens, output_tokens = usage or (None, None) # The reported token usage
+
+   return output, build_stream_metrics(start_time, first_token_time, time.perf_counter(), output_tokens or estimate_output_tokens(output), input_tokens) # Return the output and the metrics
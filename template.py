@@ -17,6 +17,7 @@ class ModelName:
 	ENV_PATH = "./.env" # The path to the .env file
 	ENV_VARIABLE = "MODELNAME_API_KEY" # The environment variable to load
 	OUTPUT_FILE = f"{OUTPUT_DIRECTORY}ModelName_output.txt" # The path to the output file
+	REQUEST_TIMEOUT_SECONDS = 120 # The deadline of each request, after which it counts as a failure of the provider's circuit breaker (None waits forever)
 
 	def __init__(self): # Constructor
 		self.api_key = None # The API key
@@ -46,6 +47,15 @@ class ModelName:
 
 		return api_key # Return the API key
 
+	def get_parameters(self):
+		"""
+		Get the parameters that change the model's response, used to build the response cache keys.
+
+		:return: Dictionary of the model parameters.
+		"""
+
+		return {"model": self.model} # Return the model parameters
+
 	def run(self, task_message):
 		"""
 		Main function to run the AI model to do what is described in the task message.
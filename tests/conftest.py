@@ -0,0 +1,4 @@
+import os # For the path of the project directory
+import sys # For importing the modules of the project
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Import the modules from the project directory, as the tests run from ./tests/
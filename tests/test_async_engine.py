@@ -0,0 +1,91 @@
+import asyncio # For running the asyncio execution engine
+import csv # For reading the output file
+import main # Import the collector from ./main.py
+import pytest # For the parametrized tests
+import threading # For counting the calls of the thread engine
+
+def test_slow_head_task_bounds_the_queue(monkeypatch):
+   """
+   Verify that a slow first task stops the dispatch of the next tasks once MAX_QUEUED_TASKS tasks wait behind it, and that the rows are written in the input order.
+
+   :param monkeypatch: The pytest fixture used to replace the pipeline functions.
+   :return: None
+   """
+
+   dispatched, written = [], [] # The dispatched and written tasks
+   dispatched_when_head_finished = [] # The number of dispatched tasks when the first task finished
+
+   async def run_task(models_object_list, task_description, provider_semaphores): # Run a task without calling any model
+      dispatched.append(task_description) # Count the dispatched task
+      if task_description == "task 0": # If it is the slow first task
+         await asyncio.sleep(0.2) # Wait long enough for every other task to finish
+         dispatched_when_head_finished.append(len(dispatched)) # Count the tasks dispatched in the meantime
+      return {}, {}, {} # Return empty results
+
+   monkeypatch.setattr(main, "MAX_QUEUED_TASKS", 6) # The maximum number of queued tasks
+   monkeypatch.setattr(main, "DEDUPLICATE_TASKS", False) # Every task is dispatched
+   monkeypatch.setattr(main, "arun_task_on_each_model", run_task) # Run the tasks without calling any model
+   monkeypatch.setattr(main, "print_task", lambda *args: None) # Do not output the tasks
+   monkeypatch.setattr(main, "store_task_results", lambda models_object_list, task_description, *args: written.append(task_description)) # Record the written rows
+   monkeypatch.setattr(main, "write_output_row", lambda *args: None) # Do not write the rows
+
+   asyncio.run(main.arun_tasks(((f"task {index}", "") for index in range(100)), [], {}, None, None)) # Run 100 tasks
+
+   assert dispatched_when_head_finished == [6] # Only MAX_QUEUED_TASKS tasks were dispatched while the first task was running
+   assert written == [f"task {index}" for index in range(100)] # Every row was written in the input order
+
+@pytest.mark.parametrize("async_execution", [True, False]) # Both execution engines
+def test_duplicate_tasks_are_sent_once(tmp_path, monkeypatch, async_execution):
+   """
+   Verify that the tasks whose normalized descriptions are identical are sent once to each model, including the duplicates dispatched while the first one is in flight
+   without taking the task semaphore, and that every row is written in the input order with the same response and its own expected output.
+
+   :param tmp_path: The temporary directory of the test.
+   :param monkeypatch: The pytest fixture used to replace the models and the module constants.
+   :param async_execution: If the tasks are run by the asyncio execution engine.
+   :return: None
+   """
+
+   calls, running, peak_running = [], [0], [0] # The sent tasks, and the current and peak number of calls in flight
+   calls_lock = threading.Lock() # Lock for counting the calls
+
+   def count_call(task_description, delta): # Count a call starting or finishing
+      with calls_lock: # Lock the counters
+         if delta > 0: # If the call starts
+            calls.append(task_description) # Count the sent task
+         running[0] += delta # Update the calls in flight
+         peak_running[0] = max(peak_running[0], running[0]) # Update the peak
+
+   def call_model(model, task_description): # Answer a task, numbering the calls so a repeated call would give another response
+      count_call(task_description, 1) # The call starts
+      count_call(task_description, -1) # The call finishes
+      return f"answer {len(calls)}", None # Return the response and no stream metrics
+
+   async def acall_model(model, task_description): # Answer a task after a short delay, so its duplicates are dispatched while it is in flight
+      count_call(task_description, 1) # The call starts
+      await asyncio.sleep(0.05) # Wait for the response
+      count_call(task_description, -1) # The call finishes
+      return f"answer {calls.index(task_description) + 1}", None # Return the response and no stream metrics
+
+   tasks = [("say hi", "hi"), ("  say\u00a0 hi ", "hello"), ("other", "other"), ("say hi", "hey"), ("other", "another"), ("say  hi", "hi")] # Duplicates that only differ in their whitespace, with their own expected outputs
+   model = type("ChatGPTModel", (), {"__module__": "chatgpt"})() # A model named after ChatGPT
+
+   monkeypatch.setattr(main, "OUTPUT_CSV_FILE", str(tmp_path / "output.csv")) # The output file
+   monkeypatch.setattr(main, "WRITE_LEADERBOARD", False) # The leaderboard is not tested here
+   monkeypatch.setattr(main, "ASYNC_EXECUTION", async_execution) # The execution engine
+   monkeypatch.setattr(main, "MAX_CONCURRENT_TASKS", 1) # A single task holds the task semaphore
+   monkeypatch.setattr(main, "DEDUPLICATE_TASKS", True) # Deduplicate the tasks
+   monkeypatch.setattr(main, "CACHE_RESPONSES", False) # The later duplicates are answered by the deduplication window rather than by the cache
+   monkeypatch.setattr(main, "get_models_object_list", lambda: [model]) # Run the fake model
+   monkeypatch.setattr(main, "call_model", call_model) # Call it with the thread engine
+   monkeypatch.setattr(main, "acall_model", acall_model) # Call it with the asyncio execution engine
+
+   main.run_tasks(iter(tasks)) # Run the tasks
+
+   with open(main.OUTPUT_CSV_FILE, mode="r", newline="", encoding="utf-8") as file: # Open the output file
+      rows = list(csv.DictReader(file)) # Read its rows
+
+   assert calls == ["say hi", "other"] # Each unique task was sent once
+   assert peak_running[0] == 1 # The deduplicated tasks did not send calls past the task semaphore
+   assert [(row["Task"], row["Expected Output"]) for row in rows] == tasks # The rows are in the input order, with their own expected outputs
+   assert [row["Chatgpt"] for row in rows] == ["answer 1", "answer 1", "answer 2", "answer 1", "answer 2", "answer 1"] # The duplicates have the response of their first task
@@ -0,0 +1,73 @@
+import contextlib # For closing the stores
+import os # For truncating the segment file
+import pytest # For the parametrized tests
+from blob_store import BLOB_RECORD_HEADER, BlobStore, parse_blob_reference, read_output_rows # Import the content-addressed response store from ./blob_store.py
+
+def test_put_deduplicates_and_reads_responses(tmp_path):
+   """
+   Verify that an identical response is only stored once and that the references are read back, also after the store is opened again.
+
+   :param tmp_path: The temporary directory of the test.
+   :return: None
+   """
+
+   blob_file = str(tmp_path / "responses.blobs") # The segment file
+
+   with contextlib.closing(BlobStore(blob_file)) as blob_store: # Open the store
+      first_reference = blob_store.put("first response ✓") # Store a response with a non-ASCII character
+      assert blob_store.put("first response ✓") == first_reference # An identical response keeps its reference
+      second_reference = blob_store.put("second response") # Store another response
+      assert blob_store.read(second_reference) == "second response" # It is read after the file was mapped
+
+   assert os.path.getsize(blob_file) == 2 * BLOB_RECORD_HEADER.size + len("first response ✓".encode("utf-8")) + len("second response") # Each response was written once
+
+   with contextlib.closing(BlobStore(blob_file, read_only=True)) as blob_store: # Open the store again
+      assert blob_store.resolve(first_reference) == "first response ✓" # The reference is read back
+      assert blob_store.resolve("an inline output") == "an inline output" # The inline outputs are kept
+   assert parse_blob_reference("blob:not-a-digest:0:1") is None # An invalid reference is not parsed
+
+@pytest.mark.parametrize("cut_bytes", [1, len("second response"), len("second response") + 1, len("second response") + BLOB_RECORD_HEADER.size - 1]) # Cut in the response, right after its header, in its header and after the first byte of its header
+def test_incomplete_last_record_is_truncated(tmp_path, cut_bytes):
+   """
+   Verify that a record cut by an interrupted run is removed when the store is opened for writing, so the next responses are appended after the last complete record.
+
+   :param tmp_path: The temporary directory of the test.
+   :param cut_bytes: The number of bytes removed from the end of the segment file.
+   :return: None
+   """
+
+   blob_file = str(tmp_path / "responses.blobs") # The segment file
+
+   with contextlib.closing(BlobStore(blob_file)) as blob_store: # Open the store
+      first_reference = blob_store.put("first response") # Store a complete record
+      blob_store.put("second response") # Store the record that is cut
+   complete_size = BLOB_RECORD_HEADER.size + len("first response") # The size of the complete records
+   os.truncate(blob_file, os.path.getsize(blob_file) - cut_bytes) # Cut the last record
+
+   with contextlib.closing(BlobStore(blob_file, read_only=True)) as blob_store: # Open the store for reading
+      assert blob_store.read(first_reference) == "first response" # The complete record is readable
+   assert os.path.getsize(blob_file) == complete_size + BLOB_RECORD_HEADER.size + len("second response") - cut_bytes # A read-only store does not truncate
+
+   with contextlib.closing(BlobStore(blob_file)) as blob_store: # Open the store for writing
+      assert os.path.getsize(blob_file) == complete_size # The incomplete record was removed
+      third_reference = blob_store.put("third response") # Store the next response
+      assert parse_blob_reference(third_reference)[1] == complete_size + BLOB_RECORD_HEADER.size # It was appended after the last complete record
+      assert blob_store.read(third_reference) == "third response" # It is readable
+      assert blob_store.read(first_reference) == "first response" # The complete record is still readable
+
+def test_read_output_rows_resolves_references(tmp_path):
+   """
+   Verify that the rows of an output file are read with their blob references replaced by the responses.
+
+   :param tmp_path: The temporary directory of the test.
+   :return: None
+   """
+
+   blob_file = str(tmp_path / "responses.blobs") # The segment file
+   with contextlib.closing(BlobStore(blob_file)) as blob_store: # Open the store
+      reference = blob_store.put("a long output") # Store a response
+
+   csv_file = tmp_path / "output.csv" # The output file
+   csv_file.write_text(f"Task,Chatgpt\ntask 1,{reference}\ntask 2,\n", encoding="utf-8") # A referenced output and an empty output
+
+   assert list(read_output_rows(str(csv_file), blob_file)) == [{"Task": "task 1", "Chatgpt": "a long output"}, {"Task": "task 2", "Chatgpt": ""}] # The reference was resolved
@@ -0,0 +1,60 @@
+import circuit_breaker # Import the provider deadlines and circuit breakers from ./circuit_breaker.py
+import pytest # For the fixtures
+import threading # For the hung requests
+import time # For measuring the elapsed time
+
+@pytest.fixture
+def hang():
+   """
+   Provide the event the hung requests wait for, which is set once the test finishes so their threads end.
+
+   :return: Generator that yields the event.
+   """
+
+   event = threading.Event() # The event the hung requests wait for
+   yield event # Run the test
+   event.set() # End the hung requests
+
+@pytest.fixture(autouse=True)
+def deadline_slots(monkeypatch):
+   """
+   Give each provider 2 deadline threads, with fresh semaphores for the test.
+
+   :param monkeypatch: The pytest fixture used to replace the module constants.
+   :return: None
+   """
+
+   monkeypatch.setattr(circuit_breaker, "DEADLINE_MAX_THREADS", 2) # The threads of each provider
+   monkeypatch.setattr(circuit_breaker, "DEADLINE_SLOTS", {}) # The semaphores of the test
+
+def test_hung_provider_does_not_block_other_providers(hang):
+   """
+   Verify that the requests of a hung provider time out without taking more than its own threads, while the requests of another provider still finish.
+
+   :param hang: The event the hung requests wait for.
+   :return: None
+   """
+
+   for _ in range(5): # More requests than the threads of the hung provider
+      with pytest.raises(circuit_breaker.ProviderTimeoutError): # The request must time out
+         circuit_breaker.run_with_deadline("Gemini", hang.wait, 0.05) # Send a request that never ends
+
+   hung_threads = [thread for thread in threading.enumerate() if thread.name == "deadline-Gemini"] # The threads of the hung requests
+   assert len(hung_threads) == 2 # The hung provider only holds its own threads
+   assert all(thread.daemon for thread in hung_threads) # They do not keep the interpreter from exiting
+
+   start_time = time.perf_counter() # Start the timer
+   results = [circuit_breaker.run_with_deadline("Chatgpt", str.upper, 1.0, f"task {index}") for index in range(10)] # Send requests to another provider
+   assert results == [f"TASK {index}" for index in range(10)] # They all finished
+   assert time.perf_counter() - start_time < 1.0 # Without waiting for the hung provider
+
+def test_request_errors_are_propagated():
+   """
+   Verify that the error of a request that finished within the deadline is raised and that its thread is freed.
+
+   :return: None
+   """
+
+   for _ in range(3): # More requests than the threads of the provider
+      with pytest.raises(ZeroDivisionError): # The error of the request
+         circuit_breaker.run_with_deadline("Mistral", lambda: 1 / 0, 1.0) # Send a request that fails
@@ -0,0 +1,122 @@
+import columnar_output # Import the columnar output writer from ./columnar_output.py
+import contextlib # For closing the blob store
+import csv # For writing the output file
+import os # For truncating the columnar output file
+import pytest # For the parametrized tests
+from blob_store import BlobStore # Import the content-addressed response store from ./blob_store.py
+
+pytest.importorskip("pyarrow") # The columnar output requires pyarrow
+
+HEADER = ["Task", "Expected Output", "Most Similar Model", "Chatgpt", "Chatgpt Similarity"] # The header of the output
+ROWS = 12 # The number of rows written by the interrupted run
+
+def write_run(tmp_path, output_format, blob_store=None):
+   """
+   Write the output CSV file and the columnar output file of an interrupted run, in row groups of 5 rows.
+
+   :param tmp_path: The temporary directory of the test.
+   :param output_format: The format of the columnar output file ("parquet" or "arrow").
+   :param blob_store: The blob store of the model outputs, or None to write them inline.
+   :return: Tuple of the paths to the output CSV file and to the columnar output file.
+   """
+
+   csv_file, file_path = str(tmp_path / "output.csv"), str(tmp_path / f"output.{output_format}") # The output files
+   columnar_writer = columnar_output.ColumnarOutputWriter(output_format, HEADER, ["Chatgpt"], file_path, row_group_size=5) # Open the columnar output file
+
+   with open(csv_file, mode="w", newline="", encoding="utf-8") as file: # Open the output CSV file
+      writer = csv.writer(file) # The CSV writer
+      writer.writerow(HEADER) # Write the header
+      for index in range(ROWS): # Loop through each row
+         output = f"output {index}" # The model output
+         writer.writerow([f"task {index}", "expected", "Chatgpt (50.0%)", blob_store.put(output) if blob_store else output, "50.0"]) # Write the row, with the output reference if the outputs are stored as blobs
+         columnar_writer.append({"Task": f"task {index}", "Expected Output": "expected", "Most Similar Model": "Chatgpt (50.0%)", "Chatgpt": output, "Chatgpt Similarity": "50.0", "Chatgpt Raw": f"raw {index}"}) # Buffer the typed row
+
+   columnar_writer.close() # Close the columnar output file
+
+   return csv_file, file_path # Return the paths to the output files
+
+def resume_run(csv_file, file_path, output_format, blob_file):
+   """
+   Resume the run, restoring its rows to the columnar output file, and read them back.
+
+   :param csv_file: The path to the output CSV file.
+   :param file_path: The path to the columnar output file.
+   :param output_format: The format of the columnar output file ("parquet" or "arrow").
+   :param blob_file: The path to the blob store of the output CSV file, which only exists if the outputs are stored as blobs.
+   :return: List of dictionaries of the restored rows.
+   """
+
+   columnar_writer = columnar_output.open_columnar_output(output_format, HEADER, ["Chatgpt"], csv_file, ROWS, file_path, blob_file) # Resume the run
+   columnar_writer.close() # Close it without new rows
+
+   assert not os.path.exists(f"{file_path}{columnar_output.PREVIOUS_FILE_SUFFIX}") # The previous file was removed once its rows were copied
+
+   return columnar_output.read_columnar_output(output_format, file_path).to_pylist() # Return the restored rows
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"]) # Both columnar formats
+def test_resume_copies_complete_columnar_rows(tmp_path, output_format):
+   """
+   Verify that a resumed run copies the rows of a complete columnar output file with their raw responses.
+
+   :param tmp_path: The temporary directory of the test.
+   :param output_format: The format of the columnar output file.
+   :return: None
+   """
+
+   rows = resume_run(*write_run(tmp_path, output_format), output_format, str(tmp_path / "responses.blobs")) # Resume the run
+
+   assert [row["Chatgpt Raw"] for row in rows] == [f"raw {index}" for index in range(ROWS)] # Every row was copied with its raw response
+
+def test_resume_rebuilds_rows_after_torn_arrow_batch(tmp_path):
+   """
+   Verify that the rows after the last complete record batch of an Arrow stream are rebuilt from the CSV file.
+
+   :param tmp_path: The temporary directory of the test.
+   :return: None
+   """
+
+   csv_file, file_path = write_run(tmp_path, "arrow") # Write the run
+   os.truncate(file_path, os.path.getsize(file_path) - 50) # Cut its last record batch
+
+   rows = resume_run(csv_file, file_path, "arrow", str(tmp_path / "responses.blobs")) # Resume the run
+
+   assert [row["Task"] for row in rows] == [f"task {index}" for index in range(ROWS)] # Every completed row was restored
+   assert [row["Chatgpt Raw"] for row in rows] == [f"raw {index}" for index in range(10)] + [None, None] # Only the rows of the complete batches have their raw responses
+
+def test_resume_resolves_blob_references_of_rebuilt_rows(tmp_path):
+   """
+   Verify that the rows rebuilt from a CSV file whose outputs are stored as blobs hold the outputs rather than their references.
+
+   :param tmp_path: The temporary directory of the test.
+   :return: None
+   """
+
+   blob_file = str(tmp_path / "responses.blobs") # The blob store of the run
+   with contextlib.closing(BlobStore(blob_file)) as blob_store: # Open the blob store
+      csv_file, file_path = write_run(tmp_path, "parquet", blob_store) # Write the run with its outputs as blobs
+   os.remove(file_path) # The Parquet file of a crashed run is not readable
+
+   rows = resume_run(csv_file, file_path, "parquet", blob_file) # Resume the run
+
+   assert [row["Chatgpt"] for row in rows] == [f"output {index}" for index in range(ROWS)] # The outputs were read from the blob store
+   assert [row["Chatgpt Similarity"] for row in rows] == [50.0] * ROWS # The scores are typed
+
+def test_row_groups_receive_the_similarity_statistics(tmp_path):
+   """
+   Verify that the similarity statistics, left empty in the rows written during the run, are computed for each row group of the columnar output.
+
+   :param tmp_path: The temporary directory of the test.
+   :return: None
+   """
+
+   header = [*HEADER[:3], "Minimum Similarity", "Maximum Similarity", "Average Similarity", "Median Similarity", "Standard Deviation Similarity", *HEADER[3:], "Llama", "Llama Similarity"] # The header of a run with two models
+   file_path = str(tmp_path / "output.parquet") # The columnar output file
+   columnar_writer = columnar_output.ColumnarOutputWriter("parquet", header, ["Chatgpt", "Llama"], file_path, row_group_size=2) # Open the columnar output file
+
+   for index, (chatgpt_score, llama_score) in enumerate([("50.0", "70.0"), ("N/A", "30.0"), ("20.0", "20.0")]): # Loop through each row
+      columnar_writer.append({**dict.fromkeys(header, ""), "Task": f"task {index}", "Chatgpt Similarity": chatgpt_score, "Llama Similarity": llama_score}) # Buffer the row, with empty statistics
+   columnar_writer.close() # Close the columnar output file
+
+   rows = columnar_output.read_columnar_output("parquet", file_path).to_pylist() # Read the rows back
+
+   assert [[row[column] for column in header[3:8]] for row in rows] == [[50.0, 70.0, 60.0, 60.0, 10.0], [0.0, 30.0, 15.0, 15.0, 15.0], [20.0, 20.0, 20.0, 20.0, 0.0]] # The statistics of each row, a missing score counting as 0
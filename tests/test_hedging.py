@@ -0,0 +1,88 @@
+import asyncio # For running the hedged coroutines
+import pytest # For the expected errors
+import threading # For counting the requests of the concurrent threads
+import time # For the slow requests
+from hedging import Hedger # Import the hedger from ./hedging.py
+from metrics import RUN_METRICS # Import the run metrics from ./metrics.py
+
+def get_hedger(name, budget_fraction):
+   """
+   Create a hedger that hedges every call slower than 1 ms, having already seen a 1 ms call.
+
+   :param name: The model name of the hedger in the run metrics.
+   :param budget_fraction: The maximum fraction of hedged calls.
+   :return: The hedger.
+   """
+
+   hedger = Hedger(name, quantile=0.0, min_samples=1, budget_fraction=budget_fraction) # The minimum recent latency is the hedge delay
+   hedger.record_latency(0.001) # A fast call
+
+   return hedger # Return the hedger
+
+def test_run_hedges_within_the_budget():
+   """
+   Verify that the slow calls are only hedged while the hedges stay within budget_fraction of the calls.
+
+   :return: None
+   """
+
+   hedger = get_hedger("HedgeBudget", 0.25) # At most one call in four is hedged
+   requests = [] # The sent requests
+   requests_lock = threading.Lock() # Lock for counting the requests of the hedge threads
+
+   def slow_request(task_message): # A request slower than the hedge delay
+      with requests_lock: # Lock the requests
+         requests.append(task_message) # Count the request
+      time.sleep(0.05) # Wait for the response
+      return task_message # Return the response
+
+   assert [hedger.run(slow_request, f"task {index}") for index in range(8)] == [f"task {index}" for index in range(8)] # Every call returns its own response
+   assert (hedger.calls, hedger.hedges, len(requests)) == (8, 2, 10) # Only the 4th and 8th calls were hedged
+   assert not hedger.acquire_hedge() # The budget is spent until more calls are made
+
+def test_run_uses_the_duplicate_when_the_original_fails():
+   """
+   Verify that a hedged call returns the response of the duplicate request when the original request fails, and counts the hedge as won by the duplicate.
+
+   :return: None
+   """
+
+   hedger = get_hedger("HedgeFailure", 1.0) # Every slow call is hedged
+   responses = iter([ConnectionError("reset"), "duplicate response"]) # The original request fails, the duplicate one succeeds
+
+   def request(task_message): # A slow request
+      response = next(responses) # The response of this request
+      time.sleep(0.05 if isinstance(response, Exception) else 0.01) # The original request is slower than the hedge delay
+      if isinstance(response, Exception): # If the request fails
+         raise response # Raise its error
+      return response # Return the response
+
+   assert hedger.run(request, "task") == "duplicate response" # The duplicate response is used
+   assert (RUN_METRICS.snapshot()["providers"]["HedgeFailure"]["hedged_calls"], RUN_METRICS.snapshot()["providers"]["HedgeFailure"]["hedge_wins"]) == (1, 1) # The duplicate won
+
+   def fail(task_message): # A slow request that always fails
+      time.sleep(0.05) # Wait for the error
+      raise ConnectionError(task_message) # Fail the request
+
+   with pytest.raises(ConnectionError): # The error is raised once both requests failed
+      hedger.run(fail, "task") # Run the call
+
+def test_arun_uses_the_duplicate_when_the_original_fails():
+   """
+   Verify that a hedged asynchronous call returns the response of the duplicate request when the original request fails.
+
+   :return: None
+   """
+
+   hedger = get_hedger("HedgeAsyncFailure", 1.0) # Every slow call is hedged
+   requests = [] # The sent requests
+
+   async def request(task_message): # A slow request
+      requests.append(task_message) # Count the request
+      if len(requests) == 1: # If it is the original request
+         await asyncio.sleep(0.05) # It is slower than the hedge delay
+         raise ConnectionError("reset") # And it fails
+      return "duplicate response" # The duplicate request succeeds
+
+   assert asyncio.run(hedger.arun(request, "task")) == "duplicate response" # The duplicate response is used
+   assert len(requests) == 2 # The original and the duplicate requests were sent
@@ -0,0 +1,91 @@
+import csv # For writing the output files
+import json # For reading the leaderboard file
+import main # Import the collector from ./main.py
+import numpy as np # For the score matrices
+from leaderboard import compute_row_statistics, write_leaderboard # Import the vectorized statistics and the leaderboard from ./leaderboard.py
+
+HEADER = ["Task", "Expected Output", "Most Similar Model", "Minimum Similarity", "Maximum Similarity", "Average Similarity", "Median Similarity", "Standard Deviation Similarity", "Chatgpt", "Chatgpt Similarity", "Chatgpt Latency (s)", "Llama", "Llama Similarity"] # The header of the output, with the stream metrics of ChatGPT only
+
+def write_csv(file_path, rows):
+   """
+   Write the rows of a CSV file.
+
+   :param file_path: The path to the CSV file.
+   :param rows: List of the rows, starting with the header.
+   :return: None
+   """
+
+   with open(file_path, mode="w", newline="", encoding="utf-8") as file: # Open the CSV file
+      csv.writer(file).writerows(rows) # Write the rows
+
+def get_output_row(index, chatgpt_score, chatgpt_latency, llama_score):
+   """
+   Build an output row written during a run, with empty similarity statistics.
+
+   :param index: The index of the row.
+   :param chatgpt_score: The similarity cell of ChatGPT.
+   :param chatgpt_latency: The latency cell of ChatGPT.
+   :param llama_score: The similarity cell of Llama.
+   :return: The output row.
+   """
+
+   return [f"task {index}", f"expected {index}", "", "", "", "", "", "", f"chatgpt {index}", chatgpt_score, chatgpt_latency, f"llama {index}", llama_score] # Return the row
+
+ROWS = [get_output_row(0, "80.0", "1.0", "60.0"), get_output_row(1, "N/A", "", "90.0"), get_output_row(2, "70.0", "2.0", "70.0")] # The rows of the output: a ChatGPT win, a missing ChatGPT score and a tie
+
+def test_compute_row_statistics():
+   """
+   Verify the minimum, maximum, average, median and standard deviation of each row of a score matrix, and the statistics without models.
+
+   :return: None
+   """
+
+   statistics = compute_row_statistics(np.array([[10.0, 20.0, 60.0], [0.0, 50.0, 50.0]])) # The statistics of two rows
+
+   assert statistics.tolist() == [[10.0, 60.0, 30.0, 20.0, 21.6], [0.0, 50.0, 33.33, 50.0, 23.57]] # Every statistic of each row, rounded to 2 decimal places
+   assert compute_row_statistics(np.zeros((2, 0))).tolist() == [[0.0] * 5] * 2 # The rows without models have 0 statistics
+
+def test_write_leaderboard(tmp_path):
+   """
+   Verify the ranking, wins, similarity and latency summaries and token usage of the leaderboard, and that it is written to its file.
+
+   :param tmp_path: The temporary directory of the test.
+   :return: None
+   """
+
+   csv_file, leaderboard_file = str(tmp_path / "output.csv"), str(tmp_path / "leaderboard.json") # The output and leaderboard files
+   write_csv(csv_file, [HEADER, *ROWS]) # Write the output
+
+   leaderboard = write_leaderboard(csv_file, leaderboard_file, {"Chatgpt": {"calls": 2, "errors": 1, "input_tokens": 10, "output_tokens": 30}}) # Write the leaderboard, with the usage of ChatGPT only
+
+   with open(leaderboard_file, encoding="utf-8") as file: # Open the leaderboard file
+      assert json.load(file) == leaderboard # The written leaderboard is the returned one
+
+   chatgpt, llama = leaderboard["models"]["Chatgpt"], leaderboard["models"]["Llama"] # The summary of each model
+   assert (leaderboard["tasks"], leaderboard["scored_tasks"], leaderboard["ranking"]) == (3, 3, ["Chatgpt", "Llama"]) # ChatGPT has the best mean similarity, without its missing score
+   assert (chatgpt["scored_tasks"], chatgpt["mean_similarity"], chatgpt["median_similarity"]) == (2, 75.0, 75.0) # The missing score is left out
+   assert (chatgpt["wins"], llama["wins"], llama["win_rate"]) == (2, 1, 0.3333) # The first model wins the tie
+   assert (chatgpt["latency"]["count"], chatgpt["latency"]["mean_seconds"], llama["latency"]["count"], llama["latency"]["p50_seconds"]) == (2, 1.5, 0, None) # Only ChatGPT has latencies
+   assert (chatgpt["usage"]["tokens_per_call"], llama["usage"]) == (20.0, None) # Only ChatGPT was called by this run
+
+def test_write_similarity_statistics(tmp_path, monkeypatch):
+   """
+   Verify that the statistics of the rows written during a run are filled in from the score matrix of the whole output, in batches, keeping the other cells.
+
+   :param tmp_path: The temporary directory of the test.
+   :param monkeypatch: The pytest fixture used to replace the batch size.
+   :return: None
+   """
+
+   csv_file = str(tmp_path / "output.csv") # The output file
+   write_csv(csv_file, [HEADER, *ROWS]) # Write the output
+   monkeypatch.setattr(main, "RESCORE_BATCH_ROWS", 2) # Rewrite the rows in two batches
+
+   main.write_similarity_statistics(csv_file) # Write the statistics
+
+   with open(csv_file, mode="r", newline="", encoding="utf-8") as file: # Open the output
+      rows = list(csv.reader(file)) # Read its rows
+
+   assert rows[0] == HEADER # The header is kept
+   assert [row[2:8] for row in rows[1:]] == [["Chatgpt (80.0%)", "60.0", "80.0", "70.0", "70.0", "10.0"], ["Llama (90.0%)", "0", "90.0", "45.0", "45.0", "45.0"], ["Chatgpt (70.0%)", "70.0", "70.0", "70.0", "70.0", "0.0"]] # The missing score counts as 0
+   assert [row[8:] for row in rows[1:]] == [row[8:] for row in ROWS] # The outputs and scores are kept
@@ -0,0 +1,118 @@
+import csv # For writing the input and shard output files
+import main # Import the collector from ./main.py
+import pytest # For the fixtures
+
+HEADER = ["Task", "Expected Output", "Most Similar Model", "Minimum Similarity", "Maximum Similarity", "Average Similarity", "Median Similarity", "Standard Deviation Similarity", "Chatgpt", "Chatgpt Similarity", "Llama", "Llama Similarity"] # The header of the shard outputs
+TASKS = [(f"task {index}", f"expected {index}") for index in range(5)] # The rows of the input file
+PREVIOUS_OUTPUT = "the output of the previous merge\n" # The content of the output file before the merge
+
+def write_csv(file_path, rows):
+   """
+   Write the rows of a CSV file.
+
+   :param file_path: The path to the CSV file.
+   :param rows: List of the rows, starting with the header.
+   :return: None
+   """
+
+   with open(file_path, mode="w", newline="", encoding="utf-8") as file: # Open the CSV file
+      csv.writer(file).writerows(rows) # Write the rows
+
+def get_shard_row(row_index):
+   """
+   Build the shard output row of an input row, with placeholder aggregate columns that the merge recomputes.
+
+   :param row_index: The index of the input row.
+   :return: The output row.
+   """
+
+   task_description, expected_output = TASKS[row_index] # The input row
+
+   return [task_description, expected_output, "", "", "", "", "", "", f"chatgpt {row_index}", str(10.0 * row_index), f"llama {row_index}", str(50.0 - row_index)] # Return the row
+
+@pytest.fixture
+def output_files(tmp_path, monkeypatch):
+   """
+   Point the input, output and blob store files of the collector to a temporary directory with the input file and the previous merged output.
+
+   :param tmp_path: The temporary directory of the test.
+   :param monkeypatch: The pytest fixture used to replace the module constants.
+   :return: The path to the output file.
+   """
+
+   output_csv_file = tmp_path / "output.csv" # The merged output file
+   monkeypatch.setattr(main, "INPUT_CSV_FILE", str(tmp_path / "input.csv")) # The input file
+   monkeypatch.setattr(main, "OUTPUT_CSV_FILE", str(output_csv_file)) # The merged output file
+   monkeypatch.setattr(main, "BLOB_STORE_FILE", str(tmp_path / "responses.blobs")) # The blob store, which the shards did not write
+   monkeypatch.setattr(main, "WRITE_LEADERBOARD", False) # The leaderboard is not tested here
+
+   write_csv(main.INPUT_CSV_FILE, [["Task", "Expected Output (Optional)"], *TASKS]) # Write the input file
+   output_csv_file.write_text(PREVIOUS_OUTPUT, encoding="utf-8") # Write the previous merged output
+
+   return output_csv_file # Return the path to the output file
+
+def write_shard_outputs(shard_rows):
+   """
+   Write the output file of each of the shards of the input file.
+
+   :param shard_rows: List of the input row indexes of each shard.
+   :return: None
+   """
+
+   for shard_index, row_indexes in enumerate(shard_rows, start=1): # Loop through each shard
+      write_csv(main.get_shard_file(main.OUTPUT_CSV_FILE, (shard_index, len(shard_rows))), [HEADER, *[get_shard_row(row_index) for row_index in row_indexes]]) # Write its output
+
+def test_merge_restores_input_order_and_aggregates(output_files):
+   """
+   Verify that the merge writes the shard rows in the input order with their aggregate columns recomputed.
+
+   :param output_files: The path to the output file.
+   :return: None
+   """
+
+   write_shard_outputs([[0, 2, 4], [1, 3]]) # The rows of each shard with the "index" strategy
+
+   assert main.merge_shard_outputs(2, "index") == len(TASKS) # Every row was merged
+
+   with open(output_files, mode="r", newline="", encoding="utf-8") as file: # Open the merged output
+      header, *rows = list(csv.reader(file)) # Read its rows
+
+   assert header == HEADER # The header is kept
+   assert [row[0] for row in rows] == [task_description for task_description, _ in TASKS] # The rows are in the input order
+   assert rows[0][2:8] == ["Llama (50.0%)", "0.0", "50.0", "25.0", "25.0", "25.0"] # The aggregate columns were recomputed
+   assert rows[4][2] == "Llama (46.0%)" # The most similar model of the last row
+
+@pytest.mark.parametrize("shard_rows", [[[0, 2], [1, 3]], [[0, 2, 4], [1]]]) # A shard without its last row and a shard without a row in the middle of the input
+def test_merge_stops_on_missing_shard_rows(output_files, shard_rows):
+   """
+   Verify that the merge stops when a shard output has fewer rows than its part of the input, leaving the previous output untouched.
+
+   :param output_files: The path to the output file.
+   :param shard_rows: List of the input row indexes of each shard.
+   :return: None
+   """
+
+   write_shard_outputs(shard_rows) # Write the shard outputs with a missing row
+
+   with pytest.raises(SystemExit): # The merge must exit
+      main.merge_shard_outputs(2, "index") # Merge the shards
+
+   assert output_files.read_text(encoding="utf-8") == PREVIOUS_OUTPUT # The previous output was not replaced
+
+@pytest.mark.parametrize("value", ["0", "-3", "two"]) # No shards, a negative number of shards and a value that is not a number
+def test_merge_rejects_invalid_shard_counts(monkeypatch, value):
+   """
+   Verify that --merge only accepts a positive number of shards, so an invalid value never falls through to a full run.
+
+   :param monkeypatch: The pytest fixture used to replace the command line arguments.
+   :param value: The invalid number of shards.
+   :return: None
+   """
+
+   monkeypatch.setattr(main.sys, "argv", ["main.py", "--merge", value]) # The command line arguments
+
+   with pytest.raises(SystemExit): # The argument parser must exit
+      main.parse_arguments() # Parse the arguments
+
+   monkeypatch.setattr(main.sys, "argv", ["main.py", "--merge", "1"]) # A single shard
+   assert main.parse_arguments().merge == 1 # It is accepted
@@ -0,0 +1,44 @@
+import pytest # For the approximate comparisons
+from metrics import METRICS_BUCKETS, DurationHistogram, RunMetrics, format_prometheus # Import the run metrics from ./metrics.py
+
+def test_histogram_keeps_fixed_buckets():
+   """
+   Verify that the histogram counts the durations in its fixed buckets, with cumulative counts, and estimates the quantiles within them.
+
+   :return: None
+   """
+
+   histogram = DurationHistogram() # The histogram
+   for seconds in [0.1] * 50 + [0.2] * 45 + [400.0] * 5: # Loop through each duration
+      histogram.observe(seconds) # Count it
+
+   summary = histogram.summarize() # The summary of the histogram
+
+   assert len(histogram.bucket_counts) == len(METRICS_BUCKETS) + 1 # The memory does not grow with the number of durations
+   assert (summary["count"], summary["total_seconds"], summary["max_seconds"]) == (100, 2014.0, 400.0) # The count, total and maximum are exact
+   assert (summary["buckets"]["0.1"], summary["buckets"]["0.25"], summary["buckets"]["300"], summary["buckets"]["+Inf"]) == (50, 95, 95, 100) # A duration equal to a bound is counted in its bucket
+   assert summary["p50"] == pytest.approx(0.1) # The median is at the upper bound of the first bucket
+   assert 0.1 < summary["p95"] <= 0.25 # The 95th percentile is in the second bucket
+   assert 300.0 < summary["p99"] <= 400.0 # The quantiles of the +Inf bucket are interpolated up to the maximum
+   assert DurationHistogram().summarize()["p50"] == 0.0 # An empty histogram has no quantiles
+
+def test_histograms_merge_and_export_to_prometheus():
+   """
+   Verify that the histograms of the providers can be merged and that the stage and latency durations are exported as Prometheus histograms.
+
+   :return: None
+   """
+
+   run_metrics = RunMetrics() # The metrics of a run
+   run_metrics.record_stage("write_output_row", 0.003) # Record a stage duration
+   run_metrics.record_call("Chatgpt", 0.5) # Record a call latency of each provider
+   run_metrics.record_call("Llama", 2.0) # Record a slower call latency
+
+   merged = DurationHistogram().merge(run_metrics.providers["Chatgpt"]["latency"]).merge(run_metrics.providers["Llama"]["latency"]) # Merge the latencies of the providers
+   prometheus = format_prometheus(run_metrics.snapshot()) # The Prometheus text
+
+   assert (merged.count, merged.maximum) == (2, 2.0) # Every latency was merged
+   assert "# TYPE collector_provider_latency_seconds histogram" in prometheus # The latencies are a histogram
+   assert 'collector_stage_seconds_bucket{stage="write_output_row",le="0.005"} 1' in prometheus # The stage duration is in its bucket
+   assert 'collector_provider_latency_seconds_bucket{provider="Llama",le="+Inf"} 1' in prometheus # The +Inf bucket counts every latency
+   assert 'collector_provider_latency_seconds_count{provider="Chatgpt"} 1' in prometheus # The count of the latencies
@@ -0,0 +1,59 @@
+import json # For building the packed responses
+import pytest # For the parametrized tests
+from packing import build_pack_prompt, parse_pack_response # Import the packed prompts from ./packing.py
+
+TASK_MESSAGES = ["first task", "second task", "third task"] # The task messages of the pack
+
+def test_parse_pack_response_maps_answers_to_tasks():
+   """
+   Verify that the answers of a packed response wrapped in a Markdown code block are mapped to their tasks by id, whatever their order.
+
+   :return: None
+   """
+
+   response = "Here are the answers:\n```json\n" + json.dumps({"answers": [{"id": 3, "answer": "third"}, {"id": 1, "answer": "first"}]}) + "\n```" # A response with text around the JSON object
+
+   assert parse_pack_response(response, TASK_MESSAGES) == {"third task": "third", "first task": "first"} # The unanswered task is left out
+
+@pytest.mark.parametrize("response", [
+   "", # An empty response
+   "I cannot answer these tasks.", # A response without JSON
+   '{"answers": [{"id": 1, "answer": "first"}', # A truncated JSON object
+   '{"answers": [{"id": 1, "answer": "first",}]}', # A trailing comma
+   "} before {", # Braces in the wrong order
+   '{"results": [{"id": 1, "answer": "first"}]}', # The wrong key
+   '{"answers": "first"}', # Answers that are not a list
+   '["answers"]', # A JSON array instead of an object
+   None, # A missing response
+]) # The malformed responses
+def test_parse_pack_response_rejects_malformed_json(response):
+   """
+   Verify that a malformed packed response gives no answers, so every task of the pack falls back to a single-task call.
+
+   :param response: The malformed response.
+   :return: None
+   """
+
+   assert parse_pack_response(response, TASK_MESSAGES) == {} # Every task falls back
+
+def test_parse_pack_response_skips_invalid_answers():
+   """
+   Verify that the answers with an unknown id, a non-integer id or an empty answer are skipped, while the valid answers are kept.
+
+   :return: None
+   """
+
+   answers = [{"id": 0, "answer": "none"}, {"id": 4, "answer": "none"}, {"id": "2", "answer": "second"}, {"id": 2, "answer": "   "}, {"id": 3}, "third", {"id": 1, "answer": "first"}] # The answers, with only the last one valid
+
+   assert parse_pack_response(json.dumps({"answers": answers}), TASK_MESSAGES) == {"first task": "first"} # Only the valid answer is kept
+
+def test_build_pack_prompt_numbers_the_tasks():
+   """
+   Verify that the packed prompt ends with the tasks numbered from 1, so the ids of the answers map back to them.
+
+   :return: None
+   """
+
+   tasks = json.loads(build_pack_prompt(TASK_MESSAGES).splitlines()[-1])["tasks"] # The JSON object on the last line of the prompt
+
+   assert tasks == [{"id": index, "task": task_message} for index, task_message in enumerate(TASK_MESSAGES, start=1)] # The tasks are numbered from 1
@@ -0,0 +1,162 @@
+import asyncio # For running the asynchronous requests
+import email.utils # For formatting the HTTP-date Retry-After headers
+import pytest # For the fixtures
+import rate_limiter # Import the rate limiter from ./rate_limiter.py
+import types # For the fake HTTP responses
+
+class ProviderError(Exception):
+   """
+   An error raised by a provider SDK, with the HTTP status code and the headers of its response.
+
+   """
+
+   def __init__(self, status_code, headers=None): # Constructor
+      super().__init__(f"HTTP {status_code}") # The error message
+      self.status_code = status_code # The HTTP status code
+      self.response = types.SimpleNamespace(headers=headers or {}) # The HTTP response
+
+@pytest.fixture
+def clock(monkeypatch):
+   """
+   Replace the clock of the rate limiter with a clock that only moves when the test advances it or the limiter sleeps,
+   and make the backoff jitter always pick the largest delay.
+
+   :param monkeypatch: The pytest fixture used to replace the clock.
+   :return: Dictionary with the current "now" time, in seconds, and the list of the "sleeps" of the limiter.
+   """
+
+   clock = {"now": 1_000_000.0, "sleeps": []} # The current time and the sleeps
+
+   def sleep(seconds): # Sleep without waiting
+      clock["sleeps"].append(seconds) # Record the sleep
+      clock["now"] += seconds # Advance the clock
+
+   monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: clock["now"]) # Read the monotonic time from the clock
+   monkeypatch.setattr(rate_limiter.time, "time", lambda: clock["now"]) # Read the wall time from the clock
+   monkeypatch.setattr(rate_limiter.time, "sleep", sleep) # Sleep on the clock
+   monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high) # The largest jittered delay
+
+   return clock # Return the clock
+
+def test_token_bucket_refills_up_to_its_capacity(clock):
+   """
+   Verify that the bucket hands out its capacity at once, makes the next reservations wait for the refill, never refills past its capacity and stays blocked after a Retry-After.
+
+   :param clock: The clock of the rate limiter.
+   :return: None
+   """
+
+   bucket = rate_limiter.TokenBucket(2, 1.0) # Two tokens, refilled at one token per second
+
+   assert [bucket.reserve(1), bucket.reserve(1), bucket.reserve(1)] == [0.0, 0.0, 1.0] # The third token is refilled in one second
+
+   clock["now"] += 100 # Much longer than a full refill
+   assert [bucket.reserve(2), bucket.reserve(1)] == [0.0, 1.0] # The bucket was refilled up to its capacity only
+
+   clock["now"] += 1 # The deficit is refilled
+   bucket.block(5) # The provider asked to wait 5 seconds
+   assert bucket.reserve(1) == 5.0 # The bucket waits for the block even with tokens left
+
+@pytest.mark.parametrize("headers, retry_after", [
+   ({"retry-after": "7"}, 7.0), # A number of seconds
+   ({"retry-after-ms": "1500", "retry-after": "7"}, 1.5), # A number of milliseconds, which wins over the seconds
+   ({"retry-after": email.utils.formatdate(1_000_030, usegmt=True)}, 30.0), # An HTTP date 30 seconds from now
+   ({"retry-after": email.utils.formatdate(999_000, usegmt=True)}, 0.0), # An HTTP date in the past
+   ({"retry-after": "soon"}, None), # An invalid header
+   ({}, None), # No header
+])
+def test_retry_after_headers(clock, headers, retry_after):
+   """
+   Verify the parsing of the Retry-After header as seconds or as an HTTP date, and of the retry-after-ms header.
+
+   :param clock: The clock of the rate limiter.
+   :param headers: The headers of the response.
+   :param retry_after: The expected delay in seconds, or None.
+   :return: None
+   """
+
+   assert rate_limiter.get_retry_after(ProviderError(429, headers)) == retry_after # The delay of the headers
+
+def test_backoff_and_adaptive_rate_factor(clock):
+   """
+   Verify the capped exponential backoff of the 5xx errors, that the 429 responses halve the request rate down to its minimum and block the buckets
+   for their Retry-After delay plus its jitter, that the successes recover the rate and that the other errors are not retried.
+
+   :param clock: The clock of the rate limiter.
+   :return: None
+   """
+
+   limiter = rate_limiter.RateLimiter("Test", requests_per_minute=60) # One request per second
+
+   assert [limiter.on_error(ProviderError(503), attempt) for attempt in (0, 2, 4)] == [1.0, 4.0, 16.0] # The backoff doubles with each attempt
+   assert limiter.rate_factor == 1.0 # The 5xx errors do not lower the rate
+
+   assert limiter.on_error(ProviderError(429, {"retry-after": "10"}), 0) == 11.0 # The Retry-After delay with its 10% jitter
+   assert (limiter.rate_factor, limiter.requests_bucket.refill_per_second) == (0.5, 0.5) # The request rate was halved
+   assert limiter.reserve("task") == 11.0 # Every request waits for the Retry-After delay
+
+   for _ in range(5): # Many rate limited requests
+      limiter.on_error(ProviderError(429), 0) # Lower the rate again
+   assert limiter.rate_factor == rate_limiter.MINIMUM_RATE_FACTOR # The rate never drops below its minimum
+
+   limiter.on_success() # A successful request
+   assert limiter.rate_factor == pytest.approx(rate_limiter.MINIMUM_RATE_FACTOR + rate_limiter.RATE_INCREASE_STEP) # The rate slowly recovers
+
+   assert limiter.on_error(ProviderError(400), 0) is None # A client error is not retried
+
+def test_run_gives_up_after_max_retries(clock):
+   """
+   Verify that a request that keeps failing is retried MAX_RETRIES times with the backoff delays before its error is raised, and that a request that recovers returns its result.
+
+   :param clock: The clock of the rate limiter.
+   :return: None
+   """
+
+   limiter = rate_limiter.RateLimiter("Test", tokens_per_minute=1_000_000) # A budget that never makes the requests wait
+   calls = [] # The sent requests
+
+   def fail(task_message): # A request that always fails
+      calls.append(task_message) # Count the request
+      raise ProviderError(500) # Fail it
+
+   with pytest.raises(ProviderError): # The last error is raised
+      limiter.run(fail, "task") # Run the request
+
+   assert len(calls) == rate_limiter.MAX_RETRIES + 1 # The first attempt and every retry
+   assert [seconds for seconds in clock["sleeps"] if seconds] == [1.0, 2.0, 4.0, 8.0, 16.0] # The backoff delays between the attempts
+
+   responses = iter([ProviderError(502), ProviderError(502), "output"]) # Two failures, then the response
+
+   def recover(task_message): # A request that fails twice
+      response = next(responses) # The next response
+      if isinstance(response, Exception): # If the request fails
+         raise response # Raise its error
+      return response # Return the response
+
+   assert limiter.run(recover, "task") == "output" # The response of the third attempt
+
+def test_arun_gives_up_after_max_retries(monkeypatch):
+   """
+   Verify that an asynchronous request that keeps failing is retried MAX_RETRIES times before its error is raised.
+
+   :param monkeypatch: The pytest fixture used to replace the sleeps.
+   :return: None
+   """
+
+   sleeps, calls = [], [] # The sleeps of the limiter and the sent requests
+
+   async def sleep(seconds): # Sleep without waiting
+      sleeps.append(seconds) # Record the sleep
+
+   async def fail(task_message): # A request that always fails
+      calls.append(task_message) # Count the request
+      raise ProviderError(429, {"retry-after": "2"}) # Rate limit it
+
+   monkeypatch.setattr(rate_limiter.asyncio, "sleep", sleep) # Sleep without waiting
+   monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: 0.0) # No jitter
+
+   with pytest.raises(ProviderError): # The last error is raised
+      asyncio.run(rate_limiter.RateLimiter("Test").arun(fail, "task")) # Run the request
+
+   assert len(calls) == rate_limiter.MAX_RETRIES + 1 # The first attempt and every retry
+   assert [seconds for seconds in sleeps if seconds] == [2.0] * rate_limiter.MAX_RETRIES # Each retry honored the Retry-After delay
@@ -0,0 +1,93 @@
+import csv # For writing the input and output files
+import main # Import the collector from ./main.py
+import os # For verifying if the rescore state file exists
+import pytest # For the fixtures
+
+HEADER = ["Task", "Expected Output", "Most Similar Model", "Minimum Similarity", "Maximum Similarity", "Average Similarity", "Median Similarity", "Standard Deviation Similarity", "Chatgpt", "Chatgpt Similarity", "Llama", "Llama Similarity"] # The header of the output
+TASKS = [("task 1", "red green blue"), ("task 2", "one two three")] # The rows of the input file
+OUTPUT_ROWS = [ # The rows of the output, scored against the previous expected outputs
+   ["task 1", "red green blue", "Chatgpt (100.0%)", "0.0", "100.0", "50.0", "50.0", "50.0", "red green blue", "100.0", "yellow", "0.0"],
+   ["task 2", "old expected output", "Chatgpt (0.0%)", "0.0", "0.0", "0.0", "0.0", "0.0", "one two", "0.0", "one two three", "0.0"],
+]
+
+def write_csv(file_path, rows):
+   """
+   Write the rows of a CSV file.
+
+   :param file_path: The path to the CSV file.
+   :param rows: List of the rows, starting with the header.
+   :return: None
+   """
+
+   with open(file_path, mode="w", newline="", encoding="utf-8") as file: # Open the CSV file
+      csv.writer(file).writerows(rows) # Write the rows
+
+def read_csv(file_path):
+   """
+   Read the rows of a CSV file.
+
+   :param file_path: The path to the CSV file.
+   :return: List of the rows, starting with the header.
+   """
+
+   with open(file_path, mode="r", newline="", encoding="utf-8") as file: # Open the CSV file
+      return list(csv.reader(file)) # Return the rows
+
+@pytest.fixture
+def output_csv_file(tmp_path, monkeypatch):
+   """
+   Point the input, output and blob store files of the collector to a temporary directory with the output to rescore.
+
+   :param tmp_path: The temporary directory of the test.
+   :param monkeypatch: The pytest fixture used to replace the module constants.
+   :return: The path to the output file.
+   """
+
+   monkeypatch.setattr(main, "INPUT_CSV_FILE", str(tmp_path / "input.csv")) # The input file
+   monkeypatch.setattr(main, "OUTPUT_CSV_FILE", str(tmp_path / "output.csv")) # The output file
+   monkeypatch.setattr(main, "BLOB_STORE_FILE", str(tmp_path / "responses.blobs")) # The blob store, which the output does not have
+   monkeypatch.setattr(main, "WRITE_LEADERBOARD", False) # The leaderboard is not tested here
+   monkeypatch.setattr(main, "SIMILARITY_IDF_MODE", "pair") # The scores of each pair only depend on the pair
+   monkeypatch.setattr(main, "SIMILARITY_ENGINE", None) # Create the engine of that mode
+
+   write_csv(main.OUTPUT_CSV_FILE, [HEADER, *OUTPUT_ROWS]) # Write the output to rescore
+
+   return main.OUTPUT_CSV_FILE # Return the path to the output file
+
+def test_rescore_updates_changed_rows_only(output_csv_file):
+   """
+   Verify that the rescore scores the rows whose expected output changed, and that a second rescore finds no changed row.
+
+   :param output_csv_file: The path to the output file.
+   :return: None
+   """
+
+   write_csv(main.INPUT_CSV_FILE, [["Task", "Expected Output (Optional)"], *TASKS]) # The expected output of the second task changed
+
+   assert main.rescore_output() == 2 # The output was never rescored, so every row is scored
+   header, first_row, second_row = read_csv(output_csv_file) # The rescored rows
+
+   assert first_row == OUTPUT_ROWS[0] # The first row has the same scores
+   assert second_row[1] == "one two three" # The expected output was updated
+   assert second_row[2] == "Llama (100.0%)" # The most similar model was recomputed
+   assert 0 < float(second_row[9]) < 100 # The partial answer was scored
+
+   assert main.rescore_output() == 0 # Nothing changed since the last rescore
+
+@pytest.mark.parametrize("tasks", [TASKS[:1], [*TASKS, ("task 3", "")]]) # An input with fewer rows and one with more rows than the output
+def test_rescore_stops_on_row_count_mismatch(output_csv_file, tasks):
+   """
+   Verify that the rescore stops when the output and the input do not have the same number of rows, before the output is replaced.
+
+   :param output_csv_file: The path to the output file.
+   :param tasks: The rows of the input file.
+   :return: None
+   """
+
+   write_csv(main.INPUT_CSV_FILE, [["Task", "Expected Output (Optional)"], *tasks]) # Write the input file
+
+   with pytest.raises(SystemExit): # The rescore must exit
+      main.rescore_output() # Rescore the output
+
+   assert read_csv(output_csv_file) == [HEADER, *OUTPUT_ROWS] # The output was not replaced
+   assert not os.path.exists(main.get_rescore_state_file(output_csv_file)) # No row hash was kept
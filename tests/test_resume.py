@@ -0,0 +1,43 @@
+import csv # For reading the resumed output file
+import main # Import the collector from ./main.py
+import pytest # For the parametrized tests
+
+HEADER = ["Task", "Expected Output", "ChatGPT", "ChatGPT Similarity"] # The header of the test output file
+COMPLETE_ROWS = "Task,Expected Output,ChatGPT,ChatGPT Similarity\r\nt1,e1,o1,50.0\r\nt2,e2,\"multi\nline\",25.0\r\n" # The header and two complete rows, one of them with a quoted line break
+
+@pytest.mark.parametrize("torn_row", ["t3,e3", "t3,e3,\"cut in the middle", "t3,e3,o3,1"]) # A row with missing cells, a row cut inside a quoted field and a row cut before its line break
+def test_resume_truncates_torn_last_row(tmp_path, torn_row):
+   """
+   Verify that --resume counts the complete rows, removes a partially written last row and appends the next rows after the complete ones.
+
+   :param tmp_path: The temporary directory of the test.
+   :param torn_row: The partially written last row.
+   :return: None
+   """
+
+   output_csv_file = tmp_path / "output.csv" # The output file of the interrupted run
+   output_csv_file.write_bytes((COMPLETE_ROWS + torn_row).encode("utf-8")) # Write the complete rows and the torn row
+
+   output_file, writer, completed_rows = main.open_output_csv(HEADER, resume=True, output_csv_file=str(output_csv_file)) # Resume the run
+   with output_file: # Close the output file
+      writer.writerow(["t3", "e3", "o3", "10.0"]) # Write the next row
+
+   with open(output_csv_file, mode="r", newline="", encoding="utf-8") as file: # Open the resumed output
+      rows = list(csv.reader(file)) # Read every row
+
+   assert completed_rows == 2 # The torn row is not counted
+   assert rows == [HEADER, ["t1", "e1", "o1", "50.0"], ["t2", "e2", "multi\nline", "25.0"], ["t3", "e3", "o3", "10.0"]] # The torn row was replaced by the next row
+
+def test_resume_keeps_complete_output(tmp_path):
+   """
+   Verify that --resume keeps every row of an output whose last row was completely written.
+
+   :param tmp_path: The temporary directory of the test.
+   :return: None
+   """
+
+   output_csv_file = tmp_path / "output.csv" # The output file of the interrupted run
+   output_csv_file.write_bytes(COMPLETE_ROWS.encode("utf-8")) # Write the complete rows
+
+   assert main.count_completed_rows(HEADER, str(output_csv_file)) == 2 # Every row is counted
+   assert output_csv_file.read_bytes() == COMPLETE_ROWS.encode("utf-8") # Nothing was truncated
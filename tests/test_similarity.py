@@ -0,0 +1,55 @@
+import random # For the synthetic texts
+import pytest # For the approximate comparisons
+from similarity import SimilarityEngine # Import the batched similarity engine from ./similarity.py
+from sklearn.feature_extraction.text import TfidfVectorizer # For the per-pair reference implementation
+from sklearn.metrics.pairwise import cosine_similarity # For the per-pair reference implementation
+
+PAIRS = [ # The (output, expected output) pairs with the edge cases of the tokenization and the IDF
+   ("The quick brown fox", "the QUICK brown fox"), # Identical texts up to their case
+   ("def add(a, b): return a + b", "def add(x, y):\n   return x + y"), # Code with punctuation
+   ("apple apple apple banana", "apple banana banana cherry"), # Repeated and shared terms
+   ("completely different words", "nothing in common here"), # No shared terms
+   ("", "an expected output"), # An empty output
+   ("a b c", "an expected output"), # An output without tokens of two characters
+   ("café résumé naïve", "résumé café"), # Accented words
+]
+
+def per_pair_similarity(output, expected_output):
+   """
+   Compute the similarity of a pair with a TfidfVectorizer fitted on the pair, as the collector originally did.
+
+   :param output: The output text.
+   :param expected_output: The expected output text.
+   :return: The similarity percentage rounded to 2 decimal places.
+   """
+
+   vectors = TfidfVectorizer().fit_transform([output, expected_output]).toarray() # Fit the vectorizer on the pair
+
+   return round(cosine_similarity([vectors[0]], [vectors[1]])[0][0] * 100, 2) # Return the similarity percentage
+
+def test_pair_mode_matches_per_pair_vectorizer():
+   """
+   Verify that the "pair" mode gives the scores of a TfidfVectorizer fitted on each pair, for the edge cases and for random texts scored in one batch.
+
+   :return: None
+   """
+
+   generator = random.Random(7) # The seeded random generator
+   vocabulary = [f"word{index}" for index in range(50)] # A small vocabulary, so the texts share terms
+   pairs = PAIRS + [(" ".join(generator.choices(vocabulary, k=generator.randint(1, 30))), " ".join(generator.choices(vocabulary, k=generator.randint(1, 30)))) for _ in range(200)] # The edge cases and the random pairs
+
+   similarities = SimilarityEngine("pair").compute_similarities([output for output, _ in pairs], [expected_output for _, expected_output in pairs]) # Score every pair in one batch
+
+   for (output, expected_output), similarity in zip(pairs, similarities): # Loop through each pair
+      assert similarity == pytest.approx(per_pair_similarity(output, expected_output), abs=0.011) # The scores only differ by the rounding
+
+def test_pair_mode_without_expected_output_or_tokens():
+   """
+   Verify that the pairs without an expected output have no similarity and that the pairs without any token score 0.
+
+   :return: None
+   """
+
+   similarities = SimilarityEngine("pair").compute_similarities(["an output", "an output", None, "?!"], ["", None, "an expected output", "..."]) # Score the edge cases
+
+   assert similarities == [None, None, 0.0, 0.0] # The pairs without an expected output are not scored
@@ -0,0 +1,136 @@
+import asyncio # For running the queue worker
+import contextlib # For closing the queue
+import main # Import the queue worker from ./main.py
+import pytest # For the fixtures
+import work_queue # Import the job queue from ./work_queue.py
+
+PROVIDERS = [("Chatgpt", "ChatGPTModel")] # The provider of the queue
+TASKS = [("task 1", "expected 1"), ("task 2", "expected 2")] # The input rows
+
+@pytest.fixture
+def clock(monkeypatch):
+   """
+   Replace the clock of the queue with a clock that only moves when the test advances it.
+
+   :param monkeypatch: The pytest fixture used to replace the clock.
+   :return: Single item list with the current time, in seconds.
+   """
+
+   now = [1000.0] # The current time
+   monkeypatch.setattr(work_queue.time, "time", lambda: now[0]) # Read the time from the list
+
+   return now # Return the clock
+
+@pytest.fixture
+def queue(tmp_path, clock):
+   """
+   Open a queue with a 10 seconds lease and 2 attempts per job, with the input rows enqueued.
+
+   :param tmp_path: The temporary directory of the test.
+   :param clock: The clock of the queue.
+   :return: Generator that yields the queue.
+   """
+
+   with contextlib.closing(work_queue.WorkQueue(str(tmp_path / "queue.sqlite3"), lease_seconds=10, max_attempts=2)) as opened_queue: # Open the queue
+      opened_queue.enqueue(TASKS, PROVIDERS) # Enqueue the input rows
+      yield opened_queue # Use the queue
+
+def test_expired_lease_is_leased_again_until_max_attempts(queue, clock):
+   """
+   Verify that a job is only leased by another worker once its lease expired, that the first worker can no longer complete it,
+   and that it is marked as failed once its lease expired max_attempts times.
+
+   :param queue: The queue.
+   :param clock: The clock of the queue.
+   :return: None
+   """
+
+   assert [job_key for job_key, _ in queue.lease("worker-a", "Chatgpt", 10)] == ["0", "1"] # The first worker leases every job
+   assert queue.lease("worker-b", "Chatgpt", 10) == [] # The leased jobs are not visible to the other workers
+
+   clock[0] += 11 # The leases expire
+   assert [job_key for job_key, _ in queue.lease("worker-b", "Chatgpt", 10)] == ["0", "1"] # The jobs are leased again
+   assert not queue.complete("worker-a", "0", "Chatgpt", "output", "output", None) # The first worker lost its lease
+   assert queue.complete("worker-b", "0", "Chatgpt", "output", "output", None) # The second worker completes the job
+
+   clock[0] += 11 # The second lease of the other job expires
+   assert queue.lease("worker-c", "Chatgpt", 10) == [] # It reached max_attempts, so it is not leased again
+   assert queue.get_status_counts() == {"done": 1, "failed": 1} # It was marked as failed
+   assert queue.count_unfinished(["Chatgpt"]) == 0 # Every job is finished
+
+def test_renewed_lease_is_kept_until_the_job_finishes(queue, clock):
+   """
+   Verify that a renewed lease hides the job from the other workers after its first expiry, and that a lease that expired
+   and was leased by another worker is not taken back by the renewal of the first worker.
+
+   :param queue: The queue.
+   :param clock: The clock of the queue.
+   :return: None
+   """
+
+   queue.lease("worker-a", "Chatgpt", 1) # The first worker leases the first job
+
+   clock[0] += 8 # The job is still running
+   assert queue.renew("worker-a", [("0", "Chatgpt")]) == 1 # Its lease is renewed
+   clock[0] += 8 # The first lease would have expired
+   assert [job_key for job_key, _ in queue.lease("worker-b", "Chatgpt", 10)] == ["1"] # Only the other job can be leased
+
+   clock[0] += 11 # The first worker missed its renewal, so the lease expired
+   assert [job_key for job_key, _ in queue.lease("worker-b", "Chatgpt", 10)] == ["0", "1"] # The jobs are leased again
+   assert queue.renew("worker-a", [("0", "Chatgpt")]) == 0 # The first worker cannot renew a lease it lost
+   assert not queue.complete("worker-a", "0", "Chatgpt", "output", "output", None) # Nor complete its job
+   assert queue.complete("worker-b", "0", "Chatgpt", "output", "output", None) # The second worker completes it
+
+@pytest.mark.parametrize("heartbeats_per_lease, lost_jobs", [(4, 0), (0.2, 2)])
+def test_worker_renews_the_leases_of_slow_jobs(tmp_path, monkeypatch, heartbeats_per_lease, lost_jobs):
+   """
+   Verify that the worker renews the leases of the jobs that run longer than the lease, so no other worker leases them again,
+   and that without a renewal within the lease the jobs are leased again by another worker and counted as lost.
+
+   :param tmp_path: The temporary directory of the test.
+   :param monkeypatch: The pytest fixture used to replace the job runner.
+   :param heartbeats_per_lease: The number of lease renewals per lease.
+   :param lost_jobs: The expected number of jobs leased again by another worker while they ran.
+   :return: None
+   """
+
+   with contextlib.closing(work_queue.WorkQueue(str(tmp_path / "queue.sqlite3"), lease_seconds=0.2, max_attempts=2)) as queue: # Open a queue with a short lease
+      queue.enqueue(TASKS, PROVIDERS) # Enqueue the input rows
+      stolen_jobs = [] # The jobs leased by another worker while they ran
+
+      async def run_slow_job(model, prompt, provider_semaphore): # Run a job for longer than its lease
+         await asyncio.sleep(0.5) # The job outlives its first lease
+         stolen_jobs.extend(queue.lease("worker-b", "Chatgpt", 10)) # Another worker tries to lease the jobs
+         return prompt, None, prompt # Return the output, metrics and raw output
+
+      monkeypatch.setattr(main, "QUEUE_HEARTBEATS_PER_LEASE", heartbeats_per_lease) # The number of lease renewals per lease
+      monkeypatch.setattr(main, "QUEUE_POLL_SECONDS", 0.05) # Wait briefly for the leases of the other worker to expire
+      monkeypatch.setattr(main, "CIRCUIT_BREAKERS", False) # The fake model has no circuit breaker
+      monkeypatch.setattr(main, "arun_queue_job", run_slow_job) # Run the jobs without calling any model
+      model = type("ChatGPTModel", (), {"__module__": "chatgpt"})() # A model named after the provider of the queue
+
+      statistics = asyncio.run(main.arun_queue_worker(queue, [model], "worker-a")) # Run the worker
+
+      assert (statistics["completed"], statistics["lost"]) == (2 - lost_jobs, lost_jobs) # The jobs were completed unless their lease was lost
+      assert len(stolen_jobs) == lost_jobs # Only the expired leases were taken by the other worker
+
+def test_failed_calls_are_retried_until_max_attempts(queue):
+   """
+   Verify that a failed job is retried until max_attempts and that a released job does not consume an attempt.
+
+   :param queue: The queue.
+   :return: None
+   """
+
+   queue.lease("worker-a", "Chatgpt", 1) # Lease the first job
+   queue.release("worker-a", "0", "Chatgpt") # Give it back without running it
+   queue.lease("worker-a", "Chatgpt", 1) # Lease it again, which is its first attempt
+   queue.fail("worker-a", "0", "Chatgpt", "HTTP 500") # Its first call fails
+   assert queue.get_status_counts() == {"pending": 2} # It will be retried
+
+   queue.lease("worker-a", "Chatgpt", 1) # Lease it for its second attempt
+   queue.fail("worker-a", "0", "Chatgpt", "HTTP 500") # Its second call fails
+   assert queue.get_status_counts() == {"failed": 1, "pending": 1} # It reached max_attempts
+
+   row_index, _, _, _, jobs = next(queue.read_rows()) # The first input row and its jobs
+   assert (row_index, jobs["Chatgpt"]["status"]) == (0, "failed") # The failed job is materialized as failed
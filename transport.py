@@ -0,0 +1,121 @@
+import httpx # For the pooled HTTP clients
+import importlib.util # For verifying if the HTTP/2 dependencies are installed
+import threading # For creating the shared clients only once
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Connection Pool Constants:
+HTTP_MAX_CONNECTIONS = 100 # The maximum number of simultaneous connections of each pool
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 50 # The maximum number of idle connections kept alive for reuse
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60.0 # The number of seconds an idle connection is kept alive
+HTTP2_ENABLED = True # If set to True, HTTP/2 is negotiated with the providers that support it (requires the "h2" package)
+
+# Timeout Constants:
+HTTP_CONNECT_TIMEOUT_SECONDS = 10.0 # The maximum number of seconds to establish a connection
+HTTP_READ_TIMEOUT_SECONDS = 120.0 # The maximum number of seconds to wait for a chunk of the response
+HTTP_WRITE_TIMEOUT_SECONDS = 30.0 # The maximum number of seconds to send a chunk of the request
+HTTP_POOL_TIMEOUT_SECONDS = 30.0 # The maximum number of seconds to wait for a free connection of the pool
+
+HTTP_CLIENTS = {} # The shared synchronous clients, one per HTTP version
+ASYNC_HTTP_CLIENTS = {} # The shared asynchronous clients, one per HTTP version
+HTTP_CLIENTS_LOCK = threading.Lock() # Lock for creating the shared clients
+
+def is_http2_available():
+   """
+   Verify if the HTTP/2 dependencies of httpx are installed.
+
+   :return: True if the "h2" package is installed.
+   """
+
+   return importlib.util.find_spec("h2") is not None # Return True if h2 can be imported
+
+def use_http2(http2):
+   """
+   Decide if a client should negotiate HTTP/2.
+
+   :param http2: If the provider supports HTTP/2.
+   :return: True if HTTP/2 is enabled, supported by the provider and installed.
+   """
+
+   return bool(http2 and HTTP2_ENABLED and is_http2_available()) # Return True if HTTP/2 can be used
+
+def get_http_limits():
+   """
+   Get the connection pool limits.
+
+   :return: The httpx limits.
+   """
+
+   return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS, keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS) # Return the limits
+
+def get_http_timeout():
+   """
+   Get the explicit connect, read, write and pool timeouts.
+
+   :return: The httpx timeout.
+   """
+
+   return httpx.Timeout(connect=HTTP_CONNECT_TIMEOUT_SECONDS, read=HTTP_READ_TIMEOUT_SECONDS, write=HTTP_WRITE_TIMEOUT_SECONDS, pool=HTTP_POOL_TIMEOUT_SECONDS) # Return the timeout
+
+def get_http_client(http2=True):
+   """
+   Get the shared synchronous HTTP client, so every provider reuses the same pool of keep-alive connections.
+
+   :param http2: If the provider supports HTTP/2.
+   :return: The shared httpx client.
+   """
+
+   http2 = use_http2(http2) # Decide if HTTP/2 is used
+
+   with HTTP_CLIENTS_LOCK: # Lock the shared clients
+      if http2 not in HTTP_CLIENTS: # If the client was not created yet
+         verbose_output(true_string=f"{BackgroundColors.GREEN}Creating the shared {BackgroundColors.CYAN}{'HTTP/2' if http2 else 'HTTP/1.1'}{BackgroundColors.GREEN} client...{Style.RESET_ALL}") # Output the creating message
+         HTTP_CLIENTS[http2] = httpx.Client(http2=http2, limits=get_http_limits(), timeout=get_http_timeout()) # Create the client
+
+      return HTTP_CLIENTS[http2] # Return the client
+
+def get_async_http_client(http2=True):
+   """
+   Get the shared asynchronous HTTP client, used by the "arun" methods.
+
+   :param http2: If the provider supports HTTP/2.
+   :return: The shared httpx asynchronous client.
+   """
+
+   http2 = use_http2(http2) # Decide if HTTP/2 is used
+
+   with HTTP_CLIENTS_LOCK: # Lock the shared clients
+      if http2 not in ASYNC_HTTP_CLIENTS: # If the client was not created yet
+         verbose_output(true_string=f"{BackgroundColors.GREEN}Creating the shared asynchronous {BackgroundColors.CYAN}{'HTTP/2' if http2 else 'HTTP/1.1'}{BackgroundColors.GREEN} client...{Style.RESET_ALL}") # Output the creating message
+         ASYNC_HTTP_CLIENTS[http2] = httpx.AsyncClient(http2=http2, limits=get_http_limits(), timeout=get_http_timeout()) # Create the client
+
+      return ASYNC_HTTP_CLIENTS[http2] # Return the client
+
+def close_http_clients():
+   """
+   Close the shared synchronous HTTP clients. The asynchronous clients must be closed by aclose_async_http_clients in their event loop,
+   so the ones left here were never used and are only forgotten.
+
+   :return: None
+   """
+
+   with HTTP_CLIENTS_LOCK: # Lock the shared clients
+      for client in HTTP_CLIENTS.values(): # Loop through each synchronous client
+         client.close() # Close its connections
+      HTTP_CLIENTS.clear() # Forget the closed clients
+      ASYNC_HTTP_CLIENTS.clear() # Forget the asynchronous clients
+
+async def aclose_async_http_clients():
+   """
+   Close the shared asynchronous HTTP clients in the event loop that used them, so their connections are released before the loop finishes.
+
+   :return: None
+   """
+
+   with HTTP_CLIENTS_LOCK: # Lock the shared clients
+      clients = list(ASYNC_HTTP_CLIENTS.values()) # The clients to close
+      ASYNC_HTTP_CLIENTS.clear() # Forget them, so a later event loop creates new ones
+
+   for client in clients: # Loop through each asynchronous client
+      await client.aclose() # Close its connections
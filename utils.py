@@ -23,6 +23,9 @@ START_PATH = os.getcwd() # The starting path
 # Input/Output Directory Constants:
 OUTPUT_DIRECTORY = f"{START_PATH}/Outputs/" # The path to the output directory
 
+# Output Columns Constants:
+STATISTICS_COLUMNS = ("Minimum Similarity", "Maximum Similarity", "Average Similarity", "Median Similarity", "Standard Deviation Similarity") # The similarity statistics columns of the output, in the order of compute_row_statistics
+
 # Sound Constants:
 SOUND_COMMANDS = {"Darwin": "afplay", "Linux": "aplay", "Windows": "start"} # The commands to play a sound for each operating system
 SOUND_FILE = "./.assets/Sounds/NotificationSound.wav" # The path to the sound file
@@ -41,6 +44,16 @@ def verbose_output(true_string="", false_string=""):
    elif false_string != "": # If the false_string is not empty
       print(false_string) # Output the false_string
 
+def get_model_name(model):
+   """
+   Get the name of the AI model, which is used as the column name in the output dictionary.
+
+   :param model: The AI model object.
+   :return: The model name.
+   """
+
+   return model.__module__.split(".")[-1].capitalize() # Extract the model name from the model's module name
+
 def verify_filepath_exists(filepath):
    """
    Verify if a file or folder exists at the specified path.
@@ -0,0 +1,233 @@
+import contextlib # For the write transactions
+import itertools # For grouping the jobs of each input row
+import json # For serializing the stream metrics of the jobs
+import sqlite3 # For the persistent job queue
+import threading # For making the queue thread safe
+import time # For the lease expiry timestamps
+from colorama import Style # For coloring the terminal
+from utils import BackgroundColors # Import Classes from ./utils.py
+from utils import OUTPUT_DIRECTORY # Import Constants from ./utils.py
+from utils import verbose_output # Import Functions from ./utils.py
+
+# Work Queue Constants:
+QUEUE_FILE = f"{OUTPUT_DIRECTORY}work_queue.sqlite3" # The path to the SQLite job queue
+QUEUE_LEASE_SECONDS = 300 # The visibility timeout of a leased job, after which another worker can lease it again
+QUEUE_HEARTBEATS_PER_LEASE = 3 # The number of times a worker renews the leases of its running jobs within each lease, so a slow job is not leased again while it runs
+QUEUE_MAX_ATTEMPTS = 3 # The maximum number of leases of a job before it is marked as failed
+QUEUE_POLL_SECONDS = 5.0 # The number of seconds a worker waits when every remaining job is leased by other workers
+QUEUE_BUSY_TIMEOUT_SECONDS = 30.0 # The number of seconds to wait for the other workers' write transactions
+QUEUE_READ_PAGE_ROWS = 1000 # The number of input rows read at a time when the output is materialized
+FINISHED_STATUSES = ("done", "failed") # The statuses of the jobs that will not be leased again
+
+class WorkQueue:
+   """
+   A persistent SQLite job queue with one job per (task, provider), leased by any number of worker processes with a visibility timeout.
+   The jobs of identical tasks are shared when the tasks are enqueued with a deduplication key.
+
+   """
+
+   def __init__(self, queue_file=QUEUE_FILE, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS): # Constructor
+      self.queue_file = queue_file # The path to the SQLite queue file
+      self.lease_seconds = lease_seconds # The visibility timeout of the leased jobs
+      self.max_attempts = max_attempts # The maximum number of leases of a job
+      self.lock = threading.Lock() # Lock for the SQLite connection
+      self.connection = sqlite3.connect(queue_file, timeout=QUEUE_BUSY_TIMEOUT_SECONDS, check_same_thread=False, isolation_level=None) # Open the SQLite database in autocommit mode
+      self.connection.execute("PRAGMA journal_mode=WAL") # Allow the workers to read while another one writes
+      self.connection.execute("CREATE TABLE IF NOT EXISTS providers (position INTEGER PRIMARY KEY, model_name TEXT NOT NULL, class_name TEXT NOT NULL)") # Create the providers table
+      self.connection.execute("CREATE TABLE IF NOT EXISTS tasks (row_index INTEGER PRIMARY KEY, task TEXT NOT NULL, expected_output TEXT NOT NULL, job_key TEXT NOT NULL)") # Create the input rows table
+      self.connection.execute("CREATE TABLE IF NOT EXISTS jobs (job_key TEXT NOT NULL, provider TEXT NOT NULL, prompt TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, lease_owner TEXT, lease_expires_at REAL, output TEXT, raw_output TEXT, metrics TEXT, error TEXT, PRIMARY KEY (job_key, provider))") # Create the jobs table
+      self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (provider, status)") # Index used by the leases
+
+   @contextlib.contextmanager
+   def transaction(self):
+      """
+      Run the statements of the block in a write transaction, which holds the database write lock from its start so two workers never lease the same job.
+
+      :return: Generator that yields the SQLite connection.
+      """
+
+      with self.lock: # Lock the connection
+         self.connection.execute("BEGIN IMMEDIATE") # Take the write lock
+         try: # Try to run the block
+            yield self.connection # Run the block
+         except BaseException: # If the block failed
+            self.connection.execute("ROLLBACK") # Undo its statements
+            raise # Propagate the error
+         self.connection.execute("COMMIT") # Apply its statements
+
+   def get_task_count(self):
+      """
+      Get the number of enqueued input rows.
+
+      :return: The number of input rows.
+      """
+
+      with self.lock: # Lock the connection
+         return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] # Return the number of rows
+
+   def get_providers(self):
+      """
+      Get the providers of the queue, in the order of the output columns.
+
+      :return: List of (model_name, class_name) tuples.
+      """
+
+      with self.lock: # Lock the connection
+         return self.connection.execute("SELECT model_name, class_name FROM providers ORDER BY position").fetchall() # Return the providers
+
+   def enqueue(self, tasks, providers, get_job_key=None):
+      """
+      Enqueue the input rows, with one job per unique task and provider.
+
+      :param tasks: Iterable of (task_description, expected_output) tuples, in the input order.
+      :param providers: List of (model_name, class_name) tuples.
+      :param get_job_key: Function returning the deduplication key of a task description, or None to give every row its own jobs.
+      :return: Tuple of the number of enqueued rows and the number of enqueued jobs.
+      """
+
+      with self.transaction() as connection: # Enqueue every row or none of them
+         connection.executemany("INSERT INTO providers (position, model_name, class_name) VALUES (?, ?, ?)", [(position, model_name, class_name) for position, (model_name, class_name) in enumerate(providers)]) # Store the providers
+
+         for row_index, (task_description, expected_output) in enumerate(tasks): # Loop through each input row
+            job_key = get_job_key(task_description) if get_job_key else str(row_index) # The key of the row's jobs
+            connection.execute("INSERT INTO tasks (row_index, task, expected_output, job_key) VALUES (?, ?, ?, ?)", (row_index, task_description, expected_output, job_key)) # Store the row
+            connection.executemany("INSERT OR IGNORE INTO jobs (job_key, provider, prompt) VALUES (?, ?, ?)", [(job_key, model_name, task_description) for model_name, _ in providers]) # Store its jobs, unless an identical task already did
+
+         rows = connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] # The number of enqueued rows
+         jobs = connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] # The number of enqueued jobs
+
+      return rows, jobs # Return the number of rows and jobs
+
+   def lease(self, worker_id, provider, limit):
+      """
+      Lease the next pending jobs of a provider, including the jobs whose lease expired. The expired jobs that reached max_attempts are marked as failed instead.
+
+      :param worker_id: The identifier of the worker.
+      :param provider: The model name of the provider.
+      :param limit: The maximum number of jobs to lease.
+      :return: List of (job_key, prompt) tuples.
+      """
+
+      if limit <= 0: # If the worker has no room for another job
+         return [] # Nothing to lease
+
+      now = time.time() # Get the current time
+
+      with self.transaction() as connection: # Lease the jobs atomically
+         connection.execute("UPDATE jobs SET status = 'failed', error = COALESCE(error, 'The lease expired too many times'), lease_owner = NULL WHERE provider = ? AND status = 'leased' AND lease_expires_at < ? AND attempts >= ?", (provider, now, self.max_attempts)) # Give up on the jobs that expired too many times
+         jobs = connection.execute("SELECT job_key, prompt FROM jobs WHERE provider = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires_at < ?)) ORDER BY rowid LIMIT ?", (provider, now, limit)).fetchall() # The next jobs
+         connection.executemany("UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1 WHERE job_key = ? AND provider = ?", [(worker_id, now + self.lease_seconds, job_key, provider) for job_key, _ in jobs]) # Lease them
+
+      if jobs: # If jobs were leased
+         verbose_output(true_string=f"{BackgroundColors.GREEN}Leased {BackgroundColors.CYAN}{len(jobs)}{BackgroundColors.GREEN} {BackgroundColors.CYAN}{provider}{BackgroundColors.GREEN} jobs.{Style.RESET_ALL}") # Output the leased message
+
+      return jobs # Return the leased jobs
+
+   def complete(self, worker_id, job_key, provider, output, raw_output, metrics):
+      """
+      Store the result of a leased job.
+
+      :param worker_id: The identifier of the worker.
+      :param job_key: The key of the job.
+      :param provider: The model name of the provider.
+      :param output: The formatted output.
+      :param raw_output: The raw output.
+      :param metrics: The stream metrics of the call, or None.
+      :return: True if the worker still held the lease, or False if the job was leased by another worker after its lease expired.
+      """
+
+      with self.transaction() as connection: # Store the result atomically
+         cursor = connection.execute("UPDATE jobs SET status = 'done', output = ?, raw_output = ?, metrics = ?, error = NULL, lease_owner = NULL, lease_expires_at = NULL WHERE job_key = ? AND provider = ? AND status = 'leased' AND lease_owner = ?", (output, raw_output, json.dumps(metrics) if metrics else None, job_key, provider, worker_id)) # Complete the job
+
+      return cursor.rowcount == 1 # Return True if the job was completed
+
+   def renew(self, worker_id, jobs):
+      """
+      Extend the leases of running jobs by lease_seconds from now. A job whose lease expired and was leased by another worker is left to it.
+
+      :param worker_id: The identifier of the worker.
+      :param jobs: Iterable of the (job_key, provider) tuples of the running jobs.
+      :return: The number of renewed leases.
+      """
+
+      now = time.time() # Get the current time
+
+      with self.transaction() as connection: # Renew the leases atomically
+         cursor = connection.executemany("UPDATE jobs SET lease_expires_at = ? WHERE job_key = ? AND provider = ? AND status = 'leased' AND lease_owner = ?", [(now + self.lease_seconds, job_key, provider, worker_id) for job_key, provider in jobs]) # Renew the leases still held by the worker
+
+      return cursor.rowcount # Return the number of renewed leases
+
+   def fail(self, worker_id, job_key, provider, error):
+      """
+      Release a leased job whose call failed, so it is retried, or mark it as failed once it reached max_attempts.
+
+      :param worker_id: The identifier of the worker.
+      :param job_key: The key of the job.
+      :param provider: The model name of the provider.
+      :param error: The error message.
+      :return: None
+      """
+
+      with self.transaction() as connection: # Release the job atomically
+         connection.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, lease_owner = NULL, lease_expires_at = NULL WHERE job_key = ? AND provider = ? AND status = 'leased' AND lease_owner = ?", (self.max_attempts, error, job_key, provider, worker_id)) # Release or fail the job
+
+   def release(self, worker_id, job_key, provider):
+      """
+      Give back a leased job that was not run, such as one skipped by an open circuit breaker, without consuming one of its attempts.
+
+      :param worker_id: The identifier of the worker.
+      :param job_key: The key of the job.
+      :param provider: The model name of the provider.
+      :return: None
+      """
+
+      with self.transaction() as connection: # Release the job atomically
+         connection.execute("UPDATE jobs SET status = 'pending', attempts = attempts - 1, lease_owner = NULL, lease_expires_at = NULL WHERE job_key = ? AND provider = ? AND status = 'leased' AND lease_owner = ?", (job_key, provider, worker_id)) # Release the job
+
+   def count_unfinished(self, providers):
+      """
+      Count the jobs of the providers that are pending or leased.
+
+      :param providers: List of the model names of the providers.
+      :return: The number of unfinished jobs.
+      """
+
+      with self.lock: # Lock the connection
+         return self.connection.execute(f"SELECT COUNT(*) FROM jobs WHERE provider IN ({', '.join('?' * len(providers))}) AND status NOT IN (?, ?)", (*providers, *FINISHED_STATUSES)).fetchone()[0] # Return the number of unfinished jobs
+
+   def get_status_counts(self):
+      """
+      Count the jobs of each status.
+
+      :return: Dictionary mapping each status to its number of jobs.
+      """
+
+      with self.lock: # Lock the connection
+         return dict(self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()) # Return the counts
+
+   def read_rows(self):
+      """
+      Read the input rows with the results of their jobs, in the input order.
+
+      :return: Generator of (row_index, task_description, expected_output, job_key, jobs) tuples, where jobs maps each provider to a dictionary with its status, output, raw output and metrics.
+      """
+
+      task_count = self.get_task_count() # The number of input rows
+
+      for page_start in range(0, task_count, QUEUE_READ_PAGE_ROWS): # Loop through each page of input rows, so the memory use does not grow with the number of rows
+         with self.lock: # Lock the connection
+            rows = self.connection.execute("SELECT tasks.row_index, tasks.task, tasks.expected_output, tasks.job_key, jobs.provider, jobs.status, jobs.output, jobs.raw_output, jobs.metrics FROM tasks JOIN jobs ON jobs.job_key = tasks.job_key WHERE tasks.row_index >= ? AND tasks.row_index < ? ORDER BY tasks.row_index", (page_start, page_start + QUEUE_READ_PAGE_ROWS)).fetchall() # Join the rows of the page with their jobs
+
+         for (row_index, task_description, expected_output, job_key), job_rows in itertools.groupby(rows, key=lambda row: row[:4]): # Loop through the jobs of each input row
+            jobs = {provider: {"status": status, "output": output, "raw_output": raw_output, "metrics": json.loads(metrics) if metrics else None} for *_, provider, status, output, raw_output, metrics in job_rows} # Map each provider to its job
+            yield row_index, task_description, expected_output, job_key, jobs # Yield the row
+
+   def close(self):
+      """
+      Close the queue.
+
+      :return: None
+      """
+
+      with self.lock: # Lock the connection
+         self.connection.close() # Close the connection